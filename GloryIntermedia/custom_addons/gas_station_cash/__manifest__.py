@@ -35,6 +35,8 @@
     'data': [
         'security/ir.model.access.csv',
         'data/cash_collect_sequence.xml',
+        'data/pos_shift_job_cron.xml',
+        'data/cash_archive_cron.xml',
         'report/cash_deposit_report.xml',
         'report/cash_withdrawal_report.xml',
         'report/cash_replenish_report.xml',
@@ -52,7 +54,8 @@
         'views/daily_report_views.xml',
         'views/cash_exchange_views.xml',
         'views/cash_collect_views.xml',
-        'views/cash_replenish_views.xml'
+        'views/cash_replenish_views.xml',
+        'views/cash_archive_views.xml'
     ],
     'assets': {
         'web.assets_backend': [
@@ -53,7 +53,7 @@ class GasStationDepositWorkflow(http.Controller):
         Deposit = request.env["gas.station.cash.deposit"].sudo()
 
         # Important: create 1 line so total_amount != 0 (because total_amount is computed from lines)
-        deposit = Deposit.create({
+        deposit = Deposit.create_machine_deposits({
             "name": tx_id,
             "staff_id": staff_id,
             "date": fields.Datetime.now(),
@@ -64,6 +64,9 @@ def _read_printer_config():
 
 PRINT_SERVICE_URL = _read_printer_config()
 _logger.info("Print service URL: %s", PRINT_SERVICE_URL or "disabled")
+# The print service only queues the job (its spooler prints and retries),
+# so the request never waits on the printer: (connect, read) seconds.
+PRINT_ENQUEUE_TIMEOUT = (2, 3)
 
 def _json_body():
     """Read JSON body for type='http' routes safely."""
@@ -82,6 +85,32 @@ def _http_json_response(resp: requests.Response):
         status=resp.status_code,
     )
 
+# Map deposit types to staff roles (staff list and fingerprint identify filter)
+# False = no role filter (all active staff)
+# List = multiple roles allowed
+DEPOSIT_TYPE_ROLES = {
+    'oil': 'attendant',
+    'engine_oil': 'attendant',
+    'rental': 'tenant',
+    'coffee_shop': 'coffee_shop_staff',
+    'convenient_store': 'convenient_store_staff',
+    'deposit_cash': 'cashier',
+    'exchange': False,
+    'exchange_cash': False,  # All staff can exchange
+    'exit_fullscreen': 'has_odoo_user',  # Only staff with Related Odoo User
+    'withdrawal': ['manager', 'supervisor', 'cashier', 'attendant'],  # Only these roles can withdraw. TODO: need to confirm roles and put in config
+}
+
+
+def _gallery_filter(deposit_type):
+    """Fingerprint gallery filter (roles / has_user) for a deposit type."""
+    role = DEPOSIT_TYPE_ROLES.get(deposit_type)
+    if role == 'has_odoo_user':
+        return {"roles": None, "has_user": True}
+    if isinstance(role, list):
+        return {"roles": role, "has_user": None}
+    return {"roles": [role] if role else None, "has_user": None}
+
 ########################## FINGERPRINT PROXY ROUTE ##########################
 class GloryApiController(http.Controller):
     """
@@ -115,28 +144,50 @@ class GloryApiController(http.Controller):
             return {"connected": False, "message": str(e)}
 
     @http.route('/gas_station_cash/fingerprint/identify', type='json', auth='user', methods=['POST'], csrf=False)
-    def fingerprint_identify(self, candidates=None, threshold=50, **kwargs):
+    def fingerprint_identify(self, deposit_type=None, candidates=None, threshold=50, **kwargs):
         """
         Proxy fingerprint identify request to the fingerprint service.
         Reads service URL from odoo.conf:
             ip_fingerprint_enroll_api_host
             port_fingerprint_enroll_api
+
+        The service matches against its template gallery (synced from
+        gas.station.staff); only the role filter of deposit_type and the
+        current gallery version are sent. If the service answers RESYNC, the
+        gallery is synced and the identify retried once. An explicit
+        candidates list (with template_b64) is still forwarded as is.
         """
         host    = odoo_config.get('ip_fingerprint_enroll_api_host', '127.0.0.1')
         port    = odoo_config.get('port_fingerprint_enroll_api', '5005')
         timeout = int(odoo_config.get('timeout_fingerprint_enroll_api', 5))
         fp_url  = f"http://{host}:{port}"
 
-        if not candidates:
-            return {"status": "ERROR", "message": "candidates is required"}
+        if not candidates and deposit_type not in DEPOSIT_TYPE_ROLES:
+            return {"status": "ERROR", "message": "deposit_type or candidates is required"}
+
+        Staff = request.env['gas.station.staff'].sudo()
 
         try:
-            resp = requests.post(
-                f"{fp_url}/api/v1/fingerprint/identify",
-                json={"threshold": threshold, "candidates": candidates},
-                timeout=timeout,
-            )
-            return resp.json()
+            if candidates:
+                payload = {"threshold": threshold, "candidates": candidates}
+            else:
+                payload = dict(
+                    _gallery_filter(deposit_type),
+                    threshold=threshold,
+                    gallery_version=Staff._fingerprint_gallery_version(),
+                )
+            resp = requests.post(f"{fp_url}/api/v1/fingerprint/identify", json=payload, timeout=timeout)
+            result = resp.json()
+
+            if result.get("status") == "RESYNC" and not candidates:
+                _logger.info("fingerprint/identify: gallery at version %s, syncing", result.get("version"))
+                version = Staff._fingerprint_gallery_sync()
+                if version is False:
+                    return {"status": "ERROR", "message": "Fingerprint gallery sync failed"}
+                payload["gallery_version"] = version
+                resp = requests.post(f"{fp_url}/api/v1/fingerprint/identify", json=payload, timeout=timeout)
+                result = resp.json()
+            return result
         except requests.exceptions.Timeout:
             return {"status": "TIMEOUT", "message": "Scanner timed out"}
         except requests.exceptions.ConnectionError:
@@ -480,6 +531,33 @@ class GloryApiController(http.Controller):
                 headers=[('Content-Type', 'application/json')]
             )
 
+    def _enqueue_print(self, kind, payload):
+        """Queue a receipt on the print service; returns without waiting for the printer."""
+        r = requests.post(f"{PRINT_SERVICE_URL}/print/{kind}", json=payload, timeout=PRINT_ENQUEUE_TIMEOUT)
+        try:
+            body = r.json()
+        except ValueError:
+            body = {}
+        _logger.info("Print %s: status=%s ref=%s job=%s%s", kind, r.status_code, payload.get("reference"),
+                     body.get("job_id"), " (coalesced)" if body.get("coalesced") else "")
+        if r.status_code != 202:
+            return {"status": "FAILED", "error": body.get("error") or f"HTTP {r.status_code}"}
+        return {"status": "OK", "job_id": body.get("job_id"), "coalesced": bool(body.get("coalesced"))}
+
+    @http.route('/gas_station_cash/print/job_status', type='json', auth='user', methods=['POST'], csrf=False)
+    def print_job_status(self, job_id=None, **kw):
+        """State of a queued receipt (queued / printing / done / failed)."""
+        if not PRINT_SERVICE_URL:
+            return {"status": "skipped"}
+        if not job_id:
+            return {"status": "FAILED", "error": "job_id is required"}
+        try:
+            r = requests.get(f"{PRINT_SERVICE_URL}/print/jobs/{job_id}", timeout=PRINT_ENQUEUE_TIMEOUT)
+            return r.json()
+        except Exception as e:
+            _logger.error("print_job_status: %s", e)
+            return {"status": "FAILED", "error": str(e)}
+
     @http.route('/gas_station_cash/print/deposit', type='json', auth='user', methods=['POST'], csrf=False)
     def print_deposit_receipt(self, **kw):
         """Print deposit receipt — breakdown from JS (Glory cash-in/end response)."""
@@ -510,9 +588,7 @@ class GloryApiController(http.Controller):
                 "breakdown":    breakdown,
                 "total_satang": total_satang,
             }
-            r = requests.post(f"{PRINT_SERVICE_URL}/print/deposit", json=payload, timeout=10)
-            _logger.info("Print deposit: status=%s ref=%s", r.status_code, kw.get("reference"))
-            return {"status": "OK"}
+            return self._enqueue_print("deposit", payload)
         except Exception as e:
             _logger.error("print_deposit_receipt: %s", e)
             return {"status": "FAILED", "error": str(e)}
@@ -547,9 +623,7 @@ class GloryApiController(http.Controller):
                 "product_name": product_name,
                 "total_satang": total_satang,
             }
-            r = requests.post(f"{PRINT_SERVICE_URL}/print/deposit_with_amount", json=payload, timeout=10)
-            _logger.info("Print deposit_with_amount: status=%s ref=%s", r.status_code, kw.get("reference"))
-            return {"status": "OK"}
+            return self._enqueue_print("deposit_with_amount", payload)
         except Exception as e:
             _logger.error("print_deposit_with_amount_receipt: %s", e)
             return {"status": "FAILED", "error": str(e)}
@@ -598,9 +672,7 @@ class GloryApiController(http.Controller):
                 "breakdown":       breakdown_satang,
                 "notes":           kw.get("notes", ""),
             }
-            r = requests.post(f"{PRINT_SERVICE_URL}/print/withdrawal", json=payload, timeout=10)
-            _logger.info("Print withdrawal: status=%s ref=%s", r.status_code, kw.get("reference"))
-            return {"status": "OK"}
+            return self._enqueue_print("withdrawal", payload)
         except Exception as e:
             _logger.error("print_withdrawal_receipt: %s", e)
             return {"status": "FAILED", "error": str(e)}
@@ -624,9 +696,7 @@ class GloryApiController(http.Controller):
                 "total_satang": int(kw.get("total_satang") or 0),
                 "breakdown":    kw.get("breakdown") or {},
             }
-            r = requests.post(f"{PRINT_SERVICE_URL}/print/replenish", json=payload, timeout=10)
-            _logger.info("Print replenish: status=%s ref=%s", r.status_code, kw.get("reference"))
-            return {"status": "OK"}
+            return self._enqueue_print("replenish", payload)
         except Exception as e:
             _logger.error("print_replenish_receipt: %s", e)
             return {"status": "FAILED", "error": str(e)}
@@ -652,15 +722,20 @@ class GloryApiController(http.Controller):
                 "reserve_kept":     int(kw.get("reserve_kept") or 0),
                 "breakdown":        kw.get("breakdown") or {},
             }
-            r = requests.post(f"{PRINT_SERVICE_URL}/print/collect_cash", json=payload, timeout=10)
-            _logger.info("Print collect_cash: status=%s ref=%s", r.status_code, kw.get("reference"))
-            return {"status": "OK"}
+            return self._enqueue_print("collect_cash", payload)
         except Exception as e:
             _logger.error("print_collect_cash_receipt: %s", e)
             return {"status": "FAILED", "error": str(e)}
 
+    def _deposit_type_role(self, deposit_type):
+        """DEPOSIT_TYPE_ROLES value of a deposit type, None if it is unknown."""
+        role = DEPOSIT_TYPE_ROLES.get(deposit_type)
+        if role is None and deposit_type not in ['exchange', 'exchange_cash', 'exit_fullscreen']:
+            return None
+        return role
+
     @http.route('/gas_station_cash/get_staff_by_deposit_type', type='json', auth='user', methods=['POST'])
-    def get_staff_by_deposit_type(self, deposit_type=None):
+    def get_staff_by_deposit_type(self, deposit_type=None, include=None):
         """
         Returns a list of staff members based on the deposit type mapping to roles.
         
@@ -671,79 +746,45 @@ class GloryApiController(http.Controller):
         - convenient_store: convenient_store_staff role
         - deposit_cash: cashier role
         - exchange_cash: all active staff (no role filter)
-        - withdrawal: manager, supervisor, or cashier roles (multiple roles)
-        """
-        logging.info("Fetching staff for deposit type: %s", deposit_type)
-        
-        # Map deposit types to roles
-        # False = no role filter (all active staff)
-        # List = multiple roles allowed
-        role_map = {
-            'oil': 'attendant',
-            'engine_oil': 'attendant',
-            'rental': 'tenant',
-            'coffee_shop': 'coffee_shop_staff',
-            'convenient_store': 'convenient_store_staff',
-            'deposit_cash': 'cashier',
-            'exchange_cash': False,  # All staff can exchange
-            'exit_fullscreen': 'has_odoo_user',  # Only staff with Related Odoo User
-            'withdrawal': ['manager', 'supervisor', 'cashier', 'attendant'],  # Only these roles can withdraw. TODO: need to confirm roles and put in config
-        }
-        
-        role = role_map.get(deposit_type)
-        logging.info("Mapped role for deposit type '%s': %s", deposit_type, role)
+        - exit_fullscreen: staff with a Related Odoo User
+        - withdrawal: manager, supervisor, cashier or attendant roles (multiple roles)
 
-        if role is None and deposit_type not in ['exchange', 'exchange_cash', 'exit_fullscreen']:
+        The list comes from the staff directory cache (models/staff_directory.py);
+        include adds optional fields (EXTRA_FIELDS).
+        """
+        role = self._deposit_type_role(deposit_type)
+        if role is None:
             logging.error("Invalid deposit type: %s", deposit_type)
             return {'staff_list': [], 'error': 'Invalid deposit type'}
 
-        domain = [('active', '=', True)]
-
-        # exit_fullscreen: only staff that have a Related Odoo User (user_id is set)
-        if deposit_type == 'exit_fullscreen':
-            domain.append(('user_id', '!=', False))
-            staff = request.env['gas.station.staff'].sudo().search(domain)
-            staff_list = [{
-                'id':                       s.id,
-                'name':                     s.name,
-                'nickname':                 s.nickname or False,
-                'employee_id':              s.employee_id,
-                'external_id':              s.external_id or False,
-                'role':                     s.role,
-                'fingerprint_template_b64': s.fingerprint_template_b64 or False,
-            } for s in staff]
-            return {'staff_list': staff_list}
-
-        # Handle different role filter scenarios
-        if role:
-            if isinstance(role, list):
-                # Multiple roles allowed (e.g., withdrawal)
-                domain.append(('role', 'in', role))
-            else:
-                # Single role
-                domain.append(('role', '=', role))
-        # If role is False, no role filter (all active staff)
-
-        staff = request.env['gas.station.staff'].sudo().search(domain)
-        logging.debug(staff)
-
-        # Corrected line: call read() directly on the staff recordset
-        # Build staff list manually to include fingerprint_template_b64
-        # (protected field) and remove the virtual PIN field.
-        staff_list = []
-        for s in staff:
-            staff_list.append({
-                'id':                       s.id,
-                'name':                     s.name,
-                'nickname':                 s.nickname or False,
-                'employee_id':              s.employee_id,
-                'external_id':              s.external_id or False,
-                'role':                     s.role,
-                # Template needed for 1:N fingerprint identify on POS side
-                'fingerprint_template_b64': s.fingerprint_template_b64 or False,
-            })
+        _etag, _body, staff_list = request.env['gas.station.staff.directory'].get_directory(role, include or ())
+        return {'staff_list': [dict(s) for s in staff_list]}
+
+    @http.route('/gas_station_cash/staff_directory', type='http', auth='user', methods=['GET'], csrf=False)
+    def staff_directory(self, deposit_type=None, include=None, **kw):
+        """
+        Same list as get_staff_by_deposit_type, for the kiosk screens: served
+        with an ETag, a kiosk that already has the list gets 304 Not Modified.
+        include: comma separated EXTRA_FIELDS.
+        """
+        role = self._deposit_type_role(deposit_type)
+        if role is None:
+            return request.make_response(
+                json.dumps({'staff_list': [], 'error': 'Invalid deposit type'}),
+                headers=[('Content-Type', 'application/json')],
+                status=400,
+            )
 
-        return {'staff_list': staff_list}
+        include = [f.strip() for f in (include or '').split(',') if f.strip()]
+        etag, body, _staff_list = request.env['gas.station.staff.directory'].get_directory(role, include)
+        # no-cache: the browser keeps the list but revalidates it every time
+        headers = [('ETag', etag), ('Cache-Control', 'private, no-cache')]
+        if etag in request.httprequest.headers.get('If-None-Match', ''):
+            return request.make_response('', headers=headers, status=304)
+        return request.make_response(
+            body,
+            headers=headers + [('Content-Type', 'application/json')],
+        )
 
     @http.route('/gas_station_cash/verify_pin', type='json', auth='user', methods=['POST'])
     def verify_pin(self, staff_id=None, pin=None):
@@ -974,7 +1015,7 @@ class GloryApiController(http.Controller):
                     product = env["gas.station.cash.product"].sudo().browse(product_id)
                     is_pos_related = bool(product.is_pos_related)
 
-                deposit = env["gas.station.cash.deposit"].sudo().create({
+                deposit = env["gas.station.cash.deposit"].sudo().create_machine_deposits({
                     "name":           txn_id,
                     "deposit_type":   deposit_type,
                     "staff_id":       staff.id,
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+File: controllers/pos_bulk_sender.py
+Description: Bulk submission of deposit callbacks to the POS (no Odoo dependency).
+
+Takes a list of prepared deposit requests (url + payload) and submits them:
+  - batch mode: when pos_deposit_batch_path is configured, one POST per
+    endpoint and batch carries several transactions; the POS answers with
+    one result per transaction_id
+  - pipelined mode: otherwise (or when the endpoint rejects the batch path),
+    one POST per transaction over a pooled keep-alive session, at most
+    `concurrency` in flight per endpoint
+
+Every transaction is acknowledged individually. The POS transaction ID is
+the idempotency key: it is sent as Idempotency-Key, a transaction appearing
+twice in one submission is sent once, and a POS reply of DUPLICATE (already
+recorded) counts as acknowledged — so a resend after a timeout or a crash
+between send and commit cannot book a deposit twice.
+
+Job dict in:  {"endpoint": "host:port", "url": ..., "payload": {...}, ...}
+Result out:   the job dict plus ok, error, latency (seconds)
+"""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+_logger = logging.getLogger(__name__)
+
+ACK_STATUSES = ("OK", "DUPLICATE")
+BATCH_UNSUPPORTED_HTTP = (404, 405, 501)
+
+
+def _acknowledged(result):
+    return (result or {}).get("status") in ACK_STATUSES
+
+
+def _error_of(result):
+    return (result or {}).get("description") or (result or {}).get("status") or "no acknowledgement"
+
+
+class PosBulkSender:
+    """
+    Args:
+        timeout: per-request timeout (seconds); a batch gets timeout + 0.1 s per transaction
+        concurrency: requests in flight per POS endpoint
+        batch_path: path of the vendor batch endpoint ("/deposit/batch"), None = pipelined only
+        batch_size: transactions per batch request
+    """
+
+    def __init__(self, timeout=5.0, concurrency=4, batch_path=None, batch_size=50):
+        self.timeout     = timeout
+        self.concurrency = max(1, concurrency)
+        self.batch_path  = batch_path or None
+        self.batch_size  = max(1, batch_size)
+        self._sessions   = {}
+        self._executors  = {}
+        self._no_batch   = set()   # endpoints that answered 404/405 on the batch path
+
+    # ------------------------------------------------------------------
+    # pool
+    # ------------------------------------------------------------------
+
+    def _executor(self, endpoint):
+        if endpoint not in self._executors:
+            self._executors[endpoint] = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix=f"pos_bulk_{endpoint}",
+            )
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sessions[endpoint] = session
+        return self._executors[endpoint]
+
+    def close(self):
+        for ex in self._executors.values():
+            ex.shutdown(wait=True)
+        for session in self._sessions.values():
+            session.close()
+        self._executors.clear()
+        self._sessions.clear()
+
+    # ------------------------------------------------------------------
+    # requests
+    # ------------------------------------------------------------------
+
+    def _post(self, job):
+        session = self._sessions[job["endpoint"]]
+        txid = job["payload"].get("transaction_id")
+        t0 = time.monotonic()
+        try:
+            resp = session.post(
+                job["url"], json=job["payload"], timeout=self.timeout,
+                headers={"Idempotency-Key": str(txid)} if txid else None,
+            )
+            result = resp.json() if resp.ok else {"status": "FAILED", "http_status": resp.status_code}
+            error = None if _acknowledged(result) else _error_of(result)
+        except Exception as e:
+            result = {"status": "FAILED"}
+            error = str(e)
+        return dict(job, ok=_acknowledged(result), error=error, latency=time.monotonic() - t0)
+
+    def _post_batch(self, endpoint, batch):
+        """
+        One batch request. Returns the per-job results, or None when the
+        endpoint does not support the batch path (caller falls back).
+        """
+        session = self._sessions[endpoint]
+        url = f"{batch[0]['url'].split('://', 1)[0]}://{endpoint}{self.batch_path}"
+        t0 = time.monotonic()
+        try:
+            resp = session.post(
+                url, json={"transactions": [job["payload"] for job in batch]},
+                timeout=self.timeout + 0.1 * len(batch),
+            )
+            if resp.status_code in BATCH_UNSUPPORTED_HTTP:
+                return None
+            body = resp.json() if resp.ok else {}
+            acks = {
+                str(item.get("transaction_id")): item
+                for item in body.get("results") or ()
+                if isinstance(item, dict)
+            }
+            failure = None if resp.ok else f"HTTP {resp.status_code}"
+        except Exception as e:
+            acks, failure = {}, str(e)
+        latency = time.monotonic() - t0
+
+        results = []
+        for job in batch:
+            ack = acks.get(str(job["payload"].get("transaction_id")))
+            ok = _acknowledged(ack)
+            results.append(dict(
+                job, ok=ok, latency=latency,
+                error=None if ok else (failure or _error_of(ack)),
+            ))
+        return results
+
+    # ------------------------------------------------------------------
+    # public
+    # ------------------------------------------------------------------
+
+    def send(self, jobs):
+        """Submit jobs; returns one result per job (same order not guaranteed)."""
+        results = []
+
+        # one submission per transaction ID — duplicates share the result
+        unique, duplicates = {}, []
+        for job in jobs:
+            txid = job["payload"].get("transaction_id")
+            if txid in unique:
+                duplicates.append(job)
+            else:
+                unique[txid] = job
+
+        by_endpoint = {}
+        for job in unique.values():
+            by_endpoint.setdefault(job["endpoint"], []).append(job)
+
+        batch_futures, single_futures = [], []
+        for endpoint, ep_jobs in by_endpoint.items():
+            executor = self._executor(endpoint)
+            if self.batch_path and endpoint not in self._no_batch:
+                for start in range(0, len(ep_jobs), self.batch_size):
+                    batch = ep_jobs[start:start + self.batch_size]
+                    batch_futures.append((endpoint, batch, executor.submit(self._post_batch, endpoint, batch)))
+            else:
+                single_futures.extend(executor.submit(self._post, job) for job in ep_jobs)
+
+        for endpoint, batch, fut in batch_futures:
+            batch_results = fut.result()
+            if batch_results is None:
+                if endpoint not in self._no_batch:
+                    _logger.info("[PosBulk] %s has no batch endpoint %s — pipelining", endpoint, self.batch_path)
+                    self._no_batch.add(endpoint)
+                single_futures.extend(self._executors[endpoint].submit(self._post, job) for job in batch)
+            else:
+                results.extend(batch_results)
+
+        for fut in single_futures:
+            results.append(fut.result())
+
+        by_txid = {res["payload"].get("transaction_id"): res for res in results}
+        for job in duplicates:
+            first = by_txid[job["payload"].get("transaction_id")]
+            results.append(dict(job, ok=first["ok"], error=first["error"], latency=0.0))
+        return results
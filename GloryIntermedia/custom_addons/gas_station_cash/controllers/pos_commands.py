@@ -17,6 +17,9 @@ import time
 import threading
 import requests
 
+from .pos_deposit_replay import DepositReplayEngine, get_replay_metrics, _count_backlog
+from .pos_shift_job_runner import start_shift_job
+
 _logger = logging.getLogger(__name__)
 
 # Glory API Configuration
@@ -238,6 +241,22 @@ def _read_pos_conf():
     except Exception:
         pos_heartbeat_interval = 60
 
+    # Backlog replay tuning (see pos_deposit_replay.py)
+    try:
+        pos_replay_chunk_size = int(section.get("pos_replay_chunk_size", "50").strip())
+    except Exception:
+        pos_replay_chunk_size = 50
+    try:
+        pos_replay_concurrency = int(section.get("pos_replay_concurrency", "4").strip())
+    except Exception:
+        pos_replay_concurrency = 4
+
+    # Vendor batch endpoint for deposit callbacks, e.g. /deposit/batch
+    # (see pos_bulk_sender.py). Empty = pooled per-deposit requests.
+    pos_deposit_batch_path = section.get("pos_deposit_batch_path", "").strip()
+    if pos_deposit_batch_path and not pos_deposit_batch_path.startswith("/"):
+        pos_deposit_batch_path = "/" + pos_deposit_batch_path
+
     # offline mode availability
     raw_offline = section.get("pos_offline_mode_availability", "false").strip().lower()
     pos_offline_mode_availability = raw_offline in ("true", "1", "yes")
@@ -249,11 +268,19 @@ def _read_pos_conf():
         "pos_heartbeat_interval":      pos_heartbeat_interval,
         "flowco_pos_map":              flowco_pos_map,
         "pos_offline_mode_availability": pos_offline_mode_availability,
+        "pos_replay_chunk_size":       max(1, pos_replay_chunk_size),
+        "pos_replay_concurrency":      max(1, pos_replay_concurrency),
+        "pos_deposit_batch_path":      pos_deposit_batch_path or None,
     }
 
 
 
 
+def _get_pos_terminal_id():
+    """POS terminal ID from odoo.conf (same key as PosCommandController._get_terminal_id)."""
+    return tools.config.get('pos_terminal_id', 'TERM-01')
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Heartbeat + Retry Worker
 # Runs as a daemon thread — calls POS heartbeat every N seconds (from odoo.conf)
@@ -301,61 +328,31 @@ class _PosHeartbeatWorker:
             except Exception as e:
                 _logger.warning("[HeartbeatWorker] Tick error: %s", e)
 
-    def _set_pos_connected(self, connected: bool):
-        """Update ICP gas_station_cash.pos_connected — called from background thread."""
+    def _record_heartbeat(self, alive: bool) -> dict:
+        """
+        Store the heartbeat result in gas.station.pos.link.state (shared across
+        worker processes). The model only writes when the state changed, so a
+        steady link does not touch the database on every tick.
+        """
         try:
             import odoo
             dbname = odoo.tools.config.get("db_name")
             if not dbname:
-                return
+                return {}
             registry = odoo.registry(dbname)
             with registry.cursor() as cr:
                 env = odoo.api.Environment(cr, 1, {})
-                ICP = env["ir.config_parameter"].sudo()
-                current = ICP.get_param("gas_station_cash.pos_connected", "true")
-                new_val = "true" if connected else "false"
-                if current != new_val:
-                    ICP.set_param("gas_station_cash.pos_connected", new_val)
-                    _logger.info("[HeartbeatWorker] pos_connected → %s", new_val)
+                return env["gas.station.pos.link.state"].sudo().record_heartbeat(
+                    _get_pos_terminal_id(), alive, offline_threshold=self.OFFLINE_THRESHOLD,
+                )
         except Exception as e:
-            _logger.warning("[HeartbeatWorker] _set_pos_connected error: %s", e)
+            _logger.warning("[HeartbeatWorker] _record_heartbeat error: %s", e)
+            return {}
 
-    def _increment_fail_count(self) -> int:
-        """Increment ICP failure counter (shared across worker processes). Returns new count."""
-        try:
-            import odoo
-            dbname = odoo.tools.config.get("db_name")
-            if not dbname:
-                return 1
-            registry = odoo.registry(dbname)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, 1, {})
-                ICP = env["ir.config_parameter"].sudo()
-                current = int(ICP.get_param("gas_station_cash.pos_fail_count", "0") or "0")
-                new_count = current + 1
-                ICP.set_param("gas_station_cash.pos_fail_count", str(new_count))
-                return new_count
-        except Exception as e:
-            _logger.warning("[HeartbeatWorker] _increment_fail_count error: %s", e)
-            return 1
-
-    def _reset_fail_count(self) -> int:
-        """Reset ICP failure counter. Returns previous count."""
-        try:
-            import odoo
-            dbname = odoo.tools.config.get("db_name")
-            if not dbname:
-                return 0
-            registry = odoo.registry(dbname)
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, 1, {})
-                ICP = env["ir.config_parameter"].sudo()
-                prev = int(ICP.get_param("gas_station_cash.pos_fail_count", "0") or "0")
-                ICP.set_param("gas_station_cash.pos_fail_count", "0")
-                return prev
-        except Exception as e:
-            _logger.warning("[HeartbeatWorker] _reset_fail_count error: %s", e)
-            return 0
+    @staticmethod
+    def _current_shift_start(env):
+        """Current shift start = last done close_shift or end_of_day (cached)."""
+        return env["gas.station.shift.boundary"].last_done()
 
     def _tick(self):
         """One heartbeat cycle: ping POS → retry failed deposits if alive."""
@@ -369,7 +366,7 @@ class _PosHeartbeatWorker:
         try:
             resp = requests.post(
                 url,
-                json={"source_system": "Odoo", "pos_terminal_id": "TERM-01"},
+                json={"source_system": "Odoo", "pos_terminal_id": _get_pos_terminal_id()},
                 timeout=timeout,
             )
             alive = resp.ok and resp.json().get("status") in ("OK", "acknowledged")
@@ -377,20 +374,20 @@ class _PosHeartbeatWorker:
             _logger.debug("[HeartbeatWorker] POS unreachable: %s", e)
             alive = False
 
+        link = self._record_heartbeat(alive)
+
         if not alive:
-            # Use ICP counter — shared across all worker processes
-            count = self._increment_fail_count()
-            _logger.debug("[HeartbeatWorker] POS heartbeat failed (%d/%d)",
-                          count, self.OFFLINE_THRESHOLD)
-            if count >= self.OFFLINE_THRESHOLD:
-                self._set_pos_connected(False)
+            _logger.debug("[HeartbeatWorker] POS heartbeat failed (%s/%d)",
+                          link.get("fail_count"), self.OFFLINE_THRESHOLD)
+            if link.get("changed"):
+                _logger.info("[HeartbeatWorker] pos_connected → false")
             return
 
-        # POS alive — reset ICP counter and mark connected
-        prev = self._reset_fail_count()
+        prev = link.get("previous_fail_count", 0)
         if prev > 0:
             _logger.info("[HeartbeatWorker] POS back online after %d failure(s)", prev)
-        self._set_pos_connected(True)
+        if link.get("changed"):
+            _logger.info("[HeartbeatWorker] pos_connected → true")
         _logger.debug("[HeartbeatWorker] POS alive — checking failed deposits")
 
         # ── Find failed deposits in current Odoo shift ────────────────────────
@@ -400,57 +397,24 @@ class _PosHeartbeatWorker:
             return
 
         try:
-            registry = odoo.registry(dbname)
+            # pick up cache invalidations (shift boundaries) signalled by other workers
+            registry = odoo.registry(dbname).check_signaling()
         except Exception as e:
             _logger.warning("[HeartbeatWorker] Cannot get registry: %s", e)
             return
 
         with registry.cursor() as cr:
             env = odoo.api.Environment(cr, 1, {})  # uid=1 (admin)
-
-            # Current shift start = last done close_shift or end_of_day
-            PosCmd    = env["gas.station.pos_command"].sudo()
-            last_done = PosCmd.search([
-                ("action", "in", ("close_shift", "end_of_day")),
-                ("status", "=", "done"),
-            ], order="started_at desc", limit=1)
-            shift_start = (
-                getattr(last_done, "finished_at", None) or last_done.started_at
-                if last_done else None
-            )
-
-            # Query failed deposits in this shift
-            domain = [("pos_status", "in", ("queued", "failed"))]
-            if shift_start:
-                domain.append(("date", ">", shift_start))
-
-            deposits = env["gas.station.cash.deposit"].sudo().search(domain)
-            if not deposits:
-                return
-
-            _logger.info("[HeartbeatWorker] Retrying %d failed deposit(s) in current shift",
-                         len(deposits))
-
+            shift_start = self._current_shift_start(env)
             pos_vendor = env["ir.config_parameter"].sudo().get_param(
                 "gas_station_cash.pos_vendor", "firstpro"
             )
 
-            # Re-use controller's send methods (instantiate without request context)
-            ctrl = PosCommandController()
-            for deposit in deposits:
-                try:
-                    if pos_vendor == "firstpro":
-                        ok = ctrl._send_deposit_to_firstpro(pos_conf, deposit)
-                    else:
-                        ok = ctrl._send_deposit_to_flowco(pos_conf, deposit)
-
-                    _logger.info(
-                        "[HeartbeatWorker] Deposit id=%s %s",
-                        deposit.id, "✅ OK" if ok else "❌ still failed",
-                    )
-                except Exception as dep_err:
-                    _logger.warning("[HeartbeatWorker] Error retrying deposit %s: %s",
-                                    deposit.id, dep_err)
+        # Replay the backlog in chunks — commits per chunk, no cursor held
+        # while waiting on the POS (controller only builds the requests)
+        DepositReplayEngine(PosCommandController(), pos_conf, pos_vendor).run(
+            registry, shift_start=shift_start,
+        )
 
 
 # Do NOT start at module load time — Odoo forks worker processes after import,
@@ -494,7 +458,7 @@ class PosCommandController(http.Controller):
 
     def _get_terminal_id(self):
         """Get the POS terminal ID from configuration or default."""
-        return tools.config.get('pos_terminal_id', 'TERM-01')
+        return _get_pos_terminal_id()
 
     def _get_default_staff_id(self):
         """Get default staff_id when not provided in request."""
@@ -520,7 +484,7 @@ class PosCommandController(http.Controller):
     # GLORY API FUNCTIONS
     # =========================================================================
 
-    def _glory_get_status(self, env=None):
+    def _glory_get_status(self, env=None, config=None):
         """
         Get Glory machine status.
         
@@ -535,7 +499,7 @@ class PosCommandController(http.Controller):
                 'error': str or None,
             }
         """
-        config = _read_collection_config(env=env)
+        config = config or _read_collection_config(env=env)
         base_url = config.get('glory_api_base_url', GLORY_API_BASE_URL)
         
         result = {
@@ -575,7 +539,8 @@ class PosCommandController(http.Controller):
         
         return result
 
-    def _glory_wait_for_idle(self, env=None, max_attempts=GLORY_POLL_MAX_ATTEMPTS, interval=GLORY_POLL_INTERVAL):
+    def _glory_wait_for_idle(self, env=None, max_attempts=GLORY_POLL_MAX_ATTEMPTS, interval=GLORY_POLL_INTERVAL,
+                             config=None):
         """
         Poll Glory status until it returns to IDLE state.
         
@@ -605,7 +570,7 @@ class PosCommandController(http.Controller):
             
             _logger.info("   Poll attempt %d/%d...", attempt, max_attempts)
             
-            status = self._glory_get_status(env=env)
+            status = self._glory_get_status(env=env, config=config)
             
             if not status['success']:
                 _logger.warning("   Status check failed: %s", status.get('error'))
@@ -758,12 +723,12 @@ class PosCommandController(http.Controller):
         }
 
 
-    def _glory_get_inventory(self, env):
+    def _glory_get_inventory(self, env, config=None):
         """
         Get dispensable cash from Glory Cash Recycler.
         Uses /cash/availability (Cash type=4 — dispensable only).
         """
-        config = _read_collection_config(env=env)
+        config = config or _read_collection_config(env=env)
         base_url = config.get('glory_api_base_url', GLORY_API_BASE_URL)
 
         _logger.info("Getting dispensable inventory from Glory API (type=4)...")
@@ -927,7 +892,7 @@ class PosCommandController(http.Controller):
     # COLLECTION BOX FUNCTIONS
     # =========================================================================
     
-    def _glory_collect_with_reserve(self, env, reserve_denoms: list = None):
+    def _glory_collect_with_reserve(self, env, reserve_denoms: list = None, config=None):
         """
         Collect cash to collection box, keeping specified denominations as reserve.
 
@@ -942,7 +907,7 @@ class PosCommandController(http.Controller):
         Returns:
             dict with collection results
         """
-        config = _read_collection_config(env=env)
+        config = config or _read_collection_config(env=env)
         base_url = config.get('glory_api_base_url', GLORY_API_BASE_URL)
 
         _logger.info("💰 Collecting cash with reserve...")
@@ -1097,13 +1062,13 @@ class PosCommandController(http.Controller):
 
         return result
 
-    def _collect_to_box(self, env, mode: str, staff_id: str = None, reserve_amount: float = 0):
+    def _collect_to_box(self, env, mode: str, staff_id: str = None, reserve_amount: float = 0, config=None):
         """
         Collect cash to collection box via Glory Cash Recycler.
 
         UPDATED: Support for denomination-based reserve configuration.
         """
-        config = _read_collection_config(env=env)
+        config = config or _read_collection_config(env=env)
         keep_reserve = config.get('end_of_day_keep_reserve', True)
         reserve_denoms = config.get('end_of_day_reserve_denoms')
 
@@ -1130,7 +1095,7 @@ class PosCommandController(http.Controller):
 
         try:
             # Step 1 - Get current cash inventory (type 4 - dispensable only)
-            inventory = self._glory_get_inventory(env)
+            inventory = self._glory_get_inventory(env, config=config)
 
             if not inventory['success']:
                 result['error'] = inventory.get('error', 'Failed to get inventory')
@@ -1146,7 +1111,7 @@ class PosCommandController(http.Controller):
             if mode == 'all' or not keep_reserve:
                 # Collect ALL - no reserve
                 _logger.info("   Mode: Collect ALL (no reserve)")
-                collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None)
+                collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None, config=config)
 
             elif mode == 'except_reserve':
                 # Collect with reserve
@@ -1195,7 +1160,7 @@ class PosCommandController(http.Controller):
                     if all_matched:
                         # min_qty logic
                         _logger.info("   Using min_qty logic (denominations matched)")
-                        collection_result = self._glory_collect_with_reserve(env, reserve_denoms=reserve_denoms)
+                        collection_result = self._glory_collect_with_reserve(env, reserve_denoms=reserve_denoms, config=config)
                     else:
                         # ── Collect largest first algorithm ───────────────────
                         # Collect largest denominations first, keep remainder.
@@ -1226,7 +1191,7 @@ class PosCommandController(http.Controller):
                         final_keep_denoms = cl_result['keep_denoms']
                         _logger.info("   Collect-largest keep denoms: %s", final_keep_denoms)
                         collection_result = self._glory_collect_with_reserve(
-                            env, reserve_denoms=final_keep_denoms
+                            env, reserve_denoms=final_keep_denoms, config=config
                         )
 
                         # ── OLD greedy algorithm (kept for reference) ──────────
@@ -1271,10 +1236,10 @@ class PosCommandController(http.Controller):
                         return result
 
                     # Use amount-based - collect without specific denoms
-                    collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None)
+                    collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None, config=config)
             else:
                 # Unknown mode - collect all
-                collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None)
+                collection_result = self._glory_collect_with_reserve(env, reserve_denoms=None, config=config)
 
             # Step 3 - Process collection result
             if not collection_result['success']:
@@ -1316,63 +1281,33 @@ class PosCommandController(http.Controller):
         return False
 
     def _get_last_end_of_day(self, env=None):
-        """Get the last successful EndOfDay command timestamp."""
+        """Get the last successful EndOfDay command timestamp (cached, see models/shift_boundary.py)."""
         if env is None:
             env = request.env
-            
-        PosCommand = env["gas.station.pos_command"].sudo()
-        
-        last_eod = PosCommand.search([
-            ('action', '=', 'end_of_day'),
-            ('status', '=', 'done'),
-        ], order='started_at desc', limit=1)
-        
-        if last_eod:
-            eod_time = getattr(last_eod, 'finished_at', None) or last_eod.started_at
-            _logger.info(" Last EndOfDay: %s (ID: %s)", eod_time, last_eod.id)
-            return eod_time
         
-        _logger.info(" No EndOfDay found")
-        return None
+        eod_time = env["gas.station.shift.boundary"].last_end_of_day()
+        if eod_time:
+            _logger.debug(" Last EndOfDay: %s", eod_time)
+        else:
+            _logger.debug(" No EndOfDay found")
+        return eod_time
 
     def _get_last_close_shift(self, env=None, after_timestamp=None):
-        """Get the last successful CloseShift command timestamp."""
+        """Get the last successful CloseShift command timestamp (cached)."""
         if env is None:
             env = request.env
-            
-        PosCommand = env["gas.station.pos_command"].sudo()
-        
-        domain = [
-            ('action', '=', 'close_shift'),
-            ('status', '=', 'done'),
-        ]
-        
-        if after_timestamp:
-            domain.append(('started_at', '>', after_timestamp))
         
-        last_shift = PosCommand.search(domain, order='started_at desc', limit=1)
-        
-        if last_shift:
-            shift_time = getattr(last_shift, 'finished_at', None) or last_shift.started_at
-            _logger.info(" Last CloseShift: %s (ID: %s)", shift_time, last_shift.id)
-            return shift_time
-        
-        return None
+        shift_time = env["gas.station.shift.boundary"].last_close_shift(after_timestamp=after_timestamp)
+        if shift_time:
+            _logger.debug(" Last CloseShift: %s", shift_time)
+        return shift_time
 
     def _get_shift_start_time(self, env=None):
-        """Get the start time of the current shift."""
+        """Get the start time of the current shift (cached, no query while the shift is open)."""
         if env is None:
             env = request.env
         
-        last_eod = self._get_last_end_of_day(env)
-        last_close_shift = self._get_last_close_shift(env, after_timestamp=last_eod)
-        
-        if last_close_shift:
-            return last_close_shift
-        elif last_eod:
-            return last_eod
-        
-        return None
+        return env["gas.station.shift.boundary"].shift_start()
 
     def _get_pending_transactions(self):
         """Get pending transactions within the current shift."""
@@ -1404,68 +1339,78 @@ class PosCommandController(http.Controller):
         """Calculate total of POS deposits within current shift."""
         shift_start = self._get_shift_start_time(env)
         
-        CashDeposit = env["gas.station.cash.deposit"].sudo()
-        
-        domain = [
-            ('state', 'in', ['confirmed', 'audited']),
-            ('pos_status', '=', 'ok'),
-        ]
-        
-        if shift_start:
-            domain.append(('date', '>', shift_start))
-        
-        successful_deposits = CashDeposit.search(domain)
-        
-        total_cash = 0.0
-        pos_related_deposits = []
-        
-        for deposit in successful_deposits:
-            if self._is_deposit_pos_related(deposit):
-                total_cash += deposit.total_amount or 0.0
-                pos_related_deposits.append(deposit.name)
+        # Same rule as _is_deposit_pos_related, evaluated in SQL
+        agg = env["gas.station.cash.deposit.totals"].sudo()._aggregate(
+            date_from=shift_start,
+            states=('confirmed', 'audited'),
+            pos_status='ok',
+        )
+        pos_related = agg['pos_related_ok']
         
         _logger.info(" Shift POS totals: %d deposits, %.2f total", 
-                    len(pos_related_deposits), total_cash)
+                    pos_related['count'], pos_related['amount'])
         
         return {
-            'total_cash': total_cash,
-            'count': len(pos_related_deposits),
-            'deposits': pos_related_deposits,
+            'total_cash': pos_related['amount'],
+            'count': pos_related['count'],
         }
 
+    def _start_pending_sender(self, dbname, uid, deposit_ids, cmd_id):
+        """
+        Start _send_pending_transactions_async once the request transaction has
+        committed — the thread's own cursor only sees the command after that.
+        """
+        def start():
+            thread = threading.Thread(
+                target=self._send_pending_transactions_async,
+                args=(dbname, uid, deposit_ids, "gas.station.cash.deposit", cmd_id)
+            )
+            thread.daemon = True
+            thread.start()
+        request.env.cr.postcommit.add(start)
+
     def _send_pending_transactions_async(self, dbname, uid, pending_ids, pending_model, cmd_id):
-        """Background thread to send pending transactions to POS."""
+        """
+        Background thread to send pending transactions to POS.
+
+        All pending deposits go out in one bulk submission (DepositReplayEngine
+        + PosBulkSender: vendor batch request, or pooled requests with bounded
+        concurrency), each acknowledged and recorded individually.
+        """
         try:
             _logger.info("📤 Starting to send %d pending transactions...", len(pending_ids))
             
             import odoo
-            registry = odoo.registry(dbname)
+            registry = odoo.registry(dbname).check_signaling()
+            
+            if pending_model != "gas.station.cash.deposit":
+                _logger.warning("Pending model %s is not sent to POS", pending_model)
+                pending_ids = []
+            
+            with registry.cursor() as cr:
+                env = odoo.api.Environment(cr, uid, {})
+                pos_vendor = env['ir.config_parameter'].sudo().get_param(
+                    'gas_station_cash.pos_vendor', 'firstpro'
+                )
+            
+            metrics = {"ok": 0, "failed": 0, "skipped": 0, "duration_s": 0.0}
+            if pending_ids:
+                # every pending deposit once, also those waiting in retry backoff;
+                # deposits a heartbeat replay is sending (leased) are left to it
+                metrics = DepositReplayEngine(self, _read_pos_conf(), pos_vendor).run(
+                    registry, uid=uid, deposit_ids=pending_ids, due_only=False,
+                )
+            _logger.info("📤 Pending transactions: %d ok, %d failed, %d skipped in %.2fs",
+                         metrics["ok"], metrics["failed"], metrics["skipped"], metrics["duration_s"])
             
             with registry.cursor() as cr:
                 env = odoo.api.Environment(cr, uid, {})
-                
                 cmd = env["gas.station.pos_command"].sudo().browse(cmd_id)
-                
-                success_count = 0
-                fail_count = 0
-                
-                for record_id in pending_ids:
-                    try:
-                        if pending_model == "gas.station.cash.deposit":
-                            deposit = env[pending_model].sudo().browse(record_id)
-                            if deposit.exists():
-                                if self._send_deposit_to_pos(env, deposit):
-                                    success_count += 1
-                                else:
-                                    fail_count += 1
-                    except Exception as e:
-                        _logger.error(" Failed to send pending transaction %s: %s", record_id, e)
-                        fail_count += 1
-                
                 if cmd.exists():
                     result = {
-                        "pending_sent": success_count,
-                        "pending_failed": fail_count,
+                        "pending_sent": metrics["ok"],
+                        "pending_failed": metrics["failed"],
+                        "pending_skipped": metrics["skipped"],
                         "completed_at": fields.Datetime.now().isoformat()
                     }
                     cmd.mark_done(result)
@@ -1486,6 +1431,84 @@ class PosCommandController(http.Controller):
             return self._send_deposit_to_flowco(pos_conf, deposit)
         return self._send_deposit_to_firstpro(pos_conf, deposit)
 
+    def _build_firstpro_request(self, pos_conf, deposit):
+        """
+        Build the FirstPro deposit request.
+
+        Returns:
+            (url, payload) tuple, or None when the deposit is not sent to FirstPro.
+        """
+        # engine_oil is NOT sent to FirstPro — they push product_amount to us instead
+        if deposit.deposit_type == 'engine_oil':
+            return None
+
+        pos_host = pos_conf.get('pos_host', '127.0.0.1')
+        pos_port = pos_conf.get('pos_port', 9003)
+        url = f"http://{pos_host}:{pos_port}/deposit"
+
+        transaction_id = deposit.pos_transaction_id or f"TXN-{deposit.id}"
+        staff_ext_id = (deposit.staff_id.external_id if deposit.staff_id else None) or "UNKNOWN"
+        _logger.debug("[FirstPro] Deposit details: staff_id=%s, amount=%.2f", staff_ext_id, deposit.total_amount or 0.0)
+        payload = {
+            "transaction_id": transaction_id,
+            "staff_id":       staff_ext_id,
+            "amount":         deposit.total_amount or 0.0,
+        }
+        return url, payload
+
+    def _build_flowco_request(self, pos_conf, deposit):
+        """
+        Build the FlowCo deposit request.
+        Payload differences vs FirstPro:
+          staff_id → staff.tag_id  (RFID card UID)
+          type_id  → 'F' (oil) or 'L' (engine_oil)
+          pos_id   → staff.pos_id  (POS terminal number)
+
+        Returns:
+            (url, payload) tuple
+        """
+        pos_map = pos_conf.get('flowco_pos_map', {})
+
+        # Resolve POS host/port from staff.pos_id via flowco_pos_map
+        # Falls back to pos_host/pos_port if map is empty (single-POS setup)
+        staff  = deposit.staff_id
+        pos_id = int(staff.pos_id) if (staff and staff.pos_id) else 1
+
+        if pos_map:
+            if pos_id not in pos_map:
+                _logger.warning("[FlowCo] pos_id=%s not in flowco_pos_map, using first entry", pos_id)
+                pos_id = next(iter(pos_map))
+            pos_host, pos_port = pos_map[pos_id]
+        else:
+            # Single-POS fallback (no flowco_pos_hosts configured)
+            pos_host = pos_conf.get('pos_host', '127.0.0.1')
+            pos_port = pos_conf.get('pos_port', 9003)
+
+        url = f"http://{pos_host}:{pos_port}/POS/Deposit"
+
+        transaction_id = deposit.pos_transaction_id or f"TXN-{deposit.id}"
+
+        # type_id: oil → F (Fuel), engine_oil → L (Lube)
+        type_id = 'F' if deposit.deposit_type == 'oil' else 'L'
+
+        # tag_id from staff RFID card
+        tag_id = (staff.tag_id if staff else None) or deposit.staff_external_id or "UNKNOWN"
+
+        payload = {
+            "transaction_id": transaction_id,
+            "staff_id":       tag_id,
+            "amount":         deposit.total_amount or 0.0,
+            "type_id":        type_id,
+            "pos_id":         pos_id,
+        }
+        return url, payload
+
+    def _build_deposit_request(self, pos_conf, pos_vendor, deposit):
+        """Vendor-specific (url, payload) for a deposit, or None if it is not sent."""
+        if pos_vendor == 'flowco':
+            return self._build_flowco_request(pos_conf, deposit)
+        return self._build_firstpro_request(pos_conf, deposit)
+
     def _send_deposit_to_firstpro(self, pos_conf, deposit):
         """
         Send deposit to FirstPro POS.
@@ -1494,27 +1517,16 @@ class PosCommandController(http.Controller):
           oil        → POST /deposit  (cash amount, FirstPro reconciles on their side)
           engine_oil → SKIP           (FirstPro sends product_amount to us at CloseShift/EndOfDay)
         """
-        # engine_oil is NOT sent to FirstPro — they push product_amount to us instead
-        if deposit.deposit_type == 'engine_oil':
+        built = self._build_firstpro_request(pos_conf, deposit)
+        if built is None:
             _logger.info("[FirstPro] Skipping engine_oil deposit id=%s (FirstPro sends product_amount to us)",
                          deposit.id)
-            deposit.write({'pos_status': 'skipped'})
+            deposit.write_machine({'pos_status': 'skipped'})
             return True  # not an error — intentional skip
 
         try:
-            pos_host    = pos_conf.get('pos_host', '127.0.0.1')
-            pos_port    = pos_conf.get('pos_port', 9003)
+            url, payload = built
             pos_timeout = pos_conf.get('pos_timeout', 5.0)
-            url = f"http://{pos_host}:{pos_port}/deposit"
-
-            transaction_id = deposit.pos_transaction_id or f"TXN-{deposit.id}"
-            staff_ext_id = (deposit.staff_id.external_id if deposit.staff_id else None) or "UNKNOWN"
-            _logger.debug("[FirstPro] Deposit details: staff_id=%s, amount=%.2f", staff_ext_id, deposit.total_amount or 0.0)
-            payload = {
-                "transaction_id": transaction_id,
-                "staff_id":       staff_ext_id,
-                "amount":         deposit.total_amount or 0.0,
-            }
 
             _logger.info("[FirstPro] -> %s  payload=%s", url, payload)
             resp   = requests.post(url, json=payload, timeout=pos_timeout)
@@ -1522,8 +1534,8 @@ class PosCommandController(http.Controller):
             _logger.info("[FirstPro] <- %s", result)
 
             ok = result.get('status') == 'OK'
-            deposit.write({
-                'pos_transaction_id': transaction_id,
+            deposit.write_machine({
+                'pos_transaction_id': payload['transaction_id'],
                 'pos_status': 'ok' if ok else 'failed',
             })
             return ok
@@ -1532,49 +1544,10 @@ class PosCommandController(http.Controller):
             return False
 
     def _send_deposit_to_flowco(self, pos_conf, deposit):
-        """
-        Send deposit to FlowCo POS.
-        Payload differences vs FirstPro:
-          staff_id → staff.tag_id  (RFID card UID)
-          type_id  → 'F' (oil) or 'L' (engine_oil)
-          pos_id   → staff.pos_id  (POS terminal number)
-        """
+        """Send deposit to FlowCo POS (see _build_flowco_request for the payload)."""
         try:
+            url, payload = self._build_flowco_request(pos_conf, deposit)
             pos_timeout = pos_conf.get('pos_timeout', 5.0)
-            pos_map     = pos_conf.get('flowco_pos_map', {})
-
-            # Resolve POS host/port from staff.pos_id via flowco_pos_map
-            # Falls back to pos_host/pos_port if map is empty (single-POS setup)
-            staff  = deposit.staff_id
-            pos_id = int(staff.pos_id) if (staff and staff.pos_id) else 1
-
-            if pos_map:
-                if pos_id not in pos_map:
-                    _logger.warning("[FlowCo] pos_id=%s not in flowco_pos_map, using first entry", pos_id)
-                    pos_id = next(iter(pos_map))
-                pos_host, pos_port = pos_map[pos_id]
-            else:
-                # Single-POS fallback (no flowco_pos_hosts configured)
-                pos_host = pos_conf.get('pos_host', '127.0.0.1')
-                pos_port = pos_conf.get('pos_port', 9003)
-
-            url = f"http://{pos_host}:{pos_port}/POS/Deposit"
-
-            transaction_id = deposit.pos_transaction_id or f"TXN-{deposit.id}"
-
-            # type_id: oil → F (Fuel), engine_oil → L (Lube)
-            type_id = 'F' if deposit.deposit_type == 'oil' else 'L'
-
-            # tag_id from staff RFID card
-            tag_id = (staff.tag_id if staff else None) or deposit.staff_external_id or "UNKNOWN"
-
-            payload = {
-                "transaction_id": transaction_id,
-                "staff_id":       tag_id,
-                "amount":         deposit.total_amount or 0.0,
-                "type_id":        type_id,
-                "pos_id":         pos_id,
-            }
 
             _logger.info("[FlowCo] -> %s", url)
             _logger.info("[FlowCo]    payload: %s", payload)
@@ -1583,8 +1556,8 @@ class PosCommandController(http.Controller):
             _logger.info("[FlowCo] <- %s", result)
 
             ok = result.get('status') == 'OK'
-            deposit.write({
-                'pos_transaction_id': transaction_id,
+            deposit.write_machine({
+                'pos_transaction_id': payload['transaction_id'],
                 'pos_status': 'ok' if ok else 'failed',
             })
             return ok
@@ -1777,439 +1750,20 @@ class PosCommandController(http.Controller):
             return None
 
     # =========================================================================
-    # CLOSE SHIFT - ASYNC PROCESSING
+    # CLOSE SHIFT / END OF DAY - DURABLE JOBS
     # =========================================================================
 
-    def _process_close_shift_async(self, dbname, uid, cmd_id, has_pending: bool, product_amount: float = None, flowco_data: dict = None):
-        """Background thread to process close shift."""
-        _logger.info("Processing close shift asynchronously...")
-        try:
-            time.sleep(2)
-            
-            import odoo
-            registry = odoo.registry(dbname)
-            
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, uid, {})
-                cmd = env["gas.station.pos_command"].sudo().browse(cmd_id)
-                
-                if not cmd.exists():
-                    return
-                
-                config = _read_collection_config(env=env)
-                collect_enabled = config['close_shift_collect_cash']
-                leave_float     = config['leave_float']
-                reserve_denoms  = config['end_of_day_reserve_denoms']
-
-                _logger.info("CloseShift collect_on_close_shift: %s leave_float: %s", collect_enabled, leave_float)
-
-                collection_result = {}
-
-                if collect_enabled:
-                    collection_result = self._collect_to_box(
-                        env,
-                        mode='except_reserve' if leave_float else 'all',
-                        staff_id=cmd.staff_external_id,
-                        reserve_amount=float(
-                            env['ir.config_parameter'].sudo().get_param(
-                                'gas_station_cash.float_amount', 0
-                            ) or 0
-                        ) if leave_float else 0,
-                    )
-
-                    # Insufficient reserve: skip collection, notify user to acknowledge
-                    if collection_result.get('insufficient_reserve', False):
-                        _logger.info("CloseShift: insufficient reserve — skipping, notifying user")
-                        current_cash    = collection_result.get('current_cash', 0.0)
-                        required_reserve = collection_result.get('required_reserve', 0.0)
-
-                        audit = self._create_shift_audit(
-                            env, cmd, 'close_shift',
-                            product_amount=product_amount,
-                            flowco_data=flowco_data,
-                            current_cash=current_cash,
-                        )
-                        result = {
-                            "shift_id": f"SHIFT-{fields.Datetime.now().strftime('%Y%m%d')}-{cmd.staff_external_id or 'AUTO'}-01",
-                            "total_cash": current_cash,
-                            "collection_result": collection_result,
-                            "completed_at": fields.Datetime.now().isoformat(),
-                            "audit_id": audit.id if audit else None,
-                            "product_amount": product_amount,
-                            "insufficient_reserve": True,
-                            "current_cash": current_cash,
-                            "required_reserve": required_reserve,
-                            "shortfall": required_reserve - current_cash,
-                            "show_unlock_popup": False,
-                            "collected_amount": 0.0,
-                            "collected_breakdown": {},
-                        }
-                        cmd.mark_insufficient_reserve(result)
-                        _logger.info("CloseShift command %s — insufficient reserve, audit=%s",
-                                     cmd_id, audit.name if audit else "None")
-                        return
-
-                    # Check collection actually succeeded — inside collect_enabled block only
-                    if not collection_result.get('success', False):
-                        err = collection_result.get('error', 'Unknown collection error')
-                        _logger.error("CloseShift: collection failed — %s", err)
-                        cmd.mark_failed(f"Collection failed: {err}")
-                        return
-
-                shift_totals = self._calculate_shift_pos_total(env, cmd.staff_external_id)
-
-                # Derive current_cash from collection result or query Glory
-                if collect_enabled and collection_result:
-                    current_cash = collection_result.get('reserve_kept', 0.0)
-                else:
-                    inv = self._glory_get_inventory(env)
-                    current_cash = inv.get('total_amount', 0.0) if inv.get('success') else 0.0
-
-                # Create Shift Audit Record
-                _logger.info("Creating shift audit for CloseShift (product_amount=%.2f, flowco_lines=%d, current_cash=%.2f)...",
-                             product_amount or 0, len((flowco_data or {}).get('data', [])), current_cash)
-                audit = self._create_shift_audit(
-                    env, cmd, 'close_shift',
-                    product_amount=product_amount,
-                    flowco_data=flowco_data,
-                    current_cash=current_cash,
-                )
-                audit_id = audit.id if audit else None
-
-                result = {
-                    "shift_id": f"SHIFT-{fields.Datetime.now().strftime('%Y%m%d')}-{cmd.staff_external_id or 'AUTO'}-01",
-                    "total_cash": shift_totals.get('total_cash', 0.0),
-                    "collection_result": collection_result,
-                    "completed_at": fields.Datetime.now().isoformat(),
-                    "audit_id": audit_id,
-                    "product_amount": product_amount,
-                }
-
-                # Print close shift receipt (non-critical)
-                if audit:
-                    try:
-                        company = env['res.company'].sudo().search([], limit=1)
-                        ICP = env['ir.config_parameter'].sudo()
-                        from datetime import timedelta
-                        close_local = fields.Datetime.now() + timedelta(hours=7)
-                        _send_print_receipt("print/close_shift", {
-                            "company_name":      company.name or "",
-                            "branch_name":       ICP.get_param("gas_station_cash.branch_name", ""),
-                            "address":           company.street or "",
-                            "phone":             company.phone or "",
-                            "reference":         audit.name or "",
-                            "shift_number":      audit.shift_number or "",
-                            "staff_name":        cmd.staff_external_id or "",
-                            "datetime_str":      close_local.strftime("%d/%m/%Y %H:%M:%S"),
-                            "total_deposits":    int((audit.total_all_deposits or 0) * 100),
-                            "total_withdrawals": int((audit.total_withdrawals or 0) * 100),
-                            "shift_net_total":   int((audit.shift_net_total or 0) * 100),
-                            "pos_total":         int((audit.pos_reported_sale_total or 0) * 100),
-                            "recon_status":      audit.reconciliation_status or "pending",
-                        })
-                    except Exception as pe:
-                        _logger.warning("CloseShift print failed: %s", pe)
-
-                cmd.mark_done(result)
-                _logger.info("CloseShift completed, audit_id=%s, product_amount=%.2f", audit_id, product_amount or 0)
-                    
-        except Exception as e:
-            _logger.exception(" Failed to process close shift: %s", e)
-            try:
-                import odoo
-                registry = odoo.registry(dbname)
-                with registry.cursor() as cr:
-                    env = odoo.api.Environment(cr, uid, {})
-                    cmd = env["gas.station.pos_command"].sudo().browse(cmd_id)
-                    if cmd.exists():
-                        cmd.mark_failed(f"CloseShift error: {str(e)}")
-            except Exception as mark_err:
-                _logger.error("Failed to mark CloseShift command as failed: %s", mark_err)
-
-    # =========================================================================
-    # END OF DAY - ASYNC PROCESSING (UPDATED WITH STATUS POLLING)
-    # =========================================================================
-
-    def _process_end_of_day_async(self, dbname, uid, cmd_id, product_amount: float = None):
+    def _start_shift_job(self, cmd, job_type, context):
         """
-        Background thread to process end of day.
-        
-        Args:
-            dbname: Database name
-            uid: User ID
-            cmd_id: Command ID
-            product_amount: float ยอดขายสินค้าจาก POS (for reconciliation)
-
-        FlowCo EOD flow (is_flowco_eod_marker=True in cmd.payload):
-            - ไม่ create audit ใหม่
-            - หา last close_shift audit → mark เป็น end_of_day ผ่าน action_mark_as_eod()
-            - สร้าง Daily Report จาก audit นั้น
-
-        Steps:
-        1. Wait for processing delay
-        2. Read collection mode from config
-        3. Check inventory and collect (if sufficient reserve)
-        4. If insufficient reserve: notify and complete (no unlock popup)
-        5. If normal: Poll Glory status until IDLE, show unlock popup
-        6. Mark command as done
+        Create the durable job (gas.station.pos.shift.job) for a CloseShift /
+        EndOfDay command and start its runner once the request transaction has
+        committed — the runner's own cursors only see the command after that.
+        If the thread never starts or dies, the resume cron picks the job up.
         """
-        try:
-            delay = 2
-            _logger.info("EndOfDay processing started (product_amount=%.2f), waiting %d seconds...", 
-                        product_amount or 0, delay)
-            time.sleep(delay)
-            
-            import odoo
-            registry = odoo.registry(dbname)
-            
-            with registry.cursor() as cr:
-                env = odoo.api.Environment(cr, uid, {})
-                cmd = env["gas.station.pos_command"].sudo().browse(cmd_id)
-                
-                if not cmd.exists():
-                    _logger.warning("Command %s not found", cmd_id)
-                    return
-
-                # ── FlowCo EOD: mark last close_shift audit as EOD ────────────
-                try:
-                    payload = json.loads(cmd.payload_in or '{}')
-                except Exception:
-                    payload = {}
-                if payload.get('is_flowco_eod_marker'):
-                    _logger.info("[FlowCo] EOD marker received — finding last close_shift audit to mark as EOD")
-                    ShiftAudit = env["gas.station.shift.audit"].sudo()
-                    last_shift = ShiftAudit.search(
-                        [('audit_type', '=', 'close_shift')],
-                        order='close_time desc', limit=1
-                    )
-                    if last_shift:
-                        _logger.info("[FlowCo] Marking audit %s as end_of_day", last_shift.name)
-                        last_shift.action_mark_as_eod()
-                        cmd.mark_done({
-                            "flowco_eod": True,
-                            "marked_audit": last_shift.name,
-                            "audit_id": last_shift.id,
-                        })
-                        # Create Daily Report
-                        try:
-                            _logger.info("📊 Creating Daily Report from FlowCo EOD audit: %s", last_shift.name)
-                            DailyReport = env["gas.station.daily.report"].sudo()
-                            daily_report = DailyReport.create_from_eod(
-                                eod_audit=last_shift,
-                                inventory_before_collection=None
-                            )
-                            _logger.info("📊 ✅ Created Daily Report: %s", daily_report.name)
-                        except Exception as e:
-                            _logger.exception("📊 ❌ Failed to create Daily Report: %s", e)
-                        cmd.dismiss_overlay()
-                    else:
-                        _logger.warning("[FlowCo] No close_shift audit found to mark as EOD")
-                        cmd.mark_done({"flowco_eod": True, "marked_audit": None})
-                    return
-                # ─────────────────────────────────────────────────────────────
-
-                # Step 1: Read collection config
-                config = _read_collection_config(env=env)
-                collect_enabled  = config['end_of_day_collect_cash']   # honour the toggle
-                collect_mode     = config['end_of_day_collect_mode']
-                reserve_amount   = config['end_of_day_reserve_amount']
-                leave_float      = config['leave_float']
-
-                _logger.info(
-                    "EndOfDay: collect_enabled=%s mode=%s reserve=%.2f leave_float=%s",
-                    collect_enabled, collect_mode, reserve_amount, leave_float,
-                )
-
-                # Step 2: Update overlay message - Checking inventory
-                cmd.update_overlay_message("Checking cash inventory...")
-
-                # Step 3: Collect cash only when toggle is enabled
-                if not collect_enabled:
-                    _logger.info("EndOfDay: collection disabled by toggle — skipping collect")
-                    collection_result = {
-                        'success': True,
-                        'collected_amount': 0.0,
-                        'reserve_kept': 0.0,
-                        'collected_breakdown': {},
-                        'reserve_breakdown': {},
-                        'skipped': True,
-                    }
-                else:
-                    collection_result = self._collect_to_box(
-                        env,
-                        mode=collect_mode,
-                        staff_id=cmd.staff_external_id,
-                        reserve_amount=reserve_amount if collect_mode == 'except_reserve' else 0
-                    )
-                    _logger.info("Collection result: %s", collection_result)
-
-                    # Step 4: Check if insufficient reserve
-                    if collection_result.get('insufficient_reserve', False):
-                        _logger.info("Insufficient reserve - notifying user")
-
-                        current_cash     = collection_result.get('current_cash', 0.0)
-                        required_reserve = collection_result.get('required_reserve', 0.0)
-                        shortfall        = required_reserve - current_cash
-
-                        shift_totals = self._calculate_shift_pos_total(env, cmd.staff_external_id)
-
-                        _logger.info("Creating shift audit for EndOfDay (insufficient reserve)...")
-                        audit = self._create_shift_audit(env, cmd, 'end_of_day', collection_result, product_amount,
-                                                         current_cash=current_cash)
-
-                        result = {
-                            "day_summary": f"EOD-{fields.Datetime.now().strftime('%Y%m%d')}",
-                            "final_shift_cash": shift_totals.get('total_cash', 0.0),
-                            "final_shift_transactions": shift_totals.get('count', 0),
-                            "collection_mode": collect_mode,
-                            "collection_result": collection_result,
-                            "completed_at": fields.Datetime.now().isoformat(),
-                            "insufficient_reserve": True,
-                            "current_cash": current_cash,
-                            "required_reserve": required_reserve,
-                            "shortfall": shortfall,
-                            "show_unlock_popup": False,
-                            "collected_amount": 0.0,
-                            "collected_breakdown": {},
-                            "audit_id": audit.id if audit else None,
-                        }
-
-                        cmd.mark_insufficient_reserve(result)
-                        _logger.info(
-                            "EndOfDay command %s - completed (insufficient reserve), audit=%s",
-                            cmd_id, audit.name if audit else None,
-                        )
-
-                        if audit:
-                            try:
-                                _logger.info("Creating Daily Report from EOD audit (insufficient reserve): %s", audit.name)
-                                DailyReport = env["gas.station.daily.report"].sudo()
-                                daily_report = DailyReport.create_from_eod(
-                                    eod_audit=audit,
-                                    inventory_before_collection=None,
-                                )
-                                _logger.info("Created Daily Report: %s", daily_report.name)
-                            except Exception as e:
-                                _logger.exception("Failed to create Daily Report: %s", e)
-                        return
-
-                    # Check collection actually succeeded
-                    if not collection_result.get('success', False):
-                        err = collection_result.get('error', 'Unknown collection error')
-                        _logger.error("EOD: collection failed — %s", err)
-                        cmd.mark_failed(f"Collection failed: {err}")
-                        return
-
-                # Step 5: Normal flow - Update overlay and poll Glory status
-                cmd.update_overlay_message("Collecting cash to Collection Box...")
-                
-                poll_result = self._glory_wait_for_idle(env=env)
-                _logger.info("Poll result: %s", poll_result)
-
-                # Check Glory actually returned to IDLE
-                if not poll_result.get('success', False):
-                    poll_err = poll_result.get('error', 'Glory did not return to IDLE')
-                    _logger.error("EOD: Glory not idle after collection — %s", poll_err)
-                    cmd.mark_failed(f"Glory not idle after collection: {poll_err}")
-                    return
-                
-                # Step 6: Calculate shift totals
-                shift_totals = self._calculate_shift_pos_total(env, cmd.staff_external_id)
-
-                # Derive current_cash from collection result
-                if collection_result:
-                    current_cash = collection_result.get('reserve_kept', 0.0)
-                else:
-                    inv = self._glory_get_inventory(env)
-                    current_cash = inv.get('total_amount', 0.0) if inv.get('success') else 0.0
-
-                # Create Shift Audit Record
-                _logger.info("Creating shift audit for EndOfDay (product_amount=%.2f, current_cash=%.2f)...",
-                             product_amount or 0, current_cash)
-                audit = self._create_shift_audit(env, cmd, 'end_of_day', collection_result, product_amount,
-                                                 current_cash=current_cash)
-                
-                # Step 7: Prepare result with collection data for frontend
-                result = {
-                    "day_summary": f"EOD-{fields.Datetime.now().strftime('%Y%m%d')}",
-                    "final_shift_cash": shift_totals.get('total_cash', 0.0),
-                    "final_shift_transactions": shift_totals.get('count', 0),
-                    "collection_mode": collect_mode,
-                    "collection_result": collection_result,
-                    "poll_result": poll_result,
-                    "completed_at": fields.Datetime.now().isoformat(),
-                    # Data for unlock popup
-                    "show_unlock_popup": True,
-                    "collected_amount": collection_result.get('collected_amount', 0.0),
-                    "collected_breakdown": collection_result.get('collected_breakdown', {}),
-                    "audit_id": audit.id if audit else None,
-                }
-                
-                # Step 8: Mark as done with collection_complete status
-                # This will update the overlay to show unlock popup
-                cmd.mark_collection_complete(result)
-                _logger.info("EndOfDay command %s - collection complete, audit=%s", cmd_id, audit.name if audit else None)
-                
-                # Step 9: Create Daily Report
-                if audit:
-                    try:
-                        _logger.info("📊 Creating Daily Report from EOD audit: %s", audit.name)
-                        DailyReport = env["gas.station.daily.report"].sudo()
-                        
-                        # Get inventory before collection (from collection_result)
-                        inventory_before = None
-                        if collection_result:
-                            inventory_before = collection_result.get('inventory_before_collection')
-                        
-                        daily_report = DailyReport.create_from_eod(
-                            eod_audit=audit,
-                            inventory_before_collection=inventory_before
-                        )
-                        _logger.info("📊 ✅ Created Daily Report: %s", daily_report.name)
-
-                        # Print EOD receipt (non-critical)
-                        try:
-                            company = env['res.company'].sudo().search([], limit=1)
-                            ICP = env['ir.config_parameter'].sudo()
-                            from datetime import timedelta
-                            close_local = fields.Datetime.now() + timedelta(hours=7)
-                            _send_print_receipt("print/eod", {
-                                "company_name":           company.name or "",
-                                "branch_name":            ICP.get_param("gas_station_cash.branch_name", ""),
-                                "address":                company.street or "",
-                                "phone":                  company.phone or "",
-                                "reference":              audit.name or "",
-                                "datetime_str":           close_local.strftime("%d/%m/%Y %H:%M:%S"),
-                                "shift_count":            audit.shift_count_in_period or 0,
-                                "total_oil":              int((audit.eod_total_oil or 0) * 100),
-                                "total_engine_oil":       int((audit.eod_total_engine_oil or 0) * 100),
-                                "total_coffee_shop":      int((audit.eod_total_coffee_shop or 0) * 100),
-                                "total_convenient_store": int((audit.eod_total_convenient_store or 0) * 100),
-                                "total_rental":           int((audit.eod_total_rental or 0) * 100),
-                                "total_other":            int((audit.eod_total_other or 0) * 100),
-                                "eod_grand_total":        int((audit.eod_grand_total or 0) * 100),
-                                "collected_amount":       int((audit.collected_amount or 0) * 100),
-                                "reserve_kept":           int((audit.reserve_kept or 0) * 100),
-                            })
-                        except Exception as pe:
-                            _logger.warning("EOD print failed: %s", pe)
-
-                    except Exception as e:
-                        _logger.exception("📊 ❌ Failed to create Daily Report: %s", e)
-                        # Don't fail the EOD process if report creation fails
-                    
-        except Exception as e:
-            _logger.exception("Failed to process end of day async: %s", e)
-            try:
-                import odoo
-                registry = odoo.registry(dbname)
-                with registry.cursor() as cr:
-                    env = odoo.api.Environment(cr, uid, {})
-                    cmd = env["gas.station.pos_command"].sudo().browse(cmd_id)
-                    if cmd.exists():
-                        cmd.mark_failed(f"EOD error: {str(e)}")
-            except Exception as mark_err:
-                _logger.error("Failed to mark EOD command as failed: %s", mark_err)
+        job = request.env["gas.station.pos.shift.job"].sudo().create_for_command(cmd, job_type, context)
+        dbname, uid, job_id = request.env.cr.dbname, request.env.uid, job.id
+        request.env.cr.postcommit.add(lambda: start_shift_job(dbname, uid, job_id))
+        return job
 
     # =========================================================================
     # UNIT LOCK/UNLOCK ENDPOINTS (Step-by-Step)
@@ -2474,12 +2028,7 @@ class PosCommandController(http.Controller):
             deposit_ids = [p.id for p in pending_transactions]
             
             if deposit_ids:
-                thread = threading.Thread(
-                    target=self._send_pending_transactions_async,
-                    args=(dbname, uid, deposit_ids, "gas.station.cash.deposit", cmd.id)
-                )
-                thread.daemon = True
-                thread.start()
+                self._start_pending_sender(dbname, uid, deposit_ids, cmd.id)
             
             return self._json_response({
                 "shift_id": "",
@@ -2500,15 +2049,10 @@ class PosCommandController(http.Controller):
         
         shift_totals = self._calculate_shift_pos_total(request.env, staff_id)
         
-        dbname = request.env.cr.dbname
-        uid = request.env.uid
-        
-        thread = threading.Thread(
-            target=self._process_close_shift_async, 
-            args=(dbname, uid, cmd.id, False, product_amount, flowco_data)
-        )
-        thread.daemon = True
-        thread.start()
+        self._start_shift_job(cmd, "close_shift", {
+            "product_amount": product_amount,
+            "flowco_data": flowco_data,
+        })
         
         return self._json_response({
             "shift_id": f"SHIFT-{fields.Datetime.now().strftime('%Y%m%d')}-{staff_id}-01",
@@ -2613,12 +2157,7 @@ class PosCommandController(http.Controller):
             deposit_ids = [p.id for p in pending_transactions]
             
             if deposit_ids:
-                thread = threading.Thread(
-                    target=self._send_pending_transactions_async,
-                    args=(dbname, uid, deposit_ids, "gas.station.cash.deposit", cmd.id)
-                )
-                thread.daemon = True
-                thread.start()
+                self._start_pending_sender(dbname, uid, deposit_ids, cmd.id)
             
             return self._json_response({
                 "shift_id": "",
@@ -2639,15 +2178,9 @@ class PosCommandController(http.Controller):
 
         shift_totals = self._calculate_shift_pos_total(request.env, staff_id)
         
-        dbname = request.env.cr.dbname
-        uid = request.env.uid
-        
-        thread = threading.Thread(
-            target=self._process_end_of_day_async, 
-            args=(dbname, uid, cmd.id, product_amount)
-        )
-        thread.daemon = True
-        thread.start()
+        self._start_shift_job(cmd, "end_of_day", {
+            "product_amount": product_amount,
+        })
 
         return self._json_response({
             "shift_id": f"SHIFT-{fields.Datetime.now().strftime('%Y%m%d')}-{staff_id}-EOD",
@@ -2692,9 +2225,10 @@ class PosCommandController(http.Controller):
         """Return POS connection status and offline mode state for frontend polling."""
         _PosHeartbeatWorker.start()
 
-        ICP = request.env["ir.config_parameter"].sudo()
-        pos_connected  = ICP.get_param("gas_station_cash.pos_connected", "true") in ("true", "True", "1")
-        offline_mode   = ICP.get_param("gas_station_cash.offline_mode_active", "false") in ("true", "True", "1")
+        # Link state lives in its own table — no ir.config_parameter reads here
+        link = request.env["gas.station.pos.link.state"].sudo().get_status(self._get_terminal_id())
+        pos_connected  = link["pos_connected"]
+        offline_mode   = link["offline_mode_active"]
 
         # Read offline availability from [options] section in odoo.conf
         # pos_offline_mode_availability is in [options], NOT [pos_http_config]
@@ -2717,18 +2251,51 @@ class PosCommandController(http.Controller):
             "offline_available":   offline_available,
         }
 
+    @http.route("/gas_station_cash/pos/replay_metrics", type="json", auth="user", methods=["POST"], csrf=False)
+    def pos_replay_metrics(self, **kwargs):
+        """Backlog drain metrics of the last deposit replay run (this worker) + live backlog size."""
+        shift_start = self._get_shift_start_time()
+        return {
+            "backlog": _count_backlog(request.env.cr, shift_start),
+            "last_run": get_replay_metrics(),
+        }
+
+    @http.route("/gas_station_cash/pos/shift_job_status", type="json", auth="user", methods=["POST"], csrf=False)
+    def pos_shift_job_status(self, **kwargs):
+        """
+        Real progress of a CloseShift / EndOfDay job for the overlay.
+        Without command_id, returns the unfinished job of this terminal (if any),
+        so a reloaded kiosk can restore the overlay.
+        """
+        Job = request.env["gas.station.pos.shift.job"].sudo()
+        command_id = kwargs.get("command_id")
+        if command_id:
+            job = Job.search([("command_id", "=", int(command_id))], limit=1)
+        else:
+            job = Job.search([
+                ("state", "in", ("queued", "running")),
+                ("command_id.pos_terminal_id", "=", self._get_terminal_id()),
+            ], limit=1)
+        if not job:
+            return {"job": None}
+        progress = job.get_progress()
+        progress.update({
+            "action": job.command_id.action,
+            "request_id": job.command_id.request_id,
+            "command_status": job.command_id.status,
+        })
+        return {"job": progress}
+
     @http.route("/gas_station_cash/offline/activate", type="json", auth="user", methods=["POST"], csrf=False)
     def activate_offline_mode(self, **kwargs):
         """User manually activates offline mode."""
-        ICP = request.env["ir.config_parameter"].sudo()
-        ICP.set_param("gas_station_cash.offline_mode_active", "true")
+        request.env["gas.station.pos.link.state"].sudo().set_offline_mode(self._get_terminal_id(), True)
         _logger.info("[OfflineMode] Activated by user")
         return {"status": "ok", "offline_mode_active": True}
 
     @http.route("/gas_station_cash/offline/deactivate", type="json", auth="user", methods=["POST"], csrf=False)
     def deactivate_offline_mode(self, **kwargs):
         """Deactivate offline mode — called when POS reconnects or user manually exits."""
-        ICP = request.env["ir.config_parameter"].sudo()
-        ICP.set_param("gas_station_cash.offline_mode_active", "false")
+        request.env["gas.station.pos.link.state"].sudo().set_offline_mode(self._get_terminal_id(), False)
         _logger.info("[OfflineMode] Deactivated")
         return {"status": "ok", "offline_mode_active": False}
\ No newline at end of file
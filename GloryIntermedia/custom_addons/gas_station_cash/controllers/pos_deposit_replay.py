@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+File: controllers/pos_deposit_replay.py
+Description: Batched, bounded-parallel replay of queued/failed POS deposits.
+
+Used by the heartbeat worker once the POS answers again. The backlog is
+processed oldest-first in chunks, each chunk in three short steps:
+
+  1. claim — one transaction: pick due, unleased deposits (FOR UPDATE SKIP
+             LOCKED), build the vendor requests, lease the rows
+             (pos_lease_until) and commit
+  2. send  — HTTP calls outside any transaction (PosBulkSender): one batch
+             request per endpoint when the vendor has a batch path, else at
+             most N in flight per POS endpoint over a pooled session
+             (FlowCo can have several hosts in flowco_pos_map)
+  3. apply — one transaction: write pos_status / backoff and commit
+
+A slow POS therefore only delays its own endpoint, and no DB transaction is
+held open while waiting on the network.
+
+Also used at CloseShift for the pending deposits (deposit_ids, due_only=False).
+The lease is kept apart from the retry backoff (pos_next_retry_at), so
+CloseShift ignores the backoff but still skips deposits another run is sending.
+"""
+
+import logging
+import threading
+import time
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from odoo import api, fields
+
+from .pos_bulk_sender import PosBulkSender
+
+_logger = logging.getLogger(__name__)
+
+REPLAY_CHUNK_SIZE = 50        # deposits claimed per transaction
+REPLAY_CONCURRENCY = 4        # parallel requests per POS endpoint
+REPLAY_BACKOFF_BASE = 30      # seconds before the first retry of a failed deposit
+REPLAY_BACKOFF_MAX = 1800     # cap for the exponential backoff
+REPLAY_LEASE_SECONDS = 120    # claimed rows are invisible to other workers for this long
+
+_metrics_lock = threading.Lock()
+_last_metrics = {}
+
+
+def get_replay_metrics():
+    """Metrics of the last replay run in this worker process."""
+    with _metrics_lock:
+        return dict(_last_metrics)
+
+
+def _backoff_seconds(retry_count):
+    """30s, 60s, 120s, ... capped at REPLAY_BACKOFF_MAX."""
+    return min(REPLAY_BACKOFF_MAX, REPLAY_BACKOFF_BASE * (2 ** max(0, retry_count - 1)))
+
+
+def _count_backlog(cr, shift_start=None):
+    query = "SELECT count(*) FROM gas_station_cash_deposit WHERE pos_status IN ('queued', 'failed')"
+    params = []
+    if shift_start:
+        query += " AND date > %s"
+        params.append(shift_start)
+    cr.execute(query, params)
+    return cr.fetchone()[0]
+
+
+class DepositReplayEngine:
+    """
+    Replays the deposit backlog against the POS.
+
+    Args:
+        sender: object providing _build_deposit_request(pos_conf, pos_vendor, deposit)
+                (PosCommandController)
+        pos_conf: dict from _read_pos_conf()
+        pos_vendor: 'firstpro' | 'flowco'
+    """
+
+    def __init__(self, sender, pos_conf, pos_vendor):
+        self.sender      = sender
+        self.pos_conf    = pos_conf
+        self.pos_vendor  = pos_vendor
+        self.timeout     = pos_conf.get("pos_timeout", 5.0)
+        self.chunk_size  = pos_conf.get("pos_replay_chunk_size") or REPLAY_CHUNK_SIZE
+        self.concurrency = pos_conf.get("pos_replay_concurrency") or REPLAY_CONCURRENCY
+        self.lease       = max(REPLAY_LEASE_SECONDS, int(self.timeout * 4))
+        self.bulk        = PosBulkSender(
+            timeout=self.timeout,
+            concurrency=self.concurrency,
+            batch_path=pos_conf.get("pos_deposit_batch_path"),
+            batch_size=self.chunk_size,
+        )
+        self._claimed    = set()
+
+    # ------------------------------------------------------------------
+    # public
+    # ------------------------------------------------------------------
+
+    def run(self, registry, uid=1, shift_start=None, deposit_ids=None, max_chunks=None, due_only=True):
+        """
+        Drain the backlog chunk by chunk.
+
+        Args:
+            registry: odoo registry of the target database
+            shift_start: only deposits after this datetime (current shift)
+            deposit_ids: restrict to these deposits (e.g. pending at CloseShift)
+            max_chunks: stop after this many chunks (None = until drained)
+            due_only: skip deposits still in retry backoff; CloseShift sends
+                      every pending deposit once (False). Deposits leased by
+                      another run are skipped either way.
+
+        Returns:
+            dict with drain metrics (also kept for get_replay_metrics())
+        """
+        started = time.monotonic()
+        with registry.cursor() as cr:
+            backlog_before = _count_backlog(cr, shift_start)
+
+        metrics = {
+            "started_at":     fields.Datetime.now().isoformat(),
+            "vendor":         self.pos_vendor,
+            "backlog_before": backlog_before,
+            "chunks":         0,
+            "sent":           0,
+            "ok":             0,
+            "failed":         0,
+            "skipped":        0,
+            "endpoints":      {},
+        }
+
+        self._claimed.clear()
+        try:
+            while max_chunks is None or metrics["chunks"] < max_chunks:
+                jobs = self._claim_chunk(registry, uid, shift_start, deposit_ids, metrics, due_only)
+                if jobs is None:
+                    break
+                metrics["chunks"] += 1
+                if jobs:
+                    results = self._send_chunk(jobs, metrics)
+                    self._apply_results(registry, uid, results)
+        finally:
+            self.bulk.close()
+
+        elapsed = time.monotonic() - started
+        with registry.cursor() as cr:
+            metrics["backlog_after"] = _count_backlog(cr, shift_start)
+        metrics["duration_s"] = round(elapsed, 3)
+        drained = metrics["ok"] + metrics["skipped"]
+        metrics["drain_rate_per_s"] = round(drained / elapsed, 2) if elapsed > 0 else 0.0
+        metrics["finished_at"] = fields.Datetime.now().isoformat()
+
+        for ep in metrics["endpoints"].values():
+            calls = ep.pop("_latency_total", 0.0)
+            ep["avg_latency_ms"] = round(calls * 1000 / ep["requests"], 1) if ep["requests"] else 0.0
+
+        with _metrics_lock:
+            _last_metrics.clear()
+            _last_metrics.update(metrics)
+
+        if metrics["sent"] or metrics["skipped"]:
+            _logger.info(
+                "[Replay] backlog %d → %d | sent=%d ok=%d failed=%d skipped=%d | %.2fs (%.2f/s)",
+                backlog_before, metrics["backlog_after"], metrics["sent"], metrics["ok"],
+                metrics["failed"], metrics["skipped"], elapsed, metrics["drain_rate_per_s"],
+            )
+        return metrics
+
+    # ------------------------------------------------------------------
+    # step 1 — claim
+    # ------------------------------------------------------------------
+
+    def _claim_chunk(self, registry, uid, shift_start, deposit_ids, metrics, due_only=True):
+        """
+        Select and lease the next chunk of due deposits.
+
+        Returns:
+            list of job dicts (may be empty if every row was skipped),
+            or None when nothing is left to claim.
+        """
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            now = fields.Datetime.now()
+
+            query = """
+                SELECT id FROM gas_station_cash_deposit
+                 WHERE pos_status IN ('queued', 'failed')
+                   AND (pos_lease_until IS NULL OR pos_lease_until <= %s)
+            """
+            params = [now]
+            if due_only:
+                query += " AND (pos_next_retry_at IS NULL OR pos_next_retry_at <= %s)"
+                params.append(now)
+            if self._claimed:
+                # each deposit is sent at most once per run
+                query += " AND NOT (id = ANY(%s))"
+                params.append(list(self._claimed))
+            if shift_start:
+                query += " AND date > %s"
+                params.append(shift_start)
+            if deposit_ids is not None:
+                query += " AND id = ANY(%s)"
+                params.append(list(deposit_ids))
+            query += " ORDER BY date, id LIMIT %s FOR UPDATE SKIP LOCKED"
+            params.append(self.chunk_size)
+
+            cr.execute(query, params)
+            ids = [row[0] for row in cr.fetchall()]
+            if not ids:
+                return None
+            self._claimed.update(ids)
+
+            deposits = env["gas.station.cash.deposit"].sudo().browse(ids)
+            lease_until = now + timedelta(seconds=self.lease)
+            jobs = []
+            for deposit in deposits:
+                try:
+                    built = self.sender._build_deposit_request(self.pos_conf, self.pos_vendor, deposit)
+                except Exception as e:
+                    _logger.warning("[Replay] Cannot build request for deposit %s: %s", deposit.id, e)
+                    built = False
+
+                if built is None:
+                    # Vendor does not take this deposit (FirstPro engine_oil)
+                    deposit.write_machine({'pos_status': 'skipped', 'pos_next_retry_at': False})
+                    metrics["skipped"] += 1
+                    continue
+
+                if built is False:
+                    jobs.append({
+                        "id": deposit.id,
+                        "retry_count": deposit.pos_retry_count,
+                        "endpoint": None,
+                    })
+                    continue
+
+                url, payload = built
+                parts = urlsplit(url)
+                jobs.append({
+                    "id": deposit.id,
+                    "retry_count": deposit.pos_retry_count,
+                    "endpoint": f"{parts.hostname}:{parts.port}",
+                    "url": url,
+                    "payload": payload,
+                })
+
+            # Lease the rows: other runs skip them until the lease expires,
+            # even after this transaction commits (the row locks do not).
+            leased = [j["id"] for j in jobs]
+            if leased:
+                cr.execute(
+                    "UPDATE gas_station_cash_deposit SET pos_lease_until = %s WHERE id = ANY(%s)",
+                    (lease_until, leased),
+                )
+                env["gas.station.cash.deposit"].invalidate_model(["pos_lease_until"])
+            return jobs
+
+    # ------------------------------------------------------------------
+    # step 2 — send
+    # ------------------------------------------------------------------
+
+    def _send_chunk(self, jobs, metrics):
+        results = [
+            dict(job, ok=False, error="request build failed", latency=0.0)
+            for job in jobs if not job["endpoint"]
+        ]
+        results += self.bulk.send([job for job in jobs if job["endpoint"]])
+
+        for res in results:
+            ep = metrics["endpoints"].setdefault(res["endpoint"] or "n/a", {
+                "requests": 0, "ok": 0, "failed": 0, "_latency_total": 0.0,
+            })
+            ep["requests"] += 1
+            ep["ok" if res["ok"] else "failed"] += 1
+            ep["_latency_total"] += res["latency"]
+            metrics["sent"] += 1
+            metrics["ok" if res["ok"] else "failed"] += 1
+        return results
+
+    # ------------------------------------------------------------------
+    # step 3 — apply
+    # ------------------------------------------------------------------
+
+    def _apply_results(self, registry, uid, results):
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            Deposit = env["gas.station.cash.deposit"].sudo()
+            now = fields.Datetime.now()
+            for res in results:
+                deposit = Deposit.browse(res["id"])
+                if not deposit.exists():
+                    continue
+                if res["ok"]:
+                    vals = {
+                        'pos_status': 'ok',
+                        'pos_error': False,
+                        'pos_next_retry_at': False,
+                        'pos_lease_until': False,
+                    }
+                else:
+                    retry_count = res["retry_count"] + 1
+                    vals = {
+                        'pos_status': 'failed',
+                        'pos_error': res["error"],
+                        'pos_retry_count': retry_count,
+                        'pos_next_retry_at': now + timedelta(seconds=_backoff_seconds(retry_count)),
+                        'pos_lease_until': False,
+                    }
+                if res.get("payload"):
+                    vals['pos_transaction_id'] = res["payload"].get("transaction_id")
+                deposit.write_machine(vals)
+                _logger.info("[Replay] Deposit id=%s %s", res["id"], "✅ OK" if res["ok"] else "❌ still failed")
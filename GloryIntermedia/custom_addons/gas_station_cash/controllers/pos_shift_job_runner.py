@@ -0,0 +1,523 @@
+# -*- coding: utf-8 -*-
+"""
+File: controllers/pos_shift_job_runner.py
+Description: Step runner for durable CloseShift / EndOfDay jobs.
+
+Replaces the fire-and-forget _process_close_shift_async / _process_end_of_day_async
+threads. Each step runs in its own transaction:
+
+  1. begin  — short transaction: mark the step started, extend the lease,
+              push the real progress to the overlay
+  2. io     — Glory steps only (inventory, collect, wait_idle): read the step
+              inputs in a short transaction (_plan_<step>), then call the
+              machine with no transaction open (_io_<step>), so the job row is
+              not held while Glory is polled (up to 120s)
+  3. step   — the step itself (or the result of its io) + its checkpoint
+              (context, timing) in one transaction, so a DB-only step is
+              recorded exactly once
+
+The runner thread is started after the request transaction commits (no more
+fixed sleep waiting for the command row to become visible). If the worker dies,
+the job's lease expires and the resume cron (_cron_resume_jobs) continues from
+the first step that was not checkpointed.
+"""
+
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from odoo import api, fields
+
+from ..models.pos_shift_job import NON_REPEATABLE_STEPS
+
+_logger = logging.getLogger(__name__)
+
+
+class StepFailed(Exception):
+    """A step ended with a business failure (message is shown on the overlay)."""
+
+
+def start_shift_job(dbname, uid, job_id):
+    """Run a job in a background thread (called after the creating transaction commits)."""
+    thread = threading.Thread(
+        target=_run_job_thread,
+        args=(dbname, uid, job_id),
+        daemon=True,
+        name=f"pos_shift_job_{job_id}",
+    )
+    thread.start()
+    return thread
+
+
+def _run_job_thread(dbname, uid, job_id):
+    try:
+        import odoo
+        registry = odoo.registry(dbname).check_signaling()
+        ShiftJobRunner().run(registry, job_id, uid=uid)
+    except Exception as e:
+        _logger.exception("[ShiftJob] Job %s crashed: %s", job_id, e)
+
+
+class ShiftJobRunner:
+    """
+    Executes the step plan of a gas.station.pos.shift.job.
+
+    Args:
+        controller: PosCommandController providing the Glory / audit helpers
+    """
+
+    def __init__(self, controller=None):
+        if controller is None:
+            from .pos_commands import PosCommandController
+            controller = PosCommandController()
+        self.ctl = controller
+
+    # ------------------------------------------------------------------
+    # public
+    # ------------------------------------------------------------------
+
+    def run(self, registry, job_id, uid=1):
+        """Claim the job and run its remaining steps. Returns the final job state."""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            Job = env["gas.station.pos.shift.job"].sudo()
+            try:
+                claimed = Job._claim(job_id)
+            except Exception as e:
+                cr.rollback()
+                _logger.info("[ShiftJob] Job %s not claimed (%s)", job_id, e)
+                claimed = False
+            if not claimed:
+                return None
+            job = Job.browse(job_id)
+            interrupted = job.current_step
+            resumed = job.attempt_count > 1
+
+        if interrupted in NON_REPEATABLE_STEPS:
+            msg = f"Interrupted during '{interrupted}' — check the machine before retrying"
+            _logger.error("[ShiftJob] Job %s: %s", job_id, msg)
+            self._fail(registry, uid, job_id, interrupted, msg)
+            return 'failed'
+        if resumed:
+            _logger.info("[ShiftJob] Resuming job %s at step %s", job_id, interrupted or "(next)")
+
+        while True:
+            step = self._begin_next_step(registry, uid, job_id)
+            if step is None:
+                return 'done'
+
+            t0 = time.monotonic()
+            try:
+                io = self._run_io(registry, uid, job_id, step)
+                with registry.cursor() as cr:
+                    env = api.Environment(cr, uid, {})
+                    job = env["gas.station.pos.shift.job"].sudo().browse(job_id)
+                    ctx = job._get_context()
+                    status = getattr(self, f"_step_{step}")(env, job, job.command_id, ctx, *io) or 'done'
+                    elapsed_ms = (time.monotonic() - t0) * 1000.0
+                    job._checkpoint(step, ctx, elapsed_ms, status)
+                _logger.info("[ShiftJob] Job %s step %-9s %s in %.0f ms", job_id, step, status, elapsed_ms)
+            except StepFailed as e:
+                _logger.error("[ShiftJob] Job %s step %s failed: %s", job_id, step, e)
+                self._fail(registry, uid, job_id, step, str(e), (time.monotonic() - t0) * 1000.0)
+                return 'failed'
+            except Exception as e:
+                _logger.exception("[ShiftJob] Job %s step %s error: %s", job_id, step, e)
+                self._fail(registry, uid, job_id, step, None, (time.monotonic() - t0) * 1000.0, exc=e)
+                return 'failed'
+
+    # ------------------------------------------------------------------
+    # bookkeeping
+    # ------------------------------------------------------------------
+
+    def _begin_next_step(self, registry, uid, job_id):
+        """Mark the next step started (committed). Returns None when the plan is complete."""
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            job = env["gas.station.pos.shift.job"].sudo().browse(job_id)
+            plan = job._get_plan()
+
+            if not job.command_id.exists():
+                job._finish('failed', "POS command deleted")
+                return None
+
+            if job.step_index >= len(plan):
+                job._finish('done')
+                _logger.info("[ShiftJob] Job %s done in %.0f ms, steps: %s",
+                             job_id, job.duration_ms, job._get_timings())
+                return None
+
+            ctx = job._get_context()
+            if 'config' not in ctx:
+                # Snapshot the collection settings once, so a resumed job
+                # keeps the settings it started with.
+                from .pos_commands import _read_collection_config
+                ctx['config'] = _read_collection_config(env=env)
+                job._checkpoint_context(ctx)
+
+            step = plan[job.step_index]
+            job._begin_step(step)
+            job.command_id.push_progress(job.get_progress())
+            return step
+
+    def _run_io(self, registry, uid, job_id, step):
+        """
+        Network part of a Glory step, outside any transaction. The step was
+        already marked started (committed), so a crash here is caught as an
+        interrupted step on resume.
+
+        Returns:
+            () for DB-only steps, else (io_result,) — io_result is None when
+            _plan_<step> found nothing to do
+        """
+        plan = getattr(self, f"_plan_{step}", None)
+        if plan is None:
+            return ()
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            job = env["gas.station.pos.shift.job"].sudo().browse(job_id)
+            inputs = plan(env, job, job.command_id, job._get_context())
+        if inputs is None:
+            return (None,)
+        return (getattr(self, f"_io_{step}")(inputs),)
+
+    def _fail(self, registry, uid, job_id, step, message, elapsed_ms=0.0, exc=None):
+        with registry.cursor() as cr:
+            env = api.Environment(cr, uid, {})
+            job = env["gas.station.pos.shift.job"].sudo().browse(job_id)
+            if not job.exists():
+                return
+            if message is None:
+                prefix = "CloseShift" if job.job_type == 'close_shift' else "EOD"
+                message = f"{prefix} error: {exc}"
+            timings = job._get_timings()
+            timings[step] = {'ms': round(elapsed_ms, 1), 'status': 'failed'}
+            job.write({'step_timings_json': json.dumps(timings)})
+            job._finish('failed', message)
+            cmd = job.command_id
+            # Do not overwrite a result the kiosk already received
+            if cmd.exists() and cmd.status == 'processing':
+                cmd.mark_failed(message)
+
+    # ------------------------------------------------------------------
+    # helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _is_marker(ctx):
+        return bool(ctx.get('flowco_eod_marker'))
+
+    @staticmethod
+    def _collect_enabled(job, ctx):
+        cfg = ctx['config']
+        if job.job_type == 'close_shift':
+            return cfg['close_shift_collect_cash']
+        return cfg['end_of_day_collect_cash']
+
+    # ------------------------------------------------------------------
+    # steps — each may update ctx and returns 'done' (default) or 'skipped'.
+    # Glory steps: _plan_<step>(env, job, cmd, ctx) → inputs (None = skip),
+    # _io_<step>(inputs) → result (no cursor), _step_<step>(..., result)
+    # ------------------------------------------------------------------
+
+    def _plan_inventory(self, env, job, cmd, ctx):
+        """CloseShift without collection: read the cash left in the machine."""
+        if self._collect_enabled(job, ctx):
+            return None
+        return {'config': ctx['config']}
+
+    def _io_inventory(self, inputs):
+        return self.ctl._glory_get_inventory(None, config=inputs['config'])
+
+    def _step_inventory(self, env, job, cmd, ctx, inv):
+        if inv is None:
+            return 'skipped'
+        ctx['current_cash'] = inv.get('total_amount', 0.0) if inv.get('success') else 0.0
+        return 'done'
+
+    def _plan_collect(self, env, job, cmd, ctx):
+        cfg = ctx['config']
+
+        if job.job_type == 'close_shift':
+            if not self._collect_enabled(job, ctx):
+                return None
+            leave_float = cfg['leave_float']
+            _logger.info("CloseShift collect_on_close_shift: True leave_float: %s", leave_float)
+            return {
+                'mode': 'except_reserve' if leave_float else 'all',
+                'staff_id': cmd.staff_external_id,
+                'reserve_amount': float(
+                    env['ir.config_parameter'].sudo().get_param(
+                        'gas_station_cash.float_amount', 0
+                    ) or 0
+                ) if leave_float else 0,
+                'config': cfg,
+            }
+
+        collect_mode = cfg['end_of_day_collect_mode']
+        _logger.info(
+            "EndOfDay: collect_enabled=%s mode=%s reserve=%.2f leave_float=%s",
+            cfg['end_of_day_collect_cash'], collect_mode,
+            cfg['end_of_day_reserve_amount'], cfg['leave_float'],
+        )
+        if not self._collect_enabled(job, ctx):
+            return None
+        return {
+            'mode': collect_mode,
+            'staff_id': cmd.staff_external_id,
+            'reserve_amount': cfg['end_of_day_reserve_amount'] if collect_mode == 'except_reserve' else 0,
+            'config': cfg,
+        }
+
+    def _io_collect(self, inputs):
+        return self.ctl._collect_to_box(None, **inputs)
+
+    def _step_collect(self, env, job, cmd, ctx, collection_result):
+        if collection_result is None:
+            if job.job_type == 'close_shift':
+                return 'skipped'
+            _logger.info("EndOfDay: collection disabled by toggle — skipping collect")
+            ctx['collection_result'] = {
+                'success': True,
+                'collected_amount': 0.0,
+                'reserve_kept': 0.0,
+                'collected_breakdown': {},
+                'reserve_breakdown': {},
+                'skipped': True,
+            }
+            ctx['current_cash'] = 0.0
+            return 'skipped'
+
+        _logger.info("Collection result: %s", collection_result)
+        ctx['collection_result'] = collection_result
+
+        # Insufficient reserve: nothing collected, the user acknowledges on the overlay
+        if collection_result.get('insufficient_reserve', False):
+            _logger.info("%s: insufficient reserve — skipping collection", job.job_type)
+            ctx['insufficient_reserve'] = True
+            ctx['current_cash'] = collection_result.get('current_cash', 0.0)
+            ctx['required_reserve'] = collection_result.get('required_reserve', 0.0)
+            return 'done'
+
+        if not collection_result.get('success', False):
+            err = collection_result.get('error', 'Unknown collection error')
+            raise StepFailed(f"Collection failed: {err}")
+
+        ctx['current_cash'] = collection_result.get('reserve_kept', 0.0)
+        return 'done'
+
+    def _plan_wait_idle(self, env, job, cmd, ctx):
+        """EndOfDay: wait until Glory is back to IDLE after the collection."""
+        if ctx.get('insufficient_reserve'):
+            return None
+        return {'config': ctx['config']}
+
+    def _io_wait_idle(self, inputs):
+        return self.ctl._glory_wait_for_idle(config=inputs['config'])
+
+    def _step_wait_idle(self, env, job, cmd, ctx, poll_result):
+        if poll_result is None:
+            return 'skipped'
+        _logger.info("Poll result: %s", poll_result)
+        ctx['poll_result'] = poll_result
+        if not poll_result.get('success', False):
+            poll_err = poll_result.get('error', 'Glory did not return to IDLE')
+            raise StepFailed(f"Glory not idle after collection: {poll_err}")
+        return 'done'
+
+    def _step_audit(self, env, job, cmd, ctx):
+        if self._is_marker(ctx):
+            # FlowCo EOD: no new audit — the last close_shift audit becomes the EOD
+            _logger.info("[FlowCo] EOD marker received — finding last close_shift audit to mark as EOD")
+            last_shift = env["gas.station.shift.audit"].sudo().search(
+                [('audit_type', '=', 'close_shift')],
+                order='close_time desc', limit=1,
+            )
+            if not last_shift:
+                _logger.warning("[FlowCo] No close_shift audit found to mark as EOD")
+                ctx['marked_audit'] = None
+                return 'skipped'
+            _logger.info("[FlowCo] Marking audit %s as end_of_day", last_shift.name)
+            last_shift.action_mark_as_eod()
+            ctx['marked_audit'] = last_shift.name
+            ctx['audit_id'] = last_shift.id
+            return 'done'
+
+        ctx['shift_totals'] = self.ctl._calculate_shift_pos_total(env, cmd.staff_external_id)
+        current_cash = ctx.get('current_cash', 0.0)
+        product_amount = ctx.get('product_amount')
+
+        if job.job_type == 'close_shift':
+            _logger.info("Creating shift audit for CloseShift (product_amount=%.2f, flowco_lines=%d, current_cash=%.2f)...",
+                         product_amount or 0, len((ctx.get('flowco_data') or {}).get('data', [])), current_cash)
+            audit = self.ctl._create_shift_audit(
+                env, cmd, 'close_shift',
+                product_amount=product_amount,
+                flowco_data=ctx.get('flowco_data'),
+                current_cash=current_cash,
+            )
+        else:
+            _logger.info("Creating shift audit for EndOfDay (product_amount=%.2f, current_cash=%.2f)...",
+                         product_amount or 0, current_cash)
+            audit = self.ctl._create_shift_audit(
+                env, cmd, 'end_of_day', ctx.get('collection_result'), product_amount,
+                current_cash=current_cash,
+            )
+        ctx['audit_id'] = audit.id if audit else None
+        return 'done'
+
+    def _step_callback(self, env, job, cmd, ctx):
+        """Deliver the result to the POS command (overlay / unlock popup)."""
+        now = fields.Datetime.now()
+        shift_totals = ctx.get('shift_totals') or {}
+        collection_result = ctx.get('collection_result') or {}
+
+        if self._is_marker(ctx):
+            result = {"flowco_eod": True, "marked_audit": ctx.get('marked_audit')}
+            if ctx.get('audit_id'):
+                result["audit_id"] = ctx['audit_id']
+            cmd.mark_done(result)
+            return 'done'
+
+        if job.job_type == 'close_shift':
+            result = {
+                "shift_id": f"SHIFT-{now.strftime('%Y%m%d')}-{cmd.staff_external_id or 'AUTO'}-01",
+                "total_cash": shift_totals.get('total_cash', 0.0),
+                "collection_result": collection_result,
+                "completed_at": now.isoformat(),
+                "audit_id": ctx.get('audit_id'),
+                "product_amount": ctx.get('product_amount'),
+            }
+        else:
+            result = {
+                "day_summary": f"EOD-{now.strftime('%Y%m%d')}",
+                "final_shift_cash": shift_totals.get('total_cash', 0.0),
+                "final_shift_transactions": shift_totals.get('count', 0),
+                "collection_mode": ctx['config']['end_of_day_collect_mode'],
+                "collection_result": collection_result,
+                "completed_at": now.isoformat(),
+                "audit_id": ctx.get('audit_id'),
+            }
+
+        if ctx.get('insufficient_reserve'):
+            current_cash = ctx.get('current_cash', 0.0)
+            required_reserve = ctx.get('required_reserve', 0.0)
+            if job.job_type == 'close_shift':
+                result["total_cash"] = current_cash
+            result.update({
+                "insufficient_reserve": True,
+                "current_cash": current_cash,
+                "required_reserve": required_reserve,
+                "shortfall": required_reserve - current_cash,
+                "show_unlock_popup": False,
+                "collected_amount": 0.0,
+                "collected_breakdown": {},
+            })
+            cmd.mark_insufficient_reserve(result)
+            return 'done'
+
+        if job.job_type == 'close_shift':
+            cmd.mark_done(result)
+            _logger.info("CloseShift completed, audit_id=%s, product_amount=%.2f",
+                         ctx.get('audit_id'), ctx.get('product_amount') or 0)
+        else:
+            result.update({
+                "poll_result": ctx.get('poll_result'),
+                # Data for unlock popup
+                "show_unlock_popup": True,
+                "collected_amount": collection_result.get('collected_amount', 0.0),
+                "collected_breakdown": collection_result.get('collected_breakdown', {}),
+            })
+            cmd.mark_collection_complete(result)
+            _logger.info("EndOfDay command %s - collection complete, audit_id=%s", cmd.id, ctx.get('audit_id'))
+        return 'done'
+
+    def _step_report(self, env, job, cmd, ctx):
+        """Daily report (EOD) and receipt printing; failures here never fail the job."""
+        audit = env["gas.station.shift.audit"].sudo().browse(ctx.get('audit_id') or [])
+        if not audit:
+            return 'skipped'
+
+        if job.job_type == 'close_shift':
+            if ctx.get('insufficient_reserve'):
+                return 'skipped'
+            self._print_close_shift(env, cmd, audit)
+            return 'done'
+
+        insufficient = ctx.get('insufficient_reserve') or self._is_marker(ctx)
+        try:
+            with env.cr.savepoint():
+                _logger.info("📊 Creating Daily Report from EOD audit: %s", audit.name)
+                inventory_before = None
+                if not insufficient:
+                    inventory_before = (ctx.get('collection_result') or {}).get('inventory_before_collection')
+                daily_report = env["gas.station.daily.report"].sudo().create_from_eod(
+                    eod_audit=audit,
+                    inventory_before_collection=inventory_before,
+                )
+                _logger.info("📊 ✅ Created Daily Report: %s", daily_report.name)
+        except Exception as e:
+            _logger.exception("📊 ❌ Failed to create Daily Report: %s", e)
+            insufficient = True  # no receipt without a report
+
+        if self._is_marker(ctx):
+            cmd.dismiss_overlay()
+        elif not insufficient:
+            self._print_eod(env, audit)
+        return 'done'
+
+    # ------------------------------------------------------------------
+    # receipts (non-critical)
+    # ------------------------------------------------------------------
+
+    def _receipt_header(self, env, audit):
+        company = env['res.company'].sudo().search([], limit=1)
+        ICP = env['ir.config_parameter'].sudo()
+        close_local = fields.Datetime.now() + timedelta(hours=7)
+        return {
+            "company_name": company.name or "",
+            "branch_name":  ICP.get_param("gas_station_cash.branch_name", ""),
+            "address":      company.street or "",
+            "phone":        company.phone or "",
+            "reference":    audit.name or "",
+            "datetime_str": close_local.strftime("%d/%m/%Y %H:%M:%S"),
+        }
+
+    def _print_close_shift(self, env, cmd, audit):
+        from .pos_commands import _send_print_receipt
+        try:
+            payload = self._receipt_header(env, audit)
+            payload.update({
+                "shift_number":      audit.shift_number or "",
+                "staff_name":        cmd.staff_external_id or "",
+                "total_deposits":    int((audit.total_all_deposits or 0) * 100),
+                "total_withdrawals": int((audit.total_withdrawals or 0) * 100),
+                "shift_net_total":   int((audit.shift_net_total or 0) * 100),
+                "pos_total":         int((audit.pos_reported_sale_total or 0) * 100),
+                "recon_status":      audit.reconciliation_status or "pending",
+            })
+            _send_print_receipt("print/close_shift", payload)
+        except Exception as pe:
+            _logger.warning("CloseShift print failed: %s", pe)
+
+    def _print_eod(self, env, audit):
+        from .pos_commands import _send_print_receipt
+        try:
+            payload = self._receipt_header(env, audit)
+            payload.update({
+                "shift_count":            audit.shift_count_in_period or 0,
+                "total_oil":              int((audit.eod_total_oil or 0) * 100),
+                "total_engine_oil":       int((audit.eod_total_engine_oil or 0) * 100),
+                "total_coffee_shop":      int((audit.eod_total_coffee_shop or 0) * 100),
+                "total_convenient_store": int((audit.eod_total_convenient_store or 0) * 100),
+                "total_rental":           int((audit.eod_total_rental or 0) * 100),
+                "total_other":            int((audit.eod_total_other or 0) * 100),
+                "eod_grand_total":        int((audit.eod_grand_total or 0) * 100),
+                "collected_amount":       int((audit.collected_amount or 0) * 100),
+                "reserve_kept":           int((audit.reserve_kept or 0) * 100),
+            })
+            _send_print_receipt("print/eod", payload)
+        except Exception as pe:
+            _logger.warning("EOD print failed: %s", pe)
@@ -41,6 +41,6 @@ class GasStationCashPOSStatusController(http.Controller):
             vals["is_offline"] = bool(params.get("is_offline"))
 
         if vals:
-            dep.write(vals)
+            dep.write_machine(vals)
 
         return {"status": "ok", "deposit_id": dep.id, "pos_status": dep.pos_status}
\ No newline at end of file
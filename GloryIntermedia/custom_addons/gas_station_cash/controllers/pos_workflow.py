@@ -77,7 +77,7 @@ class GasStationPosWorkflow(http.Controller):
             "state": "confirmed",
         }
 
-        dep = request.env["gas.station.cash.deposit"].sudo().create(vals)
+        dep = request.env["gas.station.cash.deposit"].sudo().create_machine_deposits(vals)
         _logger.info("[AUDIT] created deposit id=%s tx=%s pos_status=%s", dep.id, tx_id, pos_status)
         return dep.id
 
@@ -11,6 +11,7 @@ Endpoints:
 
 from odoo import http, fields
 from odoo.http import request
+from datetime import datetime, time
 import json
 import logging
 
@@ -253,6 +254,7 @@ class WithdrawalController(http.Controller):
         {
             "status": "OK",
             "count": 10,
+            "summary": {"count": 42, "amount": 210000, "by_type": {"general": {...}}},
             "withdrawals": [
                 {
                     "id": 1,
@@ -270,57 +272,82 @@ class WithdrawalController(http.Controller):
         _logger.info("📋 Getting withdrawal history (limit=%s, staff=%s)", limit, staff_id)
         
         try:
-            Withdrawal = request.env["gas.station.cash.withdrawal"].sudo()
-            
-            domain = []
-            
-            # Filter by staff
-            if staff_id:
-                Staff = request.env["gas.station.staff"].sudo()
-                staff = Staff.search([
-                    "|",
-                    ("external_id", "=", staff_id),
-                    ("employee_id", "=", staff_id),
-                ], limit=1)
-                if staff:
-                    domain.append(("staff_id", "=", staff.id))
-            
-            # Filter by date range
-            if date_from:
-                domain.append(("date", ">=", date_from))
-            if date_to:
-                domain.append(("date", "<=", date_to))
-            
-            # Query records
-            records = Withdrawal.search(domain, limit=int(limit), order="date desc")
-            
-            withdrawals = []
-            for rec in records:
-                withdrawals.append({
-                    "id": rec.id,
-                    "reference": rec.name,
-                    "staff_id": rec.staff_id.id,
-                    "staff_name": rec.staff_id.name,
-                    "staff_external_id": rec.staff_id.external_id,
-                    "amount": rec.total_amount,
-                    "withdrawal_type": rec.withdrawal_type,
-                    "reason": rec.reason or "",
-                    "date": rec.date.isoformat() if rec.date else "",
-                    "state": rec.state,
-                    "glory_status": rec.glory_status,
-                    "glory_transaction_id": rec.glory_transaction_id or "",
-                })
-            
-            return {
-                "status": "OK",
-                "count": len(withdrawals),
-                "withdrawals": withdrawals,
-            }
-            
+            return self._withdrawal_history(request.env, limit, staff_id, date_from, date_to)
         except Exception as e:
             _logger.exception("❌ Withdrawal history error: %s", e)
             return {"status": "FAILED", "message": str(e), "withdrawals": []}
 
+    def _withdrawal_history(self, env, limit=50, staff_id=None, date_from=None, date_to=None):
+        """Body of /withdrawal/history (also timed by scripts/plan_regression.py)."""
+        Withdrawal = env["gas.station.cash.withdrawal"].sudo()
+        
+        Staff = env["gas.station.staff"].sudo()
+        domain = []
+        staff_ids = None
+        
+        # Filter by staff
+        if staff_id:
+            staff = Staff.search([
+                "|",
+                ("external_id", "=", staff_id),
+                ("employee_id", "=", staff_id),
+            ], limit=1)
+            if staff:
+                domain.append(("staff_id", "=", staff.id))
+                staff_ids = staff.ids
+        
+        # Filter by date range
+        dt_from = fields.Datetime.to_datetime(date_from) if date_from else None
+        dt_to = fields.Datetime.to_datetime(date_to) if date_to else None
+        if dt_to and len(str(date_to).strip()) == 10:
+            # Date-only upper bound covers the whole day, like Odoo's own domain expansion
+            dt_to = datetime.combine(dt_to.date(), time.max)
+        if dt_from:
+            domain.append(("date", ">=", dt_from))
+        if dt_to:
+            domain.append(("date", "<=", dt_to))
+        
+        # Query records (plain rows; staff names in one read)
+        rows = Withdrawal.search_read(domain, [
+            "name", "staff_id", "total_amount", "withdrawal_type", "reason",
+            "date", "state", "glory_status", "glory_transaction_id",
+        ], limit=int(limit), order="date desc")
+        staff_map = {
+            s["id"]: s for s in Staff.browse(
+                {row["staff_id"][0] for row in rows if row["staff_id"]}
+            ).read(["name", "external_id"])
+        }
+        
+        withdrawals = []
+        for row in rows:
+            staff = staff_map.get(row["staff_id"][0]) if row["staff_id"] else None
+            withdrawals.append({
+                "id": row["id"],
+                "reference": row["name"],
+                "staff_id": staff["id"] if staff else False,
+                "staff_name": staff["name"] if staff else False,
+                "staff_external_id": staff["external_id"] if staff else False,
+                "amount": row["total_amount"],
+                "withdrawal_type": row["withdrawal_type"],
+                "reason": row["reason"] or "",
+                "date": row["date"].isoformat() if row["date"] else "",
+                "state": row["state"],
+                "glory_status": row["glory_status"],
+                "glory_transaction_id": row["glory_transaction_id"] or "",
+            })
+        
+        # Totals of the whole range (not only the page) from the cash ledger
+        summary = env["gas.station.cash.ledger"].sudo()._summary(
+            "withdrawal", dt_from, dt_to, include_start=True, staff_ids=staff_ids,
+        )
+        
+        return {
+            "status": "OK",
+            "count": len(withdrawals),
+            "summary": summary,
+            "withdrawals": withdrawals,
+        }
+
     # =========================================================================
     # LEGACY ENDPOINT (for backward compatibility)
     # =========================================================================
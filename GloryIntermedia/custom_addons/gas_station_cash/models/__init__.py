@@ -6,14 +6,23 @@
 # Description: Imports for the models of the Gas Station Cash module
 
 from . import cash_deposit
+from . import cash_deposit_journal
+from . import cash_deposit_totals
 from . import gas_station_cash_settings
 from . import cash_deposit_pos_flag
 from . import gas_station_cash_product
 from . import gas_station_cash_rental
+from . import shift_boundary
+from . import staff_directory
 from . import pos_command
+from . import pos_link_state
+from . import pos_shift_job
 from . import cash_withdrawal
 from . import cash_exchange
 from . import shift_audit
+from . import shift_period
 from . import daily_report
 from . import cash_collect
-from . import cash_replenish
\ No newline at end of file
+from . import cash_replenish
+from . import cash_archive
+from . import cash_ledger
\ No newline at end of file
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/cash_archive.py
+Description: Archiving of closed EOD periods into <table>_archive tables
+
+Deposits, deposit lines, withdrawals, exchanges, POS commands (with their shift
+jobs), POS TCP jobs, shift audit lines and the daily report deposit / withdrawal
+links of periods closed more than N days ago (ICP
+gas_station_cash.archive_after_days, 0 = off) are moved to archive tables with
+the same columns, so the hot tables only hold the recent periods.
+
+What stays online:
+  - shift audits and daily reports (stored totals, staff summary)
+  - deposits / withdrawals / exchanges an online audit line still points at,
+    and commands whose shift job is still queued / running
+  - the daily cash ledger (models/cash_ledger.py); archiving does not touch it
+  - one gas.station.cash.archive row per run with the moved counts / totals
+
+<table>_all views (hot UNION ALL archive) and the gas.station.cash.deposit.history /
+gas.station.cash.withdrawal.history models keep reports over archived ranges working.
+"""
+
+from odoo import models, fields, api
+from odoo.tools import sql
+from datetime import timedelta
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS_PARAM = 'gas_station_cash.archive_after_days'
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+# EOD periods archived per cron run (bounds the first run on a multi-year database)
+ARCHIVE_MAX_PERIODS = 31
+# Session flag read by the cash ledger triggers: moved rows keep their ledger rows
+ARCHIVING_FLAG = 'gas_station_cash.archiving'
+
+_DEPOSIT_IDS = "_gas_station_archive_deposit_ids"
+_WITHDRAWAL_IDS = "_gas_station_archive_withdrawal_ids"
+_EXCHANGE_IDS = "_gas_station_archive_exchange_ids"
+_COMMAND_IDS = "_gas_station_archive_command_ids"
+
+# (table, archive index column, rows to move) — children before their parents:
+# moving a parent first would fire the ondelete cascade / set null of the rows
+# still pointing at it (shift jobs, daily report links, audit lines)
+ARCHIVE_TABLES = [
+    ('gas_station_shift_audit_line', 'audit_id',
+     "audit_id IN (SELECT id FROM gas_station_shift_audit WHERE close_time <= %(cutoff)s)"),
+    ('pos_tcp_job', 'create_date',
+     "create_date <= %(cutoff)s AND state IN ('done', 'dead')"),
+    ('gas_station_pos_shift_job', 'command_id', f"command_id IN (SELECT id FROM {_COMMAND_IDS})"),
+    ('gas_station_pos_command', 'create_date', f"id IN (SELECT id FROM {_COMMAND_IDS})"),
+    ('daily_report_deposit_rel', 'deposit_id', f"deposit_id IN (SELECT id FROM {_DEPOSIT_IDS})"),
+    ('gas_station_cash_deposit_journal', 'deposit_id', f"deposit_id IN (SELECT id FROM {_DEPOSIT_IDS})"),
+    ('gas_station_cash_deposit_line', 'deposit_id', f"deposit_id IN (SELECT id FROM {_DEPOSIT_IDS})"),
+    ('gas_station_cash_deposit', 'date', f"id IN (SELECT id FROM {_DEPOSIT_IDS})"),
+    ('daily_report_withdrawal_rel', 'withdrawal_id', f"withdrawal_id IN (SELECT id FROM {_WITHDRAWAL_IDS})"),
+    ('gas_station_cash_withdrawal_line', 'withdrawal_id', f"withdrawal_id IN (SELECT id FROM {_WITHDRAWAL_IDS})"),
+    ('gas_station_cash_withdrawal', 'date', f"id IN (SELECT id FROM {_WITHDRAWAL_IDS})"),
+    ('gas_station_cash_exchange', 'exchange_time', f"id IN (SELECT id FROM {_EXCHANGE_IDS})"),
+]
+
+
+def _kept_by_audit_lines(column):
+    """
+    Rows referenced by an audit line that stays online (its audit is still open
+    or closed after the cutoff) stay too: moving them would null the line's
+    deposit_id / withdrawal_id / exchange_id (ondelete set null).
+    """
+    return f"""
+       AND NOT EXISTS (
+           SELECT 1 FROM gas_station_shift_audit_line l
+             LEFT JOIN gas_station_shift_audit a ON a.id = l.audit_id
+            WHERE l.{column} = r.id
+              AND (a.close_time IS NULL OR a.close_time > %(cutoff)s)
+       )"""
+
+
+# (temp id table, rows to move) — selected before anything moves
+ARCHIVE_SELECTS = [
+    # deposits still waiting for the POS (replay engine) stay in the hot table
+    (_DEPOSIT_IDS, """
+        SELECT r.id FROM gas_station_cash_deposit r
+         WHERE r.date <= %(cutoff)s
+           AND COALESCE(r.pos_status, 'na') NOT IN ('queued', 'failed')
+    """ + _kept_by_audit_lines('deposit_id')),
+    (_WITHDRAWAL_IDS, """
+        SELECT r.id FROM gas_station_cash_withdrawal r
+         WHERE r.date <= %(cutoff)s
+    """ + _kept_by_audit_lines('withdrawal_id')),
+    (_EXCHANGE_IDS, """
+        SELECT r.id FROM gas_station_cash_exchange r
+         WHERE r.exchange_time <= %(cutoff)s
+    """ + _kept_by_audit_lines('exchange_id')),
+    # commands of a shift job that is still queued / running stay with it
+    (_COMMAND_IDS, """
+        SELECT r.id FROM gas_station_pos_command r
+         WHERE r.create_date <= %(cutoff)s
+           AND r.status IN ('done', 'failed')
+           AND NOT EXISTS (
+               SELECT 1 FROM gas_station_pos_shift_job j
+                WHERE j.command_id = r.id AND j.state IN ('queued', 'running')
+           )
+    """),
+]
+
+# <table>_all views other views are built on (dropped with it, CASCADE)
+_DEPENDENT_MODELS = {
+    'gas_station_cash_deposit': 'gas.station.cash.deposit.history',
+    'gas_station_cash_withdrawal': 'gas.station.cash.withdrawal.history',
+}
+
+
+def archive_table(table):
+    return f"{table}_archive"
+
+
+def unified_view(table):
+    return f"{table}_all"
+
+
+def drop_unified_view(cr, table):
+    """Drop <table>_all (and the views built on it) so the hot table's columns can change."""
+    cr.execute(f"DROP VIEW IF EXISTS {unified_view(table)} CASCADE")
+
+
+def _columns(cr, table):
+    """[(name, type)] of a table in column order."""
+    cr.execute("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+          FROM pg_attribute a
+         WHERE a.attrelid = %s::regclass AND a.attnum > 0 AND NOT a.attisdropped
+         ORDER BY a.attnum
+    """, (table,))
+    return cr.fetchall()
+
+
+class GasStationCashArchivedMixin(models.AbstractModel):
+    """
+    Hot tables with an archive table: <table>_all reads every column and
+    PostgreSQL refuses to change the type of a column a view uses, so the view is
+    dropped before _auto_init updates the table and rebuilt right after.
+    """
+    _name = 'gas.station.cash.archived.mixin'
+    _description = 'Cash Archive: Archived Table'
+
+    def _auto_init(self):
+        drop_unified_view(self.env.cr, self._table)
+        result = super()._auto_init()
+        self.env['gas.station.cash.archive']._setup_unified(self._table)
+        return result
+
+
+class GasStationCashArchive(models.Model):
+    _name = 'gas.station.cash.archive'
+    _description = 'Cash Archive Run'
+    _order = 'cutoff desc'
+
+    cutoff = fields.Datetime(
+        string='Archived Until',
+        required=True,
+        readonly=True,
+        help="Close time of the last EOD included in this run",
+    )
+    eod_audit_id = fields.Many2one('gas.station.shift.audit', string='EOD Audit', readonly=True)
+    deposit_count = fields.Integer(string='Deposits', readonly=True)
+    deposit_amount = fields.Monetary(string='Deposit Amount', currency_field='currency_id', readonly=True)
+    withdrawal_count = fields.Integer(string='Withdrawals', readonly=True)
+    withdrawal_amount = fields.Monetary(string='Withdrawal Amount', currency_field='currency_id', readonly=True)
+    moved_json = fields.Text(string='Rows Moved (JSON)', readonly=True)
+    currency_id = fields.Many2one(
+        'res.currency', string='Currency', readonly=True,
+        default=lambda self: self.env.company.currency_id
+    )
+
+    def init(self):
+        # tables of models without the mixin (m2m links) or installed before this module
+        for table, _index_col, _where in ARCHIVE_TABLES:
+            self._setup_unified(table)
+
+    @api.model
+    def _setup_unified(self, table):
+        """Create / update <table>_archive and rebuild the <table>_all view."""
+        cr = self.env.cr
+        if table not in {t for t, _col, _where in ARCHIVE_TABLES} or not sql.table_exists(cr, table):
+            return
+        self._ensure_archive_table(table)
+        cols = ', '.join(f'"{col}"' for col, _type in _columns(cr, table))
+        drop_unified_view(cr, table)
+        cr.execute(f"""
+            CREATE VIEW {unified_view(table)} AS
+            SELECT {cols}, FALSE AS is_archived FROM {table}
+             UNION ALL
+            SELECT {cols}, TRUE FROM {archive_table(table)}
+        """)
+        dependent = _DEPENDENT_MODELS.get(table)
+        if dependent and dependent in self.env:
+            self.env[dependent].init()
+
+    @api.model
+    def _ensure_archive_table(self, table):
+        """Create <table>_archive, or add the columns the hot table gained since."""
+        cr = self.env.cr
+        archive = archive_table(table)
+        index_col = next(col for t, col, _where in ARCHIVE_TABLES if t == table)
+        if not sql.table_exists(cr, archive):
+            # same columns, no defaults / FKs: rows keep their ids and may
+            # point at records that were archived or deleted since
+            cr.execute(f"CREATE TABLE {archive} (LIKE {table})")
+            columns = [col for col, _type in _columns(cr, archive)]
+            for col in columns:
+                if col != 'id':
+                    cr.execute(f'ALTER TABLE {archive} ALTER COLUMN "{col}" DROP NOT NULL')
+            if 'id' in columns:  # m2m link tables have none
+                cr.execute(f"ALTER TABLE {archive} ADD PRIMARY KEY (id)")
+            _logger.info("[CashArchive] Created %s", archive)
+        archived = {col for col, _type in _columns(cr, archive)}
+        for col, col_type in _columns(cr, table):
+            if col not in archived:
+                cr.execute(f'ALTER TABLE {archive} ADD COLUMN "{col}" {col_type}')
+        sql.create_index(cr, f"{archive}_{index_col}_idx", archive, [index_col])
+
+    # ------------------------------------------------------------------
+    # Archive
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _archive_after_days(self):
+        ICP = self.env['ir.config_parameter'].sudo()
+        try:
+            return int(ICP.get_param(ARCHIVE_AFTER_DAYS_PARAM, DEFAULT_ARCHIVE_AFTER_DAYS))
+        except (TypeError, ValueError):
+            return DEFAULT_ARCHIVE_AFTER_DAYS
+
+    @api.model
+    def _last_cutoff(self):
+        self.env.cr.execute(f"SELECT max(cutoff) FROM {self._table}")
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _cron_archive(self, days=None):
+        """Archive the EOD periods closed more than archive_after_days ago, oldest first."""
+        if days is None:
+            days = self._archive_after_days()
+        if days <= 0:
+            return
+        domain = [
+            ('audit_type', '=', 'end_of_day'),
+            ('close_time', '<=', fields.Datetime.now() - timedelta(days=days)),
+        ]
+        last_cutoff = self._last_cutoff()
+        if last_cutoff:
+            domain.append(('close_time', '>', last_cutoff))
+        eods = self.env['gas.station.shift.audit'].sudo().search(
+            domain, order='close_time asc', limit=ARCHIVE_MAX_PERIODS,
+        )
+        for eod in eods:
+            self._archive_period(eod)
+
+    @api.model
+    def _archive_period(self, eod):
+        """Move every row up to the EOD close time into the archive tables (one transaction)."""
+        eod.ensure_one()
+        cr = self.env.cr
+        self.env.flush_all()
+        params = {'cutoff': eod.close_time}
+
+        id_tables = ', '.join(temp for temp, _select in ARCHIVE_SELECTS)
+        cr.execute(f"DROP TABLE IF EXISTS {id_tables}")
+        for temp, select in ARCHIVE_SELECTS:
+            cr.execute(f"CREATE TEMP TABLE {temp} ON COMMIT DROP AS {select}", params)
+
+        # the ledger keeps counting the moved rows (see cash_ledger triggers)
+        cr.execute("SELECT set_config(%s, 'on', true)", (ARCHIVING_FLAG,))
+        moved = {}
+        for table, _index_col, where in ARCHIVE_TABLES:
+            if not sql.table_exists(cr, table):
+                continue
+            self._ensure_archive_table(table)
+            cols = ', '.join(f'"{col}"' for col, _type in _columns(cr, table))
+            cr.execute(f"""
+                WITH moved AS (
+                    DELETE FROM {table} WHERE {where} RETURNING {cols}
+                )
+                INSERT INTO {archive_table(table)} ({cols}) SELECT {cols} FROM moved
+            """, params)
+            moved[table] = cr.rowcount
+        cr.execute("SELECT set_config(%s, 'off', true)", (ARCHIVING_FLAG,))
+
+        cr.execute(f"""
+            SELECT (SELECT count(*) FROM {_DEPOSIT_IDS}),
+                   (SELECT COALESCE(sum(total_amount), 0) FROM gas_station_cash_deposit_archive
+                     WHERE id IN (SELECT id FROM {_DEPOSIT_IDS})),
+                   (SELECT count(*) FROM {_WITHDRAWAL_IDS}),
+                   (SELECT COALESCE(sum(total_amount), 0) FROM gas_station_cash_withdrawal_archive
+                     WHERE id IN (SELECT id FROM {_WITHDRAWAL_IDS}))
+        """)
+        deposit_count, deposit_amount, withdrawal_count, withdrawal_amount = cr.fetchone()
+        cr.execute(f"DROP TABLE {id_tables}")
+        self.env.invalidate_all()
+        if moved.get('gas_station_pos_command'):
+            # moved done close_shift / end_of_day commands are shift boundaries
+            self.env['gas.station.shift.boundary']._invalidate()
+
+        run = self.create({
+            'cutoff': eod.close_time,
+            'eod_audit_id': eod.id,
+            'deposit_count': deposit_count,
+            'deposit_amount': float(deposit_amount),
+            'withdrawal_count': withdrawal_count,
+            'withdrawal_amount': float(withdrawal_amount),
+            'moved_json': json.dumps(moved),
+        })
+        _logger.info("[CashArchive] Archived until %s (EOD %s): %s", eod.close_time, eod.name, moved)
+        return run
+
+    @api.model
+    def _is_archived(self, date):
+        """True when records dated `date` may already be in the archive tables."""
+        last_cutoff = self._last_cutoff()
+        return bool(date and last_cutoff and date <= last_cutoff)
+
+
+class GasStationCashDepositHistory(models.Model):
+    _name = 'gas.station.cash.deposit.history'
+    _description = 'Cash Deposit History (online + archived)'
+    _auto = False
+    _order = 'date desc, id desc'
+
+    name = fields.Char(string='Reference', readonly=True)
+    staff_id = fields.Many2one('gas.station.staff', string='Staff', readonly=True)
+    date = fields.Datetime(string='Date', readonly=True)
+    deposit_type = fields.Selection(
+        lambda self: self.env['gas.station.cash.deposit']._fields['deposit_type'].selection,
+        string='Deposit Type', readonly=True,
+    )
+    product_id = fields.Many2one('gas.station.cash.product', string='Gas Station Product', readonly=True)
+    total_amount = fields.Monetary(string='Total Amount', currency_field='currency_id', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    state = fields.Selection(
+        lambda self: self.env['gas.station.cash.deposit']._fields['state'].selection,
+        string='Status', readonly=True,
+    )
+    is_pos_related = fields.Boolean(string='POS Related', readonly=True)
+    pos_status = fields.Selection(
+        lambda self: self.env['gas.station.cash.deposit']._fields['pos_status'].selection,
+        string='POS Status', readonly=True,
+    )
+    pos_transaction_id = fields.Char(string='POS Transaction ID', readonly=True)
+    audit_id = fields.Many2one('gas.station.shift.audit', string='Shift Audit', readonly=True)
+    is_archived = fields.Boolean(string='Archived', readonly=True)
+
+    def init(self):
+        sql.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE VIEW {self._table} AS
+            SELECT id, name, staff_id, date, deposit_type, product_id, total_amount,
+                   currency_id, state, is_pos_related, pos_status, pos_transaction_id,
+                   audit_id, is_archived
+              FROM {unified_view('gas_station_cash_deposit')}
+        """)
+
+
+class GasStationCashWithdrawalHistory(models.Model):
+    _name = 'gas.station.cash.withdrawal.history'
+    _description = 'Cash Withdrawal History (online + archived)'
+    _auto = False
+    _order = 'date desc, id desc'
+
+    name = fields.Char(string='Reference', readonly=True)
+    staff_id = fields.Many2one('gas.station.staff', string='Staff', readonly=True)
+    date = fields.Datetime(string='Date', readonly=True)
+    withdrawal_type = fields.Selection(
+        lambda self: self.env['gas.station.cash.withdrawal']._fields['withdrawal_type'].selection,
+        string='Withdrawal Type', readonly=True,
+    )
+    total_amount = fields.Monetary(string='Total Amount', currency_field='currency_id', readonly=True)
+    currency_id = fields.Many2one('res.currency', string='Currency', readonly=True)
+    state = fields.Selection(
+        lambda self: self.env['gas.station.cash.withdrawal']._fields['state'].selection,
+        string='Status', readonly=True,
+    )
+    is_archived = fields.Boolean(string='Archived', readonly=True)
+
+    def init(self):
+        sql.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute(f"""
+            CREATE VIEW {self._table} AS
+            SELECT id, name, staff_id, date, withdrawal_type, total_amount,
+                   currency_id, state, is_archived
+              FROM {unified_view('gas_station_cash_withdrawal')}
+        """)
+
+
+# ----------------------------------------------------------------------
+# Hot tables: drop / rebuild their <table>_all view around _auto_init
+# (pos.tcp.job adds the mixin in pos_tcp_connector)
+# ----------------------------------------------------------------------
+
+class GasStationShiftAuditLine(models.Model):
+    _name = 'gas.station.shift.audit.line'
+    _inherit = ['gas.station.shift.audit.line', 'gas.station.cash.archived.mixin']
+
+
+class GasStationPosShiftJob(models.Model):
+    _name = 'gas.station.pos.shift.job'
+    _inherit = ['gas.station.pos.shift.job', 'gas.station.cash.archived.mixin']
+
+
+class GasStationPosCommand(models.Model):
+    _name = 'gas.station.pos_command'
+    _inherit = ['gas.station.pos_command', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashDepositJournal(models.Model):
+    _name = 'gas.station.cash.deposit.journal'
+    _inherit = ['gas.station.cash.deposit.journal', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashDepositLine(models.Model):
+    _name = 'gas.station.cash.deposit.line'
+    _inherit = ['gas.station.cash.deposit.line', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashDeposit(models.Model):
+    _name = 'gas.station.cash.deposit'
+    _inherit = ['gas.station.cash.deposit', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashWithdrawalLine(models.Model):
+    _name = 'gas.station.cash.withdrawal.line'
+    _inherit = ['gas.station.cash.withdrawal.line', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashWithdrawal(models.Model):
+    _name = 'gas.station.cash.withdrawal'
+    _inherit = ['gas.station.cash.withdrawal', 'gas.station.cash.archived.mixin']
+
+
+class GasStationCashExchange(models.Model):
+    _name = 'gas.station.cash.exchange'
+    _inherit = ['gas.station.cash.exchange', 'gas.station.cash.archived.mixin']
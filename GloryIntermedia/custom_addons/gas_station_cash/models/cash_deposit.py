@@ -3,6 +3,17 @@
 # Description: Models for cash management - audit deposits from Cash Recycler
 
 from odoo import models, fields, api, _
+from odoo.tools.sql import create_index
+
+from .cash_deposit_journal import JOURNAL_FIELDS
+
+# Context for machine-generated writes: no chatter message, follower or tracking rows
+NO_TRACKING_CONTEXT = {
+    "tracking_disable": True,
+    "mail_create_nolog": True,
+    "mail_create_nosubscribe": True,
+    "mail_notrack": True,
+}
 
 
 class GasStationCashDeposit(models.Model):
@@ -137,6 +148,7 @@ class GasStationCashDeposit(models.Model):
             ("queued", "Queued"),
             ("failed", "Failed"),
             ("offline", "Offline"),
+            ("skipped", "Skipped"),
         ],
         string="POS Status",
         default="na",
@@ -160,6 +172,25 @@ class GasStationCashDeposit(models.Model):
         string="POS Error / Reason",
         readonly=True,
     )
+    pos_retry_count = fields.Integer(
+        string="POS Retry Count",
+        default=0,
+        readonly=True,
+        copy=False,
+    )
+    pos_next_retry_at = fields.Datetime(
+        string="POS Next Retry",
+        readonly=True,
+        copy=False,
+        help="Replay backoff: the heartbeat worker will not resend this deposit before this time.",
+    )
+    pos_lease_until = fields.Datetime(
+        string="POS Send Lease",
+        readonly=True,
+        copy=False,
+        help="Set while a replay run (heartbeat or CloseShift) is sending this deposit: "
+             "no other run claims it before this time.",
+    )
 
     # ----- Notes (Editable) -----
     notes = fields.Text(
@@ -176,6 +207,21 @@ class GasStationCashDeposit(models.Model):
         help="Link to the shift audit that includes this deposit"
     )
 
+    # ----- Audit journal (machine deposits) -----
+    journal_ids = fields.One2many(
+        "gas.station.cash.deposit.journal",
+        "deposit_id",
+        string="Journal",
+        readonly=True,
+    )
+
+    def init(self):
+        # Period aggregation path (gas.station.cash.deposit.totals)
+        create_index(
+            self.env.cr, "gas_station_cash_deposit_totals_idx", self._table,
+            ["date", "deposit_type", "is_pos_related", "pos_status"],
+        )
+
     @api.model_create_multi
     def create(self, vals_list):
         for vals in vals_list:
@@ -191,6 +237,71 @@ class GasStationCashDeposit(models.Model):
         for rec in self:
             rec.total_amount = sum(rec.deposit_line_ids.mapped("subtotal"))
 
+    # ----- Machine deposits (lightweight journal mode) -----
+    @api.model
+    def _journal_mode(self):
+        """Machine deposits skip mail tracking and log to the journal (default on)."""
+        ICP = self.env["ir.config_parameter"].sudo()
+        return ICP.get_param("gas_station_cash.deposit_journal_mode", "true").lower() == "true"
+
+    @api.model
+    def create_machine_deposits(self, vals_list):
+        """
+        Create deposits coming from the cash recycler / POS workflow.
+
+        In journal mode: no chatter rows, all deposit lines in one create and
+        one journal INSERT for the batch. Otherwise a plain tracked create().
+        """
+        if isinstance(vals_list, dict):
+            vals_list = [vals_list]
+        if not self._journal_mode():
+            return self.create(vals_list)
+
+        deposit_vals, line_vals = [], []
+        for vals in vals_list:
+            vals = dict(vals)
+            commands = vals.pop("deposit_line_ids", None) or []
+            new_lines = [cmd[2] for cmd in commands if cmd[0] == 0]
+            if len(new_lines) != len(commands):
+                vals["deposit_line_ids"] = [cmd for cmd in commands if cmd[0] != 0]
+            deposit_vals.append(vals)
+            line_vals.append(new_lines)
+
+        deposits = self.with_context(**NO_TRACKING_CONTEXT).create(deposit_vals)
+        lines = [
+            dict(line, deposit_id=deposit.id)
+            for deposit, new_lines in zip(deposits, line_vals)
+            for line in new_lines
+        ]
+        if lines:
+            self.env["gas.station.cash.deposit.line"].create(lines)
+
+        Journal = self.env["gas.station.cash.deposit.journal"].sudo()
+        Journal._append(
+            (deposit_id, "create", snapshot)
+            for deposit_id, snapshot in Journal._snapshot(deposits).items()
+        )
+        return deposits.with_env(self.env)
+
+    def write_machine(self, vals):
+        """write() for machine / POS updates: journal the changed fields instead of chatter tracking."""
+        if not self or not self._journal_mode():
+            return self.write(vals)
+
+        Journal = self.env["gas.station.cash.deposit.journal"].sudo()
+        fnames = [f for f in JOURNAL_FIELDS if f in vals]
+        before = Journal._snapshot(self, fnames) if fnames else {}
+        res = self.with_context(**NO_TRACKING_CONTEXT).write(vals)
+        if fnames:
+            after = Journal._snapshot(self, fnames)
+            entries = []
+            for deposit_id, old in before.items():
+                changes = {f: [old[f], after[deposit_id][f]] for f in fnames if old[f] != after[deposit_id][f]}
+                if changes:
+                    entries.append((deposit_id, "write", changes))
+            Journal._append(entries)
+        return res
+
     # ----- Workflow actions -----
     def action_confirm(self):
         for rec in self:
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/cash_deposit_journal.py
+Description: Append-only audit journal for machine-generated deposits
+
+Deposits created by the kiosk / POS workflow are written without chatter
+tracking (no mail.message / mail.tracking.value / follower rows). Instead each
+create and each update of a tracked field appends one journal row, written
+with a single multi-row INSERT per batch.
+"""
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Fields tracked in the chatter of gas.station.cash.deposit
+JOURNAL_FIELDS = [
+    'name', 'staff_id', 'date', 'total_amount', 'state', 'deposit_type', 'product_id',
+    'is_pos_related', 'is_offline', 'pos_transaction_id', 'pos_status', 'pos_error',
+]
+
+
+def _json_value(value):
+    """Plain JSON value of a read() result (many2one → id)."""
+    if isinstance(value, tuple):
+        return value[0]
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ') if hasattr(value, 'hour') else value.isoformat()
+    return value
+
+
+class GasStationCashDepositJournal(models.Model):
+    _name = 'gas.station.cash.deposit.journal'
+    _description = 'Cash Deposit Journal'
+    _order = 'id desc'
+    _log_access = False
+
+    deposit_id = fields.Many2one(
+        'gas.station.cash.deposit',
+        string='Deposit',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True,
+    )
+    event = fields.Selection([
+        ('create', 'Created'),
+        ('write', 'Updated'),
+    ], string='Event', required=True, readonly=True)
+    changes = fields.Text(
+        string='Changes (JSON)',
+        readonly=True,
+        help="create: {field: value}  |  write: {field: [old, new]}",
+    )
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+    logged_at = fields.Datetime(string='Logged At', readonly=True)
+
+    # ------------------------------------------------------------------
+    # Append-only
+    # ------------------------------------------------------------------
+
+    def write(self, vals):
+        raise UserError(_("The deposit journal is append-only."))
+
+    def unlink(self):
+        raise UserError(_("The deposit journal is append-only."))
+
+    @api.model
+    def _append(self, entries):
+        """
+        Append journal rows in one INSERT.
+
+        Args:
+            entries: iterable of (deposit_id, event, changes_dict)
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        now = fields.Datetime.now()
+        params = []
+        for deposit_id, event, changes in entries:
+            params.extend([
+                deposit_id, event,
+                json.dumps(changes, ensure_ascii=False, default=str),
+                self.env.uid, now,
+            ])
+        placeholders = ', '.join(['(%s, %s, %s, %s, %s)'] * len(entries))
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table} (deposit_id, event, changes, user_id, logged_at)
+            VALUES {placeholders}
+        """, params)
+
+    @api.model
+    def _snapshot(self, deposits, fnames=None):
+        """{deposit_id: {field: value}} of the journaled fields (one read)."""
+        fnames = fnames or JOURNAL_FIELDS
+        return {
+            row['id']: {f: _json_value(row[f]) for f in fnames}
+            for row in deposits.read(fnames)
+        }
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/cash_deposit_totals.py
+Description: Grouped SQL aggregation of cash deposits (per type / POS status / staff / product)
+
+Single place that sums deposits for the close-shift audit, the EOD daily report
+and the POS CloseShift/EndOfDay response. One GROUP BY query replaces loading
+every deposit of the period as ORM records and bucketing amounts in Python.
+
+Date-range queries read whole days from the cash ledger (models/cash_ledger.py)
+and only the first / last partial day from the deposit table.
+"""
+
+from odoo import models, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+DEPOSIT_TYPES = (
+    'oil', 'engine_oil', 'coffee_shop', 'convenient_store',
+    'rental', 'deposit_cash', 'exchange_cash',
+)
+
+# deposit_cash (replenish) and exchange_cash are cash movements, not sales
+NON_REVENUE_TYPES = ('deposit_cash', 'exchange_cash')
+
+# Deposit types always reported to the POS (see PosCommandController._is_deposit_pos_related)
+POS_DEPOSIT_TYPES = ('oil', 'engine_oil')
+
+
+def _bucket():
+    return {'count': 0, 'amount': 0.0}
+
+
+def _add(bucket, count, amount):
+    bucket['count'] += count
+    bucket['amount'] += amount
+
+
+class GasStationCashDepositTotals(models.AbstractModel):
+    _name = 'gas.station.cash.deposit.totals'
+    _description = 'Cash Deposit Totals (SQL aggregation)'
+
+    @api.model
+    def _aggregate(self, ids=None, date_from=None, date_to=None, include_start=False,
+                   states=None, pos_status=None, unaudited=False):
+        """
+        Sum deposits in one grouped query.
+
+        Filters (all optional, combined with AND):
+            ids:           restrict to these deposit ids
+            date_from:     date > date_from (>= with include_start)
+            date_to:       date <= date_to
+            states:        deposit states, e.g. ('confirmed', 'audited')
+            pos_status:    single POS status, e.g. 'ok'
+            unaudited:     only deposits not yet linked to a shift audit
+
+        Without ids / unaudited the totals come from the daily cash ledger
+        (whole days) plus the deposits of the partial first / last day.
+
+        Returns:
+            dict:
+                count, amount
+                by_type        {deposit_type: {count, amount}}
+                by_pos_status  {pos_status: {count, amount}}
+                by_staff       {staff_id: {count, amount}}
+                by_product     {product_id or 0: {count, amount}}
+                pos_ok         deposits flagged is_pos_related with pos_status 'ok'
+                               {count, amount, by_type}
+                pos_related_ok deposits the POS receives (oil / engine oil, POS
+                               product or flag) with pos_status 'ok' {count, amount}
+        """
+        if ids is None and not unaudited:
+            rows = self.env['gas.station.cash.ledger']._grouped_rows(
+                'deposit', date_from=date_from, date_to=date_to, include_start=include_start,
+                states=states, pos_status=pos_status,
+            )
+            # drop the state column: (type, status, flag, pos_related, staff, product, count, amount)
+            return self._bucket_rows(row[:6] + row[7:] for row in rows)
+
+        where = ["TRUE"]
+        params = {}
+        if ids is not None:
+            if not ids:
+                return self._empty_result()
+            where.append("d.id = ANY(%(ids)s)")
+            params['ids'] = list(ids)
+        if date_from:
+            where.append("d.date >= %(date_from)s" if include_start else "d.date > %(date_from)s")
+            params['date_from'] = date_from
+        if date_to:
+            where.append("d.date <= %(date_to)s")
+            params['date_to'] = date_to
+        if states:
+            where.append("d.state IN %(states)s")
+            params['states'] = tuple(states)
+        if pos_status:
+            where.append("d.pos_status = %(pos_status)s")
+            params['pos_status'] = pos_status
+        if unaudited:
+            where.append("d.audit_id IS NULL")
+        params['pos_types'] = POS_DEPOSIT_TYPES
+
+        self.env['gas.station.cash.deposit'].flush_model([
+            'date', 'state', 'deposit_type', 'pos_status', 'is_pos_related',
+            'staff_id', 'product_id', 'total_amount', 'audit_id',
+        ])
+        self.env.cr.execute(f"""
+            SELECT d.deposit_type,
+                   d.pos_status,
+                   COALESCE(d.is_pos_related, FALSE) AS is_pos_related,
+                   (d.deposit_type IN %(pos_types)s
+                    OR COALESCE(d.is_pos_related, FALSE)
+                    OR COALESCE(p.is_pos_related, FALSE)) AS pos_related,
+                   d.staff_id,
+                   d.product_id,
+                   count(*) AS cnt,
+                   COALESCE(sum(d.total_amount), 0) AS amount
+              FROM gas_station_cash_deposit d
+              LEFT JOIN gas_station_cash_product p ON p.id = d.product_id
+             WHERE {' AND '.join(where)}
+          GROUP BY 1, 2, 3, 4, 5, 6
+        """, params)
+
+        return self._bucket_rows(self.env.cr.fetchall())
+
+    @api.model
+    def _bucket_rows(self, rows):
+        """rows: (deposit_type, pos_status, is_pos_related, pos_related, staff_id, product_id, count, amount)"""
+        result = self._empty_result()
+        for dtype, status, flagged, pos_related, staff_id, product_id, cnt, amount in rows:
+            amount = float(amount or 0.0)
+            _add(result, cnt, amount)
+            _add(result['by_type'].setdefault(dtype or 'other', _bucket()), cnt, amount)
+            _add(result['by_pos_status'].setdefault(status or 'na', _bucket()), cnt, amount)
+            _add(result['by_staff'].setdefault(staff_id or 0, _bucket()), cnt, amount)
+            _add(result['by_product'].setdefault(product_id or 0, _bucket()), cnt, amount)
+            if status == 'ok':
+                if flagged:
+                    _add(result['pos_ok'], cnt, amount)
+                    _add(result['pos_ok']['by_type'].setdefault(dtype or 'other', _bucket()), cnt, amount)
+                if pos_related:
+                    _add(result['pos_related_ok'], cnt, amount)
+        return result
+
+    @api.model
+    def _empty_result(self):
+        return {
+            'count': 0,
+            'amount': 0.0,
+            'by_type': {},
+            'by_pos_status': {},
+            'by_staff': {},
+            'by_product': {},
+            'pos_ok': dict(_bucket(), by_type={}),
+            'pos_related_ok': _bucket(),
+        }
+
+    @api.model
+    def _type_amount(self, agg, dtype):
+        return agg['by_type'].get(dtype, {}).get('amount', 0.0)
+
+    @api.model
+    def _other_amount(self, agg):
+        """Amount of deposits whose type is none of the known types."""
+        return sum(v['amount'] for k, v in agg['by_type'].items() if k not in DEPOSIT_TYPES)
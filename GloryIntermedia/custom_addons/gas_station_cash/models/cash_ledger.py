@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/cash_ledger.py
+Description: Materialized per-day cash ledger (deposits / withdrawals / exchanges / replenishments)
+
+One row per (source, day, type, staff, product, POS status, state, POS flag)
+holding the count and sum of the matching source records. Rows are maintained
+by PostgreSQL triggers on the source tables, so every write path (ORM, raw SQL
+from the replay engine / benchmarks) keeps the ledger in sync in the same
+transaction.
+
+Time-range summaries read whole days from the ledger and only the partial
+first / last day from the source table (_grouped_rows). Days are UTC days of
+the stored datetime.
+
+Rebuild / verify: _rebuild() and _verify(), or scripts/cash_ledger.py.
+
+Rows moved to the archive tables (models/cash_archive.py) keep their ledger
+rows; rebuild, verify and the partial-day reads go through the <table>_all views.
+"""
+
+from odoo import models, fields, api
+from datetime import datetime, time, timedelta
+import logging
+
+from .cash_deposit_totals import POS_DEPOSIT_TYPES
+from .cash_archive import ARCHIVING_FLAG, unified_view
+
+_logger = logging.getLogger(__name__)
+
+LEDGER_TABLE = 'gas_station_cash_ledger'
+
+# Source table → ledger column expressions ({r} = row alias: NEW / OLD / table alias)
+# 'archived': the table has an archive table / <table>_all view (cash_archive)
+LEDGER_SOURCES = {
+    'deposit': {
+        'table': 'gas_station_cash_deposit',
+        'archived': True,
+        'date': '{r}.date',
+        'entry_type': '{r}.deposit_type',
+        'staff_id': '{r}.staff_id',
+        'product_id': '{r}.product_id',
+        'pos_status': '{r}.pos_status',
+        'state': '{r}.state',
+        'is_pos_related': 'COALESCE({r}.is_pos_related, FALSE)',
+        'amount': 'COALESCE({r}.total_amount, 0)',
+        'watch': ['date', 'deposit_type', 'staff_id', 'product_id', 'pos_status',
+                  'state', 'is_pos_related', 'total_amount'],
+    },
+    'withdrawal': {
+        'table': 'gas_station_cash_withdrawal',
+        'archived': True,
+        'date': '{r}.date',
+        'entry_type': '{r}.withdrawal_type',
+        'staff_id': '{r}.staff_id',
+        'product_id': 'NULL::integer',
+        'pos_status': 'NULL::varchar',
+        'state': '{r}.state',
+        'is_pos_related': 'FALSE',
+        'amount': 'COALESCE({r}.total_amount, 0)',
+        'watch': ['date', 'withdrawal_type', 'staff_id', 'state', 'total_amount'],
+    },
+    'exchange': {
+        'table': 'gas_station_cash_exchange',
+        'archived': True,
+        'date': '{r}.exchange_time',
+        'entry_type': "'exchange'::varchar",
+        'staff_id': '{r}.staff_id',
+        'product_id': 'NULL::integer',
+        'pos_status': 'NULL::varchar',
+        'state': '{r}.machine_status',
+        'is_pos_related': 'FALSE',
+        'amount': 'COALESCE({r}.cashout_amount, 0)',
+        'watch': ['exchange_time', 'staff_id', 'machine_status', 'cashout_amount'],
+    },
+    'replenish': {
+        'table': 'gas_station_cash_replenish',
+        'date': '{r}.replenish_date',
+        'entry_type': '{r}.mode',
+        'staff_id': '{r}.staff_id',
+        'product_id': 'NULL::integer',
+        'pos_status': 'NULL::varchar',
+        'state': '{r}.state',
+        'is_pos_related': 'FALSE',
+        'amount': 'COALESCE({r}.total_amount, 0)',
+        'watch': ['replenish_date', 'mode', 'staff_id', 'state', 'total_amount'],
+    },
+}
+
+KEY_COLUMNS = ['entry_type', 'staff_id', 'product_id', 'pos_status', 'state', 'is_pos_related']
+
+# Unique key; NULLs folded so ON CONFLICT matches rows without staff / product / status
+CONFLICT_TARGET = (
+    "(source, day, COALESCE(entry_type, ''), COALESCE(staff_id, 0), COALESCE(product_id, 0), "
+    "COALESCE(pos_status, ''), COALESCE(state, ''), is_pos_related)"
+)
+
+
+def _expr(source, column, alias):
+    return LEDGER_SOURCES[source][column].format(r=alias)
+
+
+def _read_table(source):
+    """Table (or hot + archive view) to read the source records from."""
+    spec = LEDGER_SOURCES[source]
+    return unified_view(spec['table']) if spec.get('archived') else spec['table']
+
+
+def _select_list(source, alias):
+    """day, key columns, amount of one source row."""
+    return ', '.join(
+        [f"({_expr(source, 'date', alias)})::date"]
+        + [_expr(source, col, alias) for col in KEY_COLUMNS]
+        + [_expr(source, 'amount', alias)]
+    )
+
+
+def _apply_args(source, alias, sign):
+    """Arguments of gas_station_cash_ledger_apply() for a trigger row (sign +1 / -1)."""
+    return ', '.join(
+        [f"'{source}'", f"({_expr(source, 'date', alias)})::date"]
+        + [_expr(source, col, alias) for col in KEY_COLUMNS]
+        + [str(sign), f"{sign} * {_expr(source, 'amount', alias)}"]
+    )
+
+
+class GasStationCashLedger(models.Model):
+    _name = 'gas.station.cash.ledger'
+    _description = 'Cash Ledger (daily rollup)'
+    _order = 'day desc, source, entry_type'
+    _log_access = False
+
+    source = fields.Selection([
+        ('deposit', 'Deposit'),
+        ('withdrawal', 'Withdrawal'),
+        ('exchange', 'Exchange'),
+        ('replenish', 'Replenish'),
+    ], string='Source', required=True, readonly=True)
+    day = fields.Date(string='Day (UTC)', required=True, readonly=True)
+    entry_type = fields.Char(
+        string='Type',
+        readonly=True,
+        help="deposit_type / withdrawal_type / replenish mode",
+    )
+    staff_id = fields.Many2one('gas.station.staff', string='Staff', readonly=True, ondelete='cascade')
+    product_id = fields.Many2one('gas.station.cash.product', string='Product', readonly=True, ondelete='cascade')
+    pos_status = fields.Char(string='POS Status', readonly=True)
+    state = fields.Char(string='State', readonly=True)
+    is_pos_related = fields.Boolean(string='POS Related', readonly=True)
+    entry_count = fields.Integer(string='Count', readonly=True)
+    amount = fields.Monetary(string='Amount', currency_field='currency_id', readonly=True)
+    currency_id = fields.Many2one('res.currency', compute='_compute_currency_id')
+    updated_at = fields.Datetime(string='Last Updated', readonly=True)
+
+    def _compute_currency_id(self):
+        self.currency_id = self.env.company.currency_id
+
+    # ------------------------------------------------------------------
+    # Schema: unique key, apply function, source triggers
+    # ------------------------------------------------------------------
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS gas_station_cash_ledger_key_uniq
+                ON {LEDGER_TABLE} {CONFLICT_TARGET}
+        """)
+        cr.execute(f"""
+            CREATE OR REPLACE FUNCTION gas_station_cash_ledger_apply(
+                p_source varchar, p_day date, p_type varchar, p_staff integer,
+                p_product integer, p_pos_status varchar, p_state varchar,
+                p_pos_related boolean, p_count integer, p_amount numeric
+            ) RETURNS void LANGUAGE plpgsql AS $$
+            BEGIN
+                INSERT INTO {LEDGER_TABLE} AS l
+                       (source, day, entry_type, staff_id, product_id, pos_status, state,
+                        is_pos_related, entry_count, amount, updated_at)
+                VALUES (p_source, p_day, p_type, p_staff, p_product, p_pos_status, p_state,
+                        p_pos_related, p_count, p_amount, now() at time zone 'UTC')
+                ON CONFLICT {CONFLICT_TARGET}
+                DO UPDATE SET entry_count = l.entry_count + EXCLUDED.entry_count,
+                              amount = l.amount + EXCLUDED.amount,
+                              updated_at = EXCLUDED.updated_at;
+                IF p_count < 0 THEN
+                    DELETE FROM {LEDGER_TABLE}
+                     WHERE source = p_source AND day = p_day
+                       AND COALESCE(entry_type, '') = COALESCE(p_type, '')
+                       AND COALESCE(staff_id, 0) = COALESCE(p_staff, 0)
+                       AND COALESCE(product_id, 0) = COALESCE(p_product, 0)
+                       AND COALESCE(pos_status, '') = COALESCE(p_pos_status, '')
+                       AND COALESCE(state, '') = COALESCE(p_state, '')
+                       AND is_pos_related = p_pos_related
+                       AND entry_count <= 0;
+                END IF;
+            END $$
+        """)
+        for source, spec in LEDGER_SOURCES.items():
+            func = f"gas_station_cash_ledger_{source}"
+            old_row = ', '.join(f"OLD.{col}" for col in spec['watch'])
+            new_row = ', '.join(f"NEW.{col}" for col in spec['watch'])
+            cr.execute(f"""
+                CREATE OR REPLACE FUNCTION {func}() RETURNS trigger LANGUAGE plpgsql AS $$
+                BEGIN
+                    -- moved to the archive tables: still counted in the ledger
+                    IF current_setting('{ARCHIVING_FLAG}', true) = 'on' THEN
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP = 'UPDATE' AND ROW({old_row}) IS NOT DISTINCT FROM ROW({new_row}) THEN
+                        RETURN NULL;
+                    END IF;
+                    IF TG_OP <> 'INSERT' THEN
+                        PERFORM gas_station_cash_ledger_apply({_apply_args(source, 'OLD', -1)});
+                    END IF;
+                    IF TG_OP <> 'DELETE' THEN
+                        PERFORM gas_station_cash_ledger_apply({_apply_args(source, 'NEW', 1)});
+                    END IF;
+                    RETURN NULL;
+                END $$
+            """)
+            cr.execute(f"""
+                DROP TRIGGER IF EXISTS {func}_trg ON {spec['table']};
+                CREATE TRIGGER {func}_trg
+                    AFTER INSERT OR DELETE OR UPDATE OF {', '.join(spec['watch'])} ON {spec['table']}
+                    FOR EACH ROW EXECUTE FUNCTION {func}()
+            """)
+
+        # First install / upgrade: fill the ledger from the existing records
+        cr.execute(f"SELECT 1 FROM {LEDGER_TABLE} LIMIT 1")
+        if not cr.fetchone():
+            self._rebuild()
+
+    # ------------------------------------------------------------------
+    # Rebuild / verify
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _source_rollup_sql(self):
+        """SELECT of the ledger rows computed from the source tables."""
+        parts = [
+            f"SELECT '{source}'::varchar AS source, {_select_list(source, 's')} FROM {_read_table(source)} s"
+            for source in LEDGER_SOURCES
+        ]
+        return f"""
+            SELECT source, day, entry_type, staff_id, product_id, pos_status, state,
+                   is_pos_related, count(*) AS entry_count, sum(amount) AS amount
+              FROM ({' UNION ALL '.join(parts)})
+                   AS src(source, day, entry_type, staff_id, product_id, pos_status, state,
+                          is_pos_related, amount)
+          GROUP BY 1, 2, 3, 4, 5, 6, 7, 8
+        """
+
+    @api.model
+    def _rebuild(self):
+        """Recompute the whole ledger from the source tables. Returns the number of ledger rows."""
+        for source in LEDGER_SOURCES:
+            self.env[self._source_model(source)].flush_model()
+        tables = ', '.join(spec['table'] for spec in LEDGER_SOURCES.values())
+        # Block writers while the snapshot is taken (triggers would race the rebuild)
+        self.env.cr.execute(f"LOCK TABLE {tables} IN SHARE MODE")
+        self.env.cr.execute(f"DELETE FROM {LEDGER_TABLE}")
+        self.env.cr.execute(f"""
+            INSERT INTO {LEDGER_TABLE}
+                   (source, day, entry_type, staff_id, product_id, pos_status, state,
+                    is_pos_related, entry_count, amount, updated_at)
+            SELECT *, now() at time zone 'UTC' FROM ({self._source_rollup_sql()}) AS r
+        """)
+        count = self.env.cr.rowcount
+        self.invalidate_model()
+        _logger.info("[CashLedger] Rebuilt ledger: %d row(s)", count)
+        return count
+
+    @api.model
+    def _verify(self, limit=50):
+        """
+        Compare the ledger with a fresh rollup of the source tables.
+
+        Returns:
+            list of dicts {source, day, entry_type, staff_id, product_id, pos_status,
+            state, is_pos_related, ledger_count, ledger_amount, source_count, source_amount}
+            — empty when the ledger is consistent.
+        """
+        for source in LEDGER_SOURCES:
+            self.env[self._source_model(source)].flush_model()
+        key = ['source', 'day', 'entry_type', 'staff_id', 'product_id', 'pos_status', 'state', 'is_pos_related']
+        join = ' AND '.join(f"l.{col} IS NOT DISTINCT FROM s.{col}" for col in key)
+        cols = ', '.join(f"COALESCE(l.{col}, s.{col}) AS {col}" for col in key)
+        self.env.cr.execute(f"""
+            SELECT {cols},
+                   COALESCE(l.entry_count, 0) AS ledger_count, COALESCE(l.amount, 0) AS ledger_amount,
+                   COALESCE(s.entry_count, 0) AS source_count, COALESCE(s.amount, 0) AS source_amount
+              FROM {LEDGER_TABLE} l
+              FULL OUTER JOIN ({self._source_rollup_sql()}) s ON {join}
+             WHERE COALESCE(l.entry_count, 0) <> COALESCE(s.entry_count, 0)
+                OR COALESCE(l.amount, 0) <> COALESCE(s.amount, 0)
+             ORDER BY 2, 1
+             LIMIT %s
+        """, (limit,))
+        return self.env.cr.dictfetchall()
+
+    @api.model
+    def _source_model(self, source):
+        return {
+            'deposit': 'gas.station.cash.deposit',
+            'withdrawal': 'gas.station.cash.withdrawal',
+            'exchange': 'gas.station.cash.exchange',
+            'replenish': 'gas.station.cash.replenish',
+        }[source]
+
+    # ------------------------------------------------------------------
+    # Time-range summaries (ledger for whole days + source rows at the edges)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _day_window(self, date_from=None, date_to=None, include_start=False):
+        """
+        Whole UTC days inside the range, as (first_day, end_day) with end_day
+        exclusive; first_day is None when the range is open at the start.
+        Returns None when no whole day is covered.
+        """
+        if date_from:
+            first_day = date_from.date()
+            if not (include_start and date_from == datetime.combine(first_day, time.min)):
+                first_day += timedelta(days=1)
+        else:
+            first_day = None
+        # Day D is whole when the next midnight is <= date_to; open end → up to today
+        end_day = (date_to or fields.Datetime.now()).date()
+        if first_day is not None and first_day >= end_day:
+            return None
+        return first_day, end_day
+
+    @api.model
+    def _grouped_rows(self, source, date_from=None, date_to=None, include_start=False,
+                      states=None, pos_status=None, staff_ids=None):
+        """
+        Count / sum of `source` records in the range, grouped like the ledger key.
+
+        Returns:
+            list of tuples (entry_type, pos_status, is_pos_related, pos_related,
+            staff_id, product_id, state, count, amount); pos_related also counts
+            POS deposit types and POS products (see cash_deposit_totals).
+        """
+        date_col = _expr(source, 'date', 's')
+        self.env[self._source_model(source)].flush_model()
+
+        params = {'pos_types': POS_DEPOSIT_TYPES}
+        raw_where, ledger_where = ["TRUE"], ["l.source = %(source)s"]
+        params['source'] = source
+        if date_from:
+            raw_where.append(f"{date_col} >= %(date_from)s" if include_start else f"{date_col} > %(date_from)s")
+            params['date_from'] = date_from
+        if date_to:
+            raw_where.append(f"{date_col} <= %(date_to)s")
+            params['date_to'] = date_to
+        if states:
+            raw_where.append(f"{_expr(source, 'state', 's')} IN %(states)s")
+            ledger_where.append("l.state IN %(states)s")
+            params['states'] = tuple(states)
+        if pos_status:
+            raw_where.append(f"{_expr(source, 'pos_status', 's')} = %(pos_status)s")
+            ledger_where.append("l.pos_status = %(pos_status)s")
+            params['pos_status'] = pos_status
+        if staff_ids:
+            raw_where.append(f"{_expr(source, 'staff_id', 's')} = ANY(%(staff_ids)s)")
+            ledger_where.append("l.staff_id = ANY(%(staff_ids)s)")
+            params['staff_ids'] = list(staff_ids)
+
+        window = self._day_window(date_from, date_to, include_start)
+        branches = []
+        if window:
+            first_day, end_day = window
+            edge = [f"{date_col} >= %(end_ts)s"]
+            ledger_where.append("l.day < %(end_day)s")
+            params.update(end_day=end_day, end_ts=datetime.combine(end_day, time.min))
+            if first_day is not None:
+                edge.append(f"{date_col} < %(first_ts)s")
+                ledger_where.append("l.day >= %(first_day)s")
+                params.update(first_day=first_day, first_ts=datetime.combine(first_day, time.min))
+            raw_where.append(f"({' OR '.join(edge)})")
+            branches.append(f"""
+                SELECT l.entry_type, l.pos_status, l.is_pos_related, l.staff_id, l.product_id,
+                       l.state, l.entry_count, l.amount
+                  FROM {LEDGER_TABLE} l
+                 WHERE {' AND '.join(ledger_where)}
+            """)
+        branches.append(f"""
+            SELECT {', '.join(_expr(source, col, 's') for col in
+                              ('entry_type', 'pos_status', 'is_pos_related', 'staff_id', 'product_id', 'state'))},
+                   1, {_expr(source, 'amount', 's')}
+              FROM {_read_table(source)} s
+             WHERE {' AND '.join(raw_where)}
+        """)
+
+        self.env.cr.execute(f"""
+            SELECT r.entry_type, r.pos_status, r.is_pos_related,
+                   (r.entry_type IN %(pos_types)s
+                    OR r.is_pos_related
+                    OR COALESCE(p.is_pos_related, FALSE)) AS pos_related,
+                   r.staff_id, r.product_id, r.state,
+                   sum(r.cnt)::integer, COALESCE(sum(r.amount), 0)
+              FROM ({' UNION ALL '.join(branches)})
+                   AS r(entry_type, pos_status, is_pos_related, staff_id, product_id, state, cnt, amount)
+              LEFT JOIN gas_station_cash_product p ON p.id = r.product_id
+          GROUP BY 1, 2, 3, 4, 5, 6, 7
+        """, params)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def _summary(self, source, date_from=None, date_to=None, include_start=False,
+                 states=None, staff_ids=None):
+        """{count, amount, by_type: {type: {count, amount}}} for the range."""
+        result = {'count': 0, 'amount': 0.0, 'by_type': {}}
+        for row in self._grouped_rows(source, date_from, date_to, include_start,
+                                      states=states, staff_ids=staff_ids):
+            entry_type, cnt, amount = row[0] or 'other', row[7], float(row[8] or 0.0)
+            bucket = result['by_type'].setdefault(entry_type, {'count': 0, 'amount': 0.0})
+            bucket['count'] += cnt
+            bucket['amount'] += amount
+            result['count'] += cnt
+            result['amount'] += amount
+        return result
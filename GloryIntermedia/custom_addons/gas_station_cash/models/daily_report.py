@@ -10,8 +10,23 @@ from datetime import datetime, timedelta
 import json
 import logging
 
+from .cash_deposit_totals import DEPOSIT_TYPES
+
 _logger = logging.getLogger(__name__)
 
+# Rows per INSERT when linking a period's deposits / withdrawals to the report
+LINK_CHUNK_SIZE = 50000
+
+# Deposit breakdown (chart) order: (deposit_type, label); 'other' = unknown types
+BREAKDOWN_TYPES = [
+    ('oil', 'Oil Sales'),
+    ('engine_oil', 'Engine Oil'),
+    ('coffee_shop', 'Coffee Shop'),
+    ('convenient_store', 'Convenience Store'),
+    ('rental', 'Rental'),
+    ('other', 'Other'),
+]
+
 
 class GasStationDailyReport(models.Model):
     _name = 'gas.station.daily.report'
@@ -260,6 +275,11 @@ class GasStationDailyReport(models.Model):
         string='Collection Breakdown (JSON)',
         readonly=True,
     )
+    deposit_breakdown_json = fields.Text(
+        string='Deposit Breakdown (JSON)',
+        readonly=True,
+        help="ยอด/จำนวน deposit แยกตาม type คำนวณตอนสร้าง report (ใช้กับ chart)"
+    )
     
     # Inventory Summary (for display)
     total_notes = fields.Monetary(
@@ -403,39 +423,9 @@ class GasStationDailyReport(models.Model):
         period_start = previous_eod.close_time if previous_eod else None
         period_end = eod_audit.close_time
         
-        # Get all shifts in period
-        shift_domain = [('id', '!=', eod_audit.id)]  # Exclude current EOD
-        if period_start:
-            shift_domain.append(('close_time', '>', period_start))
-        shift_domain.append(('close_time', '<=', period_end))
-        
-        shifts = self.env['gas.station.shift.audit'].search(shift_domain)
-        all_shifts = shifts | eod_audit  # Include EOD itself
-        
-        # Get all deposits in period
-        deposit_domain = []
-        if period_start:
-            deposit_domain.append(('date', '>', period_start))
-        deposit_domain.append(('date', '<=', period_end))
-        
-        deposits = self.env['gas.station.cash.deposit'].search(deposit_domain)
-        
-        # Get all withdrawals in period
-        withdrawal_domain = []
-        if period_start:
-            withdrawal_domain.append(('date', '>', period_start))
-        withdrawal_domain.append(('date', '<=', period_end))
-        
-        withdrawals = self.env['gas.station.cash.withdrawal'].search(withdrawal_domain)
-        
-        # Calculate totals by deposit type
-        totals = self._calculate_deposit_totals(deposits)
-        
-        # Calculate withdrawal total
-        total_withdrawals = sum(withdrawals.mapped('total_amount'))
-        
-        # POS deposits
-        pos_deposits = deposits.filtered(lambda d: d.is_pos_related and d.pos_status == 'ok')
+        # Aggregates: deposits in one grouped query, withdrawals + shifts in one more
+        totals = self._calculate_deposit_totals(period_start=period_start, period_end=period_end)
+        stats = self._calculate_period_stats(eod_audit, period_start, period_end)
         
         # Opening balance (from previous EOD reserve or 0)
         opening_balance = previous_eod.reserve_kept if previous_eod else 0
@@ -467,14 +457,14 @@ class GasStationDailyReport(models.Model):
             'total_exchange_cash': totals['exchange_cash'],
             
             'total_deposits': totals['all_deposits'],
-            'total_withdrawals': total_withdrawals,
+            'total_withdrawals': stats['withdrawal_amount'],
             
             # Counts
-            'deposit_count': len(deposits),
-            'withdrawal_count': len(withdrawals),
-            'shift_count': len(all_shifts),
-            'pos_deposit_count': len(pos_deposits),
-            'pos_total_amount': sum(pos_deposits.mapped('total_amount')),
+            'deposit_count': totals['count'],
+            'withdrawal_count': stats['withdrawal_count'],
+            'shift_count': stats['shift_count'],
+            'pos_deposit_count': totals['pos_count'],
+            'pos_total_amount': totals['pos_amount'],
             
             # Inventory
             'opening_balance': opening_balance,
@@ -484,70 +474,131 @@ class GasStationDailyReport(models.Model):
             'collected_amount': eod_audit.collected_amount or 0,
             'reserve_kept': eod_audit.reserve_kept or 0,
             'collection_breakdown_json': eod_audit.collection_breakdown or False,
+            'deposit_breakdown_json': json.dumps(totals['breakdown']),
             
-            # Relations
-            'shift_audit_ids': [(6, 0, all_shifts.ids)],
-            'deposit_ids': [(6, 0, deposits.ids)],
-            'withdrawal_ids': [(6, 0, withdrawals.ids)],
+            # Relations (shifts only; deposits / withdrawals are linked below)
+            'shift_audit_ids': [(6, 0, stats['shift_ids'])],
         }
         
         report = self.create(vals)
+        report._link_period_records()
         
         _logger.info("✅ Created Daily Report: %s", report.name)
         _logger.info("   Period: %s → %s", period_start, period_end)
         _logger.info("   Shifts: %d, Deposits: %d, Withdrawals: %d", 
-                    len(all_shifts), len(deposits), len(withdrawals))
+                    stats['shift_count'], totals['count'], stats['withdrawal_count'])
         _logger.info("=" * 60)
         
         return report
     
-    def _calculate_deposit_totals(self, deposits):
-        """Calculate totals by deposit type."""
+    def _calculate_deposit_totals(self, period_start=None, period_end=None):
+        """Calculate totals by deposit type for the period (one grouped SQL query)."""
+        Totals = self.env['gas.station.cash.deposit.totals']
+        agg = Totals._aggregate(date_from=period_start, date_to=period_end)
         totals = {
-            'oil': 0,
-            'engine_oil': 0,
-            'coffee_shop': 0,
-            'convenient_store': 0,
-            'rental': 0,
-            'deposit_cash': 0,
-            'exchange_cash': 0,
-            'other': 0,
-            'revenue_total': 0,
-            'all_deposits': 0,
+            'oil': Totals._type_amount(agg, 'oil'),
+            'engine_oil': Totals._type_amount(agg, 'engine_oil'),
+            'coffee_shop': Totals._type_amount(agg, 'coffee_shop'),
+            'convenient_store': Totals._type_amount(agg, 'convenient_store'),
+            'rental': Totals._type_amount(agg, 'rental'),
+            'deposit_cash': Totals._type_amount(agg, 'deposit_cash'),
+            'exchange_cash': Totals._type_amount(agg, 'exchange_cash'),
+            'other': Totals._other_amount(agg),
+            'all_deposits': agg['amount'],
+            'count': agg['count'],
+            'pos_count': agg['pos_ok']['count'],
+            'pos_amount': agg['pos_ok']['amount'],
         }
-        
-        for deposit in deposits:
-            amount = deposit.total_amount or 0
-            totals['all_deposits'] += amount
-            
-            dtype = deposit.deposit_type
-            if dtype == 'oil':
-                totals['oil'] += amount
-                totals['revenue_total'] += amount
-            elif dtype == 'engine_oil':
-                totals['engine_oil'] += amount
-                totals['revenue_total'] += amount
-            elif dtype == 'coffee_shop':
-                totals['coffee_shop'] += amount
-                totals['revenue_total'] += amount
-            elif dtype == 'convenient_store':
-                totals['convenient_store'] += amount
-                totals['revenue_total'] += amount
-            elif dtype == 'rental':
-                totals['rental'] += amount
-                totals['revenue_total'] += amount
-            elif dtype == 'deposit_cash':
-                totals['deposit_cash'] += amount
-                # ไม่นับเป็น revenue
-            elif dtype == 'exchange_cash':
-                totals['exchange_cash'] += amount
-                # ไม่นับเป็น revenue
-            else:
-                totals['other'] += amount
-                totals['revenue_total'] += amount
-        
+        # deposit_cash / exchange_cash ไม่นับเป็น revenue
+        totals['revenue_total'] = agg['amount'] - totals['deposit_cash'] - totals['exchange_cash']
+
+        other_count = sum(v['count'] for k, v in agg['by_type'].items() if k not in DEPOSIT_TYPES)
+        totals['breakdown'] = [
+            {
+                'type': dtype,
+                'name': label,
+                'value': totals[dtype],
+                'count': other_count if dtype == 'other' else agg['by_type'].get(dtype, {}).get('count', 0),
+            }
+            for dtype, label in BREAKDOWN_TYPES
+        ]
         return totals
 
+    @api.model
+    def _period_where(self, period_start, period_end, column='date'):
+        """SQL condition + params for (period_start, period_end]."""
+        where = f"{column} <= %(period_end)s"
+        params = {'period_end': period_end}
+        if period_start:
+            where += f" AND {column} > %(period_start)s"
+            params['period_start'] = period_start
+        return where, params
+
+    @api.model
+    def _calculate_period_stats(self, eod_audit, period_start, period_end):
+        """Withdrawal totals and the period's shift audits in one query."""
+        self.env['gas.station.cash.withdrawal'].flush_model(['date', 'total_amount'])
+        self.env['gas.station.shift.audit'].flush_model(['close_time'])
+        wdr_where, params = self._period_where(period_start, period_end)
+        shift_where, _params = self._period_where(period_start, period_end, column='close_time')
+        params['eod_id'] = eod_audit.id
+        self.env.cr.execute(f"""
+            SELECT (SELECT count(*) FROM gas_station_cash_withdrawal WHERE {wdr_where}),
+                   (SELECT COALESCE(sum(total_amount), 0) FROM gas_station_cash_withdrawal WHERE {wdr_where}),
+                   ARRAY(SELECT id FROM gas_station_shift_audit
+                          WHERE ({shift_where}) OR id = %(eod_id)s
+                          ORDER BY close_time DESC, id DESC)
+        """, params)
+        wdr_count, wdr_amount, shift_ids = self.env.cr.fetchone()
+        return {
+            'withdrawal_count': wdr_count,
+            'withdrawal_amount': float(wdr_amount or 0.0),
+            'shift_ids': shift_ids,
+            'shift_count': len(shift_ids),
+        }
+
+    def _link_period_records(self):
+        """
+        Fill deposit_ids / withdrawal_ids for the report period server side
+        (INSERT ... SELECT in id-ordered chunks) instead of (6, 0, ids) commands
+        carrying every id of the period through Python.
+        """
+        self.ensure_one()
+        self.env['gas.station.cash.deposit'].flush_model(['date'])
+        self.env['gas.station.cash.withdrawal'].flush_model(['date'])
+        where, params = self._period_where(self.period_start, self.period_end)
+        params.update(report_id=self.id, chunk=LINK_CHUNK_SIZE)
+        for rel_table, column, table in (
+            ('daily_report_deposit_rel', 'deposit_id', 'gas_station_cash_deposit'),
+            ('daily_report_withdrawal_rel', 'withdrawal_id', 'gas_station_cash_withdrawal'),
+        ):
+            params['after_id'] = 0
+            while True:
+                self.env.cr.execute(f"""
+                    WITH ins AS (
+                        INSERT INTO {rel_table} (report_id, {column})
+                        SELECT %(report_id)s, id FROM {table}
+                         WHERE {where} AND id > %(after_id)s
+                         ORDER BY id
+                         LIMIT %(chunk)s
+                        ON CONFLICT DO NOTHING
+                        RETURNING {column}
+                    )
+                    SELECT count(*), max({column}) FROM ins
+                """, params)
+                count, last_id = self.env.cr.fetchone()
+                if count < LINK_CHUNK_SIZE:
+                    break
+                params['after_id'] = last_id
+        self.invalidate_recordset(['deposit_ids', 'withdrawal_ids'])
+
+    def _period_domain(self):
+        self.ensure_one()
+        domain = [('date', '<=', self.period_end)]
+        if self.period_start:
+            domain.append(('date', '>', self.period_start))
+        return domain
+
     # =========================================================================
     # ACTIONS
     # =========================================================================
@@ -562,27 +613,34 @@ class GasStationDailyReport(models.Model):
         for record in self:
             record.state = 'draft'
     
+    def _period_archived(self):
+        """The report period was moved to the archive tables (see cash_archive)."""
+        self.ensure_one()
+        return self.env['gas.station.cash.archive'].sudo()._is_archived(self.period_start or self.period_end)
+
     def action_view_deposits(self):
         """Open deposits in this report."""
         self.ensure_one()
+        archived = self._period_archived()
         return {
             'type': 'ir.actions.act_window',
             'name': _('Deposits'),
-            'res_model': 'gas.station.cash.deposit',
-            'view_mode': 'tree,form',
-            'domain': [('id', 'in', self.deposit_ids.ids)],
+            'res_model': 'gas.station.cash.deposit.history' if archived else 'gas.station.cash.deposit',
+            'view_mode': 'tree' if archived else 'tree,form',
+            'domain': self._period_domain(),
             'context': {'create': False},
         }
     
     def action_view_withdrawals(self):
         """Open withdrawals in this report."""
         self.ensure_one()
+        archived = self._period_archived()
         return {
             'type': 'ir.actions.act_window',
             'name': _('Withdrawals'),
-            'res_model': 'gas.station.cash.withdrawal',
-            'view_mode': 'tree,form',
-            'domain': [('id', 'in', self.withdrawal_ids.ids)],
+            'res_model': 'gas.station.cash.withdrawal.history' if archived else 'gas.station.cash.withdrawal',
+            'view_mode': 'tree' if archived else 'tree,form',
+            'domain': self._period_domain(),
             'context': {'create': False},
         }
     
@@ -619,13 +677,17 @@ class GasStationDailyReport(models.Model):
         return result
     
     def get_deposit_breakdown(self):
-        """Get deposit breakdown by type for charts."""
+        """Get deposit breakdown by type for charts (precomputed at EOD)."""
         self.ensure_one()
+        if self.deposit_breakdown_json:
+            try:
+                return [
+                    {'name': item['name'], 'value': item['value']}
+                    for item in json.loads(self.deposit_breakdown_json)
+                ]
+            except (json.JSONDecodeError, TypeError, KeyError):
+                pass
         return [
-            {'name': 'Oil Sales', 'value': self.total_oil or 0},
-            {'name': 'Engine Oil', 'value': self.total_engine_oil or 0},
-            {'name': 'Coffee Shop', 'value': self.total_coffee_shop or 0},
-            {'name': 'Convenience Store', 'value': self.total_convenient_store or 0},
-            {'name': 'Rental', 'value': self.total_rental or 0},
-            {'name': 'Other', 'value': self.total_other or 0},
-        ]
\ No newline at end of file
+            {'name': label, 'value': self['total_' + dtype] or 0}
+            for dtype, label in BREAKDOWN_TYPES
+        ]
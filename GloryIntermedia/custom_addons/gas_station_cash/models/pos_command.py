@@ -8,6 +8,8 @@ from odoo import models, fields, api
 import json
 import logging
 
+from .shift_boundary import BOUNDARY_ACTIONS
+
 _logger = logging.getLogger(__name__)
 
 
@@ -84,6 +86,36 @@ class GasStationPosCommand(models.Model):
         help="Additional notes - can be edited anytime",
     )
 
+    # ----- Shift boundary cache (see models/shift_boundary.py) -----
+    BOUNDARY_FIELDS = {'action', 'status', 'started_at', 'finished_at'}
+
+    def _touches_boundary(self):
+        return any(
+            cmd.action in BOUNDARY_ACTIONS and cmd.status == 'done'
+            for cmd in self
+        )
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records._touches_boundary():
+            self.env['gas.station.shift.boundary']._invalidate()
+        return records
+
+    def write(self, vals):
+        if not self.BOUNDARY_FIELDS.intersection(vals):
+            return super().write(vals)
+        was_boundary = self._touches_boundary()
+        res = super().write(vals)
+        if was_boundary or self._touches_boundary():
+            self.env['gas.station.shift.boundary']._invalidate()
+        return res
+
+    def unlink(self):
+        if self._touches_boundary():
+            self.env['gas.station.shift.boundary']._invalidate()
+        return super().unlink()
+
     def push_overlay(self):
         """Push overlay notification to frontend via bus."""
         self.ensure_one()
@@ -121,6 +153,36 @@ class GasStationPosCommand(models.Model):
         
         self.env['bus.bus']._sendone(channel, 'pos_command', payload)
 
+    def push_progress(self, progress: dict):
+        """
+        Push real job progress (current step of the shift job) to the overlay.
+        Ignored once the command left 'processing' so a late step does not
+        re-open a closed overlay.
+        """
+        self.ensure_one()
+        if self.status != 'processing':
+            return
+
+        message = progress.get('step_label') or self.message or 'processing...'
+        self.write({'message': message})
+
+        channel = ('odoo', f'gas_station_cash:{self.pos_terminal_id}')
+
+        payload = {
+            'command_id': self.id,
+            'action': self.action,
+            'request_id': self.request_id,
+            'status': self.status,
+            'message': message,
+            'step': progress.get('step'),
+            'step_index': progress.get('step_index', 0),
+            'step_count': progress.get('step_count', 0),
+        }
+
+        _logger.info("PROGRESS channel=%s payload=%s", channel, payload)
+
+        self.env['bus.bus']._sendone(channel, 'pos_command', payload)
+
     def mark_collection_complete(self, result: dict):
         """
         Mark command as collection complete - shows unlock popup.
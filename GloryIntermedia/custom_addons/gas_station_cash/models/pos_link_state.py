@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/pos_link_state.py
+Description: Lightweight POS link state (connectivity, fail count, last seen)
+
+Replaces the gas_station_cash.pos_connected / pos_fail_count system parameters.
+Every write to ir.config_parameter clears the ormcache in all workers, so the
+heartbeat worker now keeps its state in this small table instead — one row per
+POS terminal — and only writes when something actually changed.
+"""
+
+from odoo import models, fields, api
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# last_seen_at is refreshed at most once per window while the link stays up,
+# so a healthy heartbeat does not rewrite the row on every tick.
+LAST_SEEN_RESOLUTION = timedelta(minutes=5)
+
+
+class GasStationPosLinkState(models.Model):
+    _name = 'gas.station.pos.link.state'
+    _description = 'POS Link State'
+    _rec_name = 'pos_terminal_id'
+    _log_access = False
+
+    pos_terminal_id = fields.Char(
+        string='Terminal ID',
+        required=True,
+        index=True,
+        readonly=True,
+    )
+    connected = fields.Boolean(
+        string='POS Connected',
+        default=True,
+        readonly=True,
+    )
+    fail_count = fields.Integer(
+        string='Consecutive Failures',
+        default=0,
+        readonly=True,
+    )
+    offline_mode_active = fields.Boolean(
+        string='Offline Mode Active',
+        default=False,
+        readonly=True,
+    )
+    last_seen_at = fields.Datetime(
+        string='Last Seen',
+        readonly=True,
+    )
+    last_failed_at = fields.Datetime(
+        string='Last Failure',
+        readonly=True,
+    )
+    changed_at = fields.Datetime(
+        string='Last Status Change',
+        readonly=True,
+    )
+
+    _sql_constraints = [
+        ('pos_terminal_id_uniq', 'unique(pos_terminal_id)',
+         'Only one link state row per POS terminal is allowed.'),
+    ]
+
+    @api.model
+    def _get_state(self, terminal_id, lock=False):
+        """Return the state row for a terminal, creating it on first use (writers only)."""
+        query = "SELECT id FROM gas_station_pos_link_state WHERE pos_terminal_id = %s"
+        if lock:
+            query += " FOR UPDATE"
+        self.env.cr.execute(query, (terminal_id,))
+        row = self.env.cr.fetchone()
+        if not row:
+            # Several workers may hit an empty table at once — let the
+            # unique constraint pick the winner instead of raising.
+            self.env.cr.execute("""
+                INSERT INTO gas_station_pos_link_state
+                    (pos_terminal_id, connected, fail_count, offline_mode_active)
+                VALUES (%s, true, 0, false)
+                ON CONFLICT (pos_terminal_id) DO NOTHING
+            """, (terminal_id,))
+            self.env.cr.execute(query, (terminal_id,))
+            row = self.env.cr.fetchone()
+        return self.browse(row[0])
+
+    @api.model
+    def get_status(self, terminal_id):
+        """
+        Read-only snapshot used by the kiosk status poll. Before the first
+        heartbeat there is no row yet: report the field defaults instead of
+        inserting one from the poll path.
+        """
+        self.env.cr.execute("""
+            SELECT connected, offline_mode_active, fail_count, last_seen_at
+              FROM gas_station_pos_link_state
+             WHERE pos_terminal_id = %s
+        """, (terminal_id,))
+        row = self.env.cr.fetchone() or (True, False, 0, None)
+        return {
+            'pos_connected': row[0],
+            'offline_mode_active': row[1],
+            'fail_count': row[2],
+            'last_seen_at': row[3],
+        }
+
+    @api.model
+    def record_heartbeat(self, terminal_id, alive, offline_threshold=3):
+        """
+        Apply one heartbeat result to the terminal state.
+
+        The row is locked so concurrent worker processes count failures
+        correctly. Only changed fields are written; when nothing changed
+        (link still up within LAST_SEEN_RESOLUTION, or still down past the
+        threshold) no UPDATE is issued at all.
+
+        Returns:
+            dict with connected, fail_count, previous_fail_count, changed
+        """
+        state = self._get_state(terminal_id, lock=True)
+        now = fields.Datetime.now()
+        prev_fail = state.fail_count
+        vals = {}
+
+        if alive:
+            if prev_fail:
+                vals['fail_count'] = 0
+            if not state.connected:
+                vals['connected'] = True
+            if not state.last_seen_at or now - state.last_seen_at >= LAST_SEEN_RESOLUTION:
+                vals['last_seen_at'] = now
+        else:
+            # Stop counting once the link is declared down — the count has
+            # no further effect and would otherwise be rewritten every tick.
+            if state.connected or prev_fail < offline_threshold:
+                vals['fail_count'] = prev_fail + 1
+                vals['last_failed_at'] = now
+                if state.connected and prev_fail + 1 >= offline_threshold:
+                    vals['connected'] = False
+
+        changed = 'connected' in vals
+        if changed:
+            vals['changed_at'] = now
+        if vals:
+            state.write(vals)
+        if changed:
+            self._notify_link_change(state)
+
+        return {
+            'connected': state.connected,
+            'fail_count': state.fail_count,
+            'previous_fail_count': prev_fail,
+            'changed': changed,
+        }
+
+    @api.model
+    def set_offline_mode(self, terminal_id, active):
+        """Toggle offline mode for a terminal. No-op when already in that mode."""
+        state = self._get_state(terminal_id, lock=True)
+        if state.offline_mode_active != bool(active):
+            state.write({'offline_mode_active': bool(active)})
+        return state.offline_mode_active
+
+    def _notify_link_change(self, state):
+        """
+        Push the new connectivity to the kiosk so it does not wait for the next
+        poll (cash_recycler_app.js refreshes its POS status on 'pos_link_state').
+        """
+        channel = ('odoo', f'gas_station_cash:{state.pos_terminal_id}')
+        payload = {
+            'pos_connected': state.connected,
+            'offline_mode_active': state.offline_mode_active,
+        }
+        _logger.info("POS LINK channel=%s payload=%s", channel, payload)
+        self.env['bus.bus']._sendone(channel, 'pos_link_state', payload)
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/pos_shift_job.py
+Description: Durable CloseShift / EndOfDay job (step plan, checkpoints, timings)
+
+One row per CloseShift / EndOfDay command. The runner
+(controllers/pos_shift_job_runner.py) executes the steps in order and
+checkpoints after each one, so a job interrupted by a worker restart is picked
+up again by the resume cron at the step where it stopped.
+"""
+
+from odoo import models, fields, api
+from datetime import timedelta
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Step plans per job type (FlowCo EOD marker only marks the last shift audit)
+STEP_PLANS = {
+    'close_shift':      ['inventory', 'collect', 'audit', 'report', 'callback'],
+    'end_of_day':       ['collect', 'wait_idle', 'audit', 'callback', 'report'],
+    'end_of_day_marker': ['audit', 'callback', 'report'],
+}
+
+STEP_LABELS = {
+    'wait_idle': 'Waiting for the machine to become idle...',
+    'inventory': 'Checking cash inventory...',
+    'collect':   'Collecting cash to Collection Box...',
+    'audit':     'Creating shift audit...',
+    'report':    'Creating report...',
+    'callback':  'Finishing...',
+}
+
+# Steps that move cash: never re-run blindly after a crash
+NON_REPEATABLE_STEPS = ('collect',)
+
+JOB_LEASE_SECONDS = 600       # > longest step (Glory polling is capped at 120s)
+JOB_START_GRACE_SECONDS = 30  # queued jobs older than this are started by the cron
+
+
+class GasStationPosShiftJob(models.Model):
+    _name = 'gas.station.pos.shift.job'
+    _description = 'POS Shift Close / End of Day Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Name', required=True, readonly=True)
+    command_id = fields.Many2one(
+        'gas.station.pos_command',
+        string='POS Command',
+        required=True,
+        ondelete='cascade',
+        index=True,
+        readonly=True,
+    )
+    job_type = fields.Selection([
+        ('close_shift', 'Close Shift'),
+        ('end_of_day', 'End of Day'),
+    ], string='Type', required=True, readonly=True)
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ], string='State', default='queued', required=True, index=True, readonly=True)
+
+    step_plan = fields.Char(string='Steps', required=True, readonly=True)
+    step_index = fields.Integer(
+        string='Completed Steps',
+        default=0,
+        readonly=True,
+        help="Number of steps checkpointed so far; the next step to run is step_plan[step_index].",
+    )
+    current_step = fields.Char(string='Current Step', readonly=True)
+    step_started_at = fields.Datetime(string='Step Started', readonly=True)
+    context_json = fields.Text(
+        string='Job Context (JSON)',
+        readonly=True,
+        help="Inputs and intermediate results carried from step to step.",
+    )
+    step_timings_json = fields.Text(string='Step Timings (JSON)', readonly=True)
+
+    attempt_count = fields.Integer(string='Runs', default=0, readonly=True)
+    lease_until = fields.Datetime(string='Lease Until', readonly=True)
+    started_at = fields.Datetime(string='Started At', readonly=True)
+    finished_at = fields.Datetime(string='Finished At', readonly=True)
+    duration_ms = fields.Float(string='Duration (ms)', digits=(16, 1), readonly=True)
+    error_message = fields.Text(string='Error', readonly=True)
+    audit_id = fields.Many2one('gas.station.shift.audit', string='Shift Audit', readonly=True)
+
+    # ------------------------------------------------------------------
+    # Creation / claiming
+    # ------------------------------------------------------------------
+
+    @api.model
+    def create_for_command(self, cmd, job_type, context=None):
+        """Create the job for a freshly created pos_command (in the request transaction)."""
+        context = dict(context or {})
+        try:
+            payload = json.loads(cmd.payload_in or '{}')
+        except Exception:
+            payload = {}
+        if job_type == 'end_of_day' and payload.get('is_flowco_eod_marker'):
+            context['flowco_eod_marker'] = True
+            plan = STEP_PLANS['end_of_day_marker']
+        else:
+            plan = STEP_PLANS[job_type]
+        return self.create({
+            'name': f"{job_type} / {cmd.request_id}",
+            'command_id': cmd.id,
+            'job_type': job_type,
+            'step_plan': ','.join(plan),
+            'context_json': json.dumps(context, ensure_ascii=False, default=str),
+        })
+
+    @api.model
+    def _claim(self, job_id):
+        """
+        Lease a job for this process. A job can be claimed when it was never
+        started, or when it is 'running' but its lease expired (the worker that
+        ran it died). Returns True when the caller owns the job.
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT id FROM gas_station_pos_shift_job
+             WHERE id = %s
+               AND (state = 'queued' OR (state = 'running' AND lease_until < %s))
+               FOR UPDATE SKIP LOCKED
+        """, (job_id, now))
+        if not self.env.cr.fetchone():
+            return False
+        self.env.cr.execute("""
+            UPDATE gas_station_pos_shift_job
+               SET state = 'running',
+                   lease_until = %s,
+                   attempt_count = attempt_count + 1,
+                   started_at = COALESCE(started_at, %s)
+             WHERE id = %s
+        """, (now + timedelta(seconds=JOB_LEASE_SECONDS), now, job_id))
+        self.invalidate_model(['state', 'lease_until', 'attempt_count', 'started_at'])
+        return True
+
+    @api.model
+    def _cron_resume_jobs(self):
+        """
+        Pick up jobs whose runner thread never started or died mid-way
+        (worker recycled by limit_time_real / memory limits, server restart).
+        """
+        from ..controllers.pos_shift_job_runner import ShiftJobRunner
+
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT id FROM gas_station_pos_shift_job
+             WHERE (state = 'queued' AND create_date < %s)
+                OR (state = 'running' AND lease_until < %s)
+             ORDER BY id
+        """, (now - timedelta(seconds=JOB_START_GRACE_SECONDS), now))
+        job_ids = [row[0] for row in self.env.cr.fetchall()]
+        if not job_ids:
+            return
+
+        _logger.info("[ShiftJob] Resuming %d job(s): %s", len(job_ids), job_ids)
+        runner = ShiftJobRunner()
+        for job_id in job_ids:
+            runner.run(self.env.registry, job_id, uid=self.env.uid)
+
+    # ------------------------------------------------------------------
+    # Checkpoints (called by the runner, inside the step's transaction)
+    # ------------------------------------------------------------------
+
+    def _get_plan(self):
+        self.ensure_one()
+        return self.step_plan.split(',') if self.step_plan else []
+
+    def _get_context(self):
+        self.ensure_one()
+        return json.loads(self.context_json or '{}')
+
+    def _get_timings(self):
+        self.ensure_one()
+        return json.loads(self.step_timings_json or '{}')
+
+    def _begin_step(self, step):
+        """Record the step as started and extend the lease (committed before the step runs)."""
+        self.ensure_one()
+        now = fields.Datetime.now()
+        self.write({
+            'current_step': step,
+            'step_started_at': now,
+            'lease_until': now + timedelta(seconds=JOB_LEASE_SECONDS),
+        })
+
+    def _checkpoint_context(self, ctx):
+        self.ensure_one()
+        self.write({'context_json': json.dumps(ctx, ensure_ascii=False, default=str)})
+
+    def _checkpoint(self, step, ctx, elapsed_ms, status='done'):
+        """Persist the result of a step; runs in the same transaction as the step."""
+        self.ensure_one()
+        timings = self._get_timings()
+        timings[step] = {'ms': round(elapsed_ms, 1), 'status': status}
+        vals = {
+            'step_index': self.step_index + 1,
+            'current_step': False,
+            'step_started_at': False,
+            'context_json': json.dumps(ctx, ensure_ascii=False, default=str),
+            'step_timings_json': json.dumps(timings),
+        }
+        if ctx.get('audit_id'):
+            vals['audit_id'] = ctx['audit_id']
+        self.write(vals)
+
+    def _finish(self, state, error=None):
+        self.ensure_one()
+        now = fields.Datetime.now()
+        self.write({
+            'state': state,
+            'current_step': False,
+            'lease_until': False,
+            'finished_at': now,
+            'duration_ms': (now - self.started_at).total_seconds() * 1000.0 if self.started_at else 0.0,
+            'error_message': error or False,
+        })
+
+    # ------------------------------------------------------------------
+    # Progress (overlay)
+    # ------------------------------------------------------------------
+
+    def get_progress(self):
+        """Snapshot of the job for the overlay / status endpoint."""
+        self.ensure_one()
+        plan = self._get_plan()
+        step = self.current_step or (plan[self.step_index] if self.step_index < len(plan) else False)
+        return {
+            'job_id': self.id,
+            'command_id': self.command_id.id,
+            'job_type': self.job_type,
+            'state': self.state,
+            'step': step or None,
+            'step_label': STEP_LABELS.get(step, '') if step else '',
+            'step_index': self.step_index,
+            'step_count': len(plan),
+            'steps': plan,
+            'timings': self._get_timings(),
+            'error': self.error_message or None,
+        }
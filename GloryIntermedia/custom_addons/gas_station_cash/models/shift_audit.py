@@ -14,6 +14,7 @@ Audit Lines แบบ Unified:
 """
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.sql import create_index
 from datetime import datetime, timedelta
 import json
 import logging
@@ -351,9 +352,15 @@ class GasStationShiftAudit(models.Model):
     staff_summary = fields.Char(
         string='Amount by Staff',
         compute='_compute_staff_summary',
-        store=False,
+        store=True,
         help='Quick text summary of deposit/withdrawal totals per staff',
     )
+    staff_summary_json = fields.Text(
+        string='Amount by Staff (JSON)',
+        compute='_compute_staff_summary',
+        store=True,
+        help='[{staff, dep, wth, dep_count, wth_count}] — same data as staff_summary',
+    )
 
     # =====================================================================
     # AUDIT LINES (Unified)
@@ -614,56 +621,85 @@ class GasStationShiftAudit(models.Model):
             else:
                 rec.reconciliation_status = 'short'
 
+    @api.depends(
+        'audit_line_ids.line_type', 'audit_line_ids.amount', 'audit_line_ids.staff_external_id',
+        'audit_line_ids.deposit_id.staff_id', 'audit_line_ids.withdrawal_id.staff_id',
+        'audit_line_ids.deposit_id.staff_id.name', 'audit_line_ids.deposit_id.staff_id.employee_id',
+        'audit_line_ids.withdrawal_id.staff_id.name', 'audit_line_ids.withdrawal_id.staff_id.employee_id',
+    )
     def _compute_staff_summary(self):
         """
         Build a short text summary of deposit/withdrawal amounts per staff.
         Example: "7B8U: dep 700 / wth 200  |  4401: dep 500"
+
+        One grouped query for all audits in self; staff keep the order of
+        their first audit line (audit_id, line_type, id).
         """
+        staff_data = self._get_staff_breakdown()
         for rec in self:
-            staff_data = {}
-
-            for line in rec.audit_line_ids:
-                staff_key = None
-
-                if line.line_type == 'pos_data':
-                    staff_key = line.staff_external_id or '—'
-                elif line.line_type == 'cash_deposit' and line.deposit_id:
-                    staff_key = (
-                        line.deposit_id.staff_id.name
-                        or line.deposit_id.staff_id.employee_id
-                        or '—'
-                    )
-                elif line.line_type == 'cash_withdrawal' and line.withdrawal_id:
-                    staff_key = (
-                        line.withdrawal_id.staff_id.name
-                        or line.withdrawal_id.staff_id.employee_id
-                        or '—'
-                    )
-                else:
-                    continue
-
-                if staff_key not in staff_data:
-                    staff_data[staff_key] = {'dep': 0.0, 'wth': 0.0}
-
-                if line.line_type == 'cash_deposit':
-                    staff_data[staff_key]['dep'] += line.amount or 0
-                elif line.line_type == 'cash_withdrawal':
-                    staff_data[staff_key]['wth'] += line.amount or 0
-
-            if not staff_data:
+            rows = staff_data.get(rec.id)
+            if not rows:
                 rec.staff_summary = ''
+                rec.staff_summary_json = False
                 continue
 
             parts = []
-            for staff, totals in staff_data.items():
-                dep = totals['dep']
-                wth = totals['wth']
-                if wth:
-                    parts.append(f"{staff}: dep {dep:,.0f} / wth {wth:,.0f}")
+            for row in rows:
+                if row['wth']:
+                    parts.append(f"{row['staff']}: dep {row['dep']:,.0f} / wth {row['wth']:,.0f}")
                 else:
-                    parts.append(f"{staff}: dep {dep:,.0f}")
+                    parts.append(f"{row['staff']}: dep {row['dep']:,.0f}")
 
             rec.staff_summary = '  |  '.join(parts)
+            rec.staff_summary_json = json.dumps(rows, ensure_ascii=False)
+
+    def _get_staff_breakdown(self):
+        """{audit_id: [{staff, dep, wth, dep_count, wth_count}]} in one grouped query."""
+        audit_ids = [rid for rid in self.ids if isinstance(rid, int)]
+        if not audit_ids:
+            return {}
+        self.env['gas.station.shift.audit.line'].flush_model(
+            ['audit_id', 'line_type', 'amount', 'staff_external_id', 'deposit_id', 'withdrawal_id'])
+        self.env['gas.station.cash.deposit'].flush_model(['staff_id'])
+        self.env['gas.station.cash.withdrawal'].flush_model(['staff_id'])
+        self.env['gas.station.staff'].flush_model(['name', 'employee_id'])
+        self.env.cr.execute("""
+            SELECT l.audit_id,
+                   CASE WHEN l.line_type = 'pos_data'
+                        THEN COALESCE(NULLIF(l.staff_external_id, ''), '—')
+                        ELSE COALESCE(NULLIF(s.name, ''), NULLIF(s.employee_id, ''), '—')
+                   END AS staff,
+                   l.line_type,
+                   min(l.id) AS first_line,
+                   count(*) AS cnt,
+                   COALESCE(sum(l.amount), 0) AS amount
+              FROM gas_station_shift_audit_line l
+              LEFT JOIN gas_station_cash_deposit d
+                     ON l.line_type = 'cash_deposit' AND d.id = l.deposit_id
+              LEFT JOIN gas_station_cash_withdrawal w
+                     ON l.line_type = 'cash_withdrawal' AND w.id = l.withdrawal_id
+              LEFT JOIN gas_station_staff s ON s.id = COALESCE(d.staff_id, w.staff_id)
+             WHERE l.audit_id = ANY(%s)
+               AND (l.line_type = 'pos_data'
+                    OR (l.line_type = 'cash_deposit' AND l.deposit_id IS NOT NULL)
+                    OR (l.line_type = 'cash_withdrawal' AND l.withdrawal_id IS NOT NULL))
+          GROUP BY 1, 2, 3
+          ORDER BY 1, 3, 4
+        """, (audit_ids,))
+
+        result = {}
+        for audit_id, staff, line_type, _first, cnt, amount in self.env.cr.fetchall():
+            by_staff = result.setdefault(audit_id, {})
+            row = by_staff.setdefault(staff, {
+                'staff': staff, 'dep': 0.0, 'wth': 0.0, 'dep_count': 0, 'wth_count': 0,
+            })
+            if line_type == 'cash_deposit':
+                row['dep'] += float(amount)
+                row['dep_count'] += cnt
+            elif line_type == 'cash_withdrawal':
+                row['wth'] += float(amount)
+                row['wth_count'] += cnt
+        return {audit_id: list(by_staff.values()) for audit_id, by_staff in result.items()}
 
     @api.depends('shift_audit_ids')
     def _compute_shift_count(self):
@@ -674,6 +710,13 @@ class GasStationShiftAudit(models.Model):
     # CRUD METHODS
     # =====================================================================
 
+    def init(self):
+        # Close shifts of the open EOD period (period rebuild / EOD linking)
+        create_index(
+            self.env.cr, "gas_station_shift_audit_open_period_idx", self._table,
+            ["close_time"], where="audit_type = 'close_shift' AND parent_eod_id IS NULL",
+        )
+
     def _generate_reference(self, audit_type, shift_number, close_time):
         if not close_time:
             close_time = fields.Datetime.now()
@@ -723,17 +766,33 @@ class GasStationShiftAudit(models.Model):
         return previous_eod.id if previous_eod else False
 
     def _link_shifts_to_eod(self):
+        """Link the period's close shifts to this EOD (one UPDATE) and close the running totals."""
         self.ensure_one()
         if self.audit_type != 'end_of_day':
             return
-        domain = [
-            ('audit_type', '=', 'close_shift'),
-            ('close_time', '<=', self.close_time),
-            ('parent_eod_id', '=', False),
-        ]
+        self.flush_model()
+        where = "audit_type = 'close_shift' AND parent_eod_id IS NULL AND close_time <= %(close_time)s"
+        params = {'eod_id': self.id, 'close_time': self.close_time, 'uid': self.env.uid}
         if self.previous_eod_id:
-            domain.append(('close_time', '>', self.previous_eod_id.close_time))
-        self.search(domain).write({'parent_eod_id': self.id})
+            where += " AND close_time > %(period_start)s"
+            params['period_start'] = self.previous_eod_id.close_time
+        self.env.cr.execute(f"""
+            UPDATE gas_station_shift_audit
+               SET parent_eod_id = %(eod_id)s,
+                   write_uid = %(uid)s,
+                   write_date = (now() at time zone 'UTC')
+             WHERE {where}
+        """, params)
+        linked = self.env.cr.rowcount
+        self.env.cr.execute("""
+            UPDATE gas_station_shift_audit
+               SET shift_count_in_period = (
+                   SELECT count(*) FROM gas_station_shift_audit WHERE parent_eod_id = %(eod_id)s)
+             WHERE id = %(eod_id)s
+        """, params)
+        self.invalidate_model(['parent_eod_id', 'shift_audit_ids', 'shift_count_in_period'])
+        self.env['gas.station.shift.period'].sudo()._close_open(self)
+        _logger.info("Linked %d shift(s) to EOD %s", linked, self.name)
 
     # =====================================================================
     # ACTION METHODS
@@ -920,17 +979,23 @@ class GasStationShiftAudit(models.Model):
 
         audit = self.create(vals)
 
+        # Running totals of the open EOD period (same transaction as the audit)
+        self.env['gas.station.shift.period'].sudo()._add_shift(audit)
+
         # ── สร้าง Audit Lines ─────────────────────────────────────────────
         AuditLine = self.env['gas.station.shift.audit.line'].sudo()
 
+        # สร้างทุก line ใน create() เดียว → staff lookup / staff summary คำนวณครั้งเดียว
+        line_vals_list = []
+
         # 1. POS data lines (FlowCo per-staff หรือ FirstPro N/A)
         for line_vals in pos_staff_lines:
             line_vals['audit_id'] = audit.id
-            AuditLine.create(line_vals)
+            line_vals_list.append(line_vals)
 
         # 2. Cash Deposit lines
         for deposit in deposits:
-            AuditLine.create({
+            line_vals_list.append({
                 'audit_id': audit.id,
                 'line_type': 'cash_deposit',
                 'deposit_id': deposit.id,
@@ -938,7 +1003,7 @@ class GasStationShiftAudit(models.Model):
 
         # 3. Cash Withdrawal lines
         for withdrawal in withdrawals:
-            AuditLine.create({
+            line_vals_list.append({
                 'audit_id': audit.id,
                 'line_type': 'cash_withdrawal',
                 'withdrawal_id': withdrawal.id,
@@ -946,7 +1011,7 @@ class GasStationShiftAudit(models.Model):
 
         # 4. Cash Exchange lines
         for exchange in exchanges:
-            AuditLine.create({
+            line_vals_list.append({
                 'audit_id': audit.id,
                 'line_type': 'cash_exchange',
                 'exchange_id': exchange.id,
@@ -954,12 +1019,14 @@ class GasStationShiftAudit(models.Model):
 
         # 5. Replenish Cash lines
         for replenish in replenishments:
-            AuditLine.create({
+            line_vals_list.append({
                 'audit_id': audit.id,
                 'line_type': 'cash_replenish',
                 'replenish_id': replenish.id,
             })
 
+        AuditLine.create(line_vals_list)
+
         # Link deposits to audit (legacy audit_id field)
         if deposits:
             deposits.write({'audit_id': audit.id})
@@ -1014,7 +1081,8 @@ class GasStationShiftAudit(models.Model):
         collection_result = collection_result or {}
 
         totals = self._calculate_deposit_totals(deposits)
-        eod_totals = self._calculate_eod_totals(totals)
+        eod_totals = self._calculate_eod_totals(dict(
+            totals, total_replenish=sum(r.total_amount for r in replenishments)))
 
         staff_external_id = getattr(command, 'staff_external_id', None) if command else None
         pos_terminal_id = getattr(command, 'pos_terminal_id', None) if command else None
@@ -1062,7 +1130,7 @@ class GasStationShiftAudit(models.Model):
             'eod_total_other': eod_totals['other'],
             'eod_grand_total': eod_totals['grand_total'],
             'eod_pos_total': eod_totals['pos_total'],
-            'eod_total_replenish': eod_totals.get('replenish', 0.0),
+            'eod_total_replenish': eod_totals['replenish'],
 
             'collected_amount': collection_result.get('collected_amount', 0.0),
             'reserve_kept': collection_result.get('reserve_kept', 0.0),
@@ -1085,7 +1153,7 @@ class GasStationShiftAudit(models.Model):
 
         # FirstPro EOD: 1 pos_data line แบบ N/A
         firstpro_shiftid = getattr(command, 'pos_shift_id', None) if command else None
-        AuditLine.create({
+        line_vals_list = [{
             'audit_id': audit.id,
             'line_type': 'pos_data',
             'pos_source': 'firstpro',
@@ -1097,23 +1165,25 @@ class GasStationShiftAudit(models.Model):
             'saleamt_lube': 0.0,
             'dropamt_lube': 0.0,
             'pos_line_status': 'N/A',
-        })
+        }]
 
         # Cash Deposit lines
         for deposit in deposits:
-            AuditLine.create({'audit_id': audit.id, 'line_type': 'cash_deposit', 'deposit_id': deposit.id})
+            line_vals_list.append({'audit_id': audit.id, 'line_type': 'cash_deposit', 'deposit_id': deposit.id})
 
         # Cash Withdrawal lines
         for withdrawal in withdrawals:
-            AuditLine.create({'audit_id': audit.id, 'line_type': 'cash_withdrawal', 'withdrawal_id': withdrawal.id})
+            line_vals_list.append({'audit_id': audit.id, 'line_type': 'cash_withdrawal', 'withdrawal_id': withdrawal.id})
 
         # Cash Exchange lines
         for exchange in exchanges:
-            AuditLine.create({'audit_id': audit.id, 'line_type': 'cash_exchange', 'exchange_id': exchange.id})
+            line_vals_list.append({'audit_id': audit.id, 'line_type': 'cash_exchange', 'exchange_id': exchange.id})
 
         # Replenish Cash lines
         for replenish in replenishments:
-            AuditLine.create({'audit_id': audit.id, 'line_type': 'cash_replenish', 'replenish_id': replenish.id})
+            line_vals_list.append({'audit_id': audit.id, 'line_type': 'cash_replenish', 'replenish_id': replenish.id})
+
+        AuditLine.create(line_vals_list)
 
         # Link legacy audit_id fields
         if deposits:
@@ -1170,22 +1240,8 @@ class GasStationShiftAudit(models.Model):
             raise UserError(_('No close_shift record found to mark as End of Day.'))
 
         # คำนวณ EOD totals รวม shifts ก่อนหน้า
-        current_totals = {
-            'pos_oil': last_shift.pos_oil_total or 0,
-            'pos_engine_oil': last_shift.pos_engine_oil_total or 0,
-            'pos_other': last_shift.pos_other_total or 0,
-            'pos_count': last_shift.pos_transaction_count or 0,
-            'total_oil': last_shift.total_oil or 0,
-            'total_engine_oil': last_shift.total_engine_oil or 0,
-            'total_coffee_shop': last_shift.total_coffee_shop or 0,
-            'total_convenient_store': last_shift.total_convenient_store or 0,
-            'total_rental': last_shift.total_rental or 0,
-            'total_deposit_cash': last_shift.total_deposit_cash or 0,
-            'total_exchange_cash': last_shift.total_exchange_cash or 0,
-            'total_other': last_shift.total_other or 0,
-            'total_all': last_shift.total_all_deposits or 0,
-        }
-        eod_totals = self._calculate_eod_totals(current_totals)
+        # (last_shift เป็น close_shift → ถูกรวมใน running totals ของ period แล้ว)
+        eod_totals = self._calculate_eod_totals()
 
         last_shift.write({
             'audit_type': 'end_of_day',
@@ -1204,6 +1260,7 @@ class GasStationShiftAudit(models.Model):
             'eod_total_other': eod_totals['other'],
             'eod_grand_total': eod_totals['grand_total'],
             'eod_pos_total': eod_totals['pos_total'],
+            'eod_total_replenish': eod_totals['replenish'],
 
             'collected_amount': collection_result.get('collected_amount', 0.0),
             'reserve_kept': collection_result.get('reserve_kept', 0.0),
@@ -1224,31 +1281,21 @@ class GasStationShiftAudit(models.Model):
         # เพิ่ม Withdrawal & Exchange lines ที่ยังไม่มี
         AuditLine = self.env['gas.station.shift.audit.line'].sudo()
 
-        for withdrawal in withdrawals:
-            existing = AuditLine.search([
-                ('audit_id', '=', last_shift.id),
-                ('line_type', '=', 'cash_withdrawal'),
-                ('withdrawal_id', '=', withdrawal.id),
-            ], limit=1)
-            if not existing:
-                AuditLine.create({
-                    'audit_id': last_shift.id,
-                    'line_type': 'cash_withdrawal',
-                    'withdrawal_id': withdrawal.id,
-                })
-
-        for exchange in exchanges:
-            existing = AuditLine.search([
-                ('audit_id', '=', last_shift.id),
-                ('line_type', '=', 'cash_exchange'),
-                ('exchange_id', '=', exchange.id),
-            ], limit=1)
-            if not existing:
-                AuditLine.create({
-                    'audit_id': last_shift.id,
-                    'line_type': 'cash_exchange',
-                    'exchange_id': exchange.id,
-                })
+        existing = last_shift.audit_line_ids
+        has_withdrawal = set(existing.filtered(lambda line: line.line_type == 'cash_withdrawal').withdrawal_id.ids)
+        has_exchange = set(existing.filtered(lambda line: line.line_type == 'cash_exchange').exchange_id.ids)
+        line_vals_list = [{
+            'audit_id': last_shift.id,
+            'line_type': 'cash_withdrawal',
+            'withdrawal_id': withdrawal.id,
+        } for withdrawal in withdrawals if withdrawal.id not in has_withdrawal]
+        line_vals_list += [{
+            'audit_id': last_shift.id,
+            'line_type': 'cash_exchange',
+            'exchange_id': exchange.id,
+        } for exchange in exchanges if exchange.id not in has_exchange]
+        if line_vals_list:
+            AuditLine.create(line_vals_list)
 
         if withdrawals:
             withdrawals.write({'audit_id': last_shift.id})
@@ -1265,91 +1312,63 @@ class GasStationShiftAudit(models.Model):
     # =====================================================================
 
     def _calculate_deposit_totals(self, deposits):
-        """คำนวณยอดรวมจาก deposits แยกตาม type"""
-        result = {
-            'pos_oil': 0.0, 'pos_engine_oil': 0.0, 'pos_other': 0.0, 'pos_count': 0,
-            'total_oil': 0.0, 'total_engine_oil': 0.0, 'total_coffee_shop': 0.0,
-            'total_convenient_store': 0.0, 'total_rental': 0.0, 'total_deposit_cash': 0.0,
-            'total_exchange_cash': 0.0, 'total_other': 0.0, 'total_all': 0.0,
+        """คำนวณยอดรวมจาก deposits แยกตาม type (one grouped SQL query)"""
+        Totals = self.env['gas.station.cash.deposit.totals']
+        agg = Totals._aggregate(ids=deposits.ids)
+        pos_ok = agg['pos_ok']
+        pos_oil = pos_ok['by_type'].get('oil', {}).get('amount', 0.0)
+        pos_engine_oil = pos_ok['by_type'].get('engine_oil', {}).get('amount', 0.0)
+        return {
+            'pos_oil': pos_oil,
+            'pos_engine_oil': pos_engine_oil,
+            'pos_other': pos_ok['amount'] - pos_oil - pos_engine_oil,
+            'pos_count': pos_ok['count'],
+            'total_oil': Totals._type_amount(agg, 'oil'),
+            'total_engine_oil': Totals._type_amount(agg, 'engine_oil'),
+            'total_coffee_shop': Totals._type_amount(agg, 'coffee_shop'),
+            'total_convenient_store': Totals._type_amount(agg, 'convenient_store'),
+            'total_rental': Totals._type_amount(agg, 'rental'),
+            'total_deposit_cash': Totals._type_amount(agg, 'deposit_cash'),
+            'total_exchange_cash': Totals._type_amount(agg, 'exchange_cash'),
+            'total_other': Totals._other_amount(agg),
+            'total_all': agg['amount'],
         }
-        if not deposits:
-            return result
 
-        for deposit in deposits:
-            amount = deposit.total_amount or 0.0
-            dtype = deposit.deposit_type
-
-            if dtype == 'oil':
-                result['total_oil'] += amount
-            elif dtype == 'engine_oil':
-                result['total_engine_oil'] += amount
-            elif dtype == 'coffee_shop':
-                result['total_coffee_shop'] += amount
-            elif dtype == 'convenient_store':
-                result['total_convenient_store'] += amount
-            elif dtype == 'rental':
-                result['total_rental'] += amount
-            elif dtype == 'deposit_cash':
-                result['total_deposit_cash'] += amount
-            elif dtype == 'exchange_cash':
-                result['total_exchange_cash'] += amount
-            else:
-                result['total_other'] += amount
-
-            result['total_all'] += amount
-
-            is_pos_related = getattr(deposit, 'is_pos_related', False)
-            pos_status = getattr(deposit, 'pos_status', '')
-            if is_pos_related and pos_status == 'ok':
-                result['pos_count'] += 1
-                if dtype == 'oil':
-                    result['pos_oil'] += amount
-                elif dtype == 'engine_oil':
-                    result['pos_engine_oil'] += amount
-                else:
-                    result['pos_other'] += amount
+    def _calculate_eod_totals(self, current_shift_totals=None):
+        """
+        คำนวณ EOD totals = running totals ของ period ที่เปิดอยู่ (+ shift ปัจจุบัน)
 
-        return result
+        close_shift ทุกตัวถูกบวกเข้า gas.station.shift.period ตอนสร้าง audit แล้ว
+        จึงอ่านได้ใน O(1) ไม่ต้อง search/sum shifts ก่อนหน้า
 
-    def _calculate_eod_totals(self, current_shift_totals):
-        """คำนวณ EOD totals รวมจาก shifts ก่อนหน้า + shift ปัจจุบัน"""
-        previous_eod = self._get_previous_eod()
-        domain = [('audit_type', '=', 'close_shift'), ('parent_eod_id', '=', False)]
-        if previous_eod:
-            domain.append(('close_time', '>', previous_eod.close_time))
-        previous_shifts = self.search(domain)
+        Args:
+            current_shift_totals: dict จาก _calculate_deposit_totals() ของ shift ที่
+                                  ยังไม่ได้เป็น close_shift (FirstPro EOD) — None ถ้า
+                                  shift สุดท้ายถูกรวมใน period แล้ว (FlowCo)
+        """
+        period = self.env['gas.station.shift.period'].sudo()._get_open_totals()
+        current = current_shift_totals or {}
 
         eod = {
-            'oil': current_shift_totals.get('total_oil', 0),
-            'engine_oil': current_shift_totals.get('total_engine_oil', 0),
-            'coffee_shop': current_shift_totals.get('total_coffee_shop', 0),
-            'convenient_store': current_shift_totals.get('total_convenient_store', 0),
-            'rental': current_shift_totals.get('total_rental', 0),
-            'deposit_cash': current_shift_totals.get('total_deposit_cash', 0),
-            'exchange_cash': current_shift_totals.get('total_exchange_cash', 0),
-            'other': current_shift_totals.get('total_other', 0),
-            'grand_total': current_shift_totals.get('total_all', 0),
-            'pos_total': (
-                current_shift_totals.get('pos_oil', 0) +
-                current_shift_totals.get('pos_engine_oil', 0) +
-                current_shift_totals.get('pos_other', 0)
+            'oil': period['total_oil'] + current.get('total_oil', 0),
+            'engine_oil': period['total_engine_oil'] + current.get('total_engine_oil', 0),
+            'coffee_shop': period['total_coffee_shop'] + current.get('total_coffee_shop', 0),
+            'convenient_store': period['total_convenient_store'] + current.get('total_convenient_store', 0),
+            'rental': period['total_rental'] + current.get('total_rental', 0),
+            'deposit_cash': period['total_deposit_cash'] + current.get('total_deposit_cash', 0),
+            'exchange_cash': period['total_exchange_cash'] + current.get('total_exchange_cash', 0),
+            'other': period['total_other'] + current.get('total_other', 0),
+            'grand_total': period['grand_total'] + current.get('total_all', 0),
+            'pos_total': period['pos_total'] + (
+                current.get('pos_oil', 0) +
+                current.get('pos_engine_oil', 0) +
+                current.get('pos_other', 0)
             ),
+            'replenish': period['total_replenish'] + current.get('total_replenish', 0),
         }
 
-        for shift in previous_shifts:
-            eod['oil'] += shift.total_oil or 0
-            eod['engine_oil'] += shift.total_engine_oil or 0
-            eod['coffee_shop'] += shift.total_coffee_shop or 0
-            eod['convenient_store'] += shift.total_convenient_store or 0
-            eod['rental'] += shift.total_rental or 0
-            eod['deposit_cash'] += shift.total_deposit_cash or 0
-            eod['exchange_cash'] += shift.total_exchange_cash or 0
-            eod['other'] += shift.total_other or 0
-            eod['grand_total'] += shift.total_all_deposits or 0
-            eod['pos_total'] += shift.pos_total_amount or 0
-
         _logger.info("EOD totals from %d previous shifts: grand_total=%.2f",
-                     len(previous_shifts), eod['grand_total'])
+                     period['shift_count'], eod['grand_total'])
         return eod
 
 
@@ -1579,18 +1598,35 @@ class GasStationShiftAuditLine(models.Model):
 
     @api.depends('staff_external_id', 'pos_source')
     def _compute_staff_record(self):
-        Staff = self.env['gas.station.staff'].sudo()
+        staff_map = self._resolve_staff(self)
         for rec in self:
-            if not rec.staff_external_id:
-                rec.staff_record_id = False
+            key = (rec.pos_source == 'flowco', rec.staff_external_id)
+            rec.staff_record_id = staff_map.get(key, False) if rec.staff_external_id else False
+
+    @api.model
+    def _resolve_staff(self, lines):
+        """
+        Batch staff lookup for audit lines: one search per match field instead of one per line.
+            FlowCo   → tag_id (RFID UID)
+            FirstPro → external_id / staff code
+
+        Returns:
+            {(is_flowco, staff_external_id): staff id}
+        """
+        Staff = self.env['gas.station.staff'].sudo()
+        tags = {line.staff_external_id for line in lines
+                if line.staff_external_id and line.pos_source == 'flowco'}
+        codes = {line.staff_external_id for line in lines
+                 if line.staff_external_id and line.pos_source != 'flowco'}
+
+        staff_map = {}
+        for is_flowco, field_name, values in ((True, 'tag_id', tags), (False, 'external_id', codes)):
+            if not values:
                 continue
-            if rec.pos_source == 'flowco':
-                # FlowCo: match ด้วย tag_id (RFID UID)
-                staff = Staff.search([('tag_id', '=', rec.staff_external_id)], limit=1)
-            else:
-                # FirstPro: match ด้วย external_id / staff code
-                staff = Staff.search([('external_id', '=', rec.staff_external_id)], limit=1)
-            rec.staff_record_id = staff.id if staff else False
+            # search order = Staff._order, so the first hit per value matches search(limit=1)
+            for staff in Staff.search_fetch([(field_name, 'in', list(values))], [field_name]):
+                staff_map.setdefault((is_flowco, staff[field_name]), staff.id)
+        return staff_map
 
     @api.depends('pos_line_status')
     def _compute_is_error(self):
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/shift_boundary.py
+Description: Cached shift boundaries (last done close_shift / end_of_day)
+
+The current shift starts at the last done close_shift after the last done
+end_of_day (or at that end_of_day). Every deposit send, heartbeat tick and
+close shift used to search gas.station.pos_command for it; the boundaries
+only move a few times a day, so they are kept in the ormcache instead.
+
+Invalidation: gas.station.pos_command clears the cache after commit whenever
+a close_shift / end_of_day command is done (or a done one is changed or
+removed), and signals the other worker processes through the registry cache
+sequence. HTTP workers pick the signal up at the start of their next request;
+background threads call registry.check_signaling() before reading.
+"""
+
+from odoo import models, api, tools
+import logging
+
+_logger = logging.getLogger(__name__)
+
+BOUNDARY_ACTIONS = ('close_shift', 'end_of_day')
+
+
+def _invalidate_ormcache_postcommit(env, key, label):
+    """
+    Clear the ormcache once the current transaction commits, at most once per
+    transaction (cr.postcommit.data[key] is set until then, so readers can read
+    through the stale cache meanwhile).
+
+    Odoo cannot signal a single cached method to the other workers: this clears
+    the whole default ormcache registry-wide and signals it to every worker
+    process. Callers only do so on rare changes (shift boundaries, staff edits).
+    """
+    cr = env.cr
+    if cr.postcommit.data.get(key):
+        return
+    cr.postcommit.data[key] = True
+    registry = env.registry
+
+    def _clear():
+        registry.clear_cache()
+        # requests signal at the end of the request; background threads
+        # (shift job runner) have no request, so signal here
+        registry.signal_changes()
+        _logger.info("[%s] invalidated", label)
+
+    cr.postcommit.add(_clear)
+
+
+class GasStationShiftBoundary(models.AbstractModel):
+    _name = 'gas.station.shift.boundary'
+    _description = 'Shift Boundary Resolver'
+
+    @api.model
+    @tools.ormcache()
+    def _cached_boundaries(self):
+        return self._load_boundaries()
+
+    @api.model
+    def _load_boundaries(self):
+        """
+        Last done command per boundary action, as
+        ((action, command_id, started_at, boundary_time), ...).
+        boundary_time = finished_at, or started_at for commands without it.
+        """
+        PosCommand = self.env['gas.station.pos_command'].sudo()
+        result = []
+        for action in BOUNDARY_ACTIONS:
+            last = PosCommand.search([
+                ('action', '=', action),
+                ('status', '=', 'done'),
+            ], order='started_at desc', limit=1)
+            if last:
+                result.append((action, last.id, last.started_at, last.finished_at or last.started_at))
+        _logger.debug("[ShiftBoundary] loaded %s", result)
+        return tuple(result)
+
+    def _boundaries(self):
+        # A boundary changed in this (uncommitted) transaction: the cache is
+        # cleared only after commit, so read through until then.
+        if self.env.cr.postcommit.data.get('shift_boundary_invalidate'):
+            return self._load_boundaries()
+        return self._cached_boundaries()
+
+    def _last(self, action):
+        for entry in self._boundaries():
+            if entry[0] == action:
+                return entry
+        return None
+
+    @api.model
+    def last_end_of_day(self):
+        """Time of the last done End of Day, or None."""
+        last = self._last('end_of_day')
+        return last[3] if last else None
+
+    @api.model
+    def last_close_shift(self, after_timestamp=None):
+        """
+        Time of the last done Close Shift, or None. With after_timestamp, only
+        a close shift started after it counts (same as the former search).
+        """
+        last = self._last('close_shift')
+        if not last or (after_timestamp and not (last[2] and last[2] > after_timestamp)):
+            return None
+        return last[3]
+
+    @api.model
+    def shift_start(self):
+        """Start of the current shift: last close shift since the last EOD, else the last EOD."""
+        last_eod = self.last_end_of_day()
+        return self.last_close_shift(after_timestamp=last_eod) or last_eod
+
+    @api.model
+    def last_done(self):
+        """Time of the most recent done close_shift or end_of_day (by started_at)."""
+        entries = [entry for entry in self._boundaries() if entry[2]]
+        if not entries:
+            return None
+        return max(entries, key=lambda entry: entry[2])[3]
+
+    @api.model
+    def _invalidate(self):
+        """Clear the cached boundaries once the current transaction commits."""
+        _invalidate_ormcache_postcommit(self.env, 'shift_boundary_invalidate', 'ShiftBoundary')
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/shift_period.py
+Description: Running totals of the open EOD period (one ledger row per period)
+
+Every close_shift audit adds its totals to the single 'open' row in the same
+transaction that creates the audit. End of Day reads the row (O(1)) instead of
+loading and summing every shift since the previous EOD, then closes it.
+
+If the open row is missing (first run after install, or after an EOD that was
+marked manually) it is rebuilt from the unlinked close_shift audits with one
+grouped query.
+"""
+
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# ledger column → shift audit column
+PERIOD_TOTAL_FIELDS = {
+    'total_oil': 'total_oil',
+    'total_engine_oil': 'total_engine_oil',
+    'total_coffee_shop': 'total_coffee_shop',
+    'total_convenient_store': 'total_convenient_store',
+    'total_rental': 'total_rental',
+    'total_deposit_cash': 'total_deposit_cash',
+    'total_exchange_cash': 'total_exchange_cash',
+    'total_other': 'total_other',
+    'grand_total': 'total_all_deposits',
+    'pos_total': 'pos_total_amount',
+    'total_replenish': 'total_replenish',
+}
+
+
+class GasStationShiftPeriod(models.Model):
+    _name = 'gas.station.shift.period'
+    _description = 'EOD Period Running Totals'
+    _order = 'id desc'
+
+    state = fields.Selection([
+        ('open', 'Open'),
+        ('closed', 'Closed'),
+    ], string='State', default='open', required=True, index=True, readonly=True)
+    period_start = fields.Datetime(
+        string='Period Start',
+        readonly=True,
+        help="Close time of the previous EOD (empty for the first period)",
+    )
+    last_close_time = fields.Datetime(string='Last Shift Closed', readonly=True)
+    closed_at = fields.Datetime(string='Closed At', readonly=True)
+    eod_audit_id = fields.Many2one('gas.station.shift.audit', string='EOD Audit', readonly=True)
+    shift_count = fields.Integer(string='Shifts', default=0, readonly=True)
+
+    total_oil = fields.Monetary(string='Total Oil', currency_field='currency_id', readonly=True)
+    total_engine_oil = fields.Monetary(string='Total Engine Oil', currency_field='currency_id', readonly=True)
+    total_coffee_shop = fields.Monetary(string='Total Coffee Shop', currency_field='currency_id', readonly=True)
+    total_convenient_store = fields.Monetary(string='Total Convenient Store', currency_field='currency_id', readonly=True)
+    total_rental = fields.Monetary(string='Total Rental', currency_field='currency_id', readonly=True)
+    total_deposit_cash = fields.Monetary(string='Total Deposit Cash', currency_field='currency_id', readonly=True)
+    total_exchange_cash = fields.Monetary(string='Total Exchange Cash', currency_field='currency_id', readonly=True)
+    total_other = fields.Monetary(string='Total Other', currency_field='currency_id', readonly=True)
+    grand_total = fields.Monetary(string='Grand Total', currency_field='currency_id', readonly=True)
+    pos_total = fields.Monetary(string='POS Total', currency_field='currency_id', readonly=True)
+    total_replenish = fields.Monetary(string='Total Replenish Cash', currency_field='currency_id', readonly=True)
+
+    currency_id = fields.Many2one(
+        'res.currency', string='Currency', readonly=True,
+        default=lambda self: self.env.company.currency_id
+    )
+
+    def init(self):
+        # At most one open period; concurrent rebuilds collide here instead of
+        # creating two ledgers
+        self.env.cr.execute(f"""
+            CREATE UNIQUE INDEX IF NOT EXISTS gas_station_shift_period_open_uniq
+                ON {self._table} (state) WHERE state = 'open'
+        """)
+
+    # ------------------------------------------------------------------
+    # Accumulate (close shift)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _add_shift(self, audit):
+        """Add a close_shift audit to the open period (same transaction as the audit)."""
+        audit.ensure_one()
+        audit.flush_recordset()
+        assignments = ', '.join(f"{col} = COALESCE({col}, 0) + %({col})s" for col in PERIOD_TOTAL_FIELDS)
+        params = {col: audit[src] or 0.0 for col, src in PERIOD_TOTAL_FIELDS.items()}
+        params.update(close_time=audit.close_time, uid=self.env.uid)
+
+        for _attempt in range(2):
+            self.env.cr.execute(f"""
+                UPDATE {self._table}
+                   SET {assignments},
+                       shift_count = shift_count + 1,
+                       last_close_time = GREATEST(last_close_time, %(close_time)s),
+                       write_uid = %(uid)s,
+                       write_date = (now() at time zone 'UTC')
+                 WHERE state = 'open'
+             RETURNING id
+            """, params)
+            if self.env.cr.fetchone():
+                break
+            # No open row: the rebuild already includes this audit
+            if self._rebuild_open():
+                break
+        self.invalidate_model()
+
+    # ------------------------------------------------------------------
+    # Read / close (end of day)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _get_open_totals(self):
+        """
+        Totals of the open period, locked until the EOD transaction ends.
+
+        Returns:
+            dict with the PERIOD_TOTAL_FIELDS keys plus shift_count
+        """
+        cols = ', '.join(PERIOD_TOTAL_FIELDS)
+        query = f"SELECT id, shift_count, {cols} FROM {self._table} WHERE state = 'open' FOR UPDATE"
+        self.env.cr.execute(query)
+        row = self.env.cr.dictfetchone()
+        if not row:
+            self._rebuild_open()
+            self.env.cr.execute(query)
+            row = self.env.cr.dictfetchone() or {}
+        totals = {col: float(row.get(col) or 0.0) for col in PERIOD_TOTAL_FIELDS}
+        totals['shift_count'] = row.get('shift_count') or 0
+        return totals
+
+    @api.model
+    def _close_open(self, eod_audit):
+        """Close the open period on EOD; the next close shift starts a fresh one."""
+        self.env.cr.execute(f"""
+            UPDATE {self._table}
+               SET state = 'closed',
+                   eod_audit_id = %s,
+                   closed_at = (now() at time zone 'UTC'),
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+             WHERE state = 'open'
+        """, (eod_audit.id, self.env.uid))
+        self.invalidate_model()
+
+    # ------------------------------------------------------------------
+    # Rebuild (fallback)
+    # ------------------------------------------------------------------
+
+    @api.model
+    def _rebuild_open(self):
+        """
+        Create the open row from the close_shift audits not yet linked to an EOD.
+        Returns False when another transaction created it first.
+        """
+        Audit = self.env['gas.station.shift.audit']
+        Audit.flush_model()
+        previous_eod = Audit._get_previous_eod()
+        period_start = previous_eod.close_time if previous_eod else None
+
+        where = "audit_type = 'close_shift' AND parent_eod_id IS NULL"
+        params = {
+            'period_start': period_start,
+            'currency_id': self.env.company.currency_id.id,
+            'uid': self.env.uid,
+        }
+        if period_start:
+            where += " AND close_time > %(period_start)s"
+
+        cols = ', '.join(PERIOD_TOTAL_FIELDS)
+        sums = ', '.join(f"COALESCE(sum({src}), 0)" for src in PERIOD_TOTAL_FIELDS.values())
+        self.env.cr.execute(f"""
+            INSERT INTO {self._table}
+                   (state, period_start, shift_count, last_close_time, {cols},
+                    currency_id, create_uid, create_date, write_uid, write_date)
+            SELECT 'open', %(period_start)s, count(*), max(close_time), {sums},
+                   %(currency_id)s, %(uid)s, (now() at time zone 'UTC'),
+                   %(uid)s, (now() at time zone 'UTC')
+              FROM gas_station_shift_audit
+             WHERE {where}
+            ON CONFLICT (state) WHERE state = 'open' DO NOTHING
+         RETURNING id, shift_count
+        """, params)
+        row = self.env.cr.fetchone()
+        self.invalidate_model()
+        if row:
+            _logger.info("[ShiftPeriod] Rebuilt open period #%s from %d unlinked shift(s)", row[0], row[1])
+        return bool(row)
+
+    @api.model
+    def action_rebuild_open_period(self):
+        """Recompute the open period from the shift audits (after manual corrections)."""
+        self.env.cr.execute(f"DELETE FROM {self._table} WHERE state = 'open'")
+        self._rebuild_open()
+        return True
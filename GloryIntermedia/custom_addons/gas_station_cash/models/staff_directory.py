@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+File: models/staff_directory.py
+Description: Cached staff directory for the kiosk role pickers
+
+Every kiosk screen (oil, engine_oil, rental, coffee_shop, withdrawal,
+exit_fullscreen...) loads the staff allowed for its deposit type. The list
+only changes when staff are edited, so it is built once per role filter,
+serialized, and kept in the ormcache together with an ETag (hash of the
+body). GET /gas_station_cash/staff_directory serves it with that ETag and
+answers 304 when the kiosk already has it.
+
+Only the fields the pickers show are included; EXTRA_FIELDS are added on
+request (include=phone,tag_id). Templates and PIN hashes are never listed.
+
+Invalidation: gas.station.staff clears the cache after commit on create,
+unlink and on writes to a listed field, and signals the other worker
+processes through the registry cache sequence
+(shift_boundary._invalidate_ormcache_postcommit: the whole default ormcache
+is cleared, so only staff edits trigger it).
+"""
+
+import hashlib
+import json
+import logging
+
+from odoo import models, api, tools
+
+from .shift_boundary import _invalidate_ormcache_postcommit
+
+_logger = logging.getLogger(__name__)
+
+# Fields on the directory (or affecting who is listed)
+DIRECTORY_FIELDS = {
+    'active', 'role', 'user_id', 'first_name', 'last_name', 'nickname',
+    'employee_id', 'external_id', 'fingerprint_template_b64',
+}
+
+# Optional fields, only sent when asked for
+EXTRA_FIELDS = ('phone', 'tag_id', 'pos_id', 'fingerprint_enrolled_at')
+
+
+class GasStationStaffDirectory(models.AbstractModel):
+    _name = 'gas.station.staff.directory'
+    _description = 'Kiosk Staff Directory'
+
+    @api.model
+    def role_key(self, role):
+        """Hashable cache key of a DEPOSIT_TYPE_ROLES value."""
+        if isinstance(role, (list, tuple)):
+            return tuple(sorted(role))
+        return role or False
+
+    @api.model
+    def get_directory(self, role, include=()):
+        """
+        Staff list for a role filter, as (etag, body, staff_list).
+
+        Args:
+            role:    DEPOSIT_TYPE_ROLES value - role, list of roles, False
+                     (all active staff) or 'has_odoo_user'
+            include: EXTRA_FIELDS to add
+        """
+        role = self.role_key(role)
+        include = tuple(f for f in EXTRA_FIELDS if f in set(include or ()))
+        # Staff changed in this (uncommitted) transaction: the cache is
+        # cleared only after commit, so read through until then.
+        if self.env.cr.postcommit.data.get('staff_directory_invalidate'):
+            return self._build(role, include)
+        return self._cached_directory(role, include)
+
+    @api.model
+    @tools.ormcache('role', 'include')
+    def _cached_directory(self, role, include):
+        return self._build(role, include)
+
+    @api.model
+    def _build(self, role, include):
+        domain = [('active', '=', True)]
+        if role == 'has_odoo_user':
+            domain.append(('user_id', '!=', False))
+        elif isinstance(role, tuple):
+            domain.append(('role', 'in', list(role)))
+        elif role:
+            domain.append(('role', '=', role))
+
+        staff = self.env['gas.station.staff'].sudo().search(domain)
+        records = staff.read(['name', 'nickname', 'employee_id', 'external_id', 'role',
+                              'fingerprint_state'] + list(include))
+        staff_list = []
+        for rec in records:
+            entry = {
+                'id':                       rec['id'],
+                'name':                     rec['name'],
+                'nickname':                 rec['nickname'] or False,
+                'employee_id':              rec['employee_id'],
+                'external_id':              rec['external_id'] or False,
+                'role':                     rec['role'],
+                # identify matches against the fingerprint service gallery
+                'fingerprint_enrolled':     rec['fingerprint_state'] == 'enrolled',
+            }
+            for field in include:
+                entry[field] = rec[field]
+            staff_list.append(entry)
+
+        body = json.dumps({'staff_list': staff_list}, default=str, ensure_ascii=False)
+        etag = '"%s"' % hashlib.sha1(body.encode('utf-8')).hexdigest()
+        _logger.debug("[StaffDirectory] built role=%s include=%s (%s staff)", role, include, len(staff_list))
+        return etag, body, tuple(staff_list)
+
+    @api.model
+    def _invalidate(self):
+        """Clear the cached directories once the current transaction commits."""
+        _invalidate_ormcache_postcommit(self.env, 'staff_directory_invalidate', 'StaffDirectory')
+
+
+class GasStationStaff(models.Model):
+    _inherit = 'gas.station.staff'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['gas.station.staff.directory']._invalidate()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if DIRECTORY_FIELDS.union(EXTRA_FIELDS).intersection(vals):
+            self.env['gas.station.staff.directory']._invalidate()
+        return res
+
+    def unlink(self):
+        self.env['gas.station.staff.directory']._invalidate()
+        return super().unlink()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/bench_data.py
+Description: Synthetic deposit data for the benchmark scripts (odoo shell).
+
+Rows are inserted with one INSERT ... SELECT generate_series per call, so a
+million deposits take seconds instead of going through the ORM. Nothing here
+commits; the benchmark scripts roll back when they are done.
+"""
+
+from datetime import timedelta
+
+BENCH_PREFIX = "BENCH-"
+
+# Rough production mix: mostly oil, a few engine oil / shop / rental deposits
+TYPE_MIX = [
+    ("oil", 60), ("engine_oil", 10), ("coffee_shop", 10), ("convenient_store", 10),
+    ("rental", 4), ("deposit_cash", 3), ("exchange_cash", 3),
+]
+
+
+def get_bench_staff(env, count=5):
+    """Return `count` staff ids, creating bench staff when the database has fewer."""
+    Staff = env["gas.station.staff"].sudo()
+    staff = Staff.search([], limit=count)
+    missing = count - len(staff)
+    if missing > 0:
+        staff |= Staff.create([
+            {"first_name": "Bench", "last_name": f"Staff {i}", "role": "attendant"}
+            for i in range(missing)
+        ])
+    return staff.ids
+
+
+def insert_deposits(env, n, date_from, date_to, staff_ids=None, state="confirmed", prefix=BENCH_PREFIX):
+    """
+    Insert n deposits spread evenly between date_from and date_to.
+
+    deposit_type follows TYPE_MIX; oil / engine oil deposits are POS related
+    and ~90% of them have pos_status 'ok'. Returns the number of rows inserted.
+    """
+    if n <= 0:
+        return 0
+    staff_ids = staff_ids or get_bench_staff(env)
+    company = env.company
+    types, weights = [], []
+    for dtype, weight in TYPE_MIX:
+        types.append(dtype)
+        weights.append(weight)
+    # cumulative weights → CASE on (i % 100)
+    cases, upper = [], 0
+    for dtype, weight in zip(types, weights):
+        upper += weight
+        cases.append(f"WHEN (g.i %% 100) < {upper} THEN '{dtype}'")
+    type_case = "CASE " + " ".join(cases) + " ELSE 'oil' END"
+
+    span = max((date_to - date_from).total_seconds(), 1.0)
+    env.cr.execute(f"""
+        INSERT INTO gas_station_cash_deposit
+            (name, staff_id, date, company_id, currency_id, state, deposit_type,
+             is_pos_related, is_offline, pos_status, total_amount, pos_retry_count,
+             create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || g.i,
+               (%(staff)s)[1 + g.i %% %(n_staff)s],
+               %(date_from)s + make_interval(secs => g.i * %(step)s),
+               %(company)s, %(currency)s, %(state)s,
+               t.dtype,
+               t.dtype IN ('oil', 'engine_oil'),
+               FALSE,
+               CASE WHEN t.dtype NOT IN ('oil', 'engine_oil') THEN 'na'
+                    WHEN g.i %% 10 = 0 THEN 'failed'
+                    ELSE 'ok' END,
+               (100 + (g.i * 37) %% 4900)::numeric,
+               0,
+               %(uid)s, now() at time zone 'utc', %(uid)s, now() at time zone 'utc'
+          FROM generate_series(1, %(n)s) AS g(i)
+          CROSS JOIN LATERAL (SELECT {type_case} AS dtype) t
+    """, {
+        "prefix": prefix,
+        "staff": staff_ids,
+        "n_staff": len(staff_ids),
+        "date_from": date_from,
+        "step": span / n,
+        "company": company.id,
+        "currency": company.currency_id.id,
+        "state": state,
+        "n": n,
+        "uid": env.uid,
+    })
+    env["gas.station.cash.deposit"].invalidate_model()
+    return env.cr.rowcount
+
+
+def period(days_back=1, now=None):
+    """(date_from, date_to) covering the last `days_back` days."""
+    from odoo import fields
+    now = now or fields.Datetime.now()
+    return now - timedelta(days=days_back), now
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/bench_deposit_journal.py
+Description: Benchmark: machine deposit write path, chatter tracking vs audit journal.
+
+Creates BENCH_DEPOSITS deposits (default 500) with one deposit line each and
+then records a POS result on each, the way the kiosk / POS controllers do:
+  - tracked:       create() + write() with mail tracking (former path)
+  - journal:       create_machine_deposits() + write_machine(), one per request
+  - journal batch: create_machine_deposits() for the whole batch
+Prints deposits/s and rows written per deposit (inserts + updates over all
+tables, from pg_stat_xact_user_tables). Everything is rolled back.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/bench_deposit_journal.py
+"""
+
+import os
+import time
+
+from odoo.addons.gas_station_cash.scripts.bench_data import BENCH_PREFIX, get_bench_staff
+
+N = int(os.getenv("BENCH_DEPOSITS", "500"))
+
+Deposit = env["gas.station.cash.deposit"].sudo()  # env is provided by odoo shell
+staff_ids = get_bench_staff(env)
+
+
+def _rows_written():
+    env.cr.execute("SELECT COALESCE(sum(n_tup_ins + n_tup_upd), 0) FROM pg_stat_xact_user_tables")
+    return env.cr.fetchone()[0]
+
+
+def _vals(run, i):
+    return {
+        "name": f"{BENCH_PREFIX}{run}-{i}",
+        "staff_id": staff_ids[i % len(staff_ids)],
+        "deposit_type": "oil",
+        "is_pos_related": True,
+        "state": "confirmed",
+        "deposit_line_ids": [(0, 0, {"currency_denomination": 100.0 + i, "quantity": 1})],
+    }
+
+
+def _pos_result(i):
+    return {"pos_status": "ok", "pos_transaction_id": f"{BENCH_PREFIX}TX-{i}", "pos_description": "OK"}
+
+
+def run_tracked():
+    for i in range(N):
+        deposit = Deposit.create(_vals("T", i))
+        deposit.write(_pos_result(i))
+
+
+def run_journal():
+    for i in range(N):
+        deposit = Deposit.create_machine_deposits(_vals("J", i))
+        deposit.write_machine(_pos_result(i))
+
+
+def run_journal_batch():
+    deposits = Deposit.create_machine_deposits([_vals("B", i) for i in range(N)])
+    for i, deposit in enumerate(deposits):
+        deposit.write_machine(_pos_result(i))
+
+
+env["ir.config_parameter"].sudo().set_param("gas_station_cash.deposit_journal_mode", "true")
+
+print(f"{'path':<14}  {'deposits/s':>10}  {'rows/deposit':>12}")
+try:
+    for label, fn in (("tracked", run_tracked), ("journal", run_journal), ("journal batch", run_journal_batch)):
+        with env.cr.savepoint(flush=False) as sp:
+            env.flush_all()
+            rows_before = _rows_written()
+            t0 = time.perf_counter()
+            fn()
+            env.flush_all()
+            elapsed = time.perf_counter() - t0
+            rows = _rows_written() - rows_before
+            print(f"{label:<14}  {N / elapsed:>10.1f}  {rows / N:>12.1f}")
+            sp.rollback()
+        env.invalidate_all()
+finally:
+    env.cr.rollback()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/bench_deposit_totals.py
+Description: Benchmark: deposit period totals, ORM loop vs grouped SQL.
+
+Inserts BENCH_DEPOSITS synthetic deposits (default 100000) into one period and
+compares the previous per-record Python bucketing with
+gas.station.cash.deposit.totals._aggregate(). Everything is rolled back.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/bench_deposit_totals.py
+"""
+
+import os
+import time
+
+from odoo.addons.gas_station_cash.scripts.bench_data import insert_deposits, period
+
+N = int(os.getenv("BENCH_DEPOSITS", "100000"))
+
+
+def _timed(label, fn):
+    env.invalidate_all()  # env is provided by odoo shell
+    t0 = time.perf_counter()
+    result = fn()
+    print(f"  {label:<34} {(time.perf_counter() - t0) * 1000:9.1f} ms")
+    return result
+
+
+def _legacy_loop(deposits):
+    """The former _calculate_deposit_totals / _calculate_shift_pos_total pattern."""
+    totals = {}
+    pos_total = 0.0
+    for d in deposits:
+        totals[d.deposit_type] = totals.get(d.deposit_type, 0.0) + (d.total_amount or 0.0)
+        if d.pos_status == "ok" and (
+            d.deposit_type in ("oil", "engine_oil") or d.is_pos_related
+            or (d.product_id and d.product_id.is_pos_related)
+        ):
+            pos_total += d.total_amount or 0.0
+    return totals, pos_total
+
+
+Deposit = env["gas.station.cash.deposit"].sudo()
+Totals = env["gas.station.cash.deposit.totals"].sudo()
+try:
+    date_from, date_to = period(days_back=1)
+    t0 = time.perf_counter()
+    insert_deposits(env, N, date_from, date_to)
+    print(f"inserted {N} deposits in {time.perf_counter() - t0:.1f}s")
+    env.cr.execute("ANALYZE gas_station_cash_deposit")
+
+    domain = [("date", ">", date_from), ("date", "<=", date_to)]
+    print(f"period totals over {N} deposits:")
+    legacy = _timed("ORM search + Python loop", lambda: _legacy_loop(Deposit.search(domain)))
+    ids = Deposit.search(domain).ids
+    _timed("_aggregate(ids=...)", lambda: Totals._aggregate(ids=ids))
+    agg = _timed("_aggregate(date range)", lambda: Totals._aggregate(date_from=date_from, date_to=date_to))
+    _timed("_aggregate(shift POS total)", lambda: Totals._aggregate(
+        date_from=date_from, states=("confirmed", "audited"), pos_status="ok"))
+
+    assert abs(agg["pos_related_ok"]["amount"] - legacy[1]) < 0.01, "POS totals differ"
+    for dtype, amount in legacy[0].items():
+        assert abs(agg["by_type"][dtype]["amount"] - amount) < 0.01, f"{dtype} totals differ"
+    print("results match")
+finally:
+    env.cr.rollback()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/bench_staff_directory.py
+Description: Benchmark: kiosk staff list, per-request build vs staff directory cache.
+
+For every deposit type of the kiosk screens, times
+  - legacy: search gas.station.staff and build the dicts field by field
+  - cold:   gas.station.staff.directory.get_directory() after a cache clear
+  - warm:   the same call again (ormcache hit)
+and checks both return the same staff. Then renames one staff member and
+checks the directory reads the change through before commit. Rolled back.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/bench_staff_directory.py
+"""
+
+import statistics
+import time
+
+from odoo.addons.gas_station_cash.controllers.main import DEPOSIT_TYPE_ROLES
+
+ROUNDS = 50
+DEPOSIT_TYPES = ['oil', 'engine_oil', 'rental', 'coffee_shop', 'withdrawal', 'exit_fullscreen']
+
+
+def _legacy(role):
+    domain = [('active', '=', True)]
+    if role == 'has_odoo_user':
+        domain.append(('user_id', '!=', False))
+    elif isinstance(role, list):
+        domain.append(('role', 'in', role))
+    elif role:
+        domain.append(('role', '=', role))
+    return [{
+        'id':                       s.id,
+        'name':                     s.name,
+        'nickname':                 s.nickname or False,
+        'employee_id':              s.employee_id,
+        'external_id':              s.external_id or False,
+        'role':                     s.role,
+        'fingerprint_enrolled':     s.fingerprint_state == 'enrolled',
+    } for s in env['gas.station.staff'].sudo().search(domain)]  # env is provided by odoo shell
+
+
+def _median_ms(fn, rounds, before=None):
+    times = []
+    for _i in range(rounds):
+        if before:
+            before()
+        env.invalidate_all()
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(times)
+
+
+Directory = env['gas.station.staff.directory']
+try:
+    print(f"{'deposit type':<16} {'staff':>5} {'legacy':>9} {'cold':>9} {'warm':>9}  (ms, median)")
+    for deposit_type in DEPOSIT_TYPES:
+        role = DEPOSIT_TYPE_ROLES[deposit_type]
+        legacy = _legacy(role)
+        _etag, _body, cached = Directory.get_directory(role)
+        assert [dict(s) for s in cached] == legacy, f"{deposit_type}: directory differs"
+        print(f"{deposit_type:<16} {len(legacy):>5} "
+              f"{_median_ms(lambda: _legacy(role), ROUNDS):>9.2f} "
+              f"{_median_ms(lambda: Directory.get_directory(role), ROUNDS, env.registry.clear_cache):>9.2f} "
+              f"{_median_ms(lambda: Directory.get_directory(role), ROUNDS):>9.3f}")
+
+    staff = env['gas.station.staff'].sudo().search([('active', '=', True)], limit=1)
+    if staff:
+        etag, _body, _list = Directory.get_directory(DEPOSIT_TYPE_ROLES['exchange_cash'])
+        staff.write({'nickname': 'bench-renamed'})
+        new_etag, _body, staff_list = Directory.get_directory(DEPOSIT_TYPE_ROLES['exchange_cash'])
+        assert new_etag != etag, "ETag unchanged after a staff write"
+        assert any(s['nickname'] == 'bench-renamed' for s in staff_list), "write not visible"
+        print("staff write changes the directory and its ETag: ok")
+finally:
+    env.cr.rollback()
+    env.registry.clear_cache()
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/bench_station_data.py
+Description: Synthetic multi-year station history for the query-plan regression suite.
+
+generate_station() lays out `years` of shifts (SHIFTS_PER_DAY per day, the last
+one of the day followed by an End of Day) and fills, for `sites` POS terminals:
+  - close shift / end of day POS commands (gas.station.pos_command)
+  - deposits with one line each, linked to their close shift audit
+  - shift audits (+ one cash_deposit audit line per deposit) and EOD audits
+  - withdrawals (+ lines), exchanges, one replenishment per day
+  - daily reports, one per EOD
+  - pos.tcp.job rows when pos_tcp_connector is installed
+Every row is written with INSERT ... SELECT generate_series; the last shift
+stays open so the "current shift" lookups have something to find. Nothing
+here commits.
+"""
+
+from datetime import timedelta
+
+from odoo import fields
+
+from odoo.addons.gas_station_cash.scripts.bench_data import get_bench_staff, insert_deposits
+
+STATION_PREFIX = "BENCH-ST-"
+SHIFTS_PER_DAY = 3
+
+_SHIFTS = "bench_station_shift"
+
+
+def _insert(env, query, params):
+    params = dict(params, uid=env.uid)
+    env.cr.execute(query, params)
+    return env.cr.rowcount
+
+
+def generate_station(env, sites=3, years=2, deposits_per_shift=40, withdrawals_per_shift=2,
+                     exchanges_per_shift=3, tcp_jobs_per_shift=10, now=None):
+    """
+    Fill the database with `years` of history for `sites` terminals.
+
+    Returns:
+        dict {table: rows inserted} plus 'period_start' (first shift start) and
+        'current_shift_start' (close time of the last generated shift)
+    """
+    now = now or fields.Datetime.now()
+    shift_len = timedelta(hours=24 / SHIFTS_PER_DAY)
+    start = (now - timedelta(days=365 * years)).replace(hour=0, minute=0, second=0, microsecond=0)
+    n_shifts = int((now - start) / shift_len) - 1     # keep the current shift open
+    last_close = start + shift_len * n_shifts
+    staff_ids = get_bench_staff(env, count=5 * sites)
+    company = env.company
+    params = {
+        "prefix": STATION_PREFIX,
+        "start": start,
+        "shift_len": shift_len,
+        "shift_secs": shift_len.total_seconds(),
+        "n_shifts": n_shifts,
+        "spd": SHIFTS_PER_DAY,
+        "sites": sites,
+        "staff": staff_ids,
+        "n_staff": len(staff_ids),
+        "company": company.id,
+        "currency": company.currency_id.id,
+    }
+    counts = {}
+    cr = env.cr
+
+    cr.execute(f"DROP TABLE IF EXISTS {_SHIFTS}")
+    cr.execute(f"""
+        CREATE TEMP TABLE {_SHIFTS} ON COMMIT DROP AS
+        SELECT g.i + 1 AS n,
+               g.i %% %(spd)s + 1 AS shift_number,
+               (g.i + 1) %% %(spd)s = 0 AS is_eod,
+               (g.i / %(spd)s + 1) * %(spd)s AS eod_n,
+               %(start)s + %(shift_len)s * g.i AS start_time,
+               %(start)s + %(shift_len)s * (g.i + 1) AS close_time
+          FROM generate_series(0, %(n_shifts)s - 1) AS g(i)
+    """, params)
+
+    # ── Shift audits + EOD audits ────────────────────────────────────────
+    counts["gas_station_shift_audit"] = _insert(env, f"""
+        INSERT INTO gas_station_shift_audit
+               (name, audit_type, is_last_shift, shift_number, shift_start_time, close_time,
+                period_start, period_end, state, company_id, currency_id,
+                create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'SA-' || s.n, 'close_shift', s.is_eod, s.shift_number,
+               s.start_time, s.close_time, s.start_time, s.close_time, 'confirmed',
+               %(company)s, %(currency)s, %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+         UNION ALL
+        SELECT %(prefix)s || 'EOD-' || s.n, 'end_of_day', TRUE, s.shift_number,
+               s.close_time - %(shift_len)s * %(spd)s, s.close_time + interval '1 second',
+               s.close_time - %(shift_len)s * %(spd)s, s.close_time + interval '1 second', 'confirmed',
+               %(company)s, %(currency)s, %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+         WHERE s.is_eod
+    """, params)
+    cr.execute(f"""
+        UPDATE gas_station_shift_audit a
+           SET parent_eod_id = e.id
+          FROM {_SHIFTS} s
+          JOIN gas_station_shift_audit e ON e.name = %(prefix)s || 'EOD-' || s.eod_n
+         WHERE a.name = %(prefix)s || 'SA-' || s.n
+    """, params)
+    cr.execute("""
+        UPDATE gas_station_shift_audit e
+           SET previous_eod_id = p.id
+          FROM gas_station_shift_audit p
+         WHERE e.name LIKE %(prefix)s || 'EOD-%%'
+           AND p.name = %(prefix)s || 'EOD-' || (substring(e.name from '[0-9]+$')::int - %(spd)s)
+    """, params)
+
+    # ── POS commands (one per shift and terminal) ────────────────────────
+    counts["gas_station_pos_command"] = _insert(env, f"""
+        INSERT INTO gas_station_pos_command
+               (name, action, request_id, pos_terminal_id, pos_shift_id, status,
+                started_at, finished_at, create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'CMD-' || s.n || '-' || t.site,
+               CASE WHEN s.is_eod THEN 'end_of_day' ELSE 'close_shift' END,
+               %(prefix)s || 'REQ-' || s.n || '-' || t.site,
+               %(prefix)s || 'T' || t.site,
+               s.n::varchar,
+               CASE WHEN (s.n + t.site) %% 50 = 0 THEN 'failed' ELSE 'done' END,
+               s.close_time, s.close_time + interval '20 seconds',
+               %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+          CROSS JOIN generate_series(1, %(sites)s) AS t(site)
+    """, params)
+
+    # ── Deposits (+ lines, audit lines) ──────────────────────────────────
+    counts["gas_station_cash_deposit"] = insert_deposits(
+        env, n_shifts * deposits_per_shift * sites, start, last_close,
+        staff_ids=staff_ids, prefix=STATION_PREFIX + "D-",
+    )
+    cr.execute("""
+        UPDATE gas_station_cash_deposit d
+           SET audit_id = a.id
+          FROM gas_station_shift_audit a
+         WHERE d.name LIKE %(prefix)s || 'D-%%'
+           AND a.name = %(prefix)s || 'SA-' ||
+               LEAST(%(n_shifts)s, ceil(extract(epoch FROM d.date - %(start)s) / %(shift_secs)s)::int)
+    """, params)
+    counts["gas_station_cash_deposit_line"] = _insert(env, """
+        INSERT INTO gas_station_cash_deposit_line
+               (deposit_id, currency_denomination, quantity, subtotal,
+                create_uid, create_date, write_uid, write_date)
+        SELECT d.id, d.total_amount, 1, d.total_amount, %(uid)s, d.date, %(uid)s, d.date
+          FROM gas_station_cash_deposit d
+         WHERE d.name LIKE %(prefix)s || 'D-%%'
+    """, params)
+    counts["gas_station_shift_audit_line"] = _insert(env, """
+        INSERT INTO gas_station_shift_audit_line
+               (audit_id, line_type, deposit_id, staff_record_id, amount, deposit_type,
+                deposit_state, currency_id, create_uid, create_date, write_uid, write_date)
+        SELECT d.audit_id, 'cash_deposit', d.id, d.staff_id, d.total_amount, d.deposit_type,
+               d.state, %(currency)s, %(uid)s, d.date, %(uid)s, d.date
+          FROM gas_station_cash_deposit d
+         WHERE d.name LIKE %(prefix)s || 'D-%%' AND d.audit_id IS NOT NULL
+    """, params)
+
+    # ── Withdrawals (+ lines), exchanges, replenishments ─────────────────
+    counts["gas_station_cash_withdrawal"] = _insert(env, f"""
+        INSERT INTO gas_station_cash_withdrawal
+               (name, staff_id, date, company_id, currency_id, state, withdrawal_type,
+                total_amount, glory_status, create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'W-' || s.n || '-' || k,
+               (%(staff)s)[1 + (s.n + k) %% %(n_staff)s],
+               s.start_time + %(shift_len)s * k / (%(per_shift)s + 1),
+               %(company)s, %(currency)s, 'confirmed',
+               (ARRAY['general', 'change', 'expense', 'transfer'])[1 + k %% 4],
+               (500 + (s.n * 97 + k * 31) %% 5000)::numeric, 'collected',
+               %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+          CROSS JOIN generate_series(1, %(per_shift)s) AS g(k)
+    """, dict(params, per_shift=withdrawals_per_shift * sites))
+    counts["gas_station_cash_withdrawal_line"] = _insert(env, """
+        INSERT INTO gas_station_cash_withdrawal_line
+               (withdrawal_id, denomination_type, currency_denomination, quantity, subtotal,
+                create_uid, create_date, write_uid, write_date)
+        SELECT w.id, 'note', w.total_amount, 1, w.total_amount, %(uid)s, w.date, %(uid)s, w.date
+          FROM gas_station_cash_withdrawal w
+         WHERE w.name LIKE %(prefix)s || 'W-%%'
+    """, params)
+    counts["gas_station_cash_exchange"] = _insert(env, f"""
+        INSERT INTO gas_station_cash_exchange
+               (name, exchange_time, staff_id, cashout_amount, currency_id, machine_status,
+                create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'X-' || s.n || '-' || k,
+               s.start_time + %(shift_len)s * k / (%(per_shift)s + 1),
+               (%(staff)s)[1 + (s.n + k) %% %(n_staff)s],
+               (100 * (1 + (s.n + k) %% 10))::numeric, %(currency)s,
+               CASE WHEN (s.n + k) %% 40 = 0 THEN 'failed' ELSE 'ok' END,
+               %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+          CROSS JOIN generate_series(1, %(per_shift)s) AS g(k)
+    """, dict(params, per_shift=exchanges_per_shift * sites))
+    counts["gas_station_cash_replenish"] = _insert(env, f"""
+        INSERT INTO gas_station_cash_replenish
+               (name, replenish_date, staff_id, mode, state, total_amount, currency_id,
+                create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'R-' || s.n, s.close_time + interval '5 minutes',
+               (%(staff)s)[1 + s.n %% %(n_staff)s], 'top_up', 'confirmed', 5000, %(currency)s,
+               %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+         WHERE s.is_eod
+    """, params)
+
+    # ── Audit / report totals ────────────────────────────────────────────
+    cr.execute("""
+        UPDATE gas_station_shift_audit a
+           SET total_all_deposits = t.amount
+          FROM (SELECT audit_id, sum(total_amount) AS amount
+                  FROM gas_station_cash_deposit
+                 WHERE name LIKE %(prefix)s || 'D-%%' AND audit_id IS NOT NULL
+              GROUP BY audit_id) t
+         WHERE a.id = t.audit_id
+    """, params)
+    counts["gas_station_daily_report"] = _insert(env, f"""
+        INSERT INTO gas_station_daily_report
+               (name, report_date, period_start, period_end, state, company_id, currency_id,
+                total_deposits, deposit_count, create_uid, create_date, write_uid, write_date)
+        SELECT %(prefix)s || 'DR-' || s.n, s.close_time::date,
+               s.close_time - %(shift_len)s * %(spd)s, s.close_time + interval '1 second',
+               'confirmed', %(company)s, %(currency)s,
+               COALESCE(t.amount, 0), %(per_day)s,
+               %(uid)s, s.close_time, %(uid)s, s.close_time
+          FROM {_SHIFTS} s
+          LEFT JOIN (SELECT a.parent_eod_id, sum(a.total_all_deposits) AS amount
+                       FROM gas_station_shift_audit a
+                      WHERE a.name LIKE %(prefix)s || 'SA-%%'
+                   GROUP BY a.parent_eod_id) t
+                 ON t.parent_eod_id = (SELECT id FROM gas_station_shift_audit
+                                        WHERE name = %(prefix)s || 'EOD-' || s.n)
+         WHERE s.is_eod
+    """, dict(params, per_day=deposits_per_shift * sites * SHIFTS_PER_DAY))
+
+    # ── pos_tcp_connector job queue ──────────────────────────────────────
+    if tcp_jobs_per_shift and _table_exists(env, "pos_tcp_job"):
+        counts["pos_tcp_job"] = _insert(env, f"""
+            INSERT INTO pos_tcp_job
+                   (message_type, direction, vendor, terminal_id, payload_json, state,
+                    attempt_count, done_at, create_uid, create_date, write_uid, write_date)
+            SELECT 'deposit', 'glory_to_pos', 'firstpro', %(prefix)s || 'T' || (1 + k %% %(sites)s),
+                   '{{}}', CASE WHEN (s.n + k) %% 100 = 0 THEN 'dead' ELSE 'done' END, 1,
+                   s.start_time + %(shift_len)s * k / (%(per_shift)s + 1),
+                   %(uid)s, s.start_time + %(shift_len)s * k / (%(per_shift)s + 1),
+                   %(uid)s, s.close_time
+              FROM {_SHIFTS} s
+              CROSS JOIN generate_series(1, %(per_shift)s) AS g(k)
+        """, dict(params, per_shift=tcp_jobs_per_shift * sites))
+
+    cr.execute(f"DROP TABLE {_SHIFTS}")
+    env.invalidate_all()
+    # shift boundaries were inserted in SQL: drop this process's cached ones
+    env.registry.clear_cache()
+    # Running EOD totals: the open period is the shifts after the last generated EOD
+    env["gas.station.shift.period"].sudo().action_rebuild_open_period()
+    for table in counts:
+        cr.execute(f"ANALYZE {table}")
+
+    counts["period_start"] = start
+    counts["current_shift_start"] = last_close
+    return counts
+
+
+def _table_exists(env, table):
+    env.cr.execute("SELECT to_regclass(%s)", (table,))
+    return bool(env.cr.fetchone()[0])
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/cash_archive.py
+Description: Run the cash archive (gas.station.cash.archive) from the shell.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/cash_archive.py
+
+Archives the EOD periods closed more than gas_station_cash.archive_after_days
+ago (ARCHIVE_DAYS overrides it for this run), up to ARCHIVE_MAX_PERIODS periods
+per cron batch, repeating until nothing is left, and commits after every batch.
+ARCHIVE_DRY_RUN=1 rolls back instead.
+"""
+
+import os
+import time
+
+Archive = env["gas.station.cash.archive"].sudo()  # env is provided by odoo shell
+DRY_RUN = os.getenv("ARCHIVE_DRY_RUN") == "1"
+DAYS = int(os.getenv("ARCHIVE_DAYS")) if os.getenv("ARCHIVE_DAYS") else None
+
+t0 = time.perf_counter()
+while True:
+    last = Archive._last_cutoff()
+    Archive._cron_archive(days=DAYS)
+    runs = Archive.search([("cutoff", ">", last)] if last else [], order="cutoff asc")
+    for run in runs:
+        print(f"  until {run.cutoff}: {run.deposit_count} deposit(s) {run.deposit_amount:,.2f}, "
+              f"{run.withdrawal_count} withdrawal(s) {run.withdrawal_amount:,.2f}  {run.moved_json}")
+    if DRY_RUN or not runs:
+        break
+    env.cr.commit()
+
+print(f"done in {time.perf_counter() - t0:.1f}s{' (dry run, rolled back)' if DRY_RUN else ''}")
+if DRY_RUN:
+    env.cr.rollback()
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/cash_ledger.py
+Description: Verify or rebuild the daily cash ledger (gas.station.cash.ledger).
+
+    LEDGER_ACTION=verify  odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/cash_ledger.py
+    LEDGER_ACTION=rebuild odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/cash_ledger.py
+
+verify  compares the ledger with a fresh rollup of deposits / withdrawals /
+        exchanges / replenishments and prints the differing rows (read only).
+rebuild recomputes the ledger from the source tables and commits.
+"""
+
+import os
+import time
+
+ACTION = os.getenv("LEDGER_ACTION", "verify")
+
+Ledger = env["gas.station.cash.ledger"].sudo()  # env is provided by odoo shell
+t0 = time.perf_counter()
+if ACTION == "rebuild":
+    rows = Ledger._rebuild()
+    env.cr.commit()
+    print(f"ledger rebuilt: {rows} row(s) in {time.perf_counter() - t0:.1f}s")
+elif ACTION == "verify":
+    diffs = Ledger._verify(limit=int(os.getenv("LEDGER_LIMIT", "50")))
+    elapsed = time.perf_counter() - t0
+    if not diffs:
+        print(f"ledger OK ({elapsed:.1f}s)")
+    else:
+        print(f"ledger differs from the source tables ({len(diffs)} row(s) shown, {elapsed:.1f}s):")
+        for d in diffs:
+            print(f"  {d['source']:<10} {d['day']} {d['entry_type'] or '-':<16} staff={d['staff_id'] or '-'} "
+                  f"product={d['product_id'] or '-'} pos={d['pos_status'] or '-'} state={d['state'] or '-'}  "
+                  f"ledger {d['ledger_count']}/{d['ledger_amount']:.2f}  "
+                  f"source {d['source_count']}/{d['source_amount']:.2f}")
+        print("run with LEDGER_ACTION=rebuild to repair")
+    env.cr.rollback()
+else:
+    print(f"unknown LEDGER_ACTION {ACTION!r} (verify / rebuild)")
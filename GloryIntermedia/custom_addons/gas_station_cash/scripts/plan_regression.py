@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/plan_regression.py
+Description: Query-plan regression suite for the hot paths, over a synthetic multi-year station.
+
+Generates PLAN_YEARS (default 2) years of history for PLAN_SITES (default 3)
+terminals with bench_station_data.generate_station(), then for every case:
+  - times PLAN_REPEAT runs (median), each in its own savepoint
+  - records the SQL the case runs (odoo.tools.profiler SQL collector) and the
+    EXPLAIN plan of each statement, reduced to its scan nodes
+      ("Seq Scan gas_station_cash_deposit", "Index Scan gas_station_cash_deposit_totals_idx", ...)
+
+PLAN_ACTION=record writes the results to PLAN_BASELINE (default plan_baseline.json).
+PLAN_ACTION=check (default) compares against it and exits with status 1 when:
+  - a case runs a Seq Scan on a large table its baseline did not
+  - the median time exceeds baseline × PLAN_TOLERANCE (default 1.5) + 5 ms
+  - the case runs more than baseline × 1.2 + 2 queries (N+1)
+PLAN_DATA=reuse skips the generator (dataset committed earlier with
+PLAN_DATA=commit); otherwise the generated data is rolled back.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/plan_regression.py
+"""
+
+import json
+import os
+import statistics
+import time
+from datetime import timedelta
+
+from odoo import fields
+from odoo.tools.profiler import Profiler
+from odoo.addons.gas_station_cash.controllers.pos_commands import PosCommandController, _PosHeartbeatWorker
+from odoo.addons.gas_station_cash.controllers.pos_deposit_replay import _count_backlog
+from odoo.addons.gas_station_cash.controllers.withdrawal_controller import WithdrawalController
+from odoo.addons.gas_station_cash.scripts.bench_station_data import STATION_PREFIX, generate_station
+
+ACTION = os.getenv("PLAN_ACTION", "check")
+BASELINE = os.getenv("PLAN_BASELINE", "plan_baseline.json")
+DATA = os.getenv("PLAN_DATA", "generate")
+REPEAT = int(os.getenv("PLAN_REPEAT", "5"))
+TOLERANCE = float(os.getenv("PLAN_TOLERANCE", "1.5"))
+TIME_SLACK_MS = 5.0
+
+# Tables that grow with operation time: a new Seq Scan on one of them is a regression
+LARGE_TABLES = {
+    "gas_station_cash_deposit", "gas_station_cash_deposit_line", "gas_station_cash_withdrawal",
+    "gas_station_cash_withdrawal_line", "gas_station_cash_exchange", "gas_station_cash_replenish",
+    "gas_station_pos_command", "gas_station_shift_audit", "gas_station_shift_audit_line",
+    "gas_station_daily_report", "pos_tcp_job", "mail_message", "mail_tracking_value",
+}
+EXPLAIN_PREFIXES = ("select", "with", "update", "delete", "insert")
+
+pos = PosCommandController()
+withdrawal_ctrl = WithdrawalController()
+
+
+# ----------------------------------------------------------------------
+# Cases: name → (setup(env) → ctx, run(env, ctx))
+# ----------------------------------------------------------------------
+
+def _no_setup(env):
+    return None
+
+
+def _heartbeat_tick(env, ctx):
+    """DB part of _PosHeartbeatWorker._tick (shift start + replay backlog), POS ping excluded."""
+    shift_start = _PosHeartbeatWorker._current_shift_start(env)
+    return _count_backlog(env.cr, shift_start)
+
+
+def _setup_close_shift(env):
+    return env["gas.station.pos_command"].sudo().create({
+        "name": f"{STATION_PREFIX}PLAN-CS",
+        "action": "close_shift",
+        "status": "processing",
+        "started_at": fields.Datetime.now(),
+    })
+
+
+def _close_shift(env, cmd):
+    audit = pos._create_shift_audit(env, cmd, "close_shift")
+    assert audit, "_create_shift_audit failed (see log)"
+    return audit
+
+
+def _setup_eod(env):
+    return env["gas.station.shift.audit"].sudo().create({
+        "audit_type": "end_of_day",
+        "is_last_shift": True,
+        "close_time": fields.Datetime.now(),
+    })
+
+
+def _create_from_eod(env, eod):
+    return env["gas.station.daily.report"].sudo().create_from_eod(eod)
+
+
+def _withdrawal_history(env, ctx):
+    now = fields.Datetime.now()
+    return withdrawal_ctrl._withdrawal_history(
+        env, limit=50, date_from=now - timedelta(days=30), date_to=now,
+    )
+
+
+def _dashboard(env, ctx):
+    """
+    Back-office dashboard reads: this month's deposits by type, the latest daily
+    reports and shift audits. (The glory_cash_inventory_dashboard endpoints read
+    the cash machine, not PostgreSQL.)
+    """
+    month_start = fields.Datetime.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    env["gas.station.cash.deposit"].read_group(
+        [("date", ">=", month_start)], ["total_amount:sum"], ["deposit_type"],
+    )
+    env["gas.station.daily.report"].search_read(
+        [], ["name", "report_date", "total_deposits", "deposit_count"], limit=30,
+    )
+    env["gas.station.shift.audit"].search_read(
+        [], ["name", "audit_type", "close_time", "total_all_deposits"], limit=30,
+    )
+
+
+CASES = {
+    "heartbeat_tick": (_no_setup, _heartbeat_tick),
+    "get_shift_start_time": (_no_setup, lambda env, ctx: pos._get_shift_start_time(env)),
+    "calculate_shift_pos_total": (_no_setup, lambda env, ctx: pos._calculate_shift_pos_total(env)),
+    "create_from_shift_close": (_setup_close_shift, _close_shift),
+    "create_from_eod": (_setup_eod, _create_from_eod),
+    "withdrawal_history": (_no_setup, _withdrawal_history),
+    "dashboard": (_no_setup, _dashboard),
+}
+
+
+# ----------------------------------------------------------------------
+# Measurement
+# ----------------------------------------------------------------------
+
+def _scan_nodes(plan, out):
+    node = plan.get("Node Type", "")
+    if "Scan" in node:
+        target = plan.get("Index Name") or plan.get("Relation Name") or ""
+        out.add(f"{node} {target}".strip())
+    for child in plan.get("Plans", ()):
+        _scan_nodes(child, out)
+    return out
+
+
+def _explain(env, query):
+    with env.cr.savepoint(flush=False):
+        env.cr.execute(f"EXPLAIN (FORMAT JSON) {query}")
+        return _scan_nodes(env.cr.fetchone()[0][0]["Plan"], set())
+
+
+def _measure(env, name, setup, run):
+    timings = []
+    for _i in range(REPEAT):
+        with env.cr.savepoint(flush=False) as sp:
+            ctx = setup(env)
+            env.flush_all()
+            env.invalidate_all()
+            t0 = time.perf_counter()
+            run(env, ctx)
+            env.flush_all()
+            timings.append((time.perf_counter() - t0) * 1000.0)
+            sp.rollback()
+        env.invalidate_all()
+
+    # one more run to capture the SQL; plans are explained before the rollback
+    scans, queries = set(), 0
+    with env.cr.savepoint(flush=False) as sp:
+        ctx = setup(env)
+        env.flush_all()
+        env.invalidate_all()
+        with Profiler(collectors=["sql"], db=None) as profiler:
+            run(env, ctx)
+            env.flush_all()
+        for entry in profiler.collectors[0].entries:
+            queries += 1
+            query = entry["full_query"]
+            if query.lstrip().lower().startswith(EXPLAIN_PREFIXES):
+                scans |= _explain(env, query)
+        sp.rollback()
+    env.invalidate_all()
+    return {"ms": statistics.median(timings), "queries": queries, "scans": sorted(scans)}
+
+
+def _regressions(name, result, base):
+    problems = []
+    new_seq = [
+        scan for scan in result["scans"]
+        if scan.startswith("Seq Scan ") and scan[len("Seq Scan "):] in LARGE_TABLES
+        and scan not in base["scans"]
+    ]
+    if new_seq:
+        problems.append(f"new {', '.join(new_seq)}")
+    if result["ms"] > base["ms"] * TOLERANCE + TIME_SLACK_MS:
+        problems.append(f"{result['ms']:.1f} ms vs baseline {base['ms']:.1f} ms")
+    if result["queries"] > base["queries"] * 1.2 + 2:
+        problems.append(f"{result['queries']} queries vs baseline {base['queries']}")
+    return problems
+
+
+# ----------------------------------------------------------------------
+# Run
+# ----------------------------------------------------------------------
+
+results, failures = {}, []
+try:
+    if DATA != "reuse":
+        t0 = time.perf_counter()
+        counts = generate_station(
+            env,  # env is provided by odoo shell
+            sites=int(os.getenv("PLAN_SITES", "3")),
+            years=int(os.getenv("PLAN_YEARS", "2")),
+        )
+        print(f"generated station history in {time.perf_counter() - t0:.0f}s:")
+        for table, rows in counts.items():
+            print(f"  {table:<34} {rows}")
+        if DATA == "commit":
+            env.cr.commit()
+
+    baseline = {}
+    if ACTION == "check" and os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+
+    print(f"{'case':<28} {'median':>9} {'queries':>8}  result")
+    for name, (setup, run) in CASES.items():
+        result = results[name] = _measure(env, name, setup, run)
+        base = baseline.get(name)
+        problems = _regressions(name, result, base) if base else []
+        status = "FAIL: " + "; ".join(problems) if problems else ("ok" if base else "no baseline")
+        print(f"{name:<28} {result['ms']:>7.1f}ms {result['queries']:>8}  {status}")
+        for scan in result["scans"]:
+            print(f"{'':<30}{scan}")
+        if problems:
+            failures.append(name)
+finally:
+    env.cr.rollback()
+
+if ACTION == "record" or not os.path.exists(BASELINE):
+    with open(BASELINE, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    print(f"baseline written to {BASELINE}")
+elif failures:
+    print(f"{len(failures)} regression(s): {', '.join(failures)}")
+    raise SystemExit(1)
+else:
+    print("no regressions")
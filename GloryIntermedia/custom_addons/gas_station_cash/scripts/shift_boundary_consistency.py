@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+File: scripts/shift_boundary_consistency.py
+Description: Consistency check of the cached shift boundaries across worker processes.
+
+Starts BOUNDARY_WORKERS (default 4) separate processes on the same database,
+each with its own registry, and lets them warm their cache. Then, in this
+process:
+  1. marks a new close_shift command done and commits
+  2. every worker must report the new shift start on its next read
+  3. deletes the command again and commits
+  4. every worker must report the previous shift start
+Workers read the way the background threads do: check_signaling(), then
+gas.station.shift.boundary. The cached reads are timed against the former
+pos_command search.
+
+NOTE: this commits (and then removes) one gas.station.pos_command row —
+run it on a test database.
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/gas_station_cash/scripts/shift_boundary_consistency.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+import odoo
+from odoo import fields
+
+WORKERS = int(os.getenv("BOUNDARY_WORKERS", "4"))
+READS = int(os.getenv("BOUNDARY_READS", "1000"))
+
+# Worker process: its own interpreter and registry. Answers each "read" line
+# on stdin with a JSON line (pid, shift_start, µs per cached read).
+WORKER_SRC = r"""
+import json, os, sys, time
+import odoo
+rcfile, dbname, reads = sys.argv[1], sys.argv[2], int(sys.argv[3])
+odoo.tools.config.parse_config(["-c", rcfile, "-d", dbname] if rcfile else ["-d", dbname])
+registry = odoo.registry(dbname)
+for line in sys.stdin:
+    if line.strip() != "read":
+        break
+    registry = registry.check_signaling()
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        Boundary = env["gas.station.shift.boundary"]
+        shift_start = Boundary.shift_start()
+        t0 = time.perf_counter()
+        for _i in range(reads):
+            Boundary.shift_start()
+        per_read_us = (time.perf_counter() - t0) * 1e6 / reads
+    print(json.dumps([os.getpid(), str(shift_start) if shift_start else None, per_read_us]), flush=True)
+"""
+
+
+def _read_all(procs):
+    for proc in procs:
+        proc.stdin.write("read\n")
+        proc.stdin.flush()
+    return [json.loads(proc.stdout.readline()) for proc in procs]
+
+
+def _check(step, answers, expected_start):
+    ok = True
+    expected = str(expected_start) if expected_start else None
+    for pid, shift_start, per_read_us in answers:
+        match = shift_start == expected
+        ok &= match
+        print(f"  {step:<10} pid {pid:<7} shift_start {shift_start}  "
+              f"{per_read_us:6.1f} µs/read  {'ok' if match else 'STALE'}")
+    return ok
+
+
+def _search_shift_start(env):
+    """Former uncached lookup, for comparison."""
+    PosCommand = env["gas.station.pos_command"].sudo()
+    eod = PosCommand.search([("action", "=", "end_of_day"), ("status", "=", "done")],
+                            order="started_at desc", limit=1)
+    domain = [("action", "=", "close_shift"), ("status", "=", "done")]
+    if eod:
+        domain.append(("started_at", ">", eod.finished_at or eod.started_at))
+    shift = PosCommand.search(domain, order="started_at desc", limit=1)
+    last = shift or eod
+    return (last.finished_at or last.started_at) if last else None
+
+
+dbname = env.cr.dbname  # env is provided by odoo shell
+procs = [
+    subprocess.Popen(
+        [sys.executable, "-c", WORKER_SRC, odoo.tools.config.rcfile or "", dbname, str(READS)],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)),
+    )
+    for _i in range(WORKERS)
+]
+
+Boundary = env["gas.station.shift.boundary"]
+before = Boundary.shift_start()
+t0 = time.perf_counter()
+for _i in range(READS):
+    _search_shift_start(env)
+search_us = (time.perf_counter() - t0) * 1e6 / READS
+print(f"uncached search: {search_us:.1f} µs/read, current shift start {before}")
+
+ok = True
+cmd = None
+try:
+    ok &= _check("warm", _read_all(procs), before)
+
+    now = fields.Datetime.now()
+    cmd = env["gas.station.pos_command"].sudo().create({
+        "name": "BOUNDARY-CHECK",
+        "action": "close_shift",
+        "status": "processing",
+        "started_at": now,
+    })
+    cmd.write({"status": "done", "finished_at": now})
+    env.cr.commit()
+    ok &= _check("close", _read_all(procs), now)
+
+    cmd.unlink()
+    cmd = None
+    env.cr.commit()
+    ok &= _check("removed", _read_all(procs), before)
+finally:
+    if cmd:
+        cmd.unlink()
+        env.cr.commit()
+    for proc in procs:
+        proc.communicate("stop\n", timeout=30)
+
+print("consistent across workers" if ok else "STALE shift boundary in a worker")
+if not ok:
+    raise SystemExit(1)
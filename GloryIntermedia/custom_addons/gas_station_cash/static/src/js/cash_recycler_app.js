@@ -124,6 +124,16 @@ export class CashRecyclerApp extends Component {
         // Poll POS connection status every 30 seconds
         this._checkPosStatus();
         this._posStatusInterval = setInterval(() => this._checkPosStatus(), 30000);
+
+        // Link changes are also pushed on the terminal channel (subscribed by
+        // pos_command_overlay) — refresh right away instead of waiting for the poll
+        this.busService = useService("bus_service");
+        this._onBusNotification = ({ detail: notifications }) => {
+            if (notifications.some((n) => (n.type || n[0]) === "pos_link_state")) {
+                this._checkPosStatus();
+            }
+        };
+        this.busService.addEventListener("notification", this._onBusNotification);
         
         // Expose this instance globally for LiveCashInScreen to access setCashInOpening
         window.cashRecyclerApp = this;
@@ -151,6 +161,10 @@ export class CashRecyclerApp extends Component {
                 clearInterval(this._posStatusInterval);
                 this._posStatusInterval = null;
             }
+            if (this._onBusNotification) {
+                this.busService.removeEventListener("notification", this._onBusNotification);
+                this._onBusNotification = null;
+            }
 
             // 2) Clean up fullscreen ESC blocker and listeners
             if (this._escKeyHandler) {
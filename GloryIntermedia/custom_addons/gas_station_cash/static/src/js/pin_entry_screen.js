@@ -89,10 +89,15 @@ export class PinEntryScreen extends Component {
         try {
             console.log("[PinEntry] Fetching staff list for deposit type:", this.props.depositType);
 
-            const res = await this.rpc(
-                "/gas_station_cash/get_staff_by_deposit_type",
-                { deposit_type: this.props.depositType }
-            );
+            // Cached directory with ETag: the browser revalidates and
+            // reuses its copy when the server answers 304
+            const params = new URLSearchParams({ deposit_type: this.props.depositType || "" });
+            const resp = await fetch(`/gas_station_cash/staff_directory?${params}`, {
+                method: "GET",
+                credentials: "same-origin",
+            });
+            if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+            const res = await resp.json();
 
             this.state.staffList = res.staff_list || [];
             this.state.errorMessage = "";
@@ -128,28 +133,23 @@ export class PinEntryScreen extends Component {
                 return;
             }
 
-            // Build candidates — only staff who have a fingerprint template enrolled
-            const candidates = this.state.staffList
-                .filter(s => s.fingerprint_template_b64)
-                .map(s => ({
-                    employee_id: s.employee_id,
-                    employee_name: s.nickname || s.name,
-                    template_b64: s.fingerprint_template_b64,
-                }));
+            // Templates stay in the fingerprint service gallery; the staff
+            // list only says who is enrolled
+            const enrolledCount = this.state.staffList.filter(s => s.fingerprint_enrolled).length;
 
-            if (candidates.length === 0) {
+            if (enrolledCount === 0) {
                 console.log("[FP Identify] No enrolled fingerprints — skipping scan");
                 this.state.fingerprintStatus = "no_templates";
                 this.props.onStatusUpdate?.("No fingerprints enrolled. Please select staff manually.");
                 return;
             }
 
-            console.log("[FP Identify] Starting scan with", candidates.length, "candidates");
+            console.log("[FP Identify] Starting scan with", enrolledCount, "enrolled staff");
             this.state.fingerprintStatus = "scanning";
             this.props.onStatusUpdate?.("Please scan your finger or select staff manually");
 
             const res = await this.rpc("/gas_station_cash/fingerprint/identify", {
-                candidates,
+                deposit_type: this.props.depositType,
                 threshold: 50,
             });
 
@@ -181,6 +181,11 @@ export class PinEntryScreen extends Component {
                     this.state.fingerprintStatus = "no_match";
                 }
 
+            } else if (res.status === "NO_TEMPLATES") {
+                console.log("[FP Identify] Gallery has no enrolled fingerprints for", this.props.depositType);
+                this.state.fingerprintStatus = "no_templates";
+                this.props.onStatusUpdate?.("No fingerprints enrolled. Please select staff manually.");
+
             } else if (res.status === "TIMEOUT") {
                 console.log("[FP Identify] Timeout — no finger placed");
                 this.state.fingerprintStatus = "timeout";
@@ -12,9 +12,9 @@ import { reactive } from "@odoo/owl";
  * 3. Collection box replacement wizard
  */
 export const posCommandOverlayService = {
-    dependencies: ["bus_service"],
+    dependencies: ["bus_service", "rpc"],
     
-    start(env, { bus_service }) {
+    start(env, { bus_service, rpc }) {
         console.log("[PosCommandOverlayService] Starting...");
         
         // Reactive state that components can subscribe to
@@ -28,6 +28,11 @@ export const posCommandOverlayService = {
             status: "processing",  // processing | collection_complete | insufficient_reserve | done | failed | error
             showCloseButton: false,
             
+            // Real job progress (CloseShift / EndOfDay step runner)
+            step: null,
+            step_index: 0,
+            step_count: 0,
+            
             // Collection complete data
             show_unlock_popup: false,
             collected_amount: 0,
@@ -95,6 +100,9 @@ export const posCommandOverlayService = {
                     state.status = "processing";
                     state.show_unlock_popup = false;
                     state.showCloseButton = false;
+                    state.step = payload.step || null;
+                    state.step_index = payload.step_index || 0;
+                    state.step_count = payload.step_count || 0;
                     break;
                     
                 case "collection_complete":
@@ -141,6 +149,29 @@ export const posCommandOverlayService = {
             }
         }
         
+        // Restore the overlay after a kiosk reload while a job is still running
+        async function restoreActiveJob() {
+            try {
+                const res = await rpc("/gas_station_cash/pos/shift_job_status", {});
+                const job = res && res.job;
+                if (job && job.command_status === "processing") {
+                    handleNotification({
+                        command_id: job.command_id,
+                        action: job.action,
+                        request_id: job.request_id,
+                        status: "processing",
+                        message: job.step_label || "Processing...",
+                        step: job.step,
+                        step_index: job.step_index,
+                        step_count: job.step_count,
+                    });
+                }
+            } catch (e) {
+                console.warn("[PosCommandOverlayService] Could not restore job progress:", e);
+            }
+        }
+        restoreActiveJob();
+        
         // Expose for debugging
         window.__posOverlayState = state;
         window.__posOverlayService = {
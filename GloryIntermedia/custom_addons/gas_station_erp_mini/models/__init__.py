@@ -3,5 +3,6 @@
 
 from . import staff_management # <
 from . import fingerprint_wizard #
+from . import fingerprint_gallery
 
 # File: GloryIntermedia/custom_addons/gas_station_erp_mini/__init__.py
\ No newline at end of file
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+import requests
+from odoo import models, fields, api, SUPERUSER_ID
+from odoo.tools import config as odoo_config
+
+_logger = logging.getLogger(__name__)
+
+# Single-row gallery version counter. Incremented in the transaction of the
+# change and row-locked until it commits, so readers only see versions of
+# committed changes (a sequence's last_value also counts uncommitted and
+# rolled-back stamps, which made identify answer RESYNC for nothing).
+FP_GALLERY_TABLE = 'gas_station_staff_fp_gallery'
+# Stamps of earlier versions came from this sequence; the counter starts above it
+FP_VERSION_SEQUENCE = 'gas_station_staff_fp_version_seq'
+
+# Fields the fingerprint service keeps per gallery entry (template, identify
+# filter, display name). Changing any of them re-stamps the staff record.
+GALLERY_FIELDS = {
+    'fingerprint_template_b64', 'role', 'active', 'user_id',
+    'employee_id', 'first_name', 'last_name', 'nickname',
+}
+
+
+def fingerprint_in_use():
+    return str(odoo_config.get('fingerprint_in_use', 'false')).strip().lower() in ('true', '1', 'yes')
+
+
+def fingerprint_service_url():
+    host = odoo_config.get('ip_fingerprint_enroll_api_host', '127.0.0.1')
+    port = odoo_config.get('port_fingerprint_enroll_api', '5005')
+    return f"http://{host}:{port}"
+
+
+class GasStationStaffFingerprintGallery(models.Model):
+    """
+    Fingerprint gallery sync.
+
+    The fingerprint service keeps the enrolled templates of all active staff
+    decoded in memory (its "gallery"), so identify only sends a role filter
+    instead of every template. Odoo stays the owner of the templates:
+
+    - every staff record carries fingerprint_version, a stamp taken from the
+      gallery version counter whenever its template, role, name, user link or
+      active flag changes (enroll, re-enroll, clear, archive...); deleting
+      staff advances the counter too
+    - the gallery version is the committed counter value; the service reports
+      the version it was last synced to plus a manifest {staff_id: stamp}
+    - a sync diffs that manifest against the database and sends only the
+      changed templates and the removed staff IDs
+    - syncs run after commit of every change, from a cron as a safety net,
+      and when identify finds the service on another version (RESYNC)
+    """
+    _inherit = 'gas.station.staff'
+
+    fingerprint_version = fields.Integer(
+        string='Fingerprint Gallery Version',
+        readonly=True,
+        copy=False,
+        index=True,
+    )
+
+    def init(self):
+        cr = self.env.cr
+        cr.execute(f"""
+            CREATE TABLE IF NOT EXISTS {FP_GALLERY_TABLE} (
+                id integer PRIMARY KEY CHECK (id = 1),
+                version bigint NOT NULL
+            )
+        """)
+        start = 0
+        cr.execute("SELECT to_regclass(%s)", (FP_VERSION_SEQUENCE,))
+        if cr.fetchone()[0]:
+            cr.execute(f"SELECT last_value FROM {FP_VERSION_SEQUENCE}")
+            start = cr.fetchone()[0]
+        cr.execute(f"""
+            INSERT INTO {FP_GALLERY_TABLE} (id, version)
+            SELECT 1, GREATEST(%s, COALESCE(MAX(fingerprint_version), 0)) FROM gas_station_staff
+            ON CONFLICT (id) DO NOTHING
+        """, (start,))
+        cr.execute(f"DROP SEQUENCE IF EXISTS {FP_VERSION_SEQUENCE}")
+        # stamp staff that existed before the gallery
+        cr.execute("""
+            SELECT id FROM gas_station_staff
+             WHERE fingerprint_version IS NULL OR fingerprint_version = 0
+        """)
+        unstamped = [row[0] for row in cr.fetchall()]
+        if unstamped:
+            self.browse(unstamped)._fingerprint_stamp(self._fingerprint_next_version())
+
+    # ---------------------------------------------------------
+    # Version stamps
+    # ---------------------------------------------------------
+
+    def _fingerprint_bump_version(self):
+        """Stamp the records with the next gallery version and sync after commit."""
+        version = self._fingerprint_next_version()
+        if self:
+            self._fingerprint_stamp(version)
+        self._fingerprint_gallery_sync_after_commit()
+
+    @api.model
+    def _fingerprint_next_version(self):
+        """
+        Advance the gallery version counter. The row stays locked until this
+        transaction ends: concurrent staff changes commit their versions in
+        order, and a rollback leaves the counter unchanged.
+        """
+        self.env.cr.execute(f"UPDATE {FP_GALLERY_TABLE} SET version = version + 1 WHERE id = 1 RETURNING version")
+        return self.env.cr.fetchone()[0]
+
+    def _fingerprint_stamp(self, version):
+        self.env.cr.execute("""
+            UPDATE gas_station_staff
+               SET fingerprint_version = %s
+             WHERE id = ANY(%s)
+        """, [version, self.ids])
+        self.invalidate_recordset(['fingerprint_version'])
+
+    @api.model
+    def _fingerprint_gallery_version(self):
+        """Current gallery version (last committed change)."""
+        self.env.cr.execute(f"SELECT version FROM {FP_GALLERY_TABLE} WHERE id = 1")
+        row = self.env.cr.fetchone()
+        return row[0] if row else 0
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._fingerprint_bump_version()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if GALLERY_FIELDS.intersection(vals):
+            self._fingerprint_bump_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.browse()._fingerprint_bump_version()
+        return res
+
+    # ---------------------------------------------------------
+    # Sync
+    # ---------------------------------------------------------
+
+    @api.model
+    def _fingerprint_gallery_sync_after_commit(self):
+        if not fingerprint_in_use():
+            return
+        cr = self.env.cr
+        if cr.postcommit.data.get('fingerprint_gallery_sync'):
+            return
+        cr.postcommit.data['fingerprint_gallery_sync'] = True
+        registry = self.env.registry
+
+        @cr.postcommit.add
+        def _sync():
+            with registry.cursor() as new_cr:
+                env = api.Environment(new_cr, SUPERUSER_ID, {})
+                env['gas.station.staff']._fingerprint_gallery_sync()
+
+    @api.model
+    def _fingerprint_gallery_sync(self, full=False):
+        """
+        Bring the fingerprint service gallery up to date.
+
+        Args:
+            full: resend every template and drop whatever else the service holds
+        Returns:
+            the synced gallery version, or False when the service is unreachable
+        """
+        fp_url = fingerprint_service_url()
+        timeout = int(odoo_config.get('timeout_fingerprint_enroll_api', 5))
+
+        # version first: a change committed after this point is stamped higher
+        # and makes the next identify resync
+        version = self._fingerprint_gallery_version()
+        Staff = self.sudo().with_context(active_test=False)
+        enrolled = Staff.search_read(
+            [('active', '=', True), ('fingerprint_state', '=', 'enrolled')],
+            ['fingerprint_version'],
+        )
+        current = {rec['id']: rec['fingerprint_version'] for rec in enrolled}
+
+        try:
+            remote = {}
+            if not full:
+                resp = requests.get(f"{fp_url}/api/v1/fingerprint/gallery", timeout=timeout)
+                resp.raise_for_status()
+                remote = {int(k): v for k, v in (resp.json().get('manifest') or {}).items()}
+
+            changed = [sid for sid, stamp in current.items() if remote.get(sid) != stamp]
+            payload = {
+                'version': version,
+                'upserts': [{
+                    'staff_id': s.id,
+                    'employee_id': s.employee_id,
+                    'employee_name': s.nickname or s.name,
+                    'role': s.role,
+                    'has_user': bool(s.user_id),
+                    'version': s.fingerprint_version,
+                    'template_b64': s.fingerprint_template_b64,
+                } for s in Staff.browse(changed)],
+                # a removed entry is only dropped if the service has not
+                # received a newer stamp for it meanwhile
+                'deletes': {str(sid): version for sid in remote if sid not in current},
+            }
+            if full:
+                payload['keep_ids'] = list(current)
+
+            resp = requests.post(f"{fp_url}/api/v1/fingerprint/gallery/sync", json=payload, timeout=timeout)
+            resp.raise_for_status()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            _logger.warning("[FPGallery] sync to %s failed: %s", fp_url, e)
+            return False
+
+        _logger.info(
+            "[FPGallery] synced version %s (%s upserted, %s removed, %s enrolled)",
+            version, len(payload['upserts']), len(payload['deletes']), len(current),
+        )
+        return version
+
+    @api.model
+    def _cron_fingerprint_gallery_sync(self):
+        if fingerprint_in_use():
+            self._fingerprint_gallery_sync()
@@ -19,6 +19,7 @@
         - Send real-time transaction JSON from GloryIntermedia to POS
         - Heartbeat JSON between GloryIntermedia and POS
         - Queue jobs when POS is offline, and replay when it comes back online
+          (cron dispatcher with per-terminal ordering, backoff and dead-lettering)
     """,
     'author': "Pakkapon Jirachatmongkon (P POWER GENERATING CO.,LTD.)",
     'website': "http://",
@@ -30,7 +31,8 @@
         'gas_station_cash',
     ],
     'data': [
-        # later: security, views, cron, etc.
+        'security/ir.model.access.csv',
+        'data/pos_tcp_job_cron.xml',
     ],
     'installable': True,
     'application': True,
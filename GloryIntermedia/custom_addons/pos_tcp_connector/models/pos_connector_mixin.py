@@ -1,12 +1,13 @@
 # custom_addons/pos_tcp_connector/models/pos_connector_mixin.py
 import json
-import socket
 import logging
 
 from odoo import models, api, fields, _
 from odoo.http import request
 from odoo.tools import config
 
+from ..services.pos_tcp_client import PosTcpClient, PosConnectionClosed, PosReusedConnectionClosed
+
 _logger = logging.getLogger(__name__)
 
 
@@ -24,12 +25,14 @@ class PosConnectorMixin(models.AbstractModel):
             vendor = 'firstpro'
         return vendor
 
-    def _get_pos_endpoint(self, terminal_id=None):
+    def _get_pos_endpoint(self, terminal_id=None, vendor=None):
         """
         Return (vendor, host, port, timeout) for current POS vendor.
         terminal_id is kept for future use (per-terminal config if needed).
+        vendor overrides the configured vendor (queued jobs keep the vendor
+        they were created for).
         """
-        vendor = self._get_pos_vendor()
+        vendor = vendor or self._get_pos_vendor()
         timeout = float(config.get('pos_tcp_timeout', 3.0))
 
         if vendor == 'firstpro':
@@ -41,6 +44,10 @@ class PosConnectorMixin(models.AbstractModel):
 
         return vendor, host, port, timeout
 
+    def _pos_tcp_keepalive(self) -> bool:
+        """Reuse POS sockets between messages (odoo.conf pos_tcp_keepalive, default True)."""
+        return str(config.get('pos_tcp_keepalive', True)).strip().lower() not in ('false', '0', 'no')
+
     # ------------------------------------------------------------------
     # Core send: write job, try TCP, update job state
     # ------------------------------------------------------------------
@@ -80,22 +87,15 @@ class PosConnectorMixin(models.AbstractModel):
                 vendor, host, port, json_body,
             )
 
-            # Open TCP connection and send
-            with socket.create_connection((host, port), timeout=timeout) as sock:
-                sock.sendall(data)
-                sock.settimeout(timeout)
-
-                # Read until newline or EOF
-                chunks = []
-                while True:
-                    chunk = sock.recv(4096)
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-                    if b'\n' in chunk:
-                        break
-
-            raw_resp = b''.join(chunks).strip()
+            # Keep-alive socket from the per-(host, port) pool; one line out,
+            # one line back (set pos_tcp_keepalive = False to connect per message)
+            client = PosTcpClient(host, port, timeout, pooled=self._pos_tcp_keepalive())
+            try:
+                raw_resp = client.send_raw(data).strip()
+            except PosReusedConnectionClosed:
+                raise  # pooled socket died under us: delivery unknown, queue a retry job
+            except PosConnectionClosed:
+                raw_resp = b''  # fresh connection: POS accepted and hung up without a reply
             if raw_resp:
                 try:
                     resp = json.loads(raw_resp.decode('utf-8'))
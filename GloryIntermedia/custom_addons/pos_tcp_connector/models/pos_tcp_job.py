@@ -1,8 +1,43 @@
 # custom_addons/pos_tcp_connector/models/pos_tcp_job.py
-from odoo import models, fields
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import models, fields, api
+from odoo.tools import config
+from odoo.tools.sql import create_index
+
+from ..services.pos_tcp_client import PosTcpClient
+
+_logger = logging.getLogger(__name__)
+
+# Messages that must not overtake earlier messages of the same vendor/terminal
+# (a close_shift is only sent once every deposit queued before it is done or dead)
+ORDERED_MESSAGE_TYPES = ('close_shift', 'end_of_day')
+
+# Jobs still waiting to be delivered
+OPEN_STATES = ('pending', 'error', 'running')
+
+DISPATCH_BATCH_SIZE = 200     # jobs claimed per transaction
+DISPATCH_WORKERS = 4          # terminal/vendor groups sent in parallel
+DISPATCH_TIME_BUDGET = 50     # seconds per cron run (cron runs every minute)
+JOB_MAX_ATTEMPTS = 10         # then the job is dead-lettered
+JOB_BACKOFF_BASE = 30         # seconds, doubled per attempt
+JOB_BACKOFF_MAX = 3600
+JOB_LEASE_SECONDS = 300       # a 'running' job whose worker died is reclaimed after this
+
+
+def _backoff_seconds(attempt):
+    return min(JOB_BACKOFF_MAX, JOB_BACKOFF_BASE * (2 ** max(0, attempt - 1)))
+
 
 class PosTcpJob(models.Model):
     _name = 'pos.tcp.job'
+    # done / dead jobs are moved to pos_tcp_job_archive by the cash archive;
+    # the mixin creates that table and the pos_tcp_job_all view on install
+    _inherit = ['gas.station.cash.archived.mixin']
     _description = 'POS TCP JSON Job Queue'
     _order = 'id desc'
 
@@ -35,8 +70,211 @@ class PosTcpJob(models.Model):
 
     state = fields.Selection([
         ('pending', 'Pending'),
+        ('running', 'Running'),
         ('done', 'Done'),
         ('error', 'Error'),
+        ('dead', 'Dead Letter'),
     ], required=True, default='pending', index=True)
 
     error_message = fields.Text(string='Error Message')
+
+    # Dispatch bookkeeping
+    attempt_count = fields.Integer(string='Attempts', default=0)
+    next_attempt_at = fields.Datetime(
+        string='Next Attempt',
+        help="Backoff for error jobs, lease expiry for running jobs.",
+    )
+    last_attempt_at = fields.Datetime(string='Last Attempt')
+    last_attempt_ms = fields.Float(string='Last Attempt (ms)', digits=(16, 1))
+    total_attempt_ms = fields.Float(string='Total Send Time (ms)', digits=(16, 1))
+    done_at = fields.Datetime(string='Delivered At')
+
+    def init(self):
+        # Claim query: open jobs per vendor/terminal in id order
+        create_index(
+            self.env.cr, 'pos_tcp_job_dispatch_idx', self._table,
+            ['state', 'vendor', 'terminal_id', 'id'],
+        )
+
+    # ------------------------------------------------------------------
+    # Dispatcher
+    # ------------------------------------------------------------------
+    @api.model
+    def _cron_dispatch(self):
+        """ir.cron entry point: drain due jobs within the time budget."""
+        return self._dispatch_pending()
+
+    @api.model
+    def _dispatch_pending(self, batch_size=None, max_batches=None,
+                          time_budget=DISPATCH_TIME_BUDGET, commit=True):
+        """
+        Claim → send → apply, batch after batch, until nothing is due.
+
+        Jobs are claimed with FOR UPDATE SKIP LOCKED and leased (state
+        'running'), so several Odoo workers can run the cron concurrently
+        without sending a job twice. Network I/O happens in worker threads,
+        one thread per vendor/terminal group; the threads never touch the
+        cursor.
+
+        Returns:
+            dict with dispatch statistics
+        """
+        batch_size = batch_size or int(config.get('pos_tcp_dispatch_batch_size', DISPATCH_BATCH_SIZE))
+        workers = int(config.get('pos_tcp_dispatch_workers', DISPATCH_WORKERS))
+        started = time.monotonic()
+        stats = {'batches': 0, 'claimed': 0, 'done': 0, 'error': 0, 'dead': 0, 'deferred': 0}
+
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='pos_tcp_job') as pool:
+            while max_batches is None or stats['batches'] < max_batches:
+                jobs = self._claim_batch(batch_size)
+                if commit:
+                    self.env.cr.commit()
+                if not jobs:
+                    break
+                stats['batches'] += 1
+                stats['claimed'] += len(jobs)
+
+                groups = {}
+                for job in jobs:
+                    groups.setdefault((job['vendor'], job['terminal_id']), []).append(job)
+
+                futures = [pool.submit(self._send_group, group) for group in groups.values()]
+                results = []
+                for fut in futures:
+                    results.extend(fut.result())
+
+                self._apply_results(results, stats)
+                if commit:
+                    self.env.cr.commit()
+
+                if time.monotonic() - started > time_budget:
+                    break
+
+        elapsed = time.monotonic() - started
+        stats['duration_s'] = round(elapsed, 3)
+        stats['jobs_per_s'] = round(stats['done'] / elapsed, 1) if elapsed > 0 else 0.0
+        if stats['claimed']:
+            _logger.info("[PosTcpJob] Dispatch %s", stats)
+        return stats
+
+    @api.model
+    def _claim_batch(self, limit):
+        """Lock and lease the next due jobs. Returns plain dicts for the worker threads."""
+        now = fields.Datetime.now()
+        self.env.cr.execute("""
+            SELECT j.id
+              FROM pos_tcp_job j
+             WHERE j.direction = 'glory_to_pos'
+               AND j.state IN %(open)s
+               AND (j.next_attempt_at IS NULL OR j.next_attempt_at <= %(now)s)
+               AND NOT (
+                    j.message_type IN %(ordered)s
+                    AND EXISTS (
+                        SELECT 1 FROM pos_tcp_job e
+                         WHERE e.state IN %(open)s
+                           AND e.vendor = j.vendor
+                           AND e.terminal_id IS NOT DISTINCT FROM j.terminal_id
+                           AND e.direction = 'glory_to_pos'
+                           AND e.id < j.id
+                    )
+               )
+             ORDER BY j.id
+             LIMIT %(limit)s
+               FOR UPDATE SKIP LOCKED
+        """, {'open': OPEN_STATES, 'now': now, 'ordered': ORDERED_MESSAGE_TYPES, 'limit': limit})
+        ids = [row[0] for row in self.env.cr.fetchall()]
+        if not ids:
+            return []
+
+        self.env.cr.execute("""
+            UPDATE pos_tcp_job
+               SET state = 'running', next_attempt_at = %s
+             WHERE id IN %s
+         RETURNING id, vendor, terminal_id, message_type, payload_json, attempt_count, total_attempt_ms
+        """, (now + timedelta(seconds=JOB_LEASE_SECONDS), tuple(ids)))
+        rows = sorted(self.env.cr.dictfetchall(), key=lambda r: r['id'])
+        self.invalidate_model(['state', 'next_attempt_at'])
+
+        Connector = self.env['pos.connector.mixin']
+        for row in rows:
+            _vendor, host, port, timeout = Connector._get_pos_endpoint(row['terminal_id'], vendor=row['vendor'])
+            row.update(host=host, port=port, timeout=timeout)
+        return rows
+
+    @staticmethod
+    def _send_group(jobs):
+        """
+        Send one vendor/terminal group in id order (runs in a worker thread).
+
+        Stops at the first failure: the rest of the group is deferred so that
+        nothing overtakes the failed message.
+        """
+        results = []
+        for idx, job in enumerate(jobs):
+            # Pooled keep-alive socket: a whole group reuses one connection
+            client = PosTcpClient(job['host'], job['port'], job['timeout'])
+            t0 = time.monotonic()
+            try:
+                resp = client.send_message(json.loads(job['payload_json']))
+                status = str(resp.get('status', '')).upper()
+                # Only an explicit OK counts; anything else is retried / dead-lettered
+                ok = status == 'OK'
+                error = None if ok else (resp.get('discription') or resp.get('description')
+                                         or status or 'No status in POS response')
+            except Exception as e:
+                resp, ok, error = None, False, str(e)
+            results.append(dict(job, ok=ok, response=resp, error=error,
+                                duration_ms=(time.monotonic() - t0) * 1000.0))
+            if not ok:
+                results.extend(dict(rest, deferred=True) for rest in jobs[idx + 1:])
+                break
+        return results
+
+    @api.model
+    def _apply_results(self, results, stats):
+        now = fields.Datetime.now()
+        max_attempts = int(config.get('pos_tcp_job_max_attempts', JOB_MAX_ATTEMPTS))
+        retry_at = {}
+
+        for res in results:
+            if res.get('deferred'):
+                continue
+            job = self.browse(res['id'])
+            attempt = res['attempt_count'] + 1
+            vals = {
+                'attempt_count': attempt,
+                'last_attempt_at': now,
+                'last_attempt_ms': res['duration_ms'],
+                'total_attempt_ms': (res['total_attempt_ms'] or 0.0) + res['duration_ms'],
+            }
+            if res['ok']:
+                vals.update(
+                    state='done',
+                    done_at=now,
+                    next_attempt_at=False,
+                    error_message=False,
+                    response_json=json.dumps(res['response'], ensure_ascii=False),
+                )
+                stats['done'] += 1
+            elif attempt >= max_attempts:
+                vals.update(state='dead', next_attempt_at=False, error_message=res['error'])
+                stats['dead'] += 1
+                _logger.warning("[PosTcpJob] Job %s dead-lettered after %d attempts: %s",
+                                res['id'], attempt, res['error'])
+            else:
+                next_at = now + timedelta(seconds=_backoff_seconds(attempt))
+                vals.update(state='error', next_attempt_at=next_at, error_message=res['error'])
+                retry_at[(res['vendor'], res['terminal_id'])] = next_at
+                stats['error'] += 1
+            job.write(vals)
+
+        # Jobs behind a failure wait for the same retry slot (no attempt counted)
+        for res in results:
+            if not res.get('deferred'):
+                continue
+            next_at = retry_at.get((res['vendor'], res['terminal_id']), now)
+            self.browse(res['id']).write({
+                'state': 'pending' if not res['attempt_count'] else 'error',
+                'next_attempt_at': next_at,
+            })
+            stats['deferred'] += 1
@@ -0,0 +1,90 @@
+# custom_addons/pos_tcp_connector/scripts/bench_job_dispatch.py
+"""
+Benchmark: drain N queued pos.tcp.job rows through the dispatcher.
+
+Runs inside an Odoo shell against a throw-away local JSON-line POS, and
+rolls everything back at the end (nothing is committed):
+
+    odoo shell -c odoo.conf -d <db> --no-http < custom_addons/pos_tcp_connector/scripts/bench_job_dispatch.py
+
+Environment variables:
+    BENCH_JOBS        number of jobs (default 10000)
+    BENCH_TERMINALS   number of terminals the jobs are spread over (default 4)
+    BENCH_LATENCY_MS  simulated POS latency per message (default 0)
+"""
+import json
+import os
+import socketserver
+import threading
+import time
+
+from odoo.tools import config
+
+N_JOBS = int(os.getenv("BENCH_JOBS", "10000"))
+N_TERMINALS = int(os.getenv("BENCH_TERMINALS", "4"))
+LATENCY = float(os.getenv("BENCH_LATENCY_MS", "0")) / 1000.0
+
+
+class _JsonLineHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            if LATENCY:
+                time.sleep(LATENCY)
+            resp = {"transaction_id": req.get("transaction_id"), "status": "OK"}
+            self.wfile.write((json.dumps(resp) + "\n").encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+server = _Server(("127.0.0.1", 0), _JsonLineHandler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+host, port = server.server_address
+
+saved = {k: config.get(k) for k in ("pos_vendor", "pos_firstpro_host", "pos_firstpro_port")}
+config["pos_vendor"] = "firstpro"
+config["pos_firstpro_host"] = host
+config["pos_firstpro_port"] = port
+
+Job = env["pos.tcp.job"].sudo()  # env is provided by odoo shell
+try:
+    t0 = time.monotonic()
+    vals_list = []
+    for i in range(N_JOBS):
+        vals_list.append({
+            "vendor": "firstpro",
+            "terminal_id": f"TERM-{i % N_TERMINALS + 1:02d}",
+            "message_type": "deposit",
+            "payload_json": json.dumps({"transaction_id": f"BENCH-{i}", "staff_id": "BENCH", "amount": 100}),
+            "state": "error",
+        })
+    Job.create(vals_list)
+    env.flush_all()
+    print(f"created {N_JOBS} jobs in {time.monotonic() - t0:.2f}s")
+
+    t0 = time.monotonic()
+    stats = Job._dispatch_pending(commit=False, time_budget=3600)
+    elapsed = time.monotonic() - t0
+    print(f"drained {stats['done']}/{N_JOBS} jobs in {elapsed:.2f}s "
+          f"({stats['done'] / elapsed:.0f} jobs/s, {stats['batches']} batches)")
+    print(stats)
+
+    env.cr.execute("""
+        SELECT percentile_cont(ARRAY[0.5, 0.95, 0.99]) WITHIN GROUP (ORDER BY last_attempt_ms)
+          FROM pos_tcp_job WHERE payload_json LIKE %s
+    """, ("%BENCH-%",))
+    p50, p95, p99 = env.cr.fetchone()[0]
+    print(f"per-message send time: p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms")
+finally:
+    env.cr.rollback()
+    server.shutdown()
+    for k, v in saved.items():
+        if v is None:
+            config.options.pop(k, None)
+        else:
+            config[k] = v
@@ -1,49 +1,265 @@
 # custom_addons/pos_tcp_connector/services/pos_tcp_client.py
 import json
+import select
 import socket
 import logging
-from typing import Any, Dict
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, List
 
 _logger = logging.getLogger(__name__)
 
+POOL_MAX_IDLE = 4            # idle keep-alive sockets kept per (host, port)
+POOL_IDLE_TIMEOUT = 60.0     # seconds before an idle socket is dropped
+RECV_SIZE = 4096
+
+
+class PosConnectionClosed(ConnectionError):
+    """The POS closed the socket before sending a response line."""
+
+
+class PosReusedConnectionClosed(PosConnectionClosed):
+    """
+    A reused keep-alive socket hit EOF after the line was written: it may have
+    been closed by the POS while idle, so the line cannot be assumed delivered.
+    """
+
+
+class PosTcpConnection:
+    """
+    One TCP socket speaking newline-framed JSON.
+
+    Bytes received after a newline stay in the buffer for the next
+    read_line(), so pipelined responses are never dropped.
+    """
+
+    def __init__(self, host: str, port: int, timeout: float) -> None:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.settimeout(timeout)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buf = bytearray()
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    def send_line(self, data: bytes) -> None:
+        if not data.endswith(b"\n"):
+            data += b"\n"
+        self.sock.sendall(data)
+
+    def read_line(self) -> bytes:
+        """Return the next line (without newline). Raises PosConnectionClosed on EOF."""
+        while True:
+            idx = self.buf.find(b"\n")
+            if idx >= 0:
+                line = bytes(self.buf[:idx])
+                del self.buf[:idx + 1]
+                self.last_used = time.monotonic()
+                return line
+            chunk = self.sock.recv(RECV_SIZE)
+            if not chunk:
+                if self.buf:
+                    # Peer closed without a trailing newline — treat the rest as the line
+                    line = bytes(self.buf)
+                    self.buf.clear()
+                    return line
+                raise PosConnectionClosed("POS closed the connection")
+            self.buf += chunk
+
+    def is_alive(self) -> bool:
+        """
+        Cheap liveness check before reuse: an idle socket that is readable
+        is either closed by the peer (recv → b"") or carries stray bytes;
+        both mean it must not be reused.
+        """
+        if self.buf:
+            return False
+        try:
+            readable, _, _ = select.select([self.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def close(self) -> None:
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class PosTcpPool:
+    """Keep-alive connections for one (host, port)."""
+
+    def __init__(self, host: str, port: int, timeout: float, max_idle: int = POOL_MAX_IDLE) -> None:
+        self.host = host
+        self.port = int(port)
+        self.timeout = float(timeout)
+        self.max_idle = max_idle
+        self._idle = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> PosTcpConnection:
+        now = time.monotonic()
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                if now - conn.last_used < POOL_IDLE_TIMEOUT and conn.is_alive():
+                    if conn.timeout != self.timeout:
+                        # get_pool() may have changed the pool timeout since
+                        conn.timeout = self.timeout
+                        conn.sock.settimeout(self.timeout)
+                    conn.reused = True
+                    return conn
+                conn.close()
+        return PosTcpConnection(self.host, self.port, self.timeout)
+
+    def release(self, conn: PosTcpConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+    def request(self, line: bytes) -> bytes:
+        """
+        Send one line and return the response line.
+
+        A reused socket that turns out to be dead while sending (peer closed it
+        while idle) is replaced by a fresh connection and the line is sent once
+        more. Once the line is sent, errors are raised to the caller: the POS
+        may already have processed it, so it is never resent here. EOF with no
+        response on a reused socket raises PosReusedConnectionClosed.
+        """
+        conn = self.acquire()
+        try:
+            conn.send_line(line)
+        except (ConnectionError, OSError) as e:
+            conn.close()
+            if not conn.reused or isinstance(e, socket.timeout):
+                raise
+            _logger.debug("POS TCP %s:%s stale connection (%s) — reconnecting", self.host, self.port, e)
+            conn = PosTcpConnection(self.host, self.port, self.timeout)
+            try:
+                conn.send_line(line)
+            except Exception:
+                conn.close()
+                raise
+        try:
+            resp = conn.read_line()
+        except PosConnectionClosed as e:
+            conn.close()
+            if conn.reused:
+                raise PosReusedConnectionClosed(str(e)) from e
+            raise
+        except Exception:
+            conn.close()
+            raise
+        self.release(conn)
+        return resp
+
+    def request_pipelined(self, lines: List[bytes]) -> List[bytes]:
+        """
+        Write all lines on one connection, then read as many response lines.
+        The caller matches responses to requests (see PosTcpClient.send_messages).
+        """
+        conn = self.acquire()
+        try:
+            conn.send_line(b"\n".join(lines))
+            responses = [conn.read_line() for _ in lines]
+        except Exception:
+            conn.close()
+            raise
+        self.release(conn)
+        return responses
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str, port: int, timeout: float = 3.0) -> PosTcpPool:
+    """Process-wide pool per (host, port)."""
+    key = (host, int(port))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = PosTcpPool(host, port, timeout)
+        pool.timeout = float(timeout)
+        return pool
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
 
 class PosTcpClient:
     """
     Simple TCP(JSON) client for POS.
 
-    - Connects to host:port
+    - Connects to host:port (keep-alive socket from the shared pool by default)
     - Sends 1 JSON line
     - Reads 1 JSON line as response
     """
 
-    def __init__(self, host: str, port: int, timeout: float = 3.0) -> None:
+    def __init__(self, host: str, port: int, timeout: float = 3.0, pooled: bool = True) -> None:
         self.host = host
         self.port = int(port)
         self.timeout = float(timeout)
+        self.pooled = pooled
+
+    def send_raw(self, line: bytes) -> bytes:
+        """Send one encoded line, return the raw response line."""
+        if self.pooled:
+            return get_pool(self.host, self.port, self.timeout).request(line)
+        conn = PosTcpConnection(self.host, self.port, self.timeout)
+        try:
+            conn.send_line(line)
+            return conn.read_line()
+        finally:
+            conn.close()
 
     def send_message(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        data = json.dumps(payload, ensure_ascii=False) + "\n"
+        data = json.dumps(payload, ensure_ascii=False)
         _logger.info("POS TCP → %s:%s payload=%s", self.host, self.port, payload)
 
-        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
-            sock.settimeout(self.timeout)
-            sock.sendall(data.encode("utf-8"))
-
-            buf = b""
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                buf += chunk
-                if b"\n" in buf:
-                    line, _rest = buf.split(b"\n", 1)
-                    break
-            else:
-                line = buf
-
-        text = line.decode("utf-8").strip()
+        text = self.send_raw(data.encode("utf-8")).decode("utf-8").strip()
         _logger.info("POS TCP ← %s:%s raw=%r", self.host, self.port, text)
         if not text:
             raise RuntimeError("Empty response from POS")
 
         return json.loads(text)
+
+    def send_messages(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Pipeline several messages on one connection.
+
+        Each request gets a correlation_id; responses that echo it are matched
+        by id, otherwise responses are taken in request order.
+        """
+        if not payloads:
+            return []
+        reqs = [dict(p, correlation_id=p.get("correlation_id") or uuid.uuid4().hex) for p in payloads]
+        lines = [json.dumps(r, ensure_ascii=False).encode("utf-8") for r in reqs]
+        _logger.info("POS TCP → %s:%s pipelined %d message(s)", self.host, self.port, len(lines))
+
+        raw = get_pool(self.host, self.port, self.timeout).request_pipelined(lines)
+        decoded = [json.loads(r.decode("utf-8")) if r.strip() else {} for r in raw]
+
+        by_id = {d.get("correlation_id"): d for d in decoded if d.get("correlation_id")}
+        if len(by_id) == len(reqs):
+            return [by_id.get(r["correlation_id"], {}) for r in reqs]
+        return decoded
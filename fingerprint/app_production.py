@@ -3,10 +3,13 @@ import time
 import json
 import base64
 import uuid
+import queue
 import threading
+from concurrent.futures import Future
 from functools import wraps
-from flask import Flask, jsonify, make_response, request, g, has_request_context
-from pyzkfp import ZKFP2
+from flask import Flask, jsonify, make_response, request, g, has_request_context, copy_current_request_context
+from scanner_backends import SCANNER_BACKEND, create_backend
+from template_store import TemplateStore
 
 app = Flask(__name__)
 
@@ -26,17 +29,40 @@ CAPTURE_TIMEOUT = int(os.getenv("FP_CAPTURE_TIMEOUT", "20"))
 CAPTURE_RETRIES = int(os.getenv("FP_CAPTURE_RETRIES", "3"))
 SCANNER_IDLE_CLOSE_SECONDS = int(os.getenv("FP_SCANNER_IDLE_CLOSE_SECONDS", "60"))
 SCANNER_OPEN_WARMUP_SECONDS = float(os.getenv("FP_SCANNER_OPEN_WARMUP_SECONDS", "0.3"))
+# Keep the device open between requests; the idle reaper closes it after
+# SCANNER_IDLE_CLOSE_SECONDS. false = open/close per request (former behaviour)
+SCANNER_KEEP_WARM = os.getenv("FP_SCANNER_KEEP_WARM", "true").lower() == "true"
+# A warm device idle for longer than this is health-checked before reuse
+SCANNER_HEALTH_CHECK_SECONDS = float(os.getenv("FP_SCANNER_HEALTH_CHECK_SECONDS", "5"))
 CAPTURE_POLL_INTERVAL = float(os.getenv("FP_CAPTURE_POLL_INTERVAL", "0.1"))
-
-# In-memory storage for test endpoints only
-fingerprint_memory = {}
-
-# Prevent concurrent access to scanner
+# How long a request waits in the capture queue before 423 "Scanner is busy"
+CAPTURE_QUEUE_TIMEOUT = float(os.getenv("FP_CAPTURE_QUEUE_TIMEOUT", "60"))
+
+# 1:N identify
+# auto = gallery identify through the SDK's in-device DB (DBIdentify) when
+# available, loop = DBMatch candidates one by one
+MATCH_ENGINE = os.getenv("FP_MATCH_ENGINE", "auto").lower()
+# DBMatch the candidates when the device DB finds nothing (its identify
+# threshold may be above FP_MATCH_THRESHOLD); false = a miss costs one DBIdentify
+MATCH_DEVICE_DB_FALLBACK = os.getenv("FP_MATCH_DEVICE_DB_FALLBACK", "true").lower() == "true"
+# stop at the first candidate scoring at least this (0 = match all candidates)
+MATCH_EARLY_EXIT_SCORE = int(os.getenv("FP_MATCH_EARLY_EXIT_SCORE", "80"))
+# a second match is a DUPLICATE only within this many points of the best
+MATCH_DUPLICATE_MARGIN = int(os.getenv("FP_MATCH_DUPLICATE_MARGIN", "10"))
+# candidates are ordered by recent use, decaying with this half-life (seconds)
+MATCH_RECENT_USE_HALF_LIFE = float(os.getenv("FP_MATCH_RECENT_USE_HALF_LIFE", "28800"))
+
+# Template store files (gallery.fpt, enrolled.fpt); empty = in memory only,
+# the gallery is then empty after a restart until Odoo resyncs it
+TEMPLATE_STORE_DIR = os.getenv(
+    "FP_TEMPLATE_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+)
+
+# Held by the capture worker while it runs a job (the idle reaper never
+# closes the device under a capture)
 scanner_lock = threading.Lock()
 
-# Global abort event — set this to interrupt any in-progress capture loop
-_capture_abort_event = threading.Event()
-
 
 # =========================================================
 # Logging
@@ -119,34 +145,36 @@ def encode_template_b64(template_bytes: bytes) -> str:
 
 
 class ScannerManager:
-    def __init__(self):
+    """
+    Owns the scanner device: a ScannerBackend (FP_SCANNER_BACKEND) opened
+    with Init + OpenDevice + DBInit.
+
+    keep_warm=True:  the device stays open between requests. A background
+                     reaper closes it after idle_close_seconds without use;
+                     a device idle for SCANNER_HEALTH_CHECK_SECONDS is checked
+                     (device_count) before reuse and reopened only if that
+                     fails or a capture raised.
+    keep_warm=False: release() closes the device after every request.
+    """
+
+    def __init__(self, backend_factory=None, keep_warm=None, idle_close_seconds=None):
         self._lock = threading.Lock()
+        self._backend_factory = backend_factory or create_backend
+        self.keep_warm = SCANNER_KEEP_WARM if keep_warm is None else keep_warm
+        self.idle_close_seconds = SCANNER_IDLE_CLOSE_SECONDS if idle_close_seconds is None else idle_close_seconds
         self._scanner = None
         self._last_opened_at = None
         self._last_used_at = None
+        self._reaper = None
+        self.open_count = 0
+        self.fault_count = 0
+        self.last_open_seconds = None
 
     def _open_new_scanner(self):
-        z = ZKFP2()
-        z.Init()
-
-        count = z.GetDeviceCount()
-        log_event("INFO", "scanner_init", device_count=count)
-
-        if count <= 0:
-            try:
-                z.Terminate()
-            except Exception:
-                pass
-            raise Exception("No fingerprint scanner found.")
-
-        z.OpenDevice(0)
-        log_event("INFO", "scanner_opened")
-
-        z.DBInit()
-        log_event("INFO", "scanner_db_initialized")
-
-        # Intentionally skipped due to wrapper incompatibility
-        log_event("INFO", "scanner_set_parameters_skipped")
+        started = time.time()
+        z = self._backend_factory()
+        count = z.open()
+        log_event("INFO", "scanner_opened", backend=z.name, device_count=count)
 
         if SCANNER_OPEN_WARMUP_SECONDS > 0:
             time.sleep(SCANNER_OPEN_WARMUP_SECONDS)
@@ -155,8 +183,18 @@ class ScannerManager:
         self._last_opened_at = now
         self._last_used_at = now
         self._scanner = z
+        self.open_count += 1
+        self.last_open_seconds = round(now - started, 3)
+        self._start_reaper_locked()
         return z
 
+    def _healthy_locked(self):
+        try:
+            return self._scanner.device_count() > 0
+        except Exception as e:
+            log_event("WARNING", "scanner_health_check_failed", error=str(e))
+            return False
+
     def ensure_open(self, force_reopen=False):
         with self._lock:
             if force_reopen:
@@ -165,15 +203,36 @@ class ScannerManager:
             if self._scanner is None:
                 return self._open_new_scanner()
 
-            self._last_used_at = time.time()
+            now = time.time()
+            if (self.keep_warm and self._last_used_at
+                    and now - self._last_used_at >= SCANNER_HEALTH_CHECK_SECONDS
+                    and not self._healthy_locked()):
+                self.fault_count += 1
+                log_event("WARNING", "scanner_reopen_unhealthy")
+                self._close_locked()
+                return self._open_new_scanner()
+
+            self._last_used_at = now
             return self._scanner
 
     def touch(self):
         with self._lock:
             self._last_used_at = time.time()
 
+    def release(self):
+        """End of a request: keep the device warm, or close it."""
+        if self.keep_warm:
+            self.touch()
+        else:
+            self.reset(reason="close_after_use")
+
+    def fault(self, reason):
+        """The device raised: close it, the next ensure_open reopens."""
+        self.fault_count += 1
+        self.reset(reason=reason)
+
     def close_if_idle(self):
-        if SCANNER_IDLE_CLOSE_SECONDS <= 0:
+        if self.idle_close_seconds <= 0:
             return
 
         with self._lock:
@@ -181,10 +240,34 @@ class ScannerManager:
                 return
 
             idle_for = time.time() - self._last_used_at
-            if idle_for >= SCANNER_IDLE_CLOSE_SECONDS:
+            if idle_for >= self.idle_close_seconds:
                 log_event("INFO", "scanner_idle_close", idle_for=round(idle_for, 3))
                 self._close_locked()
 
+    def _start_reaper_locked(self):
+        if not self.keep_warm or self.idle_close_seconds <= 0:
+            return
+        if self._reaper and self._reaper.is_alive():
+            return
+        self._reaper = threading.Thread(target=self._reap, name="scanner_idle_reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap(self):
+        interval = min(5.0, max(0.2, self.idle_close_seconds / 4.0))
+        while True:
+            time.sleep(interval)
+            # never close under a running capture / match
+            if not scanner_lock.acquire(blocking=False):
+                continue
+            try:
+                self.close_if_idle()
+                with self._lock:
+                    if self._scanner is None:
+                        self._reaper = None
+                        return
+            finally:
+                scanner_lock.release()
+
     def reset(self, reason=None):
         with self._lock:
             if reason:
@@ -192,13 +275,19 @@ class ScannerManager:
             self._close_locked()
 
     def status(self):
-        with self._lock:
-            now = time.time()
-            return {
-                "opened": self._scanner is not None,
-                "last_opened_age": (round(now - self._last_opened_at, 3) if self._last_opened_at else None),
-                "last_used_age": (round(now - self._last_used_at, 3) if self._last_used_at else None),
-            }
+        # no lock: status must answer while the device is being opened
+        now = time.time()
+        last_opened_at, last_used_at = self._last_opened_at, self._last_used_at
+        return {
+            "opened": self._scanner is not None,
+            "keep_warm": self.keep_warm,
+            "last_opened_age": (round(now - last_opened_at, 3) if last_opened_at else None),
+            "last_used_age": (round(now - last_used_at, 3) if last_used_at else None),
+            "last_open_seconds": self.last_open_seconds,
+            "open_count": self.open_count,
+            "fault_count": self.fault_count,
+            "idle_reaper": bool(self._reaper and self._reaper.is_alive()),
+        }
 
     def _close_locked(self):
         z = self._scanner
@@ -210,21 +299,177 @@ class ScannerManager:
             return
 
         try:
-            z.CloseDevice()
+            z.close()
             log_event("INFO", "scanner_closed")
         except Exception as e:
             log_event("WARNING", "scanner_close_warning", error=str(e))
 
-        try:
-            z.Terminate()
-            log_event("INFO", "scanner_terminated")
-        except Exception as e:
-            log_event("WARNING", "scanner_terminate_warning", error=str(e))
-
 
 scanner_manager = ScannerManager()
 
 
+# =========================================================
+# Capture Worker
+# One thread owns the scanner; device requests queue for it.
+# =========================================================
+class CaptureAborted(TimeoutError):
+    pass
+
+
+class CancelToken:
+    """Cancellation of one request. wait() is the capture poll sleep, so a cancel wakes it at once."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def wait(self, seconds):
+        return self._event.wait(seconds)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise CaptureAborted("Capture aborted by client.")
+
+
+class CaptureJob:
+    def __init__(self, fn, args, kwargs, request_id):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.request_id = request_id
+        self.token = CancelToken()
+        self.future = Future()
+        self.picked_up = threading.Event()   # running, or dropped while queued
+        self.queued_at = time.time()
+
+
+class CaptureWorker:
+    """
+    Runs device jobs one at a time on a single thread, in arrival order.
+    Callers get a CaptureJob: wait on job.future for the result, cancel
+    with job.token (or cancel(request_id) from another request).
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._jobs = []
+        self._current = None
+        self._thread = None
+        self._local = threading.local()
+        self._never_cancelled = CancelToken()
+
+    def submit(self, fn, *args, request_id=None, **kwargs):
+        job = CaptureJob(fn, args, kwargs, request_id)
+        with self._lock:
+            self._jobs.append(job)
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="capture_worker", daemon=True)
+                self._thread.start()
+        self._queue.put(job)
+        return job
+
+    def current_token(self):
+        """Token of the job running on this thread (never cancelled off the worker)."""
+        return getattr(self._local, "token", None) or self._never_cancelled
+
+    def cancel(self, request_id=None):
+        """Cancel the running and queued jobs (of one request_id, or all). Returns the count."""
+        cancelled = 0
+        with self._lock:
+            for job in self._jobs:
+                if request_id and job.request_id != request_id:
+                    continue
+                job.token.cancel()
+                cancelled += 1
+                if job is not self._current and not job.future.done():
+                    job.future.set_exception(CaptureAborted("Capture aborted by client."))
+                    job.picked_up.set()
+        return cancelled
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.future.done():
+                    self._jobs.remove(job)
+                    continue
+                self._current = job
+            job.picked_up.set()
+            self._local.token = job.token
+            try:
+                with scanner_lock:
+                    result = job.fn(*job.args, **job.kwargs)
+                job.future.set_result(result)
+            except BaseException as e:
+                job.future.set_exception(e)
+            finally:
+                self._local.token = None
+                with self._lock:
+                    self._current = None
+                    self._jobs.remove(job)
+
+    @property
+    def busy(self):
+        return self._current is not None
+
+    def status(self):
+        current = self._current
+        return {
+            "busy": current is not None,
+            "queued": max(0, len(self._jobs) - (1 if current else 0)),
+            "current_request_id": current.request_id if current else None,
+            "current_age": round(time.time() - current.queued_at, 3) if current else None,
+        }
+
+
+capture_worker = CaptureWorker()
+
+
+def on_capture_worker(fn):
+    """
+    Run a view on the capture worker, the only thread that touches the
+    scanner. The request thread only waits for the result; status, health
+    and abort are never queued behind a capture.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if request.method == "OPTIONS":
+            return cors_json({"status": "OK"})
+
+        request_id = g.request_id
+
+        @copy_current_request_context
+        def run():
+            g.request_id = request_id
+            return fn(*args, **kwargs)
+
+        job = capture_worker.submit(run, request_id=request_id)
+        if not job.picked_up.wait(timeout=CAPTURE_QUEUE_TIMEOUT):
+            job.token.cancel()
+            capture_worker.cancel(request_id)
+            return cors_json({
+                "status": "ERROR",
+                "message": "Scanner is busy. Please try again."
+            }, 423)
+
+        try:
+            return job.future.result()
+        except CaptureAborted as e:
+            # cancelled while still queued
+            return cors_json({
+                "status": "TIMEOUT",
+                "message": str(e)
+            }, 504)
+    return wrapper
+
+
 def get_scanner(force_reopen=False):
     return scanner_manager.ensure_open(force_reopen=force_reopen)
 
@@ -233,8 +478,8 @@ def close_scanner(_z=None, force=False):
     if force:
         scanner_manager.reset(reason="force_close")
     elif _z is not None:
-        # Called with a scanner instance — close immediately after use
-        scanner_manager.reset(reason="close_after_use")
+        # Called with a scanner instance — end of request: close, or keep warm
+        scanner_manager.release()
     else:
         # Called without instance — only close if idle timeout reached
         scanner_manager.close_if_idle()
@@ -248,6 +493,7 @@ def capture_once(timeout=20, z=None):
             "image": bytes(...)
         }
     """
+    token = capture_worker.current_token()
     local_scanner = z
     created_here = local_scanner is None
     try:
@@ -257,55 +503,40 @@ def capture_once(timeout=20, z=None):
 
         start = time.time()
         while time.time() - start < timeout:
-            if _capture_abort_event.is_set():
-                raise TimeoutError("Capture aborted by client.")
+            token.raise_if_cancelled()
             try:
-                res = local_scanner.AcquireFingerprint()
+                res = local_scanner.capture()
                 scanner_manager.touch()
             except Exception as e:
                 if created_here:
-                    scanner_manager.reset(reason=f"capture_exception:{e}")
+                    scanner_manager.fault(reason=f"capture_exception:{e}")
                     local_scanner = get_scanner(force_reopen=True)
                     continue
                 raise
 
             if not res:
-                if _capture_abort_event.is_set():
-                    raise TimeoutError("Capture aborted by client.")
-                time.sleep(CAPTURE_POLL_INTERVAL)
+                if token.wait(CAPTURE_POLL_INTERVAL):
+                    token.raise_if_cancelled()
                 continue
 
-            template = None
-            image_data = None
-
-            if isinstance(res, (tuple, list)) and len(res) >= 2:
-                # Verified from real test:
-                # res[0] = template (System.Byte[]) len=2048
-                # res[1] = image bytes len=120000
-                template = res[0]
-                image_data = res[1]
-
-            if template is not None:
-                template_bytes = bytes(template)
-
-                if len(template_bytes) != 2048:
-                    raise ValueError(
-                        f"Invalid template size: {len(template_bytes)}. Expected 2048 bytes."
-                    )
+            template_bytes, image_data = res
 
-                log_event(
-                    "INFO",
-                    "capture_success",
-                    template_size=len(template_bytes),
-                    image_size=(len(image_data) if image_data else None)
+            if len(template_bytes) != 2048:
+                raise ValueError(
+                    f"Invalid template size: {len(template_bytes)}. Expected 2048 bytes."
                 )
 
-                return {
-                    "template": template_bytes,
-                    "image": image_data
-                }
+            log_event(
+                "INFO",
+                "capture_success",
+                template_size=len(template_bytes),
+                image_size=(len(image_data) if image_data else None)
+            )
 
-            time.sleep(CAPTURE_POLL_INTERVAL)
+            return {
+                "template": template_bytes,
+                "image": image_data
+            }
 
         raise TimeoutError("Timeout waiting for fingerprint.")
 
@@ -315,26 +546,28 @@ def capture_once(timeout=20, z=None):
 
 
 def capture_with_retry(timeout=CAPTURE_TIMEOUT, retries=CAPTURE_RETRIES, z=None):
+    token = capture_worker.current_token()
     last_error = None
 
     for attempt in range(1, retries + 1):
-        if _capture_abort_event.is_set():
-            raise TimeoutError("Capture aborted by client.")
-        
+        token.raise_if_cancelled()
+
         try:
             log_event("INFO", "capture_attempt", attempt=attempt, retries=retries)
             return capture_once(timeout=timeout, z=z)
+        except CaptureAborted:
+            raise  # Don't retry on abort — propagate immediately
         except Exception as e:
-            if "aborted" in str(e).lower():
-                raise  # Don't retry on abort — propagate immediately
-            
             last_error = e
             log_event("WARNING", "capture_attempt_failed", attempt=attempt, error=str(e))
-            scanner_manager.reset(reason=f"capture_attempt_failed:{e}")
-            if z is not None:
-                z = get_scanner(force_reopen=True)
+            # no finger within the timeout is not a device fault: a warm
+            # device stays open
+            if not (isinstance(e, TimeoutError) and scanner_manager.keep_warm):
+                scanner_manager.fault(reason=f"capture_attempt_failed:{e}")
+                if z is not None:
+                    z = get_scanner(force_reopen=True)
             if attempt < retries:
-                time.sleep(0.5)
+                token.wait(0.5)
 
     raise last_error
 
@@ -351,7 +584,7 @@ def match_templates(stored_template: bytes, fresh_template: bytes, z=None) -> in
     try:
         if local_scanner is None:
             local_scanner = get_scanner()
-        score = local_scanner.DBMatch(stored_template, fresh_template)
+        score = local_scanner.match(stored_template, fresh_template)
         scanner_manager.touch()
         log_event("INFO", "dbmatch_success", score=score, reused_scanner=(not created_here))
         return score
@@ -374,40 +607,322 @@ def compare_templates(template1: bytes, template2: bytes, threshold: int = None,
     }
     
     
-def identify_from_candidates(fresh_template: bytes, candidates: list, threshold: int = None, z=None):
-    threshold = threshold if threshold is not None else MATCH_THRESHOLD
+# =========================================================
+# Template Gallery
+# Enrolled templates synced from Odoo, decoded once.
+# =========================================================
+class TemplateGallery:
+    """
+    Enrolled templates of all active staff, keyed by Odoo staff ID.
 
-    matches = []
+    Odoo stamps a staff record with a new version whenever its template,
+    role, name or user link changes, and syncs only the difference against
+    manifest(). The gallery version is the Odoo version it was last synced
+    to; identify requests carry Odoo's current version and are refused with
+    RESYNC when the two differ.
 
+    Every entry also gets a numeric fid (for the SDK's in-device DB) and a
+    recent-use score: identify tries the staff who identified most recently
+    and most often first, so early exit usually stops after a few matches.
+    generation changes whenever the templates change.
+
+    Entries and version are persisted in a TemplateStore and reloaded from
+    it on start, so a restarted service identifies without waiting for Odoo.
+    """
+
+    def __init__(self, store=None):
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._by_fid = {}
+        self._next_fid = 1
+        self.version = 0
+        self.generation = 0
+        self.store = store if store is not None else TemplateStore()
+        self._load()
+
+    def _load(self):
+        for staff_id, meta, template in self.store.items():
+            entry = {
+                "staff_id": staff_id,
+                "employee_id": meta.get("employee_id") or "",
+                "employee_name": meta.get("employee_name") or "",
+                "role": meta.get("role"),
+                "has_user": bool(meta.get("has_user")),
+                "version": int(meta.get("version") or 0),
+                "template": template,
+                "fid": self._next_fid,
+                "use": 0.0,
+                "used_at": 0.0,
+            }
+            self._next_fid += 1
+            self._entries[staff_id] = entry
+            self._by_fid[entry["fid"]] = entry
+        self.version = self.store.version
+        self.generation += 1
+
+    @staticmethod
+    def _store_meta(entry):
+        return {
+            "employee_id": entry["employee_id"],
+            "employee_name": entry["employee_name"],
+            "role": entry["role"],
+            "has_user": entry["has_user"],
+            "version": entry["version"],
+        }
+
+    def manifest(self):
+        with self._lock:
+            return self.version, {sid: e["version"] for sid, e in self._entries.items()}
+
+    def apply(self, version, upserts=(), deletes=None, keep_ids=None):
+        """
+        upserts:  [{staff_id, employee_id, employee_name, role, has_user, version, template_b64}]
+        deletes:  {staff_id: version} - dropped unless the entry has a newer stamp
+        keep_ids: full sync - every other entry is dropped
+        Raises ValueError on a bad template (nothing is applied).
+        """
+        decoded = []
+        for item in upserts:
+            decoded.append({
+                "staff_id": str(item["staff_id"]),
+                "employee_id": str(item.get("employee_id") or "").strip(),
+                "employee_name": str(item.get("employee_name") or "").strip(),
+                "role": item.get("role"),
+                "has_user": bool(item.get("has_user")),
+                "version": int(item.get("version") or 0),
+                "template": decode_template_b64(item.get("template_b64") or ""),
+            })
+
+        with self._lock:
+            removed = set()
+            if keep_ids is not None:
+                keep = {str(sid) for sid in keep_ids}
+                removed.update(sid for sid in self._entries if sid not in keep)
+            for sid, stamp in (deletes or {}).items():
+                entry = self._entries.get(str(sid))
+                if entry and entry["version"] <= int(stamp):
+                    removed.add(str(sid))
+            # two syncs racing: never replace a newer stamp with an older one
+            decoded = [
+                entry for entry in decoded
+                if entry["staff_id"] in removed
+                or entry["staff_id"] not in self._entries
+                or self._entries[entry["staff_id"]]["version"] <= entry["version"]
+            ]
+            version = int(version)
+            version = version if keep_ids is not None else max(self.version, version)
+
+            # persist first: a sync the store refused (bad meta) changes nothing
+            upserted = {e["staff_id"] for e in decoded}
+            try:
+                self.store.commit(
+                    puts=[(e["staff_id"], e["template"], self._store_meta(e)) for e in decoded],
+                    deletes=[sid for sid in removed if sid not in upserted],
+                    version=version
+                )
+            except OSError as e:
+                log_event("ERROR", "template_store_write_failed", store=self.store.path, error=str(e))
+
+            for sid in removed:
+                self._remove(sid)
+            for entry in decoded:
+                current = self._entries.get(entry["staff_id"])
+                if current:
+                    entry["fid"] = current["fid"]
+                    entry["use"], entry["used_at"] = current["use"], current["used_at"]
+                else:
+                    entry["fid"] = self._next_fid
+                    self._next_fid += 1
+                    entry["use"], entry["used_at"] = 0.0, 0.0
+                self._entries[entry["staff_id"]] = entry
+                self._by_fid[entry["fid"]] = entry
+                self.generation += 1
+            self.version = version
+            return self.version, len(self._entries)
+
+    def _remove(self, sid):
+        entry = self._entries.pop(sid)
+        self._by_fid.pop(entry["fid"], None)
+        self.generation += 1
+
+    def candidates(self, roles=None, has_user=None):
+        """Entries matching the filter, most recently / frequently used first."""
+        now = time.time()
+        with self._lock:
+            selected = [
+                e for e in self._entries.values()
+                if (not roles or e["role"] in roles)
+                and (has_user is None or e["has_user"] == has_user)
+            ]
+        selected.sort(key=lambda e: self._use_score(e, now), reverse=True)
+        return selected
+
+    @staticmethod
+    def _use_score(entry, now):
+        if not entry["use"]:
+            return 0.0
+        return entry["use"] * 0.5 ** ((now - entry["used_at"]) / MATCH_RECENT_USE_HALF_LIFE)
+
+    def record_use(self, staff_id):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(str(staff_id))
+            if entry:
+                entry["use"] = self._use_score(entry, now) + 1.0
+                entry["used_at"] = now
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries.values())
+
+    def by_fid(self, fid):
+        return self._by_fid.get(fid)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def open_template_store(filename):
+    """The store file in TEMPLATE_STORE_DIR; in memory when unset or unusable."""
+    if not TEMPLATE_STORE_DIR:
+        return TemplateStore()
+    path = os.path.join(TEMPLATE_STORE_DIR, filename)
+    started = time.time()
+    try:
+        store = TemplateStore(path)
+    except (OSError, ValueError) as e:
+        log_event("ERROR", "template_store_open_failed", path=path, error=str(e))
+        return TemplateStore()
+    log_event(
+        "INFO",
+        "template_store_opened",
+        path=path,
+        count=len(store),
+        repaired=store.repaired,
+        elapsed_ms=round((time.time() - started) * 1000, 1)
+    )
+    return store
+
+
+template_gallery = TemplateGallery(open_template_store("gallery.fpt"))
+
+# Test endpoints (enroll_fingerprint / verify_fingerprint)
+enrolled_store = open_template_store("enrolled.fpt")
+
+
+# =========================================================
+# 1:N Matching
+# =========================================================
+def _match_dict(candidate, score):
+    match = {
+        "employee_id": str(candidate.get("employee_id", "")).strip() or None,
+        "employee_name": str(candidate.get("employee_name", "")).strip() or None,
+        "score": score
+    }
+    if candidate.get("staff_id") is not None:
+        match["staff_id"] = candidate["staff_id"]
+    return match
+
+
+def _scan_candidates(z, fresh_template, candidates, threshold, early_exit_score):
+    """
+    Match the fresh template against each candidate in order. Stops at the
+    first score >= early_exit_score (0 = scan all). Returns [(score, candidate)].
+    """
+    match = z.match
+    matches = []
     for candidate in candidates:
-        employee_id = str(candidate.get("employee_id", "")).strip() or None
-        employee_name = str(candidate.get("employee_name", "")).strip() or None
-        template_b64 = candidate.get("template_b64")
+        # gallery entries are decoded once at sync; request candidates carry b64
+        candidate_template = candidate.get("template")
+        if candidate_template is None:
+            template_b64 = candidate.get("template_b64")
+            if not template_b64:
+                continue
+            try:
+                candidate_template = decode_template_b64(template_b64)
+            except ValueError as e:
+                log_event(
+                    "WARNING",
+                    "identify_candidate_failed",
+                    employee_id=candidate.get("employee_id"),
+                    error=str(e)
+                )
+                continue
 
-        if not template_b64:
-            continue
+        score = match(candidate_template, fresh_template)
+        if score >= threshold:
+            matches.append((score, candidate))
+            if early_exit_score and score >= early_exit_score:
+                break
+    return matches
 
+
+class DeviceTemplateDB:
+    """
+    The gallery loaded into the SDK's in-device DB (DBAdd), so a gallery
+    identify is one native DBIdentify call instead of N DBMatch calls.
+
+    The device DB lives with the open device handle: it is (re)loaded when
+    the device was reopened or the gallery changed. A backend error (or a
+    backend without db_* support) switches it off and identify uses the loop.
+    """
+
+    def __init__(self):
+        self._loaded = None
+        self.disabled = MATCH_ENGINE != "auto"
+
+    def ensure_loaded(self, z, gallery):
+        key = (id(z), scanner_manager.open_count, gallery.generation)
+        if self._loaded == key:
+            return
+        started = time.time()
+        z.db_clear()
+        entries = gallery.entries()
+        for entry in entries:
+            z.db_add(entry["fid"], entry["template"])
+        self._loaded = key
+        log_event(
+            "INFO",
+            "device_db_loaded",
+            count=len(entries),
+            seconds=round(time.time() - started, 3)
+        )
+
+    def identify(self, z, fresh_template, candidates, gallery, threshold, early_exit_score, max_probes=5):
+        """
+        Best and runner-up gallery match via DBIdentify. A hit is removed
+        (DBDel) and identify repeated to find the runner-up, or the next hit
+        inside the filter; removed templates are added back afterwards.
+        Returns [(score, candidate)] or None when the device DB found nothing.
+        """
+        self.ensure_loaded(z, gallery)
+        allowed = {c["fid"] for c in candidates}
+        matches, removed = [], []
         try:
-            candidate_template = decode_template_b64(template_b64)
-            score = match_templates(candidate_template, fresh_template, z=z)
+            for _probe in range(max_probes):
+                fid, score = z.db_identify(fresh_template)
+                if fid is None or fid <= 0 or score < threshold:
+                    break
+                z.db_del(fid)
+                removed.append(fid)
+                if fid in allowed:
+                    matches.append((score, gallery.by_fid(fid)))
+                    if len(matches) == 2 or (early_exit_score and score >= early_exit_score):
+                        break
+        finally:
+            for fid in removed:
+                entry = gallery.by_fid(fid)
+                if entry:
+                    z.db_add(fid, entry["template"])
+        return matches or None
 
-            if score >= threshold:
-                matches.append({
-                    "employee_id": employee_id,
-                    "employee_name": employee_name,
-                    "score": score
-                })
 
-        except Exception as e:
-            log_event(
-                "WARNING",
-                "identify_candidate_failed",
-                employee_id=employee_id,
-                error=str(e)
-            )
+device_template_db = DeviceTemplateDB()
+
 
+def _identify_result(matches, duplicate_margin):
     # sort by highest score first
-    matches.sort(key=lambda x: x["score"], reverse=True)
+    matches = sorted(matches, key=lambda m: m[0], reverse=True)
 
     if len(matches) == 0:
         return {
@@ -416,37 +931,92 @@ def identify_from_candidates(fresh_template: bytes, candidates: list, threshold:
             "matches": []
         }
 
-    if len(matches) == 1:
+    best_score = matches[0][0]
+    # a second match only makes it ambiguous when it scores close to the best
+    rivals = [m for m in matches[1:] if best_score - m[0] <= duplicate_margin]
+
+    if not rivals:
+        best = _match_dict(matches[0][1], best_score)
         return {
             "result": "SUCCESS",
-            "matched_count": 1,
-            "match": matches[0],
-            "matches": matches
+            "matched_count": len(matches),
+            "match": best,
+            "matches": [best] + [_match_dict(c, s) for s, c in matches[1:]]
         }
 
     return {
         "result": "DUPLICATE",
         "matched_count": len(matches),
-        "matches": matches,
+        "matches": [_match_dict(c, s) for s, c in [matches[0]] + rivals],
         "message": "Multiple matched fingerprints found. Please scan again."
     }
 
 
-def with_scanner_lock(fn):
-    @wraps(fn)
-    def wrapper(*args, **kwargs):
-        acquired = scanner_lock.acquire(timeout=60)
-        if not acquired:
-            return cors_json({
-                "status": "ERROR",
-                "message": "Scanner is busy. Please try again."
-            }, 423)
+def identify_from_candidates(fresh_template: bytes, candidates: list, threshold: int = None, z=None,
+                             gallery=None, early_exit_score=None, duplicate_margin=None,
+                             check_duplicates=False):
+    """
+    1:N identify of fresh_template among candidates (gallery entries with a
+    decoded "template", or request candidates with "template_b64").
 
-        try:
-            return fn(*args, **kwargs)
-        finally:
-            scanner_lock.release()
-    return wrapper
+    With gallery (candidates taken from it) the in-device DB is tried first;
+    when it is unavailable, or finds nothing and MATCH_DEVICE_DB_FALLBACK is
+    on, candidates are DBMatched in order with early exit.
+
+    check_duplicates (duplicate enrolment check) DBMatches every candidate,
+    without early exit or the device DB (its probes stop after two hits), and
+    any second match above the threshold makes the result DUPLICATE.
+    """
+    threshold = threshold if threshold is not None else MATCH_THRESHOLD
+    early_exit_score = MATCH_EARLY_EXIT_SCORE if early_exit_score is None else early_exit_score
+    duplicate_margin = MATCH_DUPLICATE_MARGIN if duplicate_margin is None else duplicate_margin
+    if check_duplicates:
+        early_exit_score, duplicate_margin = 0, float("inf")
+
+    local_scanner = z
+    created_here = local_scanner is None
+    try:
+        if local_scanner is None:
+            local_scanner = get_scanner()
+
+        started = time.time()
+        matches, engine = None, "loop"
+        if gallery is not None and not device_template_db.disabled and not check_duplicates:
+            try:
+                matches = device_template_db.identify(
+                    local_scanner, fresh_template, candidates, gallery, threshold, early_exit_score
+                )
+                engine = "device_db"
+                if matches is None and not MATCH_DEVICE_DB_FALLBACK:
+                    matches = []
+            except Exception as e:
+                device_template_db.disabled = True
+                log_event("WARNING", "device_db_unavailable", error=str(e))
+
+        if matches is None:
+            try:
+                matches = _scan_candidates(local_scanner, fresh_template, candidates, threshold, early_exit_score)
+            except Exception as e:
+                scanner_manager.fault(reason=f"dbmatch_exception:{e}")
+                raise
+
+        result = _identify_result(matches, duplicate_margin)
+        if gallery is not None and result["result"] == "SUCCESS" and not check_duplicates:
+            gallery.record_use(result["match"].get("staff_id"))
+
+        log_event(
+            "INFO",
+            "identify_matched",
+            engine=engine,
+            check_duplicates=check_duplicates,
+            candidates=len(candidates),
+            result=result["result"],
+            seconds=round(time.time() - started, 4)
+        )
+        return result
+    finally:
+        if created_here:
+            close_scanner(local_scanner)
 
 
 # =========================================================
@@ -485,18 +1055,27 @@ def health():
     return cors_json({
         "status": "OK",
         "message": "Fingerprint service is healthy.",
-        "registered_count": len(fingerprint_memory),
-        "registered_users": list(fingerprint_memory.keys()),
+        "registered_count": len(enrolled_store),
+        "registered_users": enrolled_store.keys(),
+        "gallery": {
+            "version": template_gallery.version,
+            "count": len(template_gallery),
+            "store": template_gallery.store.stats(),
+        },
         "config": {
             "require_api_key": REQUIRE_API_KEY,
+            "scanner_backend": SCANNER_BACKEND,
             "match_threshold": MATCH_THRESHOLD,
             "capture_timeout": CAPTURE_TIMEOUT,
             "capture_retries": CAPTURE_RETRIES,
             "scanner_idle_close_seconds": SCANNER_IDLE_CLOSE_SECONDS,
             "scanner_open_warmup_seconds": SCANNER_OPEN_WARMUP_SECONDS,
+            "scanner_keep_warm": SCANNER_KEEP_WARM,
+            "scanner_health_check_seconds": SCANNER_HEALTH_CHECK_SECONDS,
             "capture_poll_interval": CAPTURE_POLL_INTERVAL,
         },
-        "scanner_manager": scanner_manager.status()
+        "scanner_manager": scanner_manager.status(),
+        "capture_worker": capture_worker.status()
     })
 
 @app.route("/api/v1/fingerprint/status", methods=["GET"])
@@ -504,31 +1083,40 @@ def scanner_status():
     """
     Check if the physical fingerprint scanner is connected.
     Returns connected=true/false without opening the device for capture.
+    Never waits for the capture worker: an open or busy device is reported
+    from the manager state, a closed idle one is probed.
     """
     try:
         manager_status = scanner_manager.status()
-        if manager_status["opened"]:
+        if manager_status["opened"] or capture_worker.busy:
             return cors_json({
                 "connected": True,
                 "device_count": 1,
-                "busy": scanner_lock.locked(),
-                "scanner_opened": True,
+                "busy": capture_worker.busy,
+                "scanner_opened": manager_status["opened"],
                 "message": "Scanner ready.",
                 "manager_status": manager_status
             })
 
-        z = ZKFP2()
-        z.Init()
-        count = z.GetDeviceCount()
-        connected = count > 0
+        # probe only while no job can start using the device
+        if not scanner_lock.acquire(blocking=False):
+            return cors_json({
+                "connected": True,
+                "device_count": 1,
+                "busy": True,
+                "scanner_opened": False,
+                "message": "Scanner ready.",
+                "manager_status": manager_status
+            })
         try:
-            z.Terminate()
-        except Exception:
-            pass
+            count = create_backend().probe()
+        finally:
+            scanner_lock.release()
+        connected = count > 0
         return cors_json({
             "connected": connected,
             "device_count": count,
-            "busy": scanner_lock.locked(),
+            "busy": capture_worker.busy,
             "scanner_opened": False,
             "message": "Scanner ready." if connected else "Scanner not found.",
             "manager_status": manager_status
@@ -537,7 +1125,7 @@ def scanner_status():
         return cors_json({
             "connected": False,
             "device_count": 0,
-            "busy": scanner_lock.locked(),
+            "busy": capture_worker.busy,
             "message": str(e)
         })
 
@@ -547,12 +1135,19 @@ def get_config():
     return cors_json({
         "status": "OK",
         "require_api_key": REQUIRE_API_KEY,
+        "scanner_backend": SCANNER_BACKEND,
         "match_threshold": MATCH_THRESHOLD,
         "capture_timeout": CAPTURE_TIMEOUT,
         "capture_retries": CAPTURE_RETRIES,
         "scanner_idle_close_seconds": SCANNER_IDLE_CLOSE_SECONDS,
         "scanner_open_warmup_seconds": SCANNER_OPEN_WARMUP_SECONDS,
-        "capture_poll_interval": CAPTURE_POLL_INTERVAL
+        "scanner_keep_warm": SCANNER_KEEP_WARM,
+        "scanner_health_check_seconds": SCANNER_HEALTH_CHECK_SECONDS,
+        "capture_poll_interval": CAPTURE_POLL_INTERVAL,
+        "match_engine": MATCH_ENGINE,
+        "match_device_db_fallback": MATCH_DEVICE_DB_FALLBACK,
+        "match_early_exit_score": MATCH_EARLY_EXIT_SCORE,
+        "match_duplicate_margin": MATCH_DUPLICATE_MARGIN
     })
 
 
@@ -561,7 +1156,7 @@ def get_config():
 # =========================================================
 @app.route("/scan_fingerprint", methods=["GET", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def scan_fingerprint():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -592,7 +1187,7 @@ def scan_fingerprint():
 
 @app.route("/enroll_fingerprint", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def enroll_fingerprint():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -609,10 +1204,7 @@ def enroll_fingerprint():
 
         result = capture_with_retry()
 
-        fingerprint_memory[user_id] = {
-            "template": result["template"],
-            "created_at": time.time()
-        }
+        enrolled_store.put(user_id, result["template"], {"created_at": time.time()})
 
         log_event("INFO", "enroll_success", user_id=user_id)
 
@@ -639,7 +1231,7 @@ def enroll_fingerprint():
 
 @app.route("/verify_fingerprint", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def verify_fingerprint():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -655,7 +1247,7 @@ def verify_fingerprint():
                 "message": "user_id is required."
             }, 400)
 
-        stored = fingerprint_memory.get(user_id)
+        stored = enrolled_store.get(user_id)
         if not stored:
             return cors_json({
                 "status": "ERROR",
@@ -664,7 +1256,7 @@ def verify_fingerprint():
 
         z = get_scanner()
         fresh = capture_with_retry(z=z)
-        result = compare_templates(stored["template"], fresh["template"], threshold=threshold, z=z)
+        result = compare_templates(stored[1], fresh["template"], threshold=threshold, z=z)
         close_scanner(z)
 
         log_event("INFO", "verify_success", user_id=user_id, score=result["score"], verified=result["verified"])
@@ -696,8 +1288,8 @@ def verify_fingerprint():
 def list_enrolled():
     return cors_json({
         "status": "OK",
-        "count": len(fingerprint_memory),
-        "users": list(fingerprint_memory.keys())
+        "count": len(enrolled_store),
+        "users": enrolled_store.keys()
     })
 
 
@@ -707,8 +1299,7 @@ def delete_enrolled(user_id):
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
 
-    if user_id in fingerprint_memory:
-        del fingerprint_memory[user_id]
+    if enrolled_store.delete(user_id):
         log_event("INFO", "delete_enrolled_success", user_id=user_id)
         return cors_json({
             "status": "OK",
@@ -727,7 +1318,7 @@ def clear_enrolled():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
 
-    fingerprint_memory.clear()
+    enrolled_store.clear()
     log_event("INFO", "clear_enrolled_success")
     return cors_json({
         "status": "OK",
@@ -741,7 +1332,7 @@ def clear_enrolled():
 # =========================================================
 @app.route("/api/v1/fingerprint/capture", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def api_capture_fingerprint():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -780,7 +1371,7 @@ def api_capture_fingerprint():
 
 @app.route("/api/v1/fingerprint/verify_template", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def api_verify_template():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -836,6 +1427,7 @@ def api_verify_template():
 
 @app.route("/api/v1/fingerprint/compare_templates", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
+@on_capture_worker
 def api_compare_templates():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
@@ -855,10 +1447,9 @@ def api_compare_templates():
         template1 = decode_template_b64(template1_b64)
         template2 = decode_template_b64(template2_b64)
 
-        with scanner_lock:
-            z = get_scanner()
-            result = compare_templates(template1, template2, threshold=threshold, z=z)
-            close_scanner(z)
+        z = get_scanner()
+        result = compare_templates(template1, template2, threshold=threshold, z=z)
+        close_scanner(z)
 
         log_event("INFO", "api_compare_templates_success", score=result["score"], verified=result["verified"])
 
@@ -879,23 +1470,52 @@ def api_compare_templates():
 
 @app.route("/api/v1/fingerprint/identify", methods=["POST", "OPTIONS"])
 @require_api_key_if_enabled
-@with_scanner_lock
+@on_capture_worker
 def api_identify_fingerprint():
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
-    
-    _capture_abort_event.clear()
 
     try:
         data = request.get_json(silent=True) or {}
         threshold = int(data.get("threshold", MATCH_THRESHOLD))
-        candidates = data.get("candidates", [])
-
-        if not isinstance(candidates, list) or len(candidates) == 0:
-            return cors_json({
-                "status": "ERROR",
-                "message": "candidates must be a non-empty list."
-            }, 400)
+        check_duplicates = bool(data.get("check_duplicates"))
+
+        gallery = None
+        if "candidates" in data:
+            candidates = data.get("candidates")
+            if not isinstance(candidates, list) or len(candidates) == 0:
+                return cors_json({
+                    "status": "ERROR",
+                    "message": "candidates must be a non-empty list."
+                }, 400)
+        else:
+            # Gallery identify: only a filter is sent, checked before capture
+            expected_version = data.get("gallery_version")
+            if expected_version is not None and int(expected_version) != template_gallery.version:
+                log_event(
+                    "INFO",
+                    "api_identify_gallery_stale",
+                    gallery_version=template_gallery.version,
+                    expected_version=expected_version
+                )
+                return cors_json({
+                    "status": "RESYNC",
+                    "message": "Template gallery is out of date.",
+                    "version": template_gallery.version
+                }, 409)
+
+            roles = data.get("roles") or None
+            has_user = data.get("has_user")
+            gallery = template_gallery
+            candidates = gallery.candidates(
+                roles=set(roles) if roles else None,
+                has_user=bool(has_user) if has_user is not None else None
+            )
+            if not candidates:
+                return cors_json({
+                    "status": "NO_TEMPLATES",
+                    "message": "No enrolled fingerprints for this filter."
+                }, 200)
 
         z = get_scanner()
         fresh = capture_with_retry(z=z)
@@ -903,7 +1523,9 @@ def api_identify_fingerprint():
             fresh_template=fresh["template"],
             candidates=candidates,
             threshold=threshold,
-            z=z
+            z=z,
+            gallery=gallery,
+            check_duplicates=check_duplicates
         )
         close_scanner(z)
 
@@ -949,28 +1571,107 @@ def api_identify_fingerprint():
         }, 500)
 
 
-@app.route("/api/v1/fingerprint/abort", methods=["POST", "OPTIONS"])
+@app.route("/api/v1/fingerprint/gallery", methods=["GET"])
 @require_api_key_if_enabled
-def api_abort_fingerprint():
+def api_gallery_manifest():
+    version, manifest = template_gallery.manifest()
+    return cors_json({
+        "status": "OK",
+        "version": version,
+        "count": len(manifest),
+        "manifest": manifest
+    })
+
+
+@app.route("/api/v1/fingerprint/gallery/sync", methods=["POST", "OPTIONS"])
+@require_api_key_if_enabled
+def api_gallery_sync():
+    if request.method == "OPTIONS":
+        return cors_json({"status": "OK"})
+
+    try:
+        data = request.get_json(silent=True) or {}
+        if data.get("version") is None:
+            return cors_json({
+                "status": "ERROR",
+                "message": "version is required."
+            }, 400)
+
+        version, count = template_gallery.apply(
+            version=data["version"],
+            upserts=data.get("upserts") or [],
+            deletes=data.get("deletes") or {},
+            keep_ids=data.get("keep_ids")
+        )
+
+        log_event(
+            "INFO",
+            "api_gallery_synced",
+            version=version,
+            count=count,
+            upserted=len(data.get("upserts") or []),
+            deleted=len(data.get("deletes") or {}),
+            full=data.get("keep_ids") is not None
+        )
+
+        return cors_json({
+            "status": "OK",
+            "version": version,
+            "count": count
+        }, 200)
+
+    except (ValueError, KeyError, TypeError) as e:
+        log_event("ERROR", "api_gallery_sync_failed", error=str(e))
+        return cors_json({
+            "status": "ERROR",
+            "message": str(e)
+        }, 400)
+
+
+@app.route("/api/v1/fingerprint/simulator/present", methods=["POST", "OPTIONS"])
+@require_api_key_if_enabled
+def api_simulator_present():
+    """Simulated scanner only: put a finger on the sensor for the next capture(s)."""
     if request.method == "OPTIONS":
         return cors_json({"status": "OK"})
 
-    _capture_abort_event.set()
-    scanner_manager.reset(reason="abort_requested_by_client")
-    log_event("INFO", "fingerprint_abort_requested")
+    if SCANNER_BACKEND != "simulated":
+        return cors_json({
+            "status": "ERROR",
+            "message": "Endpoint not found"
+        }, 404)
+
+    from scanner_sim import present_finger
 
-    # Clear the event after a short delay so next scan can start fresh
-    def _clear_abort():
-        import time as _time
-        _time.sleep(0.5)
-        _capture_abort_event.clear()
-        log_event("INFO", "fingerprint_abort_event_cleared")
+    data = request.get_json(silent=True) or {}
+    finger = str(data.get("finger", "")).strip()
+    if not finger:
+        return cors_json({
+            "status": "ERROR",
+            "message": "finger is required."
+        }, 400)
+
+    present_finger(finger, count=int(data.get("count", 1)))
+    return cors_json({"status": "OK", "finger": finger})
+
+
+@app.route("/api/v1/fingerprint/abort", methods=["POST", "OPTIONS"])
+@require_api_key_if_enabled
+def api_abort_fingerprint():
+    if request.method == "OPTIONS":
+        return cors_json({"status": "OK"})
 
-    threading.Thread(target=_clear_abort, daemon=True).start()
+    # Cancels the running capture at its next poll and drops queued ones;
+    # requests after this one are not affected. request_id = only that request.
+    data = request.get_json(silent=True) or {}
+    request_id = str(data.get("request_id", "")).strip() or None
+    cancelled = capture_worker.cancel(request_id)
+    log_event("INFO", "fingerprint_abort_requested", cancelled=cancelled, target_request_id=request_id)
 
     return cors_json({
         "status": "OK",
-        "message": "Fingerprint scan aborted."
+        "message": "Fingerprint scan aborted.",
+        "cancelled": cancelled
     })
 
 if __name__ == "__main__":
@@ -981,8 +1682,11 @@ if __name__ == "__main__":
         port=PORT,
         debug=DEBUG,
         require_api_key=REQUIRE_API_KEY,
+        scanner_backend=SCANNER_BACKEND,
         match_threshold=MATCH_THRESHOLD,
         capture_timeout=CAPTURE_TIMEOUT,
-        capture_retries=CAPTURE_RETRIES
+        capture_retries=CAPTURE_RETRIES,
+        scanner_keep_warm=SCANNER_KEEP_WARM,
+        scanner_idle_close_seconds=SCANNER_IDLE_CLOSE_SECONDS
     )
     app.run(host=HOST, port=PORT, debug=DEBUG)
\ No newline at end of file
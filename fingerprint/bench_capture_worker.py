@@ -0,0 +1,103 @@
+"""
+Benchmark: status latency and abort time while a capture is running.
+
+Starts app_production in-process on the simulated scanner with nobody on
+the sensor, so a capture keeps polling until it times out. Meanwhile it
+measures GET /api/v1/fingerprint/status (must not wait behind the capture),
+then POSTs /api/v1/fingerprint/abort and measures how long until the
+capture request returns. A capture started after the abort must not be
+cancelled by it.
+
+Usage:
+    python bench_capture_worker.py [--status-calls 20]
+
+Simulated device timings: see scanner_sim.py (FP_SIM_*).
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("FP_SCANNER_BACKEND", "simulated")
+os.environ.setdefault("FP_TEMPLATE_STORE_DIR", "")
+os.environ["FP_SIM_FINGER"] = ""
+os.environ.setdefault("FP_SIM_CAPTURE_SECONDS", "0.05")
+
+import requests  # noqa: E402
+
+
+def start_service():
+    import logging
+    from werkzeug.serving import make_server
+
+    import app_production as fp
+    fp.log_event = lambda *a, **k: None
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, fp.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return fp, f"http://127.0.0.1:{server.server_port}"
+
+
+def start_capture(fp_url, result):
+    def run():
+        t0 = time.perf_counter()
+        resp = requests.post(f"{fp_url}/api/v1/fingerprint/capture", json={}, timeout=60)
+        result["status_code"] = resp.status_code
+        result["body"] = resp.json()
+        result["returned_at"] = time.perf_counter()
+        result["elapsed"] = result["returned_at"] - t0
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--status-calls", type=int, default=20)
+    args = ap.parse_args()
+
+    fp, fp_url = start_service()
+    session = requests.Session()
+
+    result = {}
+    thread = start_capture(fp_url, result)
+    deadline = time.time() + 10
+    # wait until the device is open and the capture is polling the sensor
+    while not (fp.capture_worker.busy and fp.scanner_manager.status()["opened"]) and time.time() < deadline:
+        time.sleep(0.01)
+    assert fp.capture_worker.busy, "capture did not start"
+    time.sleep(0.2)
+
+    latencies = []
+    for _i in range(args.status_calls):
+        t0 = time.perf_counter()
+        body = session.get(f"{fp_url}/api/v1/fingerprint/status", timeout=5).json()
+        latencies.append(time.perf_counter() - t0)
+        assert body["busy"], body
+    health = session.get(f"{fp_url}/health", timeout=5).json()
+    assert health["capture_worker"]["busy"], health
+
+    t_abort = time.perf_counter()
+    body = session.post(f"{fp_url}/api/v1/fingerprint/abort", json={}, timeout=5).json()
+    thread.join(timeout=30)
+    assert not thread.is_alive(), "capture did not return after abort"
+    abort_ms = (result["returned_at"] - t_abort) * 1000
+
+    print(f"status during capture: {len(latencies)} calls, median "
+          f"{statistics.median(latencies) * 1000:.1f} ms, max {max(latencies) * 1000:.1f} ms")
+    print(f"abort: cancelled {body.get('cancelled')}, capture returned {result['status_code']} "
+          f"{result['body'].get('status')} after {abort_ms:.0f} ms")
+
+    # the abort is per request: the next capture runs normally
+    requests.post(f"{fp_url}/api/v1/fingerprint/simulator/present", json={"finger": "after-abort"}, timeout=5)
+    result = {}
+    start_capture(fp_url, result).join(timeout=30)
+    print(f"capture after abort: {result['status_code']} {result['body'].get('status')}")
+    assert result["status_code"] == 200, result
+
+
+if __name__ == "__main__":
+    main()
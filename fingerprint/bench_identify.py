@@ -0,0 +1,103 @@
+"""
+Benchmark: 1:N identify latency against gallery size (10 / 100 / 1000).
+
+Times identify_from_candidates only (capture excluded) on the simulated
+scanner (scanner_sim.py), for a station where a few staff on shift
+identify over and over, plus a finger that is not enrolled:
+  - former:    decode every template_b64, DBMatch all (match_templates)
+  - loop:      pre-decoded gallery, recent-use order, early exit
+  - device db: gallery loaded with DBAdd, one DBIdentify
+  - dup check: check_duplicates=True, every candidate DBMatched (no early exit)
+The miss columns identify the finger that is not enrolled: nothing reaches
+the early-exit score, so the loop (and the device-DB fallback) scans all.
+
+Usage:
+    python bench_identify.py [--sizes 10,100,1000] [--rounds 50] [--on-shift 5]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+# benchmarks never touch the service's template store files
+os.environ.setdefault("FP_TEMPLATE_STORE_DIR", "")
+
+import app_production as fp  # noqa: E402
+from scanner_sim import SimulatedScanner, synthetic_template  # noqa: E402
+
+
+def former_identify(z, fresh, candidates, threshold):
+    matches = []
+    for c in candidates:
+        score = fp.match_templates(fp.decode_template_b64(c["template_b64"]), fresh, z=z)
+        if score >= threshold:
+            matches.append(score)
+    return matches
+
+
+def timed(fn, rounds):
+    times = []
+    for _i in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,100,1000")
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--on-shift", type=int, default=5)
+    args = ap.parse_args()
+
+    fp.log_event = lambda *a, **k: None
+    fp.scanner_manager = fp.ScannerManager(backend_factory=SimulatedScanner, keep_warm=True, idle_close_seconds=0)
+    z = fp.get_scanner()
+    rng = random.Random(42)
+    threshold = fp.MATCH_THRESHOLD
+
+    print(f"{'templates':>9}  {'former':>9}  {'loop':>9}  {'device db':>9}  {'dup check':>9}"
+          f"  {'miss loop':>9}  {'miss db':>9}   (ms, median)")
+    for n in (int(x) for x in args.sizes.split(",")):
+        gallery = fp.TemplateGallery()
+        upserts = [{
+            "staff_id": i, "employee_id": f"E{i:04d}", "role": "attendant", "version": 1,
+            "template_b64": fp.encode_template_b64(synthetic_template(i)),
+        } for i in range(n)]
+        gallery.apply(1, upserts=upserts)
+        on_shift = rng.sample(range(n), min(args.on_shift, n))
+        unknown = synthetic_template("not-enrolled", capture=1)
+        # fresh captures of the staff on shift (noisy, like real captures)
+        captures = [synthetic_template(rng.choice(on_shift), capture=k) for k in range(1, 101)]
+
+        def pick():
+            return rng.choice(captures)
+
+        def identify(fresh, use_db, check_duplicates=False):
+            fp.device_template_db.disabled = not use_db
+            result = fp.identify_from_candidates(fresh, gallery.candidates(), threshold, z=z, gallery=gallery,
+                                                 check_duplicates=check_duplicates)
+            return result
+
+        former = timed(lambda: former_identify(z, pick(), upserts, threshold), max(3, args.rounds // 10))
+        loop = timed(lambda: identify(pick(), False), args.rounds)
+        db = timed(lambda: identify(pick(), True), args.rounds)
+        dup = timed(lambda: identify(pick(), True, check_duplicates=True), max(3, args.rounds // 10))
+        miss_loop = timed(lambda: identify(unknown, False), max(3, args.rounds // 10))
+        miss_db = timed(lambda: identify(unknown, True), max(3, args.rounds // 10))
+
+        assert identify(synthetic_template(on_shift[0], capture=999), True)["result"] == "SUCCESS"
+        assert identify(synthetic_template(on_shift[0], capture=999), False)["result"] == "SUCCESS"
+        # the same finger enrolled for a second staff is found only by the full scan
+        twin = {"staff_id": n, "employee_id": f"E{n:04d}", "role": "attendant", "version": 1,
+                "template_b64": fp.encode_template_b64(synthetic_template(on_shift[0]))}
+        gallery.apply(2, upserts=[twin])
+        assert identify(synthetic_template(on_shift[0], capture=999), True, check_duplicates=True)["result"] == "DUPLICATE"
+        print(f"{n:>9}  {former:>9.1f}  {loop:>9.1f}  {db:>9.1f}  {dup:>9.1f}  {miss_loop:>9.1f}  {miss_db:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: time to first capture, open/close per request vs keep-warm.
+
+Runs the service's capture path (get_scanner -> capture_with_retry ->
+close_scanner) against the simulated scanner (scanner_sim.py) in both
+lifecycle modes and reports the time per request: the first one is cold
+(Init + OpenDevice + DBInit + warmup), the rest are warm in keep-warm mode.
+Finally checks that the idle reaper closes a warm device.
+
+Usage:
+    python bench_scanner_lifecycle.py [--requests 5] [--idle 1.0]
+
+Simulated device timings: see scanner_sim.py (FP_SIM_*).
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+# benchmarks never touch the service's template store files
+os.environ.setdefault("FP_TEMPLATE_STORE_DIR", "")
+
+import app_production as fp  # noqa: E402
+from scanner_sim import SimulatedScanner  # noqa: E402
+
+
+def run_requests(n):
+    times = []
+    for _i in range(n):
+        t0 = time.perf_counter()
+        z = fp.get_scanner()
+        fp.capture_with_retry(z=z)
+        fp.close_scanner(z)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5)
+    ap.add_argument("--idle", type=float, default=1.0, help="idle close seconds for the reaper check")
+    args = ap.parse_args()
+
+    fp.log_event = lambda *a, **k: None
+
+    print(f"{'mode':<16} {'cold':>8} {'warm (median)':>14} {'opens':>6}")
+    for label, keep_warm in (("open/close", False), ("keep-warm", True)):
+        fp.scanner_manager = fp.ScannerManager(backend_factory=SimulatedScanner, keep_warm=keep_warm, idle_close_seconds=0)
+        times = run_requests(args.requests)
+        status = fp.scanner_manager.status()
+        print(f"{label:<16} {times[0]:>7.3f}s {statistics.median(times[1:]):>13.3f}s {status['open_count']:>6}")
+        fp.scanner_manager.reset()
+
+    # idle reaper: a warm device is closed after --idle seconds without use
+    fp.scanner_manager = fp.ScannerManager(backend_factory=SimulatedScanner, keep_warm=True, idle_close_seconds=args.idle)
+    run_requests(1)
+    assert fp.scanner_manager.status()["opened"]
+    time.sleep(args.idle * 1.5 + 0.3)
+    status = fp.scanner_manager.status()
+    assert not status["opened"], status
+    print(f"idle reaper closed the device after {args.idle:.1f}s idle: ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""
+Load test: capture -> identify -> staff login, on the simulated scanner.
+
+Service mode (default): starts app_production in-process with
+FP_SCANNER_BACKEND=simulated, syncs a gallery of --staff synthetic
+templates, then --clients threads each run --rounds fingerprint logins:
+put a staff finger on the simulated sensor, identify, and log the matched
+staff in. Every login must match, and the staff logged in must be exactly
+the staff whose fingers were presented.
+
+Odoo mode (--odoo): the same through Odoo's /gas_station_cash routes, the
+way the PIN screen logs in (staff list, then fingerprint identify). Odoo
+must point at a fingerprint service started with FP_SCANNER_BACKEND=simulated
+(--fp-url). With --enroll-synthetic the staff of --deposit-type first get
+synthetic templates written to their records (TEST DATABASE ONLY: this
+replaces their enrolled fingerprints).
+
+Usage:
+    python load_test_identify.py [--staff 200] [--clients 4] [--rounds 20]
+    python load_test_identify.py --odoo http://localhost:8069 --db test --login admin
+        --password admin --fp-url http://127.0.0.1:5005 [--enroll-synthetic]
+
+Simulated device timings: see scanner_sim.py (FP_SIM_*).
+"""
+
+import argparse
+import collections
+import os
+import statistics
+import threading
+import time
+
+os.environ.setdefault("FP_SCANNER_BACKEND", "simulated")
+os.environ.setdefault("FP_TEMPLATE_STORE_DIR", "")
+os.environ.setdefault("FP_SIM_FINGER", "")
+os.environ.setdefault("FP_SIM_CAPTURE_SECONDS", "0.05")
+
+import requests  # noqa: E402
+
+from scanner_sim import synthetic_template  # noqa: E402
+
+
+def _finger(employee_id):
+    return f"staff-{employee_id}"
+
+
+# ---------------------------------------------------------------------------
+# Service mode
+# ---------------------------------------------------------------------------
+
+def start_service():
+    import logging
+    from werkzeug.serving import make_server
+
+    import app_production as fp
+    fp.log_event = lambda *a, **k: None
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, fp.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return fp, f"http://127.0.0.1:{server.server_port}"
+
+
+class ServiceClient:
+    def __init__(self, fp_url, version):
+        self.fp_url = fp_url
+        self.version = version
+        self.session = requests.Session()
+
+    def login(self, employee_id):
+        self.session.post(f"{self.fp_url}/api/v1/fingerprint/simulator/present",
+                          json={"finger": _finger(employee_id)}, timeout=5)
+        res = self.session.post(f"{self.fp_url}/api/v1/fingerprint/identify",
+                                json={"gallery_version": self.version, "roles": ["attendant"]},
+                                timeout=60).json()
+        return res.get("match", {}).get("employee_id") if res.get("result") == "SUCCESS" else None
+
+
+def setup_service(args):
+    fp, fp_url = start_service()
+    employees = [f"E{i:05d}" for i in range(args.staff)]
+    resp = requests.post(f"{fp_url}/api/v1/fingerprint/gallery/sync", json={
+        "version": 1,
+        "upserts": [{
+            "staff_id": i, "employee_id": emp, "employee_name": emp, "role": "attendant", "version": 1,
+            "template_b64": fp.encode_template_b64(synthetic_template(_finger(emp))),
+        } for i, emp in enumerate(employees)],
+    }, timeout=30)
+    resp.raise_for_status()
+    return employees, lambda: ServiceClient(fp_url, 1)
+
+
+# ---------------------------------------------------------------------------
+# Odoo mode
+# ---------------------------------------------------------------------------
+
+class OdooClient:
+    def __init__(self, args):
+        self.args = args
+        self.session = requests.Session()
+        self._call("/web/session/authenticate", db=args.db, login=args.login, password=args.password)
+        self.staff = self._call("/gas_station_cash/get_staff_by_deposit_type",
+                                deposit_type=args.deposit_type)["staff_list"]
+
+    def _call(self, path, **params):
+        resp = self.session.post(f"{self.args.odoo}{path}", timeout=60, json={
+            "jsonrpc": "2.0", "method": "call", "params": params,
+        })
+        body = resp.json()
+        if body.get("error"):
+            raise RuntimeError(body["error"].get("data", {}).get("message") or body["error"])
+        return body["result"]
+
+    def login(self, employee_id):
+        requests.post(f"{self.args.fp_url}/api/v1/fingerprint/simulator/present",
+                      json={"finger": _finger(employee_id)}, timeout=5)
+        res = self._call("/gas_station_cash/fingerprint/identify",
+                         deposit_type=self.args.deposit_type, threshold=50)
+        if res.get("result") != "SUCCESS":
+            return None
+        # the PIN screen logs the matched staff in from its staff list
+        matched = res["match"]["employee_id"]
+        staff = next((s for s in self.staff if s["employee_id"] == matched), None)
+        return staff and staff["employee_id"]
+
+
+def setup_odoo(args):
+    admin = OdooClient(args)
+    staff = [s for s in admin.staff if s.get("fingerprint_enrolled") or args.enroll_synthetic]
+    if args.enroll_synthetic:
+        import base64
+        for s in staff:
+            admin._call("/web/dataset/call_kw", model="gas.station.staff", method="write",
+                        args=[[s["id"]], {"fingerprint_template_b64": base64.b64encode(
+                            synthetic_template(_finger(s["employee_id"]))).decode("ascii")}],
+                        kwargs={})
+    if not staff:
+        raise SystemExit("no enrolled staff for this deposit type (see --enroll-synthetic)")
+    return [s["employee_id"] for s in staff], lambda: OdooClient(args)
+
+
+# ---------------------------------------------------------------------------
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--staff", type=int, default=200)
+    ap.add_argument("--clients", type=int, default=4)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--odoo")
+    ap.add_argument("--db")
+    ap.add_argument("--login", default="admin")
+    ap.add_argument("--password", default="admin")
+    ap.add_argument("--fp-url", default="http://127.0.0.1:5005")
+    ap.add_argument("--deposit-type", default="oil")
+    ap.add_argument("--enroll-synthetic", action="store_true")
+    args = ap.parse_args()
+
+    employees, make_client = setup_odoo(args) if args.odoo else setup_service(args)
+    latencies, failures, presented, matched = [], [], [], []
+    lock = threading.Lock()
+
+    def worker(n):
+        client = make_client()
+        for r in range(args.rounds):
+            expected = employees[(n * args.rounds + r * 7) % len(employees)]
+            t0 = time.perf_counter()
+            got = client.login(expected)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                presented.append(expected)
+                if got is None:
+                    failures.append(expected)
+                else:
+                    matched.append(got)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    # presented fingers and identifies interleave across clients, so a client
+    # may get another client's finger; over the run the two must add up
+    mixed_up = collections.Counter(presented) != collections.Counter(matched)
+    latencies.sort()
+    print(f"{'odoo' if args.odoo else 'service'}: {len(employees)} enrolled, "
+          f"{args.clients} clients x {args.rounds} logins")
+    print(f"  {len(latencies) / wall:.1f} logins/s, p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms, failed {len(failures)}, "
+          f"identities {'MIXED UP' if mixed_up else 'ok'}")
+    if failures or mixed_up:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
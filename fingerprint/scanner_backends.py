@@ -0,0 +1,137 @@
+"""
+Scanner backends for the fingerprint service.
+
+ScannerManager and the matcher only talk to a ScannerBackend:
+
+    probe()                 number of connected devices, without opening one
+    open() / close()        Init + OpenDevice + DBInit / CloseDevice + Terminate
+    device_count()          cheap health check on an open device
+    capture()               (template bytes, image bytes), or None while no finger
+    match(t1, t2)           1:1 score
+    db_add(fid, t) / db_del(fid) / db_clear()
+    db_identify(t)          (fid, score) of the best in-device DB match, fid <= 0 if none
+
+FP_SCANNER_BACKEND selects the implementation:
+
+    zkfp       ZKTeco scanner through pyzkfp (ZKFinger SDK, Windows)
+    simulated  pure-Python simulator, see scanner_sim.py
+"""
+
+import os
+
+SCANNER_BACKEND = os.getenv("FP_SCANNER_BACKEND", "zkfp").lower()
+
+
+class ScannerBackend:
+    name = None
+
+    def probe(self) -> int:
+        raise NotImplementedError
+
+    def open(self) -> int:
+        """Open device 0 and its template DB. Returns the device count."""
+        raise NotImplementedError
+
+    def close(self):
+        raise NotImplementedError
+
+    def device_count(self) -> int:
+        raise NotImplementedError
+
+    def capture(self):
+        raise NotImplementedError
+
+    def match(self, template1: bytes, template2: bytes) -> int:
+        raise NotImplementedError
+
+    def db_add(self, fid: int, template: bytes):
+        raise NotImplementedError
+
+    def db_del(self, fid: int):
+        raise NotImplementedError
+
+    def db_clear(self):
+        raise NotImplementedError
+
+    def db_identify(self, template: bytes):
+        raise NotImplementedError
+
+
+class ZKFPBackend(ScannerBackend):
+    """ZKTeco scanner through pyzkfp.ZKFP2."""
+
+    name = "zkfp"
+
+    def __init__(self):
+        from pyzkfp import ZKFP2
+        self._z = ZKFP2()
+
+    def probe(self):
+        self._z.Init()
+        try:
+            return self._z.GetDeviceCount()
+        finally:
+            try:
+                self._z.Terminate()
+            except Exception:
+                pass
+
+    def open(self):
+        self._z.Init()
+        count = self._z.GetDeviceCount()
+        if count <= 0:
+            try:
+                self._z.Terminate()
+            except Exception:
+                pass
+            raise Exception("No fingerprint scanner found.")
+        self._z.OpenDevice(0)
+        self._z.DBInit()
+        # SetParameters intentionally skipped due to wrapper incompatibility
+        return count
+
+    def close(self):
+        try:
+            self._z.CloseDevice()
+        finally:
+            self._z.Terminate()
+
+    def device_count(self):
+        return self._z.GetDeviceCount()
+
+    def capture(self):
+        res = self._z.AcquireFingerprint()
+        if not res:
+            return None
+        # Verified from real test:
+        # res[0] = template (System.Byte[]) len=2048
+        # res[1] = image bytes len=120000
+        if isinstance(res, (tuple, list)) and len(res) >= 2 and res[0] is not None:
+            return bytes(res[0]), res[1]
+        return None
+
+    def match(self, template1, template2):
+        return self._z.DBMatch(template1, template2)
+
+    def db_add(self, fid, template):
+        self._z.DBAdd(fid, template)
+
+    def db_del(self, fid):
+        self._z.DBDel(fid)
+
+    def db_clear(self):
+        self._z.DBClear()
+
+    def db_identify(self, template):
+        fid, score = self._z.DBIdentify(template)
+        return fid, score
+
+
+def create_backend(name=None):
+    name = (name or SCANNER_BACKEND).lower()
+    if name == "zkfp":
+        return ZKFPBackend()
+    if name == "simulated":
+        from scanner_sim import SimulatedScanner
+        return SimulatedScanner()
+    raise ValueError(f"Unknown FP_SCANNER_BACKEND: {name}")
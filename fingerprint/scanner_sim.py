@@ -0,0 +1,162 @@
+"""
+Simulated fingerprint scanner (FP_SCANNER_BACKEND=simulated).
+
+Pure Python, deterministic, for development, benchmarks and load tests
+on machines without the device or the ZKFinger SDK:
+
+- templates are synthetic 2048-byte buffers derived from a finger name;
+  every capture of the same finger differs by FP_SIM_CAPTURE_NOISE of its
+  bytes, the same way two real captures never match exactly
+- the score is the share of equal bytes scaled to 0..100: two captures of
+  one finger score about 80, different fingers about 0
+- the finger on the sensor is the next one queued with present_finger()
+  (POST /api/v1/fingerprint/simulator/present), else FP_SIM_FINGER
+  (empty = nobody touches the sensor, captures time out)
+
+Timings (seconds):
+
+    FP_SIM_INIT_SECONDS     ZKFP2.Init                    (default 0.4)
+    FP_SIM_OPEN_SECONDS     OpenDevice                    (default 0.6)
+    FP_SIM_DBINIT_SECONDS   DBInit                        (default 0.05)
+    FP_SIM_CAPTURE_SECONDS  finger read after polling     (default 0.2)
+    FP_SIM_MATCH_SECONDS    one DBMatch                   (default 0.0005)
+    FP_SIM_IDENTIFY_SECONDS DBIdentify, per template      (default 0.000002)
+"""
+
+import collections
+import hashlib
+import os
+import random
+import threading
+import time
+
+from scanner_backends import ScannerBackend
+
+INIT_SECONDS = float(os.getenv("FP_SIM_INIT_SECONDS", "0.4"))
+OPEN_SECONDS = float(os.getenv("FP_SIM_OPEN_SECONDS", "0.6"))
+DBINIT_SECONDS = float(os.getenv("FP_SIM_DBINIT_SECONDS", "0.05"))
+CAPTURE_SECONDS = float(os.getenv("FP_SIM_CAPTURE_SECONDS", "0.2"))
+MATCH_SECONDS = float(os.getenv("FP_SIM_MATCH_SECONDS", "0.0005"))
+IDENTIFY_SECONDS = float(os.getenv("FP_SIM_IDENTIFY_SECONDS", "0.000002"))
+CAPTURE_NOISE = float(os.getenv("FP_SIM_CAPTURE_NOISE", "0.1"))
+DEFAULT_FINGER = os.getenv("FP_SIM_FINGER", "sim-finger")
+
+TEMPLATE_SIZE = 2048
+IMAGE_SIZE = 120000
+
+_presented = collections.deque()
+_presented_lock = threading.Lock()
+
+
+def present_finger(finger, count=1):
+    """Queue a finger for the next capture(s)."""
+    with _presented_lock:
+        _presented.extend([str(finger)] * count)
+
+
+def _next_finger():
+    with _presented_lock:
+        if _presented:
+            return _presented.popleft()
+    return DEFAULT_FINGER or None
+
+
+def synthetic_template(finger, capture=None) -> bytes:
+    """
+    2048-byte template of a finger. capture=None is the clean template;
+    capture=n is the n-th capture, with CAPTURE_NOISE of the bytes replaced.
+    """
+    out = bytearray()
+    block = str(finger).encode("utf-8")
+    while len(out) < TEMPLATE_SIZE:
+        block = hashlib.sha256(block).digest()
+        out.extend(block)
+    del out[TEMPLATE_SIZE:]
+
+    if capture is not None and CAPTURE_NOISE > 0:
+        rng = random.Random(f"{finger}:{capture}")
+        for index in rng.sample(range(TEMPLATE_SIZE), int(TEMPLATE_SIZE * CAPTURE_NOISE)):
+            out[index] = rng.randrange(256)
+    return bytes(out)
+
+
+def similarity(template1, template2) -> int:
+    """Share of equal bytes, scaled so unrelated templates score about 0."""
+    diff = int.from_bytes(template1, "big") ^ int.from_bytes(template2, "big")
+    equal = diff.to_bytes(TEMPLATE_SIZE, "big").count(0) / TEMPLATE_SIZE
+    chance = 1 / 256
+    return max(0, min(100, round(100 * (equal - chance) / (1 - chance))))
+
+
+class SimulatedScanner(ScannerBackend):
+    name = "simulated"
+
+    def __init__(self, device_count=1):
+        self._device_count = device_count
+        self.initialized = False
+        self.opened = False
+        self._poll_started = None
+        self._db = {}
+        self.captures = 0
+
+    def probe(self):
+        return self._device_count
+
+    def open(self):
+        time.sleep(INIT_SECONDS)
+        self.initialized = True
+        if self._device_count <= 0:
+            raise Exception("No fingerprint scanner found.")
+        time.sleep(OPEN_SECONDS)
+        self.opened = True
+        time.sleep(DBINIT_SECONDS)
+        self._db = {}
+        return self._device_count
+
+    def close(self):
+        self.opened = False
+        self.initialized = False
+
+    def device_count(self):
+        if not self.initialized:
+            raise RuntimeError("Scanner not initialized")
+        return self._device_count
+
+    def capture(self):
+        """None until CAPTURE_SECONDS after polling started, then the finger on the sensor."""
+        if not self.opened:
+            raise RuntimeError("Device not opened")
+        now = time.time()
+        if self._poll_started is None:
+            self._poll_started = now
+        if now - self._poll_started < CAPTURE_SECONDS:
+            return None
+        finger = _next_finger()
+        if finger is None:
+            return None
+        self._poll_started = None
+        self.captures += 1
+        return synthetic_template(finger, capture=self.captures), bytes(IMAGE_SIZE)
+
+    def match(self, template1, template2):
+        time.sleep(MATCH_SECONDS)
+        return similarity(bytes(template1), bytes(template2))
+
+    def db_add(self, fid, template):
+        self._db[fid] = bytes(template)
+
+    def db_del(self, fid):
+        self._db.pop(fid, None)
+
+    def db_clear(self):
+        self._db.clear()
+
+    def db_identify(self, template):
+        time.sleep(IDENTIFY_SECONDS * len(self._db))
+        template = bytes(template)
+        best = (-1, 0)
+        for fid, stored in self._db.items():
+            score = similarity(stored, template)
+            if score > best[1]:
+                best = (fid, score)
+        return best
@@ -0,0 +1,313 @@
+"""
+Persistent template store for the fingerprint service.
+
+A file of fixed-size records, memory-mapped, one 2048-byte template per
+record. The ID index ({key: slot}) is rebuilt from the file when it is
+opened, so a restart reloads thousands of templates in milliseconds.
+
+File layout (little endian):
+
+    header   512 bytes   magic, format, record/template size, version
+    record   2560 bytes  x slots
+
+    record   0    state     u8   0 free, 1 live, 2 tombstone
+             4    crc32     u32  of bytes 8..2560
+             8    seq       u64  write sequence, the newest record of a key wins
+             16   key_len   u16
+             18   meta_len  u16
+             20   key       64 bytes, utf-8
+             84   meta      428 bytes, json
+             512  template  2048 bytes
+
+Writes are crash-safe: new records go to free slots and are fsynced before
+the records they replace are tombstoned (and fsynced again). After a crash
+the file holds the old record, the new one, or both; on open a torn record
+fails its crc and is dropped, and of two live records of a key the higher
+seq wins. Tombstoned slots are reused by later writes.
+
+path=None keeps the store in anonymous memory (nothing persisted).
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+TEMPLATE_SIZE = 2048
+HEADER_SIZE = 512
+RECORD_SIZE = 2560
+KEY_SIZE = 64
+META_SIZE = 428
+GROW_SLOTS = 256
+
+MAGIC = b"GLFPSTOR"
+FORMAT = 1
+
+FREE, LIVE, TOMBSTONE = 0, 1, 2
+
+# magic, format, record size, template size, version
+_HEADER = struct.Struct("<8sHII q")
+# state, crc32, seq, key_len, meta_len
+_RECORD = struct.Struct("<B3xIQHH")
+_KEY_OFFSET = _RECORD.size
+_META_OFFSET = _KEY_OFFSET + KEY_SIZE
+_TEMPLATE_OFFSET = RECORD_SIZE - TEMPLATE_SIZE
+_decode_meta = json.JSONDecoder().decode
+
+
+class TemplateStore:
+
+    def __init__(self, path=None, grow_slots=GROW_SLOTS):
+        self.path = path
+        self._grow_slots = grow_slots
+        self._lock = threading.RLock()
+        self._fd = None
+        self._mm = None
+        self._slots = 0
+        self._index = {}
+        self._free = []
+        self._seq = 0
+        self.version = 0
+        self.repaired = 0
+        self._open()
+
+    # ---------------------------------------------------------
+    # File
+    # ---------------------------------------------------------
+
+    def _open(self):
+        if self.path is None:
+            self._map(HEADER_SIZE + self._grow_slots * RECORD_SIZE)
+            self._write_header()
+            self._scan()
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o600)
+        size = os.fstat(self._fd).st_size
+        if size == 0:
+            size = HEADER_SIZE + self._grow_slots * RECORD_SIZE
+            os.ftruncate(self._fd, size)
+            self._map(size)
+            self._write_header()
+            self._sync()
+        else:
+            self._map(size)
+            magic, fmt, record_size, template_size, version = _HEADER.unpack_from(self._mm, 0)
+            if (magic, fmt, record_size, template_size) != (MAGIC, FORMAT, RECORD_SIZE, TEMPLATE_SIZE):
+                self.close()
+                raise ValueError(f"{self.path} is not a template store (format {FORMAT})")
+            self.version = version
+        self._scan()
+
+    def _map(self, size):
+        if self._fd is None:
+            mm = mmap.mmap(-1, size)
+            if self._mm is not None:
+                mm[:len(self._mm)] = self._mm
+                self._mm.close()
+        else:
+            if self._mm is not None:
+                self._mm.close()
+            mm = mmap.mmap(self._fd, size)
+        self._mm = mm
+        self._slots = (size - HEADER_SIZE) // RECORD_SIZE
+
+    def _grow(self):
+        old = self._slots
+        size = HEADER_SIZE + (old + self._grow_slots) * RECORD_SIZE
+        if self._fd is not None:
+            self._mm.close()
+            self._mm = None
+            os.ftruncate(self._fd, size)
+        self._map(size)
+        self._free.extend(range(self._slots - 1, old - 1, -1))
+
+    def _write_header(self):
+        _HEADER.pack_into(self._mm, 0, MAGIC, FORMAT, RECORD_SIZE, TEMPLATE_SIZE, self.version)
+
+    def _sync(self):
+        if self._fd is None:
+            return
+        self._mm.flush()
+        os.fsync(self._fd)
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    # ---------------------------------------------------------
+    # Records
+    # ---------------------------------------------------------
+
+    @staticmethod
+    def _offset(slot):
+        return HEADER_SIZE + slot * RECORD_SIZE
+
+    def _scan(self):
+        """Rebuild the index and free list; drop torn and superseded records."""
+        mm = self._mm
+        live = {}
+        stale = []
+        # a view, not slices: the crc reads the mapping without copying it
+        with memoryview(mm) as view:
+            for slot in range(self._slots):
+                offset = self._offset(slot)
+                state, crc, seq, key_len, _meta_len = _RECORD.unpack_from(view, offset)
+                if seq > self._seq:
+                    self._seq = seq
+                if state != LIVE:
+                    continue
+                if zlib.crc32(view[offset + 8:offset + RECORD_SIZE]) != crc:
+                    stale.append(slot)
+                    continue
+                key = bytes(view[offset + _KEY_OFFSET:offset + _KEY_OFFSET + key_len]).decode("utf-8")
+                current = live.get(key)
+                if current is None or current[0] < seq:
+                    if current is not None:
+                        stale.append(current[1])
+                    live[key] = (seq, slot)
+                else:
+                    stale.append(slot)
+
+        for slot in stale:
+            mm[self._offset(slot)] = TOMBSTONE
+        if stale:
+            self._sync()
+        self.repaired = len(stale)
+
+        self._index = {key: slot for key, (_seq, slot) in live.items()}
+        used = set(self._index.values())
+        self._free = [slot for slot in range(self._slots - 1, -1, -1) if slot not in used]
+
+    def _encode(self, key, template, meta):
+        key_raw = str(key).encode("utf-8")
+        meta_raw = json.dumps(meta or {}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if not key_raw or len(key_raw) > KEY_SIZE:
+            raise ValueError(f"Template store key must be 1..{KEY_SIZE} bytes: {key!r}")
+        if len(meta_raw) > META_SIZE:
+            raise ValueError(f"Template store meta of {key!r} is {len(meta_raw)} bytes, max {META_SIZE}")
+        if len(template) != TEMPLATE_SIZE:
+            raise ValueError(f"Template size is {len(template)}, expected {TEMPLATE_SIZE}")
+        return key_raw, meta_raw, bytes(template)
+
+    def _write_record(self, slot, key_raw, meta_raw, template):
+        self._seq += 1
+        record = bytearray(RECORD_SIZE)
+        _RECORD.pack_into(record, 0, LIVE, 0, self._seq, len(key_raw), len(meta_raw))
+        record[_KEY_OFFSET:_KEY_OFFSET + len(key_raw)] = key_raw
+        record[_META_OFFSET:_META_OFFSET + len(meta_raw)] = meta_raw
+        record[_TEMPLATE_OFFSET:] = template
+        struct.pack_into("<I", record, 4, zlib.crc32(record[8:]))
+        offset = self._offset(slot)
+        self._mm[offset:offset + RECORD_SIZE] = record
+
+    def _read(self, slot):
+        offset = self._offset(slot)
+        record = self._mm[offset:offset + RECORD_SIZE]
+        _state, _crc, _seq, key_len, meta_len = _RECORD.unpack_from(record)
+        key = record[_KEY_OFFSET:_KEY_OFFSET + key_len].decode("utf-8")
+        meta = _decode_meta(record[_META_OFFSET:_META_OFFSET + meta_len].decode("utf-8") or "{}")
+        return key, meta, record[_TEMPLATE_OFFSET:]
+
+    # ---------------------------------------------------------
+    # API
+    # ---------------------------------------------------------
+
+    def commit(self, puts=(), deletes=(), version=None):
+        """
+        puts:    [(key, template bytes, meta dict)] - insert or replace
+        deletes: [key]
+        version: stored in the header with the change
+        Raises ValueError on a bad record (nothing is written).
+        """
+        encoded = [self._encode(key, template, meta) for key, template, meta in puts]
+        with self._lock:
+            replaced = []
+            written = {}
+            for key_raw, meta_raw, template in encoded:
+                if not self._free:
+                    self._grow()
+                slot = self._free.pop()
+                self._write_record(slot, key_raw, meta_raw, template)
+                key = key_raw.decode("utf-8")
+                if key in written:
+                    replaced.append(written[key])
+                elif key in self._index:
+                    replaced.append(self._index[key])
+                written[key] = slot
+            if written:
+                self._sync()
+
+            for key in deletes:
+                key = str(key)
+                if key in self._index and key not in written:
+                    replaced.append(self._index.pop(key))
+            for slot in replaced:
+                self._mm[self._offset(slot)] = TOMBSTONE
+            if version is not None:
+                self.version = int(version)
+                self._write_header()
+            if replaced or version is not None:
+                self._sync()
+
+            self._index.update(written)
+            self._free.extend(replaced)
+
+    def put(self, key, template, meta=None):
+        self.commit(puts=[(key, template, meta)])
+
+    def delete(self, key):
+        """Returns False when the key is not stored."""
+        with self._lock:
+            if str(key) not in self._index:
+                return False
+            self.commit(deletes=[key])
+            return True
+
+    def clear(self):
+        with self._lock:
+            self.commit(deletes=list(self._index))
+
+    def get(self, key):
+        """(meta, template bytes) or None."""
+        with self._lock:
+            slot = self._index.get(str(key))
+            if slot is None:
+                return None
+            _key, meta, template = self._read(slot)
+            return meta, template
+
+    def items(self):
+        """[(key, meta, template bytes)] of all live records."""
+        with self._lock:
+            return [self._read(slot) for slot in self._index.values()]
+
+    def keys(self):
+        with self._lock:
+            return list(self._index)
+
+    def __contains__(self, key):
+        return str(key) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "count": len(self._index),
+                "slots": self._slots,
+                "free_slots": len(self._free),
+                "file_size": HEADER_SIZE + self._slots * RECORD_SIZE,
+                "version": self.version,
+                "repaired_on_open": self.repaired,
+            }
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: CloseShift pending-deposit callbacks — one by one vs pooled vs batch.
+
+Starts http_app.py in-process on a free port and sends N pending deposits
+with gas_station_cash's PosBulkSender, the way CloseShift does:
+  - sequential:  one new connection per deposit (former requests.post loop)
+  - pooled:      keep-alive session, --concurrency requests in flight
+  - batch:       /deposit/batch, --batch transactions per request
+Every deposit must be acknowledged; a second pooled pass re-sends the same
+transaction IDs and must be answered DUPLICATE (idempotency).
+
+Usage:
+    python bench_deposit_bulk.py [--sizes 10,50,200] [--concurrency 4] [--batch 50]
+
+Environment variables:
+    MOCK_LATENCY_MS   simulated POS processing time per request (default: 20)
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+import requests
+
+os.environ.setdefault("MOCK_LATENCY_MS", "20")
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "GloryIntermedia", "custom_addons", "gas_station_cash", "controllers"))
+
+import http_app  # noqa: E402
+from pos_bulk_sender import PosBulkSender  # noqa: E402
+
+
+def _jobs(endpoint, run, n):
+    return [{
+        "id": i,
+        "endpoint": endpoint,
+        "url": f"http://{endpoint}/deposit",
+        "payload": {"transaction_id": f"BENCH-{run}-{i}", "staff_id": "BENCH", "amount": 100},
+    } for i in range(n)]
+
+
+def sequential(jobs):
+    ok = 0
+    for job in jobs:
+        resp = requests.post(job["url"], json=job["payload"], timeout=5.0)
+        ok += resp.json().get("status") == "OK"
+    return ok
+
+
+def bulk(jobs, **kw):
+    sender = PosBulkSender(timeout=5.0, **kw)
+    try:
+        return sum(res["ok"] for res in sender.send(jobs))
+    finally:
+        sender.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,50,200")
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--batch", type=int, default=50)
+    args = ap.parse_args()
+
+    http_app.print = lambda *a, **k: None  # the mock prints every request
+    logging.disable(logging.INFO)
+    server = http_app.start_server()
+    host, port = server.server_address
+    endpoint = f"{host}:{port}"
+
+    print(f"POS mock {endpoint}, latency {http_app.LATENCY * 1000:.0f}ms per request")
+    print(f"{'pending':>7}  {'sequential':>10}  {'pooled x' + str(args.concurrency):>10}  "
+          f"{'batch ' + str(args.batch):>10}  {'resend':>7}")
+    for n in (int(x) for x in args.sizes.split(",")):
+        row = []
+        for label, fn in (
+            ("seq", lambda jobs: sequential(jobs)),
+            ("pool", lambda jobs: bulk(jobs, concurrency=args.concurrency)),
+            ("batch", lambda jobs: bulk(jobs, concurrency=args.concurrency,
+                                        batch_path="/deposit/batch", batch_size=args.batch)),
+        ):
+            jobs = _jobs(endpoint, f"{label}{n}", n)
+            t0 = time.perf_counter()
+            acked = fn(jobs)
+            row.append(time.perf_counter() - t0)
+            assert acked == n, f"{label}: {acked}/{n} acknowledged"
+
+        # idempotency: the pooled run's IDs again → DUPLICATE, still acknowledged
+        resent = bulk(_jobs(endpoint, f"pool{n}", n), concurrency=args.concurrency)
+        assert resent == n
+        print(f"{n:>7}  {row[0]:>9.2f}s  {row[1]:>9.2f}s  {row[2]:>9.2f}s  {'ok':>7}")
+
+    print(f"recorded {len(http_app.transactions)} unique transactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: POS TCP messages/s — connect per message vs pooled keep-alive vs pipelined.
+
+Starts tcp_app.py in-process on a free port (or uses --host/--port of a
+running mock) and drives it with pos_tcp_connector's PosTcpClient.
+
+Usage:
+    python bench_tcp_pool.py [messages] [--threads N] [--batch N] [--host H --port P]
+
+Environment variables:
+    MOCK_LATENCY_MS   simulated latency of the in-process mock (default: 0)
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "GloryIntermedia", "custom_addons", "pos_tcp_connector", "services"))
+
+import tcp_app  # noqa: E402
+from pos_tcp_client import PosTcpClient, close_pools  # noqa: E402
+
+
+def _payload(i):
+    return {"transaction_id": f"BENCH-{i}", "staff_id": "BENCH", "amount": 100}
+
+
+def run(label, n, threads, fn):
+    t0 = time.perf_counter()
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(fn, range(threads)))
+    else:
+        fn(0)
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<24} {n:>7} msgs  {elapsed:7.2f}s  {n / elapsed:9.0f} msgs/s")
+    return n / elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("messages", nargs="?", type=int, default=5000)
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--batch", type=int, default=50, help="messages per pipelined round trip")
+    ap.add_argument("--host")
+    ap.add_argument("--port", type=int)
+    args = ap.parse_args()
+
+    if args.host and args.port:
+        host, port = args.host, args.port
+    else:
+        server = tcp_app.start_server(port=0)
+        host, port = server.server_address
+
+    per_thread = max(1, args.messages // args.threads)
+    total = per_thread * args.threads
+
+    def single(pooled):
+        def fn(tid):
+            client = PosTcpClient(host, port, timeout=5.0, pooled=pooled)
+            for i in range(per_thread):
+                client.send_message(_payload(tid * per_thread + i))
+        return fn
+
+    def pipelined(tid):
+        client = PosTcpClient(host, port, timeout=5.0)
+        base = tid * per_thread
+        for start in range(0, per_thread, args.batch):
+            count = min(args.batch, per_thread - start)
+            resps = client.send_messages([_payload(base + start + k) for k in range(count)])
+            assert len(resps) == count
+
+    import logging
+    logging.disable(logging.INFO)  # the client logs every message at INFO
+
+    print(f"POS mock {host}:{port}, {args.threads} thread(s)")
+    base = run("connect per message", total, args.threads, single(False))
+    pooled = run("pooled keep-alive", total, args.threads, single(True))
+    piped = run(f"pipelined x{args.batch}", total, args.threads, pipelined)
+    close_pools()
+    print(f"speed-up: pooled {pooled / base:.1f}x, pipelined {piped / base:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,32 +6,42 @@ Supports both FirstPro and FlowCo URL patterns
 
 FirstPro endpoints:
     POST /deposit
+    POST /deposit/batch      {"transactions": [...]} → {"results": [...]}
     POST /CloseShift
     POST /EndOfDay
     POST /HeartBeat
 
 FlowCo endpoints:
     POST /pos/deposit
+    POST /pos/deposit/batch
     POST /pos/CloseShift
     POST /pos/EndOfDay
     POST /pos/HeartBeat
 
+Deposits are idempotent on transaction_id: a repeated one is answered with
+status DUPLICATE and not recorded again.
+
 Usage:
     python mock_pos_http.py [port]
     
     Default port: 9001
+
+Environment variables:
+    MOCK_LATENCY_MS   simulated processing time per deposit request (default: 0)
 """
 
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 from datetime import datetime
 import os
 import sys
+import threading
+import time
 import requests
 
 # Configuration
 HOST = "0.0.0.0"
-PORT = int(sys.argv[1]) if len(sys.argv) > 1 else 9003
+PORT = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 9003
 
 # Track transactions for testing
 transactions  = []
@@ -39,6 +49,10 @@ shifts_closed = 0
 end_of_days   = 0
 heartbeats    = 0
 
+LATENCY = float(os.getenv("MOCK_LATENCY_MS", "0")) / 1000.0
+_tx_lock = threading.Lock()
+_seen_tx = set()   # transaction_ids already recorded (idempotency)
+
 # ===============================
 # ODOO TARGET (POS -> ODOO)
 # ===============================
@@ -47,14 +61,17 @@ ODOO_BASE_URL = os.getenv("ODOO_BASE_URL", "http://127.0.0.1:8069").rstrip("/")
 ODOO_TIMEOUT = float(os.getenv("ODOO_TIMEOUT", "5.0"))
 
 class MockPOSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive for pooled clients
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
     
     def _send_json_response(self, data, status=200):
         """Send JSON response"""
+        response = json.dumps(data, ensure_ascii=False).encode('utf-8')
         self.send_response(status)
         self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(response)))
         self.end_headers()
-        response = json.dumps(data, ensure_ascii=False)
-        self.wfile.write(response.encode('utf-8'))
+        self.wfile.write(response)
         print(f"📤 TX [{status}]: {data}")
     
     def _read_json_body(self):
@@ -120,7 +137,7 @@ class MockPOSHandler(BaseHTTPRequestHandler):
     
     def do_POST(self):
         """Handle POST requests"""
-        path = self.path.lower()
+        path = self.path.lower().split('?')[0]
         body = self._read_json_body()
         
         print(f"\n{'='*60}")
@@ -130,6 +147,8 @@ class MockPOSHandler(BaseHTTPRequestHandler):
         # Route to appropriate handler — compare lowercase to handle both vendors
         if path in ['/deposit', '/pos/deposit']:
             self._handle_deposit(body)
+        elif path in ['/deposit/batch', '/pos/deposit/batch']:
+            self._handle_deposit_batch(body)
         elif path in ['/closeshift', '/pos/closeshift']:
             self._handle_close_shift(body)
         elif path in ['/endofday', '/pos/endofday']:
@@ -157,8 +176,8 @@ class MockPOSHandler(BaseHTTPRequestHandler):
         else:
             self._send_json_response({"status": "OK", "message": "Mock POS Server"})
     
-    def _handle_deposit(self, body):
-        """Handle deposit request"""
+    def _record_deposit(self, body):
+        """Record one deposit (idempotent on transaction_id) and build its result"""
         global transactions
         
         transaction_id = body.get('transaction_id', 'UNKNOWN')
@@ -167,25 +186,56 @@ class MockPOSHandler(BaseHTTPRequestHandler):
         type_id = body.get('type_id', '-')   # FlowCo: F=Fuel, L=Lube
         pos_id  = body.get('pos_id', '-')    # FlowCo: POS terminal number
         
-        # Store transaction
-        transactions.append({
-            'transaction_id': transaction_id,
-            'staff_id': staff_id,
-            'amount': amount,
-            'type_id': type_id,
-            'pos_id': pos_id,
-            'timestamp': datetime.now().isoformat(),
-        })
+        with _tx_lock:
+            duplicate = transaction_id in _seen_tx
+            if not duplicate:
+                _seen_tx.add(transaction_id)
+                # Store transaction
+                transactions.append({
+                    'transaction_id': transaction_id,
+                    'staff_id': staff_id,
+                    'amount': amount,
+                    'type_id': type_id,
+                    'pos_id': pos_id,
+                    'timestamp': datetime.now().isoformat(),
+                })
+        
+        if duplicate:
+            print(f"🔁 Deposit: tx={transaction_id} already recorded")
+            return {
+                "transaction_id": transaction_id,
+                "status": "DUPLICATE",
+                "description": "Already recorded",
+                "time_stamp": datetime.now().isoformat(),
+            }
         
         print(f"✅ Deposit: tx={transaction_id}, staff={staff_id}, amount={amount}, type={type_id}, pos={pos_id}")
         print(f"   Total transactions: {len(transactions)}")
         
-        self._send_json_response({
+        return {
             "transaction_id": transaction_id,
             "status": "OK",
             "discription": "Deposit Success",  # Note: POS uses "discription" (typo)
             "description": "Deposit Success",
             "time_stamp": datetime.now().isoformat(),
+        }
+    
+    def _handle_deposit(self, body):
+        """Handle deposit request"""
+        if LATENCY:
+            time.sleep(LATENCY)
+        self._send_json_response(self._record_deposit(body))
+    
+    def _handle_deposit_batch(self, body):
+        """Handle batch deposit request — one result per transaction"""
+        items = body.get('transactions') or []
+        print(f"📦 Deposit batch: {len(items)} transaction(s)")
+        if LATENCY:
+            time.sleep(LATENCY)
+        self._send_json_response({
+            "status": "OK",
+            "results": [self._record_deposit(item) for item in items if isinstance(item, dict)],
+            "time_stamp": datetime.now().isoformat(),
         })
     
         
@@ -303,6 +353,14 @@ class MockPOSHandler(BaseHTTPRequestHandler):
         pass
 
 
+def start_server(host="127.0.0.1", port=0):
+    """Start the mock in a background thread. Returns the server (port 0 = any free port)."""
+    server = ThreadingHTTPServer((host, port), MockPOSHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
 def main():
     print(f"""
 ╔══════════════════════════════════════════════════════════════╗
@@ -315,12 +373,14 @@ def main():
 ║                                                              ║
 ║  FirstPro Pattern:                                           ║
 ║    POST /deposit      - Receive deposit                      ║
+║    POST /deposit/batch - Receive several deposits            ║
 ║    POST /CloseShift   - Close shift                          ║
 ║    POST /EndOfDay     - End of day                           ║
 ║    POST /HeartBeat    - Heartbeat check                      ║
 ║                                                              ║
 ║  FlowCo Pattern:                                             ║
 ║    POST /POS/Deposit      - Receive deposit                  ║
+║    POST /POS/Deposit/Batch - Receive several deposits        ║
 ║    POST /POS/CloseShift   - Close shift                      ║
 ║    POST /POS/EndOfDay     - End of day                       ║
 ║    POST /POS/HeartBeat    - Heartbeat check                  ║
@@ -330,7 +390,7 @@ def main():
 ╚══════════════════════════════════════════════════════════════╝
     """)
     
-    server = HTTPServer((HOST, PORT), MockPOSHandler)
+    server = ThreadingHTTPServer((HOST, PORT), MockPOSHandler)
     print(f"🚀 Server started at http://{HOST}:{PORT}")
     print(f"   Press Ctrl+C to stop\n")
     
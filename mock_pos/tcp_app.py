@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+POS Mock TCP Server (newline-delimited JSON)
+
+Speaks the same framing as pos_tcp_connector: one JSON object per line,
+one JSON response line per request. Connections stay open, so clients may
+keep a socket alive and pipeline several requests on it.
+
+    {"transaction_id": "...", ...}\n   →   {"transaction_id": "...", "status": "OK"}\n
+
+If the request carries a correlation_id it is echoed back.
+
+Usage:
+    python tcp_app.py [port]
+    Default port: 9004
+
+Environment variables:
+    MOCK_LATENCY_MS   simulated processing time per message (default: 0)
+"""
+
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+LATENCY = float(os.getenv("MOCK_LATENCY_MS", "0")) / 1000.0
+
+_count_lock = threading.Lock()
+_counts = {"connections": 0, "messages": 0}
+
+
+class JsonLineHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        with _count_lock:
+            _counts["connections"] += 1
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                req = json.loads(line)
+                resp = {
+                    "transaction_id": req.get("transaction_id"),
+                    "status": "OK",
+                    "description": "Success",
+                }
+                if "correlation_id" in req:
+                    resp["correlation_id"] = req["correlation_id"]
+            except ValueError:
+                resp = {"status": "FAILED", "description": "Invalid JSON"}
+            if LATENCY:
+                time.sleep(LATENCY)
+            with _count_lock:
+                _counts["messages"] += 1
+            self.wfile.write((json.dumps(resp, ensure_ascii=False) + "\n").encode("utf-8"))
+
+
+class MockPosTcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start_server(host="127.0.0.1", port=9004):
+    """Start the mock in a background thread. Returns the server (port 0 = any free port)."""
+    server = MockPosTcpServer((host, port), JsonLineHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def get_counts():
+    with _count_lock:
+        return dict(_counts)
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 9004
+    server = MockPosTcpServer(("0.0.0.0", port), JsonLineHandler)
+    print(f"POS mock TCP server listening on 0.0.0.0:{port} (latency {LATENCY * 1000:.0f}ms)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nstopped — {get_counts()}")
@@ -2,6 +2,10 @@
 """
 app2.py — Flask Print Service สำหรับ Xprinter XP-80C (Windows GDI)
 
+PRINT_BACKEND:
+    gdi      (default) printer2.py — Windows GDI
+    escpos   escpos_backend.py — ESC/POS text mode ผ่าน TCP 9100 / USB / ไฟล์ (รันบน Linux ได้)
+
 Endpoints:
     POST /print/deposit              — ใบเสร็จ Cash Deposit (พร้อม breakdown)
     POST /print/deposit_with_amount  — ใบเสร็จ Deposit with Amount (ไม่มี breakdown)
@@ -10,12 +14,19 @@ Endpoints:
     POST /print/close_shift          — ใบสรุปปิดกะ
     POST /print/eod                  — ใบสรุป End of Day
     POST /print/collect_cash         — ใบเสร็จ Collect Cash
+      (ทุก /print/<kind> เข้าคิว print_spooler แล้วตอบ 202 + job_id ทันที)
+    GET  /print/jobs                 — งานพิมพ์ล่าสุด (?state=failed&limit=50)
+    GET  /print/jobs/<id>            — สถานะงานพิมพ์ (queued / printing / done / failed)
+    POST /print/jobs/<id>/retry      — พิมพ์งาน failed ใหม่
+    POST /print/preview/<kind>       — render ใบเสร็จเป็น PNG (ไม่พิมพ์) เช่น /print/preview/deposit
     GET  /health                     — Health check
 """
 
 import logging
-from flask import Flask, request, jsonify
-from printer2 import print_receipt
+import os
+from flask import Flask, request, jsonify, Response
+from render_engine import get_engine
+from print_spooler import PrintSpooler
 from receipt_builder2 import (
     build_deposit_receipt,
     build_deposit_with_amount_receipt,
@@ -32,37 +43,65 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PRINT_BACKEND = os.getenv("PRINT_BACKEND", "gdi").lower()
+if PRINT_BACKEND == "escpos":
+    from escpos_backend import print_receipt
+else:
+    from printer2 import print_receipt
+
 app = Flask(__name__)
 
+BUILDERS = {
+    "deposit":             build_deposit_receipt,
+    "deposit_with_amount": build_deposit_with_amount_receipt,
+    "withdrawal":          build_withdrawal_receipt,
+    "replenish":           build_replenish_receipt,
+    "close_shift":         build_close_shift_receipt,
+    "eod":                 build_eod_receipt,
+    "collect_cash":        build_collect_cash_receipt,
+}
+
+
+def _print_job(kind, data):
+    print_receipt(BUILDERS[kind](data))
+
 
-def _print_or_error(builder_fn, data):
+spooler = PrintSpooler(_print_job)
+spooler.start()
+
+
+def _enqueue(kind, data):
+    # build ก่อนเข้าคิว: payload ที่ render ไม่ได้ตอบ 400 ทันที ไม่ต้อง retry
     try:
-        lines = builder_fn(data)
-        print_receipt(lines)
-        logger.info("Printed: %s", data.get("reference", ""))
-        return jsonify({"status": "OK", "message": "Printed successfully"}), 200
+        BUILDERS[kind](data)
     except Exception as e:
-        logger.error("Print error: %s", e)
-        return jsonify({"status": "FAILED", "error": str(e)}), 500
+        logger.error("Receipt build error (%s): %s", kind, e)
+        return jsonify({"status": "FAILED", "error": str(e)}), 400
+    job, coalesced = spooler.submit(kind, data)
+    logger.info("Queued %s: ref=%s job=%s%s", kind, data.get("reference", ""), job["job_id"],
+                " (coalesced)" if coalesced else "")
+    return jsonify({"status": "QUEUED", "job_id": job["job_id"], "state": job["state"],
+                    "coalesced": coalesced}), 202
 
 
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"status": "OK", "service": "print_service"}), 200
+    return jsonify({"status": "OK", "service": "print_service", "backend": PRINT_BACKEND,
+                    "spooler": spooler.stats()}), 200
 
 
 @app.route("/print/deposit", methods=["POST"])
 def print_deposit():
     data = request.get_json(force=True) or {}
     logger.info("Print deposit: ref=%s", data.get("reference"))
-    return _print_or_error(build_deposit_receipt, data)
+    return _enqueue("deposit", data)
 
 
 @app.route("/print/deposit_with_amount", methods=["POST"])
 def print_deposit_with_amount():
     data = request.get_json(force=True) or {}
     logger.info("Print deposit_with_amount: ref=%s type=%s", data.get("reference"), data.get("deposit_type"))
-    return _print_or_error(build_deposit_with_amount_receipt, data)
+    return _enqueue("deposit_with_amount", data)
 
 
 
@@ -70,35 +109,72 @@ def print_deposit_with_amount():
 def print_withdrawal():
     data = request.get_json(force=True) or {}
     logger.info("Print withdrawal: ref=%s", data.get("reference"))
-    return _print_or_error(build_withdrawal_receipt, data)
+    return _enqueue("withdrawal", data)
 
 
 @app.route("/print/replenish", methods=["POST"])
 def print_replenish():
     data = request.get_json(force=True) or {}
     logger.info("Print replenish: ref=%s", data.get("reference"))
-    return _print_or_error(build_replenish_receipt, data)
+    return _enqueue("replenish", data)
 
 
 @app.route("/print/close_shift", methods=["POST"])
 def print_close_shift():
     data = request.get_json(force=True) or {}
     logger.info("Print close_shift: ref=%s", data.get("reference"))
-    return _print_or_error(build_close_shift_receipt, data)
+    return _enqueue("close_shift", data)
 
 
 @app.route("/print/eod", methods=["POST"])
 def print_eod():
     data = request.get_json(force=True) or {}
     logger.info("Print EOD: ref=%s", data.get("reference"))
-    return _print_or_error(build_eod_receipt, data)
+    return _enqueue("eod", data)
 
 
 @app.route("/print/collect_cash", methods=["POST"])
 def print_collect_cash():
     data = request.get_json(force=True) or {}
     logger.info("Print collect_cash: ref=%s", data.get("reference"))
-    return _print_or_error(build_collect_cash_receipt, data)
+    return _enqueue("collect_cash", data)
+
+
+@app.route("/print/jobs", methods=["GET"])
+def print_jobs():
+    state = request.args.get("state")
+    limit = request.args.get("limit", 50, type=int)
+    return jsonify({"status": "OK", "jobs": spooler.jobs(state, limit)}), 200
+
+
+@app.route("/print/jobs/<job_id>", methods=["GET"])
+def print_job_status(job_id):
+    job = spooler.get(job_id)
+    if job is None:
+        return jsonify({"status": "FAILED", "error": f"Unknown job: {job_id}"}), 404
+    return jsonify({"status": "OK", "job": job}), 200
+
+
+@app.route("/print/jobs/<job_id>/retry", methods=["POST"])
+def print_job_retry(job_id):
+    job = spooler.retry(job_id)
+    if job is None:
+        return jsonify({"status": "FAILED", "error": f"Unknown job: {job_id}"}), 404
+    return jsonify({"status": "OK", "job": job}), 200
+
+
+@app.route("/print/preview/<kind>", methods=["POST"])
+def print_preview(kind):
+    builder_fn = BUILDERS.get(kind)
+    if builder_fn is None:
+        return jsonify({"status": "FAILED", "error": f"Unknown receipt: {kind}"}), 404
+    data = request.get_json(force=True) or {}
+    try:
+        png = get_engine().render_png(builder_fn(data))
+    except Exception as e:
+        logger.error("Preview error: %s", e)
+        return jsonify({"status": "FAILED", "error": str(e)}), 500
+    return Response(png, mimetype="image/png")
 
 
 if __name__ == "__main__":
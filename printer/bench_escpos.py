@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+bench_escpos.py — เทียบ ESC/POS text mode กับ bitmap (จำนวน byte + เวลาพิมพ์) บน Linux
+
+ทุก receipt ส่งผ่าน TCP จริงไปยัง sink บน 127.0.0.1 (แทนเครื่องพิมพ์ port 9100):
+    bmp        printer.py — RGB BMP 550px ทั้งใบ (ไฟล์ที่ส่งให้ mspaint; spooler แปลงเป็น
+               raster อีกที จึงไม่คิดเวลาส่งไปเครื่อง — ดูแถว raster)
+    raster     bitmap ทั้งใบเป็น GS v 0 1-bit (render_engine) — สิ่งที่ driver ส่งจริง
+    escpos     escpos_backend — text + raster เฉพาะ logo header
+
+เวลาพิมพ์โดยประมาณ = max(เวลาส่งที่ --link-kbps, ความยาวกระดาษ / --speed-mm-s)
+(เครื่องพิมพ์ได้เร็วเท่าที่ข้อมูลมาถึง; ถ้าข้อมูลมาเร็วพอ ความเร็วหัวพิมพ์เป็นตัวจำกัด)
+
+Usage:
+    python bench_escpos.py [--rounds 20] [--link-kbps 115.2] [--speed-mm-s 200]
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+import escpos_backend
+import render_engine
+from bench_render import SAMPLE
+from receipt_builder2 import (
+    build_deposit_receipt,
+    build_withdrawal_receipt,
+    build_collect_cash_receipt,
+)
+
+DOTS_PER_MM = render_engine.RENDER_DPI / 25.4
+# ความสูงบรรทัด text mode (dots): Font A 24 + spacing 6, double height 48 + 6, Font B 17 + 6
+TEXT_LINE_DOTS = {"normal": 30, "double": 54, "small": 23}
+
+
+def _sink():
+    """TCP server ที่อ่านทิ้งทุก byte (แทน port 9100)"""
+    srv = socket.create_server(("127.0.0.1", 0))
+
+    def serve():
+        while True:
+            conn, _ = srv.accept()
+            with conn:
+                while conn.recv(65536):
+                    pass
+
+    threading.Thread(target=serve, daemon=True).start()
+    return f"tcp://127.0.0.1:{srv.getsockname()[1]}"
+
+
+def _bmp_bytes(lines):
+    img = render_engine.get_engine().render_image(lines)
+    img = img.resize((550, int(img.height * 550 / img.width)))
+    row = (img.width * 3 + 3) & ~3
+    return b"BM" + bytes(52) + bytes(row * img.height)
+
+
+def _raster_bytes(lines):
+    return escpos_backend.raster_command(render_engine.get_engine().render(lines)) + escpos_backend.CUT
+
+
+def _escpos_bytes(lines):
+    return escpos_backend.build_job(lines)[0]
+
+
+def _paper_mm(kind, lines):
+    if kind != "escpos":
+        return render_engine.get_engine().render(lines).height / DOTS_PER_MM
+    dots = 0
+    for line in lines:
+        if line.get("type") == "logo_header":
+            dots += render_engine.get_engine().render_line(line).height
+        elif line.get("small"):
+            dots += TEXT_LINE_DOTS["small"]
+        else:
+            rows = 1
+            if line.get("right_text") and escpos_backend._width(line["text"] + line["right_text"]) >= escpos_backend.COLUMNS:
+                rows = 2
+            dots += rows * TEXT_LINE_DOTS["double" if line.get("double_height") else "normal"]
+    return dots / DOTS_PER_MM
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--link-kbps", type=float, default=115.2, help="USB-serial / RS-232 ของ XP-80C")
+    ap.add_argument("--speed-mm-s", type=float, default=200)
+    args = ap.parse_args()
+
+    logo_path = os.path.join(tempfile.mkdtemp(), "logo.png")
+    Image.radial_gradient("L").convert("RGB").resize((600, 400)).save(logo_path)
+    data = dict(SAMPLE, logo_path=logo_path)
+    receipts = {
+        "deposit":      build_deposit_receipt(data),
+        "withdrawal":   build_withdrawal_receipt(data),
+        "collect_cash": build_collect_cash_receipt(data),
+    }
+    target = _sink()
+    paths = {"bmp": _bmp_bytes, "raster": _raster_bytes, "escpos": _escpos_bytes}
+
+    print(f"link {args.link_kbps:g} kbit/s, head {args.speed_mm_s:g} mm/s, {args.rounds} rounds, "
+          f"local TCP sink {target}")
+    print(f"{'receipt':<13} {'path':<7} {'bytes':>9} {'build+send':>11} {'transfer':>9} "
+          f"{'paper':>8} {'est. print':>10}")
+    for name, lines in receipts.items():
+        for path, build in paths.items():
+            build(lines)   # warm caches
+            samples = []
+            for _ in range(args.rounds):
+                t0 = time.perf_counter()
+                payload = build(lines)
+                escpos_backend.send(payload, target)
+                samples.append(time.perf_counter() - t0)
+            paper = _paper_mm(path, lines)
+            row = f"{name:<13} {path:<7} {len(payload):>9,} {statistics.median(samples) * 1000:>8.2f} ms "
+            if path == "bmp":
+                print(row + f"{'-':>9} {paper:>6.0f} mm {'-':>10}")
+                continue
+            transfer = len(payload) * 8 / (args.link_kbps * 1000)
+            est = max(transfer, paper / args.speed_mm_s)
+            print(row + f"{transfer:>7.2f} s {paper:>6.0f} mm {est:>8.2f} s")
+    stats = escpos_backend.build_job(receipts["deposit"])[1]
+    print(f"escpos deposit: {stats['text_lines']} text lines, {stats['raster_lines']} raster (logo header)")
+
+
+if __name__ == "__main__":
+    main()
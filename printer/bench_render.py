@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+bench_render.py — วัดเวลา render ใบเสร็จ (รันบน Linux ได้ ไม่ต้องมี win32print)
+
+เทียบ:
+    fonts      โหลด font ทุกใบเสร็จ (printer.py เดิม) กับโหลดครั้งเดียว
+    logo       เตรียม logo DIB แบบเดิม (open / resize / flip / swap BGR / pad ทุกใบ)
+               กับ cache ใน printer2._logo_dib (ใช้ PIL encoder เดียวกันนอก Windows)
+    engine     render_engine: cold (cache ว่าง) กับ warm (header / footer / text runs cached)
+
+Usage:
+    python bench_render.py [--rounds 50] [--out /tmp/receipts]
+"""
+
+import argparse
+import os
+import statistics
+import struct
+import tempfile
+import time
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+import render_engine
+from receipt_builder2 import (
+    build_deposit_receipt,
+    build_withdrawal_receipt,
+    build_collect_cash_receipt,
+)
+
+SAMPLE = {
+    "company_name": "บริษัท ปั๊มน้ำมัน ตัวอย่าง จำกัด",
+    "branch_name":  "สาขา 001",
+    "address":      "99 ถ.พหลโยธิน กรุงเทพฯ",
+    "phone":        "02-000-0000",
+    "deposit_type": "oil",
+    "staff_name":   "สมชาย ใจดี",
+    "reference":    "DEP/2026/0001",
+    "datetime_str": "18/10/2026 08:00",
+    "total_satang": 1234500,
+    "amount_satang": 500000,
+    "breakdown": {
+        "notes": [{"value": 100000, "qty": 10}, {"value": 50000, "qty": 4}, {"value": 10000, "qty": 3}],
+        "coins": [{"value": 1000, "qty": 4}, {"value": 500, "qty": 1}],
+    },
+}
+
+
+def _ms(samples):
+    return f"median {statistics.median(samples) * 1000:7.2f} ms"
+
+
+def _time(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+# ── Fonts (printer.py) ───────────────────────────────────────────────────────
+
+def _load_font(size):
+    for path in render_engine.FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+def _draw_receipt(lines, get_font):
+    """printer._render_receipt โดยย่อ; get_font = โหลดทุกใบ หรือ lru_cache"""
+    font_normal, font_large = get_font(26), get_font(36)
+    img = Image.new("RGB", (550, 34 * len(lines) + 132), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(lines):
+        draw.text((6, 6 + 34 * i), line.get("text", "") or line.get("company_name", ""),
+                  font=font_large if line.get("double_height") else font_normal, fill=(0, 0, 0))
+    return img
+
+
+# ── Logo DIB (printer2.py) ───────────────────────────────────────────────────
+
+def _logo_dib_per_print(logo_path, target_w):
+    """_draw_logo_gdi ก่อน cache"""
+    img      = Image.open(logo_path).convert("RGB")
+    orig_w, orig_h = img.size
+    target_h = max(1, int(target_w * orig_h / orig_w))
+    img      = img.resize((target_w, target_h), Image.LANCZOS)
+    pixels   = bytearray(img.transpose(Image.FLIP_TOP_BOTTOM).tobytes())
+    for i in range(0, len(pixels), 3):
+        pixels[i], pixels[i + 2] = pixels[i + 2], pixels[i]
+    row_bytes = target_w * 3
+    pad       = (4 - row_bytes % 4) % 4
+    if pad:
+        padded = bytearray()
+        for row in range(target_h):
+            padded += pixels[row * row_bytes:(row + 1) * row_bytes]
+            padded += b'\x00' * pad
+        pixels = padded
+    return bytes(pixels), target_h
+
+
+_logo_cache = {}
+
+
+def _logo_dib_cached(logo_path, target_w):
+    """printer2._logo_dib (printer2 import win32ui ไม่ได้บน Linux จึงจำลอง logic เดียวกัน)"""
+    key = (logo_path, target_w, os.path.getmtime(logo_path))
+    if key not in _logo_cache:
+        img = Image.open(logo_path).convert("RGB")
+        target_h = max(1, int(target_w * img.height / img.width))
+        img = img.resize((target_w, target_h), Image.LANCZOS)
+        stride = (target_w * 3 + 3) & ~3
+        pixels = img.tobytes("raw", ("BGR", stride, -1))
+        _logo_cache[key] = (pixels, struct.pack("<Ii", 40, target_w), target_h)
+    return _logo_cache[key]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--out", help="เขียน PNG ตัวอย่างลง folder นี้")
+    args = ap.parse_args()
+
+    logo_path = os.path.join(tempfile.mkdtemp(), "logo.png")
+    Image.radial_gradient("L").convert("RGB").resize((600, 400)).save(logo_path)
+    data = dict(SAMPLE, logo_path=logo_path)
+    receipts = {
+        "deposit":      build_deposit_receipt(data),
+        "withdrawal":   build_withdrawal_receipt(data),
+        "collect_cash": build_collect_cash_receipt(data),
+    }
+    for lines in receipts.values():
+        for line in lines:
+            if line.get("type") == "logo_header":
+                line["logo_path"] = logo_path
+    deposit = receipts["deposit"]
+
+    print(f"font: {next((p for p in render_engine.FONT_PATHS if os.path.exists(p)), 'PIL default')}")
+
+    print("fonts (printer.py):")
+    cached_font = lru_cache(maxsize=None)(_load_font)
+    print(f"  load per print     {_ms(_time(lambda: _draw_receipt(deposit, _load_font), args.rounds))}")
+    print(f"  lru_cache          {_ms(_time(lambda: _draw_receipt(deposit, cached_font), args.rounds))}")
+
+    print(f"logo DIB ({render_engine.LOGO_WIDTH_PX}px, printer2.py):")
+    same = _logo_dib_per_print(logo_path, render_engine.LOGO_WIDTH_PX)[0] == \
+        _logo_dib_cached(logo_path, render_engine.LOGO_WIDTH_PX)[0]
+    print(f"  per print          {_ms(_time(lambda: _logo_dib_per_print(logo_path, render_engine.LOGO_WIDTH_PX), args.rounds))}")
+    print(f"  cached             {_ms(_time(lambda: _logo_dib_cached(logo_path, render_engine.LOGO_WIDTH_PX), args.rounds))}"
+          f"  (bytes {'identical' if same else 'DIFFER'})")
+
+    print("render_engine:")
+    cold = _time(lambda: render_engine.ReceiptRenderer().render(deposit), max(3, args.rounds // 10))
+    engine = render_engine.get_engine()
+    for lines in receipts.values():
+        engine.render(lines)
+    print(f"  cold (new engine)  {_ms(cold)}")
+    for name, lines in receipts.items():
+        warm = _time(lambda: engine.render(lines), args.rounds)
+        png = engine.render_png(lines)
+        width_bytes, height, raster = engine.render_raster(lines)
+        print(f"  warm {name:<13} {_ms(warm)}  png {len(png) / 1024:.1f} KB, "
+              f"raster {width_bytes}x{height} = {len(raster) / 1024:.1f} KB")
+        if args.out:
+            os.makedirs(args.out, exist_ok=True)
+            with open(os.path.join(args.out, f"{name}.png"), "wb") as f:
+                f.write(png)
+    print(f"  cache {engine.stats()}")
+    if not same:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
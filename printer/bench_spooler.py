@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+bench_spooler.py — ทดสอบ print_spooler บน Linux (เครื่องพิมพ์จำลองผ่าน ESC/POS TCP)
+
+    1. เครื่องพิมพ์ offline: /print/* ยังตอบทันที (202) และไม่มีใบหาย
+    2. reprint ซ้ำ (reference เดียวกัน) ถูก coalesce เป็น job เดียว
+    3. เครื่องกลับมา online: worker retry (backoff) แล้วพิมพ์ครบตามลำดับ
+    4. restart service ระหว่างมีงานค้าง: งานในคิวพิมพ์ต่อจาก DB
+
+Usage:
+    python bench_spooler.py [--jobs 20]
+"""
+
+import argparse
+import logging
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class FakePrinter:
+    """TCP 9100 ที่เปิด / ปิดได้; เก็บ reference ของใบที่พิมพ์ตามลำดับ"""
+
+    def __init__(self, port):
+        self.port = port
+        self.printed = []
+        self._srv = None
+
+    def online(self):
+        self._srv = socket.create_server(("127.0.0.1", self.port))
+        threading.Thread(target=self._serve, args=(self._srv,), daemon=True).start()
+
+    def offline(self):
+        if self._srv is not None:
+            try:
+                self._srv.shutdown(socket.SHUT_RDWR)   # ปลุก accept() ที่ค้างอยู่
+            except OSError:
+                pass
+            self._srv.close()
+            self._srv = None
+
+    def _serve(self, srv):
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            with conn:
+                data = b""
+                while True:
+                    chunk = conn.recv(65536)
+                    if not chunk:
+                        break
+                    data += chunk
+            for ref in data.split(b"REF-")[1:]:
+                self.printed.append("REF-" + ref.split(b"\n")[0].decode("cp874").strip())
+
+
+def _wait(cond, timeout):
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=20)
+    args = ap.parse_args()
+
+    port = _free_port()
+    os.environ.update({
+        "PRINT_BACKEND": "escpos",
+        "PRINT_ESCPOS_TARGET": f"tcp://127.0.0.1:{port}",
+        "PRINT_ESCPOS_TIMEOUT": "1",
+        "PRINT_SPOOL_DB": os.path.join(tempfile.mkdtemp(), "spool.db"),
+        "PRINT_SPOOL_BACKOFF": "0.2",
+        "PRINT_SPOOL_BACKOFF_MAX": "0.5",
+    })
+    logging.disable(logging.WARNING)
+    import app2
+
+    printer = FakePrinter(port)
+    client = app2.app.test_client()
+    refs = [f"REF-{i:04d}" for i in range(args.jobs)]
+    ok = True
+
+    # 1 + 2. offline: enqueue ทุกใบ + reprint ซ้ำ
+    latencies, job_ids = [], {}
+    for ref in refs + refs[:5]:
+        t0 = time.perf_counter()
+        r = client.post("/print/deposit", json={"reference": ref, "total_satang": 10000})
+        latencies.append(time.perf_counter() - t0)
+        body = r.get_json()
+        if r.status_code != 202:
+            ok = False
+        if ref in job_ids and (body["job_id"] != job_ids[ref] or not body["coalesced"]):
+            ok = False
+        job_ids.setdefault(ref, body["job_id"])
+    print(f"offline: {len(latencies)} requests, p50 {statistics.median(latencies) * 1000:.1f} ms, "
+          f"max {max(latencies) * 1000:.1f} ms, {len(job_ids)} jobs (5 reprints coalesced)")
+    time.sleep(1.0)
+    job = client.get(f"/print/jobs/{job_ids[refs[0]]}").get_json()["job"]
+    print(f"  first job while offline: state={job['state']} attempts={job['attempts']} error={job['error']!r}")
+
+    # 3. online: พิมพ์ครบตามลำดับ
+    t0 = time.perf_counter()
+    printer.online()
+    done = _wait(lambda: len(printer.printed) >= args.jobs, 30)
+    print(f"online: {len(printer.printed)}/{args.jobs} printed in {time.perf_counter() - t0:.2f} s, "
+          f"order {'ok' if printer.printed == refs else 'WRONG'}")
+    ok = ok and done and printer.printed == refs
+    ok = ok and all(client.get(f"/print/jobs/{j}").get_json()["job"]["state"] == "done" for j in job_ids.values())
+
+    # 4. restart: งานค้างใน DB พิมพ์ต่อ
+    printer.offline()
+    app2.spooler.submit("deposit", {"reference": "REF-RESTART", "total_satang": 100})
+    app2.spooler.stop(timeout=5)
+    from print_spooler import PrintSpooler
+    restarted = PrintSpooler(app2._print_job, db_path=os.environ["PRINT_SPOOL_DB"], backoff=0.2, backoff_max=0.5)
+    printer.online()
+    restarted.start()
+    resumed = _wait(lambda: printer.printed[-1:] == ["REF-RESTART"], 10)
+    print(f"restart: queued job {'printed' if resumed else 'LOST'} after restart; {restarted.stats()}")
+    ok = ok and resumed
+    restarted.stop(timeout=5)
+
+    print("OK" if ok else "FAILED")
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+escpos_backend.py — พิมพ์ receipt lines เป็นคำสั่ง ESC/POS ตรง (text mode) ไม่ต้องใช้ win32
+
+ข้อความส่งเป็นตัวอักษร (ESC ! bold / double height / font B, ESC a align) ด้วย
+Thai code page ของเครื่อง — ไม่ต้องส่ง bitmap ทั้งใบ
+Raster (GS v 0, วาดด้วย render_engine) ใช้เฉพาะ:
+    - logo_header (logo + ชื่อบริษัท)
+    - บรรทัดที่มีตัวอักษรที่ code page ไม่มี
+    - บรรทัดที่มีสระบน/ล่าง/วรรณยุกต์ เมื่อ PRINT_ESCPOS_THAI_MARKS=0
+      (เครื่องที่ซ้อนสระเองไม่ได้)
+
+Output (PRINT_ESCPOS_TARGET):
+    tcp://192.168.1.50:9100    raw TCP (port 9100 ถ้าไม่ระบุ)
+    /dev/usb/lp0               USB printer บน Linux / ไฟล์ใดก็ได้ (เช่น receipt.bin)
+    file:///tmp/receipt.bin
+
+Usage:
+    from escpos_backend import print_receipt
+    print_receipt(lines)
+"""
+
+import logging
+import os
+import socket
+import threading
+import unicodedata
+
+from render_engine import get_engine, to_raster
+
+logger = logging.getLogger(__name__)
+
+ESCPOS_TARGET      = os.getenv("PRINT_ESCPOS_TARGET", "/dev/usb/lp0")
+ESCPOS_TIMEOUT     = float(os.getenv("PRINT_ESCPOS_TIMEOUT", "10"))
+# ESC t n — เลข code page ภาษาไทยตาม self-test ของเครื่อง, encoding ฝั่ง Python ให้ตรงกัน
+ESCPOS_CODEPAGE    = int(os.getenv("PRINT_ESCPOS_CODEPAGE", "20"))
+ESCPOS_ENCODING    = os.getenv("PRINT_ESCPOS_ENCODING", "cp874")
+ESCPOS_THAI_MARKS  = os.getenv("PRINT_ESCPOS_THAI_MARKS", "1") == "1"
+
+COLUMNS            = 48     # Font A 12x24 บน 576 dots (= RECEIPT_WIDTH)
+COLUMNS_SMALL      = 64     # Font B 9x17
+RASTER_BAND_ROWS   = 256    # GS v 0 ต่อครั้งไม่เกินนี้ (buffer ของเครื่อง)
+
+ESC, GS, LF = b"\x1b", b"\x1d", b"\n"
+INIT        = ESC + b"@"
+ALIGN       = {"left": ESC + b"a\x00", "center": ESC + b"a\x01", "right": ESC + b"a\x02"}
+MODE_FONT_B = 0x01
+MODE_BOLD   = 0x08
+MODE_DOUBLE_HEIGHT = 0x10
+CUT         = GS + b"VB\x00"   # feed ถึง cutter แล้ว partial cut
+
+
+# ── Text ─────────────────────────────────────────────────────────────────────
+
+def _width(text):
+    """จำนวน column (สระบน/ล่าง วรรณยุกต์ ไม่กิน column)"""
+    return sum(1 for ch in text if unicodedata.category(ch) != "Mn")
+
+
+def _has_marks(text):
+    return any(unicodedata.category(ch) == "Mn" for ch in text)
+
+
+def _fit(text, cols):
+    """ตัดข้อความที่ยาวเกินแล้วต่อ … (เหมือน printer2.py)"""
+    if _width(text) <= cols:
+        return text
+    while text and _width(text) > cols - 1:
+        text = text[:-1]
+    return text + "…"
+
+
+def _encode(text):
+    """bytes ใน code page ของเครื่อง หรือ None ถ้าต้องใช้ raster"""
+    if not ESCPOS_THAI_MARKS and _has_marks(text):
+        return None
+    try:
+        return text.encode(ESCPOS_ENCODING)
+    except UnicodeEncodeError:
+        return None
+
+
+def _text_line(line):
+    """ESC/POS ของบรรทัด text / left-right หรือ None ถ้าต้อง raster"""
+    text  = line.get("text", "")
+    right = line.get("right_text", "")
+    small = line.get("small", False)
+    cols  = COLUMNS_SMALL if small else COLUMNS
+
+    mode = 0
+    if small:
+        mode |= MODE_FONT_B
+    if line.get("bold"):
+        mode |= MODE_BOLD
+    if line.get("double_height"):
+        mode |= MODE_DOUBLE_HEIGHT
+
+    if right:
+        pad = cols - _width(text) - _width(right)
+        if pad >= 1:
+            rows = [("left", text + " " * pad + right)]
+        else:
+            # ไม่พอดี → right_text ขึ้นบรรทัดใหม่ ชิดขวา (เหมือน GDI)
+            rows = [("left", _fit(text, cols)), ("right", _fit(right, cols))]
+    else:
+        rows = [(line.get("align", "left"), _fit(text, cols))]
+
+    out = [ESC + b"!" + bytes([mode])]
+    for align, row in rows:
+        raw = _encode(row)
+        if raw is None:
+            return None
+        out += [ALIGN.get(align, ALIGN["left"]), raw, LF]
+    return b"".join(out)
+
+
+# ── Raster fallback ──────────────────────────────────────────────────────────
+
+def raster_command(mask):
+    """GS v 0 ของ "L" mask (255 = หมึก) แบ่งเป็น band"""
+    width_bytes, height, data = to_raster(mask)
+    out = [ALIGN["left"]]
+    for top in range(0, height, RASTER_BAND_ROWS):
+        rows = min(RASTER_BAND_ROWS, height - top)
+        out.append(GS + b"v0\x00" + bytes([width_bytes & 0xFF, width_bytes >> 8, rows & 0xFF, rows >> 8]))
+        out.append(data[top * width_bytes:(top + rows) * width_bytes])
+    return b"".join(out)
+
+
+_raster_cache      = {}
+_raster_cache_lock = threading.Lock()
+
+
+def _raster_line(line):
+    """logo_header ใช้ block เดิมทุกใบ → cache GS v 0 bytes ต่อ company / branch / logo ด้วย"""
+    if line.get("type") != "logo_header":
+        return raster_command(get_engine().render_line(line))
+    logo_path = line.get("logo_path") or ""
+    try:
+        logo_mtime = os.path.getmtime(logo_path) if logo_path else None
+    except OSError:
+        logo_mtime = None
+    key = tuple(line.get(k, "") for k in ("company_name", "branch_name", "address", "phone",
+                                          "logo_path", "logo_width_px")) + (logo_mtime,)
+    with _raster_cache_lock:
+        cmd = _raster_cache.get(key)
+        if cmd is None:
+            cmd = raster_command(get_engine().render_line(line))
+            if len(_raster_cache) >= 8:
+                _raster_cache.clear()
+            _raster_cache[key] = cmd
+        return cmd
+
+
+# ── Job ──────────────────────────────────────────────────────────────────────
+
+def build_job(lines: list, cut: bool = True):
+    """
+    คำสั่ง ESC/POS ของ receipt ทั้งใบ
+    Returns: (bytes, {"text_lines": n, "raster_lines": n})
+    """
+    out = [INIT, ESC + b"t" + bytes([ESCPOS_CODEPAGE])]
+    stats = {"text_lines": 0, "raster_lines": 0}
+
+    for line in lines:
+        if isinstance(line, str):   # receipt_builder (v1) ส่ง string จาก _lr มาตรง ๆ
+            line = {"text": line}
+        cmd = None if line.get("type") == "logo_header" else _text_line(line)
+        if cmd is None:
+            cmd = _raster_line(line)
+            stats["raster_lines"] += 1
+        else:
+            stats["text_lines"] += 1
+        out.append(cmd)
+
+    out += [ESC + b"!\x00", ALIGN["left"]]
+    if cut:
+        out.append(CUT)
+    return b"".join(out), stats
+
+
+# ── Output ───────────────────────────────────────────────────────────────────
+
+def send(data: bytes, target: str = None, timeout: float = None):
+    """ส่ง bytes ไป tcp://host[:port] หรือไฟล์ / device"""
+    target  = target or ESCPOS_TARGET
+    timeout = ESCPOS_TIMEOUT if timeout is None else timeout
+
+    if target.startswith("tcp://"):
+        host, _, port = target[len("tcp://"):].partition(":")
+        with socket.create_connection((host, int(port or 9100)), timeout=timeout) as sock:
+            sock.sendall(data)
+        return
+
+    path = target[len("file://"):] if target.startswith("file://") else target
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def print_receipt(lines: list, cut: bool = True):
+    data, stats = build_job(lines, cut=cut)
+    send(data)
+    logger.info("Printed via ESC/POS to %s: %d bytes (%d text, %d raster lines)",
+                ESCPOS_TARGET, len(data), stats["text_lines"], stats["raster_lines"])
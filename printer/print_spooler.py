@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+print_spooler.py — คิวงานพิมพ์แบบถาวร (SQLite) + worker เดียวที่คุยกับเครื่องพิมพ์
+
+HTTP request แค่ใส่งานลงคิวแล้วตอบทันที; worker พิมพ์ทีละงานตามลำดับที่เข้าคิว
+(งานแรกยังพิมพ์ไม่ได้ งานหลังรอด้วย — ใบเสร็จไม่สลับลำดับ)
+    - เครื่องพิมพ์ offline / กระดาษหมด → retry แบบ backoff (PRINT_SPOOL_BACKOFF ... MAX)
+      ครบ PRINT_SPOOL_MAX_ATTEMPTS แล้วเป็น failed (สั่ง retry ได้ภายหลัง)
+    - service restart → งานที่ค้าง (queued / printing) พิมพ์ต่อจาก DB
+    - reprint ซ้ำ (kind + reference เดียวกัน) ขณะงานเดิมยังไม่พิมพ์ หรือพิมพ์เสร็จไม่เกิน
+      PRINT_SPOOL_COALESCE_SECONDS → ได้ job เดิม ไม่พิมพ์ซ้ำ
+
+Job state: queued → printing → done | failed
+
+Usage:
+    spooler = PrintSpooler(handler=lambda kind, payload: ...)
+    spooler.start()
+    job, coalesced = spooler.submit("deposit", payload)
+    spooler.get(job["job_id"])
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DB               = os.getenv("PRINT_SPOOL_DB",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "spool.db"))
+SPOOL_MAX_ATTEMPTS     = int(os.getenv("PRINT_SPOOL_MAX_ATTEMPTS", "20"))
+SPOOL_BACKOFF          = float(os.getenv("PRINT_SPOOL_BACKOFF", "2"))        # วินาที, x2 ทุกครั้ง
+SPOOL_BACKOFF_MAX      = float(os.getenv("PRINT_SPOOL_BACKOFF_MAX", "60"))
+SPOOL_COALESCE_SECONDS = float(os.getenv("PRINT_SPOOL_COALESCE_SECONDS", "10"))
+SPOOL_KEEP_DAYS        = float(os.getenv("PRINT_SPOOL_KEEP_DAYS", "7"))
+
+QUEUED, PRINTING, DONE, FAILED = "queued", "printing", "done", "failed"
+PENDING = (QUEUED, PRINTING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              TEXT PRIMARY KEY,
+    kind            TEXT NOT NULL,
+    reference       TEXT,
+    dedupe_key      TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    state           TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    error           TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    printed_at      REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, updated_at);
+"""
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts).isoformat(timespec="seconds") if ts else None
+
+
+def dedupe_key(kind, payload):
+    """reprint ของใบเดียวกัน = kind + reference (datetime_str เปลี่ยนทุกครั้งที่กด จึงไม่ใช้ทั้ง payload)"""
+    reference = (payload or {}).get("reference")
+    if reference:
+        return f"{kind}:{reference}"
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{kind}#{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class PrintSpooler:
+
+    def __init__(self, handler, db_path=SPOOL_DB, max_attempts=SPOOL_MAX_ATTEMPTS,
+                 backoff=SPOOL_BACKOFF, backoff_max=SPOOL_BACKOFF_MAX,
+                 coalesce_seconds=SPOOL_COALESCE_SECONDS, keep_days=SPOOL_KEEP_DAYS):
+        """handler(kind, payload): พิมพ์งาน, raise เมื่อพิมพ์ไม่สำเร็จ (จะ retry)"""
+        self.handler = handler
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.coalesce_seconds = coalesce_seconds
+        self.keep_days = keep_days
+
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._stop = False
+        self._thread = None
+        self._purged_at = 0.0
+
+        # งานที่พิมพ์ค้างตอน process ตาย → พิมพ์ใหม่ (อาจได้ใบซ้ำหนึ่งใบ ดีกว่าใบหาย)
+        with self._lock:
+            n = self._db.execute("UPDATE jobs SET state=? WHERE state=?", (QUEUED, PRINTING)).rowcount
+        if n:
+            logger.warning("Spooler: %d interrupted job(s) re-queued", n)
+
+    # ── API ──────────────────────────────────────────────────────────────────
+
+    def submit(self, kind, payload):
+        """ใส่งานลงคิว → (job, coalesced)"""
+        key = dedupe_key(kind, payload)
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE dedupe_key=? AND (state IN (?, ?) OR (state=? AND printed_at>=?)) "
+                "ORDER BY created_at DESC LIMIT 1",
+                (key, *PENDING, DONE, now - self.coalesce_seconds),
+            ).fetchone()
+            if row is not None:
+                logger.info("Spooler: %s coalesced into job %s (%s)", key, row["id"], row["state"])
+                return self._job(row), True
+
+            job_id = uuid.uuid4().hex
+            self._db.execute(
+                "INSERT INTO jobs (id, kind, reference, dedupe_key, payload, state, created_at, updated_at, "
+                "next_attempt_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, (payload or {}).get("reference"), key,
+                 json.dumps(payload, ensure_ascii=False, default=str), QUEUED, now, now, now),
+            )
+            self._wake.notify()
+            row = self._db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return self._job(row), False
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return self._job(row) if row is not None else None
+
+    def jobs(self, state=None, limit=50):
+        sql, args = "SELECT * FROM jobs", []
+        if state:
+            sql += " WHERE state=?"
+            args.append(state)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        args.append(int(limit))
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+        return [self._job(row) for row in rows]
+
+    def retry(self, job_id):
+        """failed → queued (นับ attempts ใหม่); None ถ้าไม่มี job, job เดิมถ้าไม่ได้ failed"""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET state=?, attempts=0, error=NULL, next_attempt_at=?, updated_at=? "
+                "WHERE id=? AND state=?",
+                (QUEUED, now, now, job_id, FAILED),
+            )
+            self._wake.notify()
+        return self.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = {state: 0 for state in (QUEUED, PRINTING, DONE, FAILED)}
+        counts.update({state: n for state, n in rows})
+        return {"db": self.db_path, "worker_alive": bool(self._thread and self._thread.is_alive()), **counts}
+
+    @staticmethod
+    def _job(row):
+        return {
+            "job_id":          row["id"],
+            "kind":            row["kind"],
+            "reference":       row["reference"],
+            "state":           row["state"],
+            "attempts":        row["attempts"],
+            "error":           row["error"],
+            "created_at":      _iso(row["created_at"]),
+            "updated_at":      _iso(row["updated_at"]),
+            "next_attempt_at": _iso(row["next_attempt_at"]) if row["state"] == QUEUED else None,
+            "printed_at":      _iso(row["printed_at"]),
+        }
+
+    # ── Worker ───────────────────────────────────────────────────────────────
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name="print-spooler", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            self._stop = True
+            self._wake.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next_job(self):
+        """งานถัดไปที่ถึงเวลา (mark printing) หรือ None เมื่อ stop; lock ถือไว้แล้ว"""
+        while not self._stop:
+            now = time.time()
+            row = self._db.execute(
+                "SELECT * FROM jobs WHERE state=? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None and row["next_attempt_at"] <= now:
+                self._db.execute("UPDATE jobs SET state=?, updated_at=? WHERE id=?", (PRINTING, now, row["id"]))
+                return row
+            if row is None and now - self._purged_at > 3600:
+                self._purge(now)
+            self._wake.wait(None if row is None else row["next_attempt_at"] - now)
+        return None
+
+    def _purge(self, now):
+        self._purged_at = now
+        n = self._db.execute("DELETE FROM jobs WHERE state=? AND updated_at<?",
+                             (DONE, now - self.keep_days * 86400)).rowcount
+        if n:
+            logger.info("Spooler: purged %d printed job(s)", n)
+
+    def _run(self):
+        logger.info("Spooler worker started (%s)", self.db_path)
+        while True:
+            with self._lock:
+                row = self._next_job()
+            if row is None:
+                return
+
+            attempts = row["attempts"] + 1
+            try:
+                self.handler(row["kind"], json.loads(row["payload"]))
+            except Exception as e:
+                now = time.time()
+                if attempts >= self.max_attempts:
+                    state, next_at = FAILED, now
+                    logger.error("Spooler: job %s (%s %s) failed after %d attempts: %s",
+                                 row["id"], row["kind"], row["reference"], attempts, e)
+                else:
+                    delay = min(self.backoff_max, self.backoff * 2 ** (attempts - 1))
+                    state, next_at = QUEUED, now + delay
+                    logger.warning("Spooler: job %s (%s %s) attempt %d failed, retry in %.1fs: %s",
+                                   row["id"], row["kind"], row["reference"], attempts, delay, e)
+                with self._lock:
+                    self._db.execute(
+                        "UPDATE jobs SET state=?, attempts=?, error=?, next_attempt_at=?, updated_at=? WHERE id=?",
+                        (state, attempts, str(e), next_at, now, row["id"]),
+                    )
+                continue
+
+            now = time.time()
+            with self._lock:
+                self._db.execute(
+                    "UPDATE jobs SET state=?, attempts=?, error=NULL, printed_at=?, updated_at=? WHERE id=?",
+                    (DONE, attempts, now, now, row["id"]),
+                )
+            logger.info("Spooler: job %s printed (%s %s)", row["id"], row["kind"], row["reference"])
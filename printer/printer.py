@@ -2,6 +2,7 @@
 import logging
 import os
 import tempfile
+from functools import lru_cache
 import win32print
 import win32api
 from PIL import Image, ImageDraw, ImageFont
@@ -23,7 +24,9 @@ THAI_FONTS = [
 ]
 
 
+@lru_cache(maxsize=None)
 def _get_font(size):
+    """โหลด font ครั้งเดียวต่อ size (เดิม probe ทุก path ทุกใบเสร็จ)"""
     for path in THAI_FONTS:
         try:
             return ImageFont.truetype(path, size)
@@ -6,10 +6,14 @@ printer2.py — พิมพ์ผ่าน Windows GDI รองรับภา
 
 import ctypes
 import logging
+import os
 import struct
+import threading
 import win32ui
 import win32con
 
+from render_engine import LOGO_PATH, LOGO_WIDTH_PX
+
 logger = logging.getLogger(__name__)
 
 PRINTER_NAME     = "XP-80C"
@@ -21,16 +25,18 @@ FONT_SIZE_SMALL  = 9    # point — footer
 LINE_SPACING     = 1.5
 MARGIN_X_PCT     = 0.01  # 1% margin
 
-# Logo file path — วาง logo.png ไว้ใน folder เดียวกับ printer2.py
-LOGO_PATH        = r"C:\GloryMiddleware\printer\logo.png"
-LOGO_WIDTH_PX    = 110   # ความกว้าง logo บนกระดาษ (pixel)
-
 GDI32 = ctypes.windll.gdi32
 
 
 # ── Font helpers ────────────────────────────────────────────────────────────
 
-def _make_font(dc, size, bold=False):
+def _make_font(dc, size, bold=False, cache=None):
+    """cache: dict ของงานพิมพ์นี้ — font ผูกกับ DC จึงสร้างครั้งเดียวต่อ (size, bold) ต่องาน"""
+    if cache is not None:
+        key = (size, bold)
+        if key not in cache:
+            cache[key] = _make_font(dc, size, bold)
+        return cache[key]
     lpy    = dc.GetDeviceCaps(win32con.LOGPIXELSY)
     height = -int(size * lpy / 72)
     return win32ui.CreateFont({
@@ -47,56 +53,63 @@ def _lh(lpy, size):
 
 # ── Logo via StretchDIBits (ctypes) ─────────────────────────────────────────
 
+_logo_cache      = {}
+_logo_cache_lock = threading.Lock()
+
+
+def _logo_dib(logo_path: str, target_w: int):
+    """
+    (pixels, bmi, target_h) ของ logo ที่ resize แล้ว — cached ต่อ (path, width, mtime)
+    เปิด / resize (LANCZOS) / flip / RGB → BGR ครั้งเดียว ไม่ใช่ทุกใบเสร็จ
+    """
+    key = (logo_path, target_w, os.path.getmtime(logo_path))
+    with _logo_cache_lock:
+        if key in _logo_cache:
+            return _logo_cache[key]
+
+    from PIL import Image
+
+    img      = Image.open(logo_path).convert("RGB")
+    orig_w, orig_h = img.size
+    target_h = max(1, int(target_w * orig_h / orig_w))
+    img      = img.resize((target_w, target_h), Image.LANCZOS)
+
+    # DIB = bottom-up, BGR, แต่ละ row align 4 bytes — ให้ PIL encoder ทำในครั้งเดียว
+    stride = (target_w * 3 + 3) & ~3
+    pixels = img.tobytes("raw", ("BGR", stride, -1))
+
+    # BITMAPINFOHEADER (40 bytes)
+    bmi = struct.pack('<IiiHHIIiiII',
+        40,           # biSize
+        target_w,     # biWidth
+        target_h,     # biHeight (positive = bottom-up)
+        1,            # biPlanes
+        24,           # biBitCount = 24-bit RGB
+        0,            # biCompression = BI_RGB
+        len(pixels),  # biSizeImage
+        2835, 2835,   # pixels per meter (~72dpi)
+        0, 0,         # clrUsed, clrImportant
+    )
+
+    with _logo_cache_lock:
+        _logo_cache[key] = (pixels, bmi, target_h)
+    return pixels, bmi, target_h
+
+
 def _draw_logo_gdi(pdc, logo_path: str, dest_x: int, dest_y: int, target_w: int) -> int:
     """
     วาด logo image ลงบน printer DC โดยใช้ StretchDIBits
     Returns: actual height drawn (px), หรือ 0 ถ้า fail
     """
     try:
-        from PIL import Image
-
-        img      = Image.open(logo_path).convert("RGB")
-        orig_w, orig_h = img.size
-        target_h = max(1, int(target_w * orig_h / orig_w))
-        img      = img.resize((target_w, target_h), Image.LANCZOS)
-
-        # DIB = bottom-up → flip ก่อน
-        img_flip = img.transpose(Image.FLIP_TOP_BOTTOM)
-        pixels   = bytearray(img_flip.tobytes())  # RGB bytes
-
-        # แปลง RGB → BGR (Windows DIB ใช้ BGR)
-        for i in range(0, len(pixels), 3):
-            pixels[i], pixels[i + 2] = pixels[i + 2], pixels[i]
-
-        # แต่ละ row ต้อง align 4 bytes
-        row_bytes = target_w * 3
-        pad       = (4 - row_bytes % 4) % 4
-        if pad:
-            padded = bytearray()
-            for row in range(target_h):
-                padded += pixels[row * row_bytes:(row + 1) * row_bytes]
-                padded += b'\x00' * pad
-            pixels = padded
-
-        # BITMAPINFOHEADER (40 bytes)
-        bmi = struct.pack('<IiiHHIIiiII',
-            40,           # biSize
-            target_w,     # biWidth
-            target_h,     # biHeight (positive = bottom-up)
-            1,            # biPlanes
-            24,           # biBitCount = 24-bit RGB
-            0,            # biCompression = BI_RGB
-            len(pixels),  # biSizeImage
-            2835, 2835,   # pixels per meter (~72dpi)
-            0, 0,         # clrUsed, clrImportant
-        )
+        pixels, bmi, target_h = _logo_dib(logo_path, target_w)
 
         hdc    = pdc.GetSafeHdc()
         result = GDI32.StretchDIBits(
             hdc,
             dest_x, dest_y, target_w, target_h,  # dest rect
             0, 0, target_w, target_h,             # src rect
-            bytes(pixels),                         # pixel data
+            pixels,                               # pixel data
             bmi,                                  # BITMAPINFO
             0,                                    # DIB_RGB_COLORS
             0x00CC0020,                           # SRCCOPY
@@ -114,7 +127,7 @@ def _draw_logo_gdi(pdc, logo_path: str, dest_x: int, dest_y: int, target_w: int)
 
 # ── Logo Header renderer ─────────────────────────────────────────────────────
 
-def _render_logo_header(pdc, line: dict, y: int, page_w: int, margin_x: int, lpy: int) -> int:
+def _render_logo_header(pdc, line: dict, y: int, page_w: int, margin_x: int, lpy: int, fonts=None) -> int:
     """
     วาด header แบบ logo-ซ้าย / company info-ขวา
     Returns: total height used (px)
@@ -132,14 +145,14 @@ def _render_logo_header(pdc, line: dict, y: int, page_w: int, margin_x: int, lpy
 
     # Company name — bold, FONT_SIZE_NORMAL+1
     name_size = FONT_SIZE_NORMAL + 1
-    font_bold = _make_font(pdc, name_size, bold=True)
+    font_bold = _make_font(pdc, name_size, bold=True, cache=fonts)
     pdc.SelectObject(font_bold)
     lh_bold = _lh(lpy, name_size)
     pdc.TextOut(text_x, text_y, line.get("company_name", ""))
     text_y += lh_bold
 
     # Branch, address, phone — normal size
-    font_norm = _make_font(pdc, FONT_SIZE_NORMAL, bold=False)
+    font_norm = _make_font(pdc, FONT_SIZE_NORMAL, bold=False, cache=fonts)
     pdc.SelectObject(font_norm)
     lh_norm = _lh(lpy, FONT_SIZE_NORMAL)
 
@@ -171,6 +184,8 @@ def print_receipt(lines: list, cut: bool = True):
     logger.info("page_w=%d px  lpy=%d dpi  usable_w=%d px  font_normal=%dpt",
                 page_w, lpy, usable_w, FONT_SIZE_NORMAL)
 
+    fonts = {}
+
     try:
         pdc.StartDoc("Receipt")
         pdc.StartPage()
@@ -182,7 +197,7 @@ def print_receipt(lines: list, cut: bool = True):
 
             # ── Logo header (logo left + text right) ──
             if line_type == "logo_header":
-                used_h = _render_logo_header(pdc, line, y, page_w, margin_x, lpy)
+                used_h = _render_logo_header(pdc, line, y, page_w, margin_x, lpy, fonts)
                 y += used_h
                 continue
 
@@ -201,7 +216,7 @@ def print_receipt(lines: list, cut: bool = True):
             else:
                 size = FONT_SIZE_NORMAL
 
-            font   = _make_font(pdc, size, bold)
+            font   = _make_font(pdc, size, bold, cache=fonts)
             pdc.SelectObject(font)
             line_h = _lh(lpy, size)
 
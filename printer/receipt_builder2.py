@@ -10,7 +10,7 @@ Layout changes (ตาม feedback ลูกค้า):
 """
 
 from datetime import datetime, timedelta
-from printer2 import LOGO_PATH, LOGO_WIDTH_PX
+from render_engine import LOGO_PATH, LOGO_WIDTH_PX
 
 RECEIPT_WIDTH = 48
 LINE          = "-" * RECEIPT_WIDTH
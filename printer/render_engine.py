@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+render_engine.py — วาด receipt lines (receipt_builder / receipt_builder2) เป็น bitmap ด้วย PIL
+
+ไม่ใช้ win32 เลย: render เป็น PNG หรือ raster 1-bit ได้บน Linux (benchmark / preview /
+ESC/POS raster) ด้วย layout เดียวกับ printer2.py (GDI: pt sizes, LINE_SPACING, margin)
+
+Cache (ต่อ process):
+    fonts         โหลด TrueType ครั้งเดียวต่อ (size, bold)
+    logo          logo ที่ resize แล้ว ต่อ (path, width, mtime)
+    header        logo_header ทั้ง block ต่อ company / branch / address / phone
+    footer        บรรทัด small ท้าย receipt ทั้ง block
+    text runs     ข้อความที่วาดแล้วต่อ (text, size, bold) — LRU, label ที่ซ้ำ
+                  (ชนิดเงิน, เส้นคั่น, ลายเซ็น, footer) วาดครั้งเดียว
+
+Usage:
+    engine = get_engine()
+    png    = engine.render_png(lines)
+    width_bytes, height, data = engine.render_raster(lines)
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from PIL import Image, ImageDraw, ImageFont
+
+logger = logging.getLogger(__name__)
+
+RENDER_DPI        = int(os.getenv("PRINT_RENDER_DPI", "203"))        # XP-80C: 8 dots/mm
+RENDER_WIDTH_PX   = int(os.getenv("PRINT_RENDER_WIDTH_PX", "576"))   # 72 mm printable
+FONT_SIZE_NORMAL  = 11   # point — เท่ากับ printer2.py
+FONT_SIZE_LARGE   = 14
+FONT_SIZE_SMALL   = 9
+LINE_SPACING      = 1.5
+MARGIN_X_PCT      = 0.01
+LOGO_GAP_PX       = 10
+TEXT_RUN_CACHE    = int(os.getenv("PRINT_TEXT_RUN_CACHE", "512"))
+BLOCK_CACHE       = 32
+
+# Logo file path — วาง logo.png ไว้ใน folder เดียวกับ printer2.py
+LOGO_PATH         = os.getenv("PRINT_LOGO_PATH", r"C:\GloryMiddleware\printer\logo.png")
+LOGO_WIDTH_PX     = 110   # ความกว้าง logo บนกระดาษ (pixel)
+
+# ลองตามลำดับ; PRINT_FONT_PATH / PRINT_FONT_BOLD_PATH มาก่อน
+FONT_PATHS = [p for p in [os.getenv("PRINT_FONT_PATH")] if p] + [
+    "C:/Windows/Fonts/THSarabunNew.ttf",
+    "C:/Windows/Fonts/Tahoma.ttf",
+    "/usr/share/fonts/truetype/tlwg/Garuda.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+]
+BOLD_FONT_PATHS = [p for p in [os.getenv("PRINT_FONT_BOLD_PATH")] if p] + [
+    "C:/Windows/Fonts/THSarabunNew Bold.ttf",
+    "C:/Windows/Fonts/tahomabd.ttf",
+    "/usr/share/fonts/truetype/tlwg/Garuda-Bold.ttf",
+    "/usr/share/fonts/truetype/noto/NotoSansThai-Bold.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+]
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        try:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+        self.misses += 1
+        value = build()
+        self._data[key] = value
+        if len(self._data) > self.size:
+            self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ReceiptRenderer:
+    """
+    Bitmap ของ receipt: "L" image, 255 = หมึก (ใช้เป็น mask ตอน paste)
+    Thread-safe (lock เดียว) — print service พิมพ์ทีละใบอยู่แล้ว
+    """
+
+    def __init__(self, width_px=RENDER_WIDTH_PX, dpi=RENDER_DPI):
+        self.width_px = width_px
+        self.dpi = dpi
+        self.margin_x = max(4, int(width_px * MARGIN_X_PCT))
+        self.usable_w = width_px - self.margin_x * 2
+        self._lock = threading.RLock()
+        self._fonts = {}
+        self._logos = {}
+        self._runs = _LRU(TEXT_RUN_CACHE)
+        self._blocks = _LRU(BLOCK_CACHE)
+
+    # ── Metrics / resources ──────────────────────────────────────────────────
+
+    def px(self, size_pt):
+        return int(size_pt * self.dpi / 72)
+
+    def line_height(self, size_pt):
+        return int(size_pt * self.dpi / 72 * LINE_SPACING)
+
+    def font(self, size_pt, bold=False):
+        key = (size_pt, bold)
+        font = self._fonts.get(key)
+        if font is None:
+            font = self._load_font(self.px(size_pt), BOLD_FONT_PATHS if bold else FONT_PATHS)
+            self._fonts[key] = font
+        return font
+
+    @staticmethod
+    def _load_font(px, paths):
+        for path in paths:
+            try:
+                font = ImageFont.truetype(path, px)
+                logger.info("Font loaded: %s (%dpx)", path, px)
+                return font
+            except Exception:
+                continue
+        logger.warning("No TrueType font found, using PIL default font")
+        return ImageFont.load_default(px)
+
+    def logo(self, path, target_w):
+        """Logo เป็น "L" mask กว้าง target_w (None ถ้าเปิดไม่ได้)"""
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        key = (path, target_w, mtime)
+        if key not in self._logos:
+            try:
+                img = Image.open(path).convert("L")
+                target_h = max(1, int(target_w * img.height / img.width))
+                img = img.resize((target_w, target_h), Image.LANCZOS)
+                self._logos[key] = Image.eval(img, lambda v: 255 - v)
+            except Exception as e:
+                logger.warning("Logo load failed (%s): %s", path, e)
+                self._logos[key] = None
+        return self._logos[key]
+
+    # ── Text runs ────────────────────────────────────────────────────────────
+
+    def text_width(self, text, size_pt, bold=False):
+        return int(self.font(size_pt, bold).getlength(text) + 0.5)
+
+    def text_run(self, text, size_pt, bold=False):
+        """ข้อความหนึ่งช่วง เป็น mask สูงเท่า line height (cached)"""
+        def build():
+            font = self.font(size_pt, bold)
+            lh = self.line_height(size_pt)
+            img = Image.new("L", (max(1, self.text_width(text, size_pt, bold)), lh), 0)
+            ImageDraw.Draw(img).text((0, (lh - self.px(size_pt)) // 3), text, font=font, fill=255)
+            return img
+        return self._runs.get((text, size_pt, bold), build)
+
+    def _fit(self, text, size_pt, bold):
+        """ตัดข้อความที่ยาวเกินกระดาษแล้วต่อ … (เหมือน printer2.py)"""
+        if self.text_width(text, size_pt, bold) <= self.usable_w:
+            return text
+        display = text
+        while len(display) > 1 and self.text_width(display + "…", size_pt, bold) > self.usable_w:
+            display = display[:-1]
+        return display + "…"
+
+    # ── Blocks ───────────────────────────────────────────────────────────────
+
+    def header(self, line):
+        """logo ซ้าย / company info ขวา — cached ต่อ company, branch, address, phone, logo"""
+        logo_path = line.get("logo_path") or ""
+        logo_w = int(line.get("logo_width_px") or 0)
+        try:
+            logo_mtime = os.path.getmtime(logo_path) if logo_path else None
+        except OSError:
+            logo_mtime = None
+        key = ("header", line.get("company_name", ""), line.get("branch_name", ""),
+               line.get("address", ""), line.get("phone", ""), logo_path, logo_w, logo_mtime)
+
+        def build():
+            logo = self.logo(logo_path, logo_w) if logo_path and logo_w else None
+            text_x = self.margin_x + logo_w + LOGO_GAP_PX
+            rows = [(line.get("company_name", ""), FONT_SIZE_NORMAL + 1, True)]
+            for field in ("branch_name", "address"):
+                if line.get(field):
+                    rows.append((line[field], FONT_SIZE_NORMAL, False))
+            if line.get("phone"):
+                rows.append((f"โทร: {line['phone']}", FONT_SIZE_NORMAL, False))
+
+            text_h = sum(self.line_height(size) for _text, size, _bold in rows)
+            height = max(logo.height if logo else 0, text_h)
+            img = Image.new("L", (self.width_px, height), 0)
+            if logo:
+                img.paste(logo, (self.margin_x, 0))
+            y = 0
+            for text, size, bold in rows:
+                run = self.text_run(text, size, bold)
+                img.paste(255, (text_x, y, text_x + run.width, y + run.height), run)
+                y += self.line_height(size)
+            return img
+        return self._blocks.get(key, build)
+
+    def footer(self, lines):
+        """บรรทัด small ท้าย receipt ทั้ง block (cached)"""
+        key = ("footer",) + tuple((l.get("text", ""), l.get("align", "left")) for l in lines)
+
+        def build():
+            img = Image.new("L", (self.width_px, sum(self._line_height(l) for l in lines)), 0)
+            y = 0
+            for line in lines:
+                self._draw_line(img, line, y)
+                y += self._line_height(line)
+            return img
+        return self._blocks.get(key, build)
+
+    # ── Lines ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _size(line):
+        if line.get("small"):
+            return FONT_SIZE_SMALL
+        if line.get("double_height"):
+            return FONT_SIZE_LARGE
+        return FONT_SIZE_NORMAL
+
+    def _line_height(self, line):
+        """ความสูงของบรรทัด (right_text ที่ไม่พอดีขึ้นบรรทัดใหม่)"""
+        size = self._size(line)
+        lh = self.line_height(size)
+        right = line.get("right_text", "")
+        if right:
+            bold = line.get("bold", False)
+            if self.text_width(line.get("text", ""), size, bold) + self.text_width(right, size, bold) > self.usable_w:
+                return lh * 2
+        return lh
+
+    def _paste(self, img, run, x, y):
+        img.paste(255, (x, y, x + run.width, y + run.height), run)
+
+    def _draw_line(self, img, line, y):
+        text  = line.get("text", "")
+        right = line.get("right_text", "")
+        align = line.get("align", "left")
+        bold  = line.get("bold", False)
+        size  = self._size(line)
+
+        if right:
+            left_run  = self.text_run(text, size, bold)
+            right_run = self.text_run(right, size, bold)
+            self._paste(img, left_run, self.margin_x, y)
+            if left_run.width + right_run.width > self.usable_w:
+                y += self.line_height(size)
+            self._paste(img, right_run, self.width_px - right_run.width - self.margin_x, y)
+        elif text:
+            run = self.text_run(self._fit(text, size, bold), size, bold)
+            if align == "center":
+                x = max(self.margin_x, (self.width_px - run.width) // 2)
+            elif align == "right":
+                x = max(self.margin_x, self.width_px - run.width - self.margin_x)
+            else:
+                x = self.margin_x
+            self._paste(img, run, x, y)
+
+    @staticmethod
+    def _footer_start(lines):
+        start = len(lines)
+        while start > 0 and (lines[start - 1].get("small") or not lines[start - 1].get("text")):
+            start -= 1
+        # ต้องมีบรรทัด small อย่างน้อยหนึ่งบรรทัด
+        while start < len(lines) and not lines[start].get("small"):
+            start += 1
+        return start
+
+    def render_line(self, line):
+        """บรรทัดเดียวเป็น mask (ESC/POS raster fallback); logo_header ได้ทั้ง block"""
+        with self._lock:
+            if line.get("type") == "logo_header":
+                return self.header(line)
+            img = Image.new("L", (self.width_px, self._line_height(line)), 0)
+            self._draw_line(img, line, 0)
+            return img
+
+    def render(self, lines):
+        """receipt ทั้งใบเป็น "L" mask กว้าง width_px"""
+        with self._lock:
+            footer_at = self._footer_start(lines)
+            parts = []
+            for line in lines[:footer_at]:
+                if line.get("type") == "logo_header":
+                    parts.append(("block", self.header(line)))
+                else:
+                    parts.append(("line", line))
+            if footer_at < len(lines):
+                parts.append(("block", self.footer(lines[footer_at:])))
+
+            top = self.line_height(FONT_SIZE_NORMAL) // 2
+            height = top + sum(
+                part.height if kind == "block" else self._line_height(part)
+                for kind, part in parts
+            )
+            img = Image.new("L", (self.width_px, height), 0)
+            y = top
+            for kind, part in parts:
+                if kind == "block":
+                    img.paste(part, (0, y))
+                    y += part.height
+                else:
+                    self._draw_line(img, part, y)
+                    y += self._line_height(part)
+            return img
+
+    # ── Output ───────────────────────────────────────────────────────────────
+
+    def render_image(self, lines):
+        """พร้อมพิมพ์ / preview: RGB ขาว-ดำ"""
+        return Image.eval(self.render(lines), lambda v: 255 - v).convert("RGB")
+
+    def render_png(self, lines):
+        mono = self.render(lines).point(lambda v: 0 if v >= 128 else 255, "1")
+        buf = io.BytesIO()
+        mono.save(buf, "PNG", optimize=False)
+        return buf.getvalue()
+
+    def render_raster(self, lines):
+        """(width_bytes, height, data) 1 bit/dot, 1 = หมึก — สำหรับ ESC/POS GS v 0"""
+        return to_raster(self.render(lines))
+
+    def stats(self):
+        return {
+            "fonts": len(self._fonts),
+            "logos": len(self._logos),
+            "blocks": len(self._blocks),
+            "block_hits": self._blocks.hits,
+            "text_runs": len(self._runs),
+            "text_run_hits": self._runs.hits,
+            "text_run_misses": self._runs.misses,
+        }
+
+
+def to_raster(mask):
+    """"L" mask → packed 1-bit rows (MSB ซ้าย), 1 = หมึก"""
+    mono = mask.point(lambda v: 255 if v >= 128 else 0, "1")
+    width_bytes = (mono.width + 7) // 8
+    # PIL "1" raw: 1 = ขาว(255); mask กลับด้านแล้ว 1 = หมึก
+    return width_bytes, mono.height, mono.tobytes("raw", "1")
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """ReceiptRenderer ของ process (fonts / logo / cache โหลดครั้งเดียว)"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ReceiptRenderer()
+        return _engine